@@ -7,7 +7,12 @@ LobbyView (updated) – sảnh chờ: tạo phòng, xem danh sách phòng & tham
 import re
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import List
+from typing import List, Tuple
+
+try:
+    from Client.list_views import sync_listbox
+except Exception:  # chạy trực tiếp trong thư mục Client
+    from list_views import sync_listbox
 
 FONT_H1 = ("Segoe UI", 16, "bold")
 
@@ -66,6 +71,7 @@ class LobbyView(ttk.Frame):
         self.lst_rooms.pack(fill=tk.BOTH, expand=True)
         self.lst_rooms.bind("<Double-1>", lambda e: self._join_sel())
         self.lst_rooms.bind("<Return>", lambda e: self._join_sel())
+        self._rooms: List[Tuple[str, str]] = []     # (tên, dòng hiển thị) đang có trong lst_rooms
 
         quick = ttk.Frame(join, style="Panel.TFrame")
         quick.pack(fill=tk.X, pady=(10, 0))
@@ -87,9 +93,10 @@ class LobbyView(ttk.Frame):
 
     # callbacks from app
     def populate_rooms(self, rooms: List[dict]) -> None:
-        self.lst_rooms.delete(0, tk.END)
-        for r in rooms:
-            self.lst_rooms.insert(tk.END, f"{r['name']}  [{r['users']}]")
+        new = [(r["name"], f"{r['name']}  [{r['users']}]") for r in rooms]
+        if new != self._rooms:
+            sync_listbox(self.lst_rooms, self._rooms, new)
+            self._rooms = new
 
     # actions
     def _create(self):
@@ -102,7 +109,7 @@ class LobbyView(ttk.Frame):
         sel = self.lst_rooms.curselection()
         if not sel:
             return
-        name = self.lst_rooms.get(sel[0]).split("  [")[0]
+        name = self._rooms[sel[0]][0]
         self.app.join_room(name)
 
     def _join_action(self):
@@ -1,12 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
-from typing import List, Dict
+from typing import List, Optional
 from PIL import Image, ImageTk
 import cv2
 import numpy as np
 from advanced_feature.video_call import VideoCallClient
+try:
+    from Client.list_views import ChatBuffer, ParticipantModel, VirtualList
+    from Client.video_grid import TileCompositor
+except Exception:  # chạy trực tiếp trong thư mục Client
+    from list_views import ChatBuffer, ParticipantModel, VirtualList
+    from video_grid import TileCompositor
 
 FONT_H1 = ("Segoe UI", 16, "bold")
+DISPLAY_FPS = 20          # nhịp vẽ lên Tk, độc lập với số người/khung nhận
+LOCAL_SIZE = (200, 120)
 
 
 class RoomView(ttk.Frame):
@@ -31,11 +39,12 @@ class RoomView(ttk.Frame):
         # Participants
         left = ttk.Labelframe(body, text="Người tham gia", style="Card.TLabelframe", padding=10)
         left.pack(side=tk.LEFT, fill=tk.Y)
-        self.lst_users = tk.Listbox(
-            left, height=18, width=26, bg="#0f172a", fg="#e5e7eb",
-            highlightthickness=0, selectbackground="#6c63ff"
+        self.participants = ParticipantModel()
+        self.lst_users = VirtualList(
+            left, self.participants, height=18, width=26, bg="#0f172a", fg="#e5e7eb",
+            selectbackground="#6c63ff", wrap=tk.NONE, cursor="arrow"
         )
-        self.lst_users.pack(fill=tk.Y)
+        self.lst_users.pack(fill=tk.Y, expand=True)
 
         # Center: video area
         center = ttk.Frame(body, style="TFrame")
@@ -53,12 +62,12 @@ class RoomView(ttk.Frame):
         # Chat
         right = ttk.Labelframe(body, text="Tin nhắn", style="Card.TLabelframe", padding=10)
         right.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.txt_chat = tk.Text(
-            right, height=18, bg="#0f172a", fg="#e5e7eb",
+        self.chat = ChatBuffer()
+        self.txt_chat = VirtualList(
+            right, self.chat, follow_tail=True, height=18, bg="#0f172a", fg="#e5e7eb",
             insertbackground="#e5e7eb", wrap=tk.WORD
         )
         self.txt_chat.pack(fill=tk.BOTH, expand=True)
-        self.txt_chat.configure(state=tk.DISABLED)
         row = ttk.Frame(right, style="Panel.TFrame")
         row.pack(fill=tk.X, pady=(6, 0))
         self.ent_chat = ttk.Entry(row)
@@ -68,52 +77,73 @@ class RoomView(ttk.Frame):
 
         # Video state
         self.vclient: VideoCallClient = None
-        self._local_imgtk = None
-        self._remote_imgtk: Dict[str, ImageTk.PhotoImage] = {}
-        self._remote_frames: Dict[str, np.ndarray] = {}
+        self._local_imgtk: Optional[ImageTk.PhotoImage] = None
+        self._local_frame: Optional[np.ndarray] = None
+        self._remote_imgtk: Optional[ImageTk.PhotoImage] = None
+        self._compositor = TileCompositor()   # không đặt tên `grid`: sẽ che Widget.grid()
         self.cam_visible = False
+        self._closed = False
+        self._present_after = self.after(int(1000 / DISPLAY_FPS), self._present)
 
     # ------------------- Video rendering -------------------
+    # Luồng rx/local của VideoCallClient chỉ đẩy dữ liệu vào compositor/slot;
+    # mọi thao tác Tk nằm trong _present (chạy bằng after() trên luồng GUI).
     def _draw_local(self, frame: np.ndarray):
-        if self.canvas.winfo_width() < 50 or self.canvas.winfo_height() < 50:
-            return
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(rgb).resize((200, 120))
-        self._local_imgtk = ImageTk.PhotoImage(image=img)
-        self.canvas.delete("local")
-        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
-        self.canvas.create_image(w - 10, h - 10, anchor=tk.SE,
-                                 image=self._local_imgtk, tags="local")
+        self._local_frame = frame
 
     def _draw_remote(self, user: str, payload: bytes):
-        arr = np.frombuffer(payload, dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        if img is None:
-            return
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self._remote_frames[user] = rgb
-        self._render_all_remotes()
+        self._compositor.submit(user, payload)
 
-    def _render_all_remotes(self):
-        self.canvas.delete("remote")
-        if not self._remote_frames:
+    def _present(self):
+        if self._closed:
             return
+        try:
+            w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+            if w >= 50 and h >= 50:
+                self._compositor.resize(w, h)
+                self._present_remote(w, h)
+                self._present_local(w, h)
+        finally:
+            if not self._closed:
+                self._present_after = self.after(int(1000 / DISPLAY_FPS), self._present)
+
+    def destroy(self):
+        self._closed = True
+        if self._present_after is not None:
+            self.after_cancel(self._present_after)
+            self._present_after = None
+        self._compositor.close()
+        super().destroy()
+
+    def _present_remote(self, w: int, h: int):
+        frame = self._compositor.take_frame()
+        if frame is None:
+            return
+        img = Image.fromarray(frame)
+        if self._remote_imgtk is None or (self._remote_imgtk.width(), self._remote_imgtk.height()) != img.size:
+            self._remote_imgtk = ImageTk.PhotoImage(image=img)
+            self.canvas.delete("remote")
+            self.canvas.create_image(0, 0, anchor=tk.NW, image=self._remote_imgtk, tags="remote")
+            self.canvas.tag_lower("remote")
+        else:
+            self._remote_imgtk.paste(img)
 
-        users = list(self._remote_frames.keys())
-        count = len(users)
-        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
-
-        cols = int(np.ceil(np.sqrt(count)))
-        rows = int(np.ceil(count / cols))
-        cell_w, cell_h = w // cols, h // rows
-
-        for idx, (user, frame) in enumerate(self._remote_frames.items()):
-            r, c = divmod(idx, cols)
-            x, y = c * cell_w, r * cell_h
-            img = Image.fromarray(frame).resize((cell_w, cell_h))
-            imgtk = ImageTk.PhotoImage(image=img)
-            self._remote_imgtk[user] = imgtk
-            self.canvas.create_image(x, y, anchor=tk.NW, image=imgtk, tags="remote")
+    def _present_local(self, w: int, h: int):
+        frame, self._local_frame = self._local_frame, None
+        if frame is None or not self.cam_visible:
+            return
+        rgb = cv2.cvtColor(cv2.resize(frame, LOCAL_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(rgb)
+        if self._local_imgtk is None:
+            self._local_imgtk = ImageTk.PhotoImage(image=img)
+        else:
+            self._local_imgtk.paste(img)
+        if not self.canvas.find_withtag("local"):
+            self.canvas.create_image(w - 10, h - 10, anchor=tk.SE,
+                                     image=self._local_imgtk, tags="local")
+        else:
+            self.canvas.coords("local", w - 10, h - 10)
+        self.canvas.tag_raise("local")
 
     # ------------------- Camera toggle -------------------
     def _toggle_cam(self) -> None:
@@ -122,7 +152,8 @@ class RoomView(ttk.Frame):
                 self.app.client.host if hasattr(self.app, "client") else "127.0.0.1",
                 getattr(self.app.client, "port", 5000),
                 on_remote_frame=self._draw_remote,
-                on_local_frame=self._draw_local
+                on_local_frame=self._draw_local,
+                lipsync=self.app.get_lipsync() if hasattr(self.app, "get_lipsync") else None
             )
             self.vclient.start(self.app.room or "hp-meeting",
                                self.app.username or "guest")
@@ -152,40 +183,33 @@ class RoomView(ttk.Frame):
 
     def set_room(self, name: str) -> None:
         self._room_name = f"Phòng: {name}"
+        self._compositor.clear()
         self.lbl_title.configure(text=self._title_text())
 
     def set_participants(self, users: List[str]) -> None:
-        self._count = len(users)
-        self.lst_users.delete(0, tk.END)
-        for u in users:
-            self.lst_users.insert(tk.END, u)
+        self.participants.reset(users)
+        self._count = len(self.participants)
+        self.lst_users.refresh()
         self.lbl_title.configure(text=self._title_text())
 
     def user_joined(self, who: str) -> None:
-        self.lst_users.insert(tk.END, who)
-        self._count += 1
-        self.lbl_title.configure(text=self._title_text())
+        if self.participants.add(who):
+            self._count = len(self.participants)
+            self.lst_users.refresh()
+            self.lbl_title.configure(text=self._title_text())
         self.append_chat(f"* {who} đã tham gia vào phòng *")
 
     def user_left(self, who: str) -> None:
-        items = [self.lst_users.get(i) for i in range(self.lst_users.size())]
-        self.lst_users.delete(0, tk.END)
-        self._count = 0
-        for name in items:
-            if name != who:
-                self.lst_users.insert(tk.END, name)
-                self._count += 1
-        self.lbl_title.configure(text=self._title_text())
+        if self.participants.remove(who):
+            self._count = len(self.participants)
+            self.lst_users.refresh()
+            self.lbl_title.configure(text=self._title_text())
         self.append_chat(f"* {who} đã rời đi *")
-        if who in self._remote_frames:
-            del self._remote_frames[who]
-            self._render_all_remotes()
+        self._compositor.remove(who)
 
     def append_chat(self, line: str) -> None:
-        self.txt_chat.configure(state=tk.NORMAL)
-        self.txt_chat.insert(tk.END, line + "\n")
-        self.txt_chat.configure(state=tk.DISABLED)
-        self.txt_chat.see(tk.END)
+        self.chat.append(line)
+        self.txt_chat.refresh()
 
     def _send_chat(self) -> None:
         text = self.ent_chat.get().strip()
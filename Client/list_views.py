@@ -0,0 +1,193 @@
+"""
+Danh sách lớn trong GUI (chat, người tham gia, phòng) cho phòng họp rất đông.
+
+- ChatBuffer / ParticipantModel (không phụ thuộc Tk): dữ liệu nằm ở model,
+  widget chỉ giữ phần đang nhìn thấy. ChatBuffer giữ tối đa `maxlen` dòng gần
+  nhất (append O(1), truy cập theo hàng O(1)); ParticipantModel thêm/xoá O(1)
+  nhờ chỉ mục tên → hàng (xoá = đưa phần tử cuối vào chỗ trống).
+- VirtualList: một tk.Text chỉ chứa các dòng trong khung nhìn + thanh cuộn
+  điều khiển theo model; nhiều thay đổi liên tiếp gộp thành một lần vẽ
+  (after_idle), chi phí mỗi lần vẽ tỉ lệ số dòng nhìn thấy, không phải cỡ model.
+- sync_listbox: cập nhật Listbox theo diff có khoá thay vì xoá/chèn lại toàn bộ
+  (giữ nguyên lựa chọn và vị trí cuộn).
+"""
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+CHAT_MAX_LINES = 5000
+
+
+# ---------- model ----------
+class ChatBuffer:
+    def __init__(self, maxlen: int = CHAT_MAX_LINES) -> None:
+        self.maxlen = maxlen
+        self._lines: List[str] = []
+        self._head = 0              # dòng đầu còn giữ; phần trước đó chờ dọn theo lô
+        self.dropped = 0
+
+    def append(self, line: str) -> None:
+        self._lines.append(line)
+        if len(self._lines) - self._head > self.maxlen:
+            self._head += 1
+            self.dropped += 1
+            if self._head >= self.maxlen:           # dọn theo lô: O(1) khấu hao
+                del self._lines[:self._head]
+                self._head = 0
+
+    def clear(self) -> None:
+        self._lines.clear()
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._lines) - self._head
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._lines[self._head + i]
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        return self._lines[self._head + max(0, start):self._head + max(0, stop)]
+
+
+class ParticipantModel:
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._items: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.reset(names)
+
+    def reset(self, names: Iterable[str]) -> None:
+        self._items = list(dict.fromkeys(names))
+        self._index = {n: i for i, n in enumerate(self._items)}
+
+    def add(self, name: str) -> bool:
+        if name in self._index:
+            return False
+        self._index[name] = len(self._items)
+        self._items.append(name)
+        return True
+
+    def remove(self, name: str) -> bool:
+        i = self._index.pop(name, None)
+        if i is None:
+            return False
+        last = self._items.pop()
+        if i < len(self._items):                    # lấp chỗ trống bằng phần tử cuối
+            self._items[i] = last
+            self._index[last] = i
+        return True
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, i: int) -> str:
+        return self._items[i]
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        return self._items[max(0, start):max(0, stop)]
+
+
+# ---------- widget ----------
+class VirtualList(ttk.Frame):
+    """Hiển thị model (len + slice) trong một tk.Text chỉ chứa các dòng đang thấy."""
+
+    def __init__(self, parent, model, follow_tail: bool = False, **text_kw) -> None:
+        super().__init__(parent, style="TFrame")
+        self.model = model
+        self.follow = follow_tail       # đang ở cuối thì dòng mới kéo khung nhìn theo
+        self.top = 0
+        self.rows = int(text_kw.get("height", 20))
+        self._pending = False
+        text_kw.setdefault("highlightthickness", 0)
+        self.text = tk.Text(self, **text_kw)
+        self.text.configure(state=tk.DISABLED)
+        self.sb = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.sb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.bind("<Configure>", self._on_configure)
+        self.text.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1, 3))
+        self.text.bind("<Button-4>", lambda e: self._scroll(-1, 3))
+        self.text.bind("<Button-5>", lambda e: self._scroll(1, 3))
+
+    def refresh(self) -> None:
+        """Model đã đổi: vẽ lại một lần khi Tk rảnh."""
+        if not self._pending:
+            self._pending = True
+            self.after_idle(self._render)
+
+    def _render(self) -> None:
+        self._pending = False
+        n = len(self.model)
+        if self.follow:
+            self.top = n - self.rows
+        self.top = max(0, min(self.top, n - self.rows))
+        lines = self.model.slice(self.top, self.top + self.rows)
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.configure(state=tk.DISABLED)
+        if self.follow:
+            self.text.see(tk.END)       # dòng dài bị wrap: giữ dòng cuối trong khung
+        if n:
+            self.sb.set(self.top / n, (self.top + len(lines)) / n)
+        else:
+            self.sb.set(0.0, 1.0)
+
+    def _on_configure(self, _e) -> None:
+        line_h = max(1, int(self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace")))
+        rows = max(1, self.text.winfo_height() // line_h)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def _scroll(self, direction: int, amount: int) -> None:
+        self.top += direction * amount
+        self.follow = self.top >= len(self.model) - self.rows
+        self.refresh()
+
+    def _on_scrollbar(self, op: str, value: str, unit: Optional[str] = None) -> None:
+        if op == "moveto":
+            self.top = int(float(value) * len(self.model))
+            self.follow = self.top >= len(self.model) - self.rows
+            self.refresh()
+        elif op == "scroll":
+            self._scroll(int(value), self.rows if unit == "pages" else 1)
+
+
+def sync_listbox(lb: tk.Listbox, old: Sequence[Tuple[Hashable, str]],
+                 new: Sequence[Tuple[Hashable, str]]) -> int:
+    """
+    Đưa Listbox đang hiển thị `old` (danh sách (khoá, chữ)) về `new` bằng ít
+    thao tác nhất có thể theo khoá; trả về số dòng đã đụng tới.
+    """
+    keep = {k for k, _ in new}
+    cur = list(old)
+    ops = 0
+    for i in range(len(cur) - 1, -1, -1):
+        if cur[i][0] not in keep:
+            lb.delete(i)
+            del cur[i]
+            ops += 1
+    for i, (key, text) in enumerate(new):
+        if i < len(cur) and cur[i][0] == key:
+            if cur[i][1] != text:
+                selected = lb.selection_includes(i)
+                lb.delete(i)
+                lb.insert(i, text)
+                if selected:
+                    lb.selection_set(i)
+                cur[i] = (key, text)
+                ops += 1
+            continue
+        j = next((j for j in range(i + 1, len(cur)) if cur[j][0] == key), None)   # đổi chỗ: hiếm
+        if j is not None:
+            lb.delete(j)
+            del cur[j]
+        lb.insert(i, text)
+        cur.insert(i, (key, text))
+        ops += 1
+    return ops
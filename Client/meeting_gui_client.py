@@ -9,39 +9,94 @@ from __future__ import annotations
 import base64
 import json
 import queue
+import random
 import socket
 import struct
+import sys
 import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Optional
+from collections import deque
+from typing import Callable, Deque, Iterable, List, Optional
 
 # --- imports view (ổn định khi chạy -m) ---
+# RoomView kéo theo cv2/numpy/PIL/video_call nên không import ở đây: nó được
+# dựng khi vào phòng lần đầu, và một luồng nền nạp sẵn sau khi màn hình login hiện.
 try:
     from Client.gui_login import LoginView
     from Client.gui_lobby import LobbyView
-    from Client.gui_room import RoomView
 except Exception:  # fallback khi chạy trực tiếp file
     from gui_login import LoginView
     from gui_lobby import LobbyView
-    from gui_room import RoomView
 
 # --- config & crypto helpers ---
 from advanced_feature import config_client
-from server.utils import aes_encrypt, aes_decrypt, CRYPTO_AVAILABLE, recvall
+from server.utils import aes_encrypt, aes_decrypt, CRYPTO_AVAILABLE, preload_crypto, recvall
+
+
+def _import_room_view():
+    try:
+        from Client.gui_room import RoomView
+    except ImportError:  # fallback khi chạy trực tiếp file
+        from gui_room import RoomView
+    return RoomView
+
+
+def _preload_media() -> None:
+    """Luồng nền: import trước stack media + crypto; thiếu gói thì để lúc dùng thật báo lỗi."""
+    for load in (preload_crypto, _import_room_view):
+        try:
+            load()
+        except Exception:
+            pass
 
 # ============================ TCP JSON CLIENT ============================= #
-class TCPJsonClient:
-    """Length‑prefixed JSON over TCP; AES‑GCM after login_ok."""
+RECONNECT_BASE_S = 0.5      # backoff: chờ ngẫu nhiên trong [0, min(MAX, BASE·2^lần)]
+RECONNECT_MAX_S = 15.0
+RESUME_TIMEOUT_S = 3.0      # server không hỗ trợ resume thì im lặng → login lại
+LOGIN_TIMEOUT_S = 10.0
+MAX_PENDING = 256           # tin gửi trong lúc mất kết nối; đầy thì bỏ tin cũ nhất
 
-    def __init__(self, host: str, port: int) -> None:
+class TCPJsonClient:
+    """
+    Length‑prefixed JSON over TCP; AES‑GCM after login_ok.
+
+    Mất kết nối sau khi đã login: luồng rx tự nối lại (backoff mũ + jitter),
+    ưu tiên `resume` bằng token (không login/PBKDF2 lại), không được thì login
+    lại bằng thông tin đã dùng; sau đó vào lại phòng, đăng ký lại UDP và xả
+    các tin gửi trong lúc mất kết nối (hàng đợi có giới hạn). GUI nhận hai tin
+    giả `connection_lost` / `reconnected` để hiển thị trạng thái.
+    """
+
+    def __init__(self, host: str, port: int, on_message: Optional[Callable[[], None]] = None,
+                 coalesce: Iterable[str] = (), auto_reconnect: bool = True,
+                 max_pending: int = MAX_PENDING) -> None:
         self.host = host
         self.port = port
         self.sock: Optional[socket.socket] = None
         self.aes_key: Optional[bytes] = None
         self._rx_thread: Optional[threading.Thread] = None
         self._rx_queue: "queue.Queue[dict]" = queue.Queue()
-        self._alive = False
+        self._closed = threading.Event()
+        self._connected = False
+        self._send_lock = threading.Lock()      # GUI gửi, luồng rx nối lại: không chen nhau trên socket
+        # gọi từ luồng rx khi hàng đợi vừa có tin (tối đa một lần cho tới khi rearm())
+        self.on_message = on_message
+        self._notified = False
+        # loại tin chỉ bản mới nhất có nghĩa (vd. danh sách phòng): giữ một bản, không xếp hàng
+        self.coalesce = frozenset(coalesce)
+        self._latest: dict = {}
+        # nối lại + khôi phục trạng thái
+        self.auto_reconnect = auto_reconnect
+        self._pending: Deque[dict] = deque(maxlen=max_pending)
+        self.pending_dropped = 0
+        self._login: Optional[dict] = None      # payload login gần nhất (khi resume không được)
+        self.username: Optional[str] = None
+        self.token: Optional[str] = None
+        self.room: Optional[str] = None
+        self._udp: dict = {}                    # media → port đã udp_register
+        self.reconnects = 0
 
     # --- send ---
     def _send_plain(self, obj: dict) -> None:
@@ -58,12 +113,33 @@ class TCPJsonClient:
         header = struct.pack("!I", len(blob))
         self.sock.sendall(header + blob)
 
-    def send(self, obj: dict) -> None:
+    def _send_now(self, obj: dict) -> None:
         if self.aes_key is None or obj.get("type") == "login":
             self._send_plain(obj)
         else:
             self._send_secure(obj)
 
+    def send(self, obj: dict) -> None:
+        t = obj.get("type")
+        if t == "login":
+            self._login = dict(obj.get("payload", {}))
+        elif t == "udp_register":
+            p = obj.get("payload", {})
+            self._udp[p.get("media")] = p.get("port")
+        with self._send_lock:
+            if self._connected:
+                try:
+                    self._send_now(obj)
+                    return
+                except OSError:
+                    self._connected = False     # luồng rx cũng sẽ gặp lỗi và nối lại
+                    self._shutdown_sock()
+            if not self.auto_reconnect or self._login is None or t == "login":
+                raise ConnectionError("Not connected to server")
+            if len(self._pending) == self._pending.maxlen:
+                self.pending_dropped += 1
+            self._pending.append(obj)
+
     # --- recv ---
     def _read_plain(self) -> dict:
         assert self.sock is not None
@@ -80,13 +156,15 @@ class TCPJsonClient:
 
     def connect(self) -> None:
         self.sock = socket.create_connection((self.host, self.port), timeout=5)
-        self.sock.settimeout(2)
-        self._alive = True
+        # luồng rx chặn hẳn trên recv (close() shutdown socket để đánh thức nó);
+        # timeout giữa chừng một frame sẽ làm lệch luồng byte
+        self.sock.settimeout(None)
+        self._closed.clear()
+        self._connected = True
         self._rx_thread = threading.Thread(target=self._rx_loop, daemon=True)
         self._rx_thread.start()
 
-    def close(self) -> None:
-        self._alive = False
+    def _shutdown_sock(self) -> None:
         try:
             if self.sock:
                 self.sock.shutdown(socket.SHUT_RDWR)
@@ -98,23 +176,115 @@ class TCPJsonClient:
         except Exception:
             pass
 
+    def close(self) -> None:
+        self._closed.set()
+        self._connected = False
+        self._shutdown_sock()
+
+    def _track(self, msg: dict) -> None:
+        """Cập nhật trạng thái cần khôi phục từ tin server gửi."""
+        t = msg.get("type")
+        if t == "login_ok":
+            key_b64 = msg.get("aes_key_b64")
+            if key_b64:
+                try:
+                    self.aes_key = base64.b64decode(key_b64)
+                except Exception:
+                    self.aes_key = None
+            self.username = msg.get("username") or self.username
+            self.token = msg.get("token")
+        elif t == "join_room_ok":
+            self.room = msg.get("room")
+        elif t == "leave_room_ok":
+            self.room = None
+
+    def _deliver(self, msg: dict) -> None:
+        if msg.get("type") in self.coalesce and msg.get("id") is None:
+            self._latest[msg["type"]] = msg     # bản cũ chưa ai lấy thì bỏ (phản hồi gắn id thì không)
+        else:
+            self._rx_queue.put(msg)
+        if self.on_message is not None and not self._notified:
+            self._notified = True
+            self.on_message()
+
     def _rx_loop(self) -> None:
-        while self._alive and self.sock is not None:
+        while not self._closed.is_set() and self.sock is not None:
             try:
                 msg = self._read_secure() if self.aes_key else self._read_plain()
-                if isinstance(msg, dict) and msg.get("type") == "login_ok":
-                    key_b64 = msg.get("aes_key_b64")
-                    if key_b64:
-                        try:
-                            self.aes_key = base64.b64decode(key_b64)
-                        except Exception:
-                            self.aes_key = None
-                self._rx_queue.put(msg)
-            except socket.timeout:
-                continue
             except Exception:
-                self._alive = False
+                if self._closed.is_set() or not self.auto_reconnect or self._login is None:
+                    break
+                if not self._reconnect():
+                    break
+                continue
+            if not isinstance(msg, dict):
+                continue
+            self._track(msg)
+            self._deliver(msg)
+        self._connected = False
+
+    # --- reconnect ---
+    def _reconnect(self) -> bool:
+        """Chạy trên luồng rx. Trả về False nếu client bị close() trong lúc chờ."""
+        with self._send_lock:
+            self._connected = False
+        self._shutdown_sock()
+        lost_at = time.monotonic()
+        self._deliver({"type": "connection_lost"})
+        attempt = 0
+        while True:
+            # full jitter: nhiều client rớt cùng lúc không nối lại cùng một nhịp
+            delay = random.uniform(0, min(RECONNECT_MAX_S, RECONNECT_BASE_S * 2 ** attempt))
+            attempt += 1
+            if self._closed.wait(delay):
+                return False
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=5)
+                resumed = self._handshake()
                 break
+            except Exception:
+                self._shutdown_sock()
+        with self._send_lock:
+            try:
+                if self.room:
+                    self._send_now({"type": "join_room", "payload": {"room": self.room}})
+                for media, port in self._udp.items():
+                    self._send_now({"type": "udp_register", "payload": {"media": media, "port": port}})
+                while self._pending:
+                    self._send_now(self._pending[0])
+                    self._pending.popleft()
+                self._connected = True
+            except OSError:
+                pass                            # rớt tiếp: lần đọc sau báo lỗi và nối lại
+        self.reconnects += 1
+        self._deliver({"type": "reconnected", "resumed": resumed,
+                       "downtime_s": round(time.monotonic() - lost_at, 3)})
+        return True
+
+    def _handshake(self) -> bool:
+        """Resume bằng token nếu có, không thì login lại. True nếu đã resume."""
+        assert self.sock is not None
+        self.aes_key = None
+        if self.token and self.username:
+            self.sock.settimeout(RESUME_TIMEOUT_S)
+            self._send_plain({"type": "resume", "payload": {"username": self.username, "token": self.token}})
+            try:
+                msg = self._read_plain()
+            except socket.timeout:
+                self.token = None               # server không biết `resume`: lần sau login thẳng
+                raise
+            if msg.get("type") == "login_ok":
+                self._track(msg)
+                self.sock.settimeout(None)
+                return True
+        self.sock.settimeout(LOGIN_TIMEOUT_S)
+        self._send_plain({"type": "login", "payload": self._login})
+        msg = self._read_plain()
+        if msg.get("type") != "login_ok":
+            raise ConnectionError(msg.get("error", "login failed"))
+        self._track(msg)
+        self.sock.settimeout(None)
+        return False
 
     def get_message_nowait(self) -> Optional[dict]:
         try:
@@ -122,6 +292,19 @@ class TCPJsonClient:
         except queue.Empty:
             return None
 
+    def take_latest(self) -> List[dict]:
+        """Lấy (và xoá) bản mới nhất của các loại tin trong `coalesce`."""
+        out = []
+        for t in list(self._latest):
+            msg = self._latest.pop(t, None)
+            if msg is not None:
+                out.append(msg)
+        return out
+
+    def rearm(self) -> None:
+        """GUI đã thấy hàng đợi rỗng: tin kế tiếp lại gọi on_message."""
+        self._notified = False
+
 
 # ================================ THEME ================================== #
 PALETTE = {
@@ -139,6 +322,12 @@ FONT_H1 = ("Segoe UI", 16, "bold")
 FONT_BASE = ("Segoe UI", 11)
 FONT_SMALL = ("Segoe UI", 10)
 
+PRELOAD_DELAY_MS = 150      # để màn hình login vẽ xong rồi mới nạp nền
+
+PUMP_BUDGET_S = 0.008       # mỗi lượt bơm xử lý tin tối đa ~8 ms, còn lại nhường Tk vẽ/nhận input
+PUMP_YIELD_MS = 4           # còn tin sau một lượt: hẹn lượt tiếp sau chừng này
+COALESCE_TYPES = ("rooms",)  # chỉ bản mới nhất có nghĩa: luồng rx giữ một bản thay vì xếp hàng
+
 
 # ============================== MAIN APP ================================= #
 class MeetingApp(tk.Tk):
@@ -150,7 +339,9 @@ class MeetingApp(tk.Tk):
         self.configure(bg=PALETTE["bg"])
 
         # Networking
-        self.client = TCPJsonClient(config_client.SERVER_HOST, config_client.TCP_PORT)
+        self._init_wakeup()
+        self.client = TCPJsonClient(config_client.SERVER_HOST, config_client.TCP_PORT,
+                                    on_message=self._wake_from_rx, coalesce=COALESCE_TYPES)
         self.username: Optional[str] = None
         self.room: Optional[str] = None
 
@@ -159,6 +350,7 @@ class MeetingApp(tk.Tk):
         self.video = None
         self.mic_on = False
         self.cam_on = False
+        self.lipsync = None   # LipSyncScheduler dùng chung cho voice + video
 
         # Styles
         self._init_style()
@@ -171,14 +363,14 @@ class MeetingApp(tk.Tk):
         self.views: dict[str, tk.Frame] = {}
         self.views["LoginView"] = LoginView(self.container, app=self)
         self.views["LobbyView"] = LobbyView(self.container, app=self)
-        self.views["RoomView"] = RoomView(self.container, app=self)
         for v in self.views.values():
             v.grid(row=0, column=0, sticky="nsew")
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
         self.show("LoginView")
-        self.after(60, self._pump_network)
+        self.after(PRELOAD_DELAY_MS, lambda: threading.Thread(
+            target=_preload_media, name="preload-media", daemon=True).start())
 
     # --------------------- Styling --------------------- #
     def _init_style(self) -> None:
@@ -204,8 +396,16 @@ class MeetingApp(tk.Tk):
         style.configure("Card.TLabelframe.Label", background=PALETTE["panel"], foreground=PALETTE["muted"], font=FONT_SMALL)
 
     # --------------------- View switch --------------------- #
+    def _view(self, name: str) -> tk.Frame:
+        """View theo tên; RoomView được dựng lần đầu khi cần."""
+        if name == "RoomView" and name not in self.views:
+            rv = _import_room_view()(self.container, app=self)
+            rv.grid(row=0, column=0, sticky="nsew")
+            self.views[name] = rv           # chỉ lưu view đã dựng xong
+        return self.views[name]
+
     def show(self, name: str) -> None:
-        frame = self.views[name]
+        frame = self._view(name)
         frame.tkraise()
         if hasattr(frame, "on_show"):
             try:
@@ -214,13 +414,65 @@ class MeetingApp(tk.Tk):
                 pass
 
     # --------------------- Networking pump --------------------- #
+    # Luồng rx đánh thức vòng Tk ngay khi có tin thay vì poll after(60):
+    # POSIX dùng socketpair + file handler của Tcl; Windows (Tcl không theo dõi
+    # được socket) dùng sự kiện ảo <<NetRx>>, tkinter chuyển lời gọi về luồng Tk.
+    def _init_wakeup(self) -> None:
+        self._pump_after = None
+        self._wake_r = self._wake_w = None
+        if hasattr(self.tk, "createfilehandler"):
+            self._wake_r, self._wake_w = socket.socketpair()
+            self._wake_r.setblocking(False)
+            self._wake_w.setblocking(False)
+            self.tk.createfilehandler(self._wake_r, tk.READABLE, self._on_wake_fd)
+        else:
+            self.bind("<<NetRx>>", lambda _e: self._on_wake())
+
+    def _wake_from_rx(self) -> None:
+        """Chạy trên luồng rx; không đụng widget."""
+        if self._wake_w is not None:
+            try:
+                self._wake_w.send(b"\0")
+            except OSError:
+                pass
+        else:
+            try:
+                self.event_generate("<<NetRx>>", when="tail")
+            except (tk.TclError, RuntimeError):   # app đang đóng
+                pass
+
+    def _on_wake_fd(self, _fd, _mask) -> None:
+        try:
+            while self._wake_r.recv(512):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        self._on_wake()
+
+    def _on_wake(self) -> None:
+        if self._pump_after is None:      # đã hẹn lượt tiếp thì lượt đó sẽ vét luôn
+            self._pump_network()
+
     def _pump_network(self) -> None:
+        self._pump_after = None
+        deadline = time.perf_counter() + PUMP_BUDGET_S
         while True:
             msg = self.client.get_message_nowait()
             if msg is None:
+                self.client.rearm()
+                msg = self.client.get_message_nowait()   # tin đến giữa get và rearm
+                if msg is None:
+                    break
+            try:
+                self._handle_message(msg)
+            except Exception:
+                self.report_callback_exception(*sys.exc_info())   # một tin hỏng không được làm đứt bơm
+            if time.perf_counter() >= deadline:
+                # còn tin: nhường Tk một nhịp; đánh thức từ luồng rx trong lúc chờ bị bỏ qua (_on_wake)
+                self._pump_after = self.after(PUMP_YIELD_MS, self._pump_network)
                 break
+        for msg in self.client.take_latest():
             self._handle_message(msg)
-        self.after(60, self._pump_network)
 
     def _handle_message(self, msg: dict) -> None:
         t = msg.get("type")
@@ -235,14 +487,13 @@ class MeetingApp(tk.Tk):
                 self.views["LobbyView"].populate_rooms(msg.get("rooms", []))
         elif t == "join_room_ok":
             self.room = msg.get("room")
-            if "RoomView" in self.views:
-                rv = self.views["RoomView"]
-                if hasattr(rv, "set_room"):
-                    rv.set_room(self.room)
-                if hasattr(rv, "set_participants"):
-                    rv.set_participants(msg.get("users", []))
-                if hasattr(rv, "append_chat"):
-                    rv.append_chat(f"— joined room {self.room} —")
+            rv = self._view("RoomView")
+            if hasattr(rv, "set_room"):
+                rv.set_room(self.room)
+            if hasattr(rv, "set_participants"):
+                rv.set_participants(msg.get("users", []))
+            if hasattr(rv, "append_chat"):
+                rv.append_chat(f"— joined room {self.room} —")
             self.show("RoomView")
         elif t == "participant_joined":
             rv = self.views.get("RoomView")
@@ -256,6 +507,10 @@ class MeetingApp(tk.Tk):
             rv = self.views.get("RoomView")
             if rv and hasattr(rv, "append_chat"):
                 rv.append_chat(f"{msg.get('from')}: {p.get('text','')}")
+        elif t == "connection_lost":
+            self.title("HPH Meeting – Client (mất kết nối, đang nối lại…)")
+        elif t == "reconnected":
+            self.title("HPH Meeting – Client")
         elif not msg.get("ok", True):
             messagebox.showerror("Server", msg.get("error", "Unknown error"))
 
@@ -293,6 +548,12 @@ class MeetingApp(tk.Tk):
         self.client.send({"type": "chat", "payload": {"text": text}})
 
     # Media toggles (dùng advanced_feature.voice_chat/video_call)
+    def get_lipsync(self):
+        if self.lipsync is None:
+            from advanced_feature.lipsync import LipSyncScheduler
+            self.lipsync = LipSyncScheduler()
+        return self.lipsync
+
     def toggle_mic(self) -> bool:
         try:
             from advanced_feature.voice_chat import VoiceChatClient
@@ -303,7 +564,8 @@ class MeetingApp(tk.Tk):
             messagebox.showwarning("Audio", "Hãy tham gia phòng trước.")
             return False
         if not self.mic_on:
-            self.voice = VoiceChatClient(config_client.SERVER_HOST, config_client.UDP_PORT_VOICE)
+            self.voice = VoiceChatClient(config_client.SERVER_HOST, config_client.UDP_PORT_VOICE,
+                                         lipsync=self.get_lipsync())
             self.voice.start(self.room, self.username or "user")
             self.mic_on = True
         else:
@@ -324,7 +586,8 @@ class MeetingApp(tk.Tk):
             messagebox.showwarning("Video", "Hãy tham gia phòng trước.")
             return False
         if not self.cam_on:
-            self.video = VideoCallClient(config_client.SERVER_HOST, config_client.UDP_PORT_VIDEO)
+            self.video = VideoCallClient(config_client.SERVER_HOST, config_client.UDP_PORT_VIDEO,
+                                         lipsync=self.get_lipsync())
             self.video.start(self.room, self.username or "user")
             self.cam_on = True
         else:
@@ -0,0 +1,508 @@
+"""
+SDK asyncio cho bot và tích hợp (ghi âm, phiên âm, công cụ quản trị…): nói
+đúng giao thức TCP/UDP của server, không cần Tkinter hay thiết bị âm thanh/hình.
+
+- Login như client GUI: plain tới login_ok, sau đó AES-GCM (server.protocol).
+- request(): gắn `id` vào tin, nhiều request cùng bay trên một kết nối
+  (pipelining); phản hồi khớp theo `id` (server cũ không trả `id` → khớp
+  theo thứ tự gửi). `ok: false` → RequestError.
+- events(*types): async iterator các tin server đẩy (chat, dm,
+  participant_joined/left…) và `connection_lost` / `reconnected`. Mỗi người
+  nghe có hàng đợi giới hạn, đầy thì bỏ tin cũ nhất: bot chậm không làm
+  phình bộ nhớ, cũng không làm chậm các bot khác.
+- Tự nối lại như TCPJsonClient: backoff mũ + jitter, `resume` bằng token,
+  không được thì login lại, rồi vào lại phòng và báo lại relay UDP.
+  send()/request() trong lúc mất kết nối chờ nối lại (tối đa `timeout`).
+- Media UDP tuỳ chọn (open_media): JOIN/KEEPALIVE/LEAVE với relay, gửi/nhận
+  gói HPH2 thô. Payload voice là khung advanced_feature.voice_codec, video là
+  JPEG; SDK không đụng codec hay thiết bị.
+
+Mỗi phiên chỉ là một task đọc (+ một task keepalive nếu mở media) trên event
+loop chung, không có luồng riêng: một tiến trình chạy được hàng trăm bot.
+
+    async with MeetingClient("127.0.0.1", 8888, "bot1", "secret") as c:
+        await c.join_room("demo")
+        await c.chat("hello")
+        async for ev in c.events("chat"):
+            print(ev["from"], ev["payload"]["text"])
+"""
+import asyncio
+import base64
+import contextlib
+import itertools
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from advanced_feature import config_client
+from advanced_feature.lipsync import MEDIA_CLOCK
+from server.protocol import read_any, read_msg, send_any, send_msg
+
+# ---------- gói UDP (như advanced_feature.voice_chat / server.udp_server) ----------
+MAGIC = b"HPH1"
+MAGIC_TS = b"HPH2"
+_HDR = struct.Struct("!4sBHHI")         # magic, type, room_len, user_len, seq
+_HDR_TS = struct.Struct("!4sBHHII")     # + ts (ms, MEDIA_CLOCK)
+
+MSG_VOICE = 1
+MSG_VIDEO = 2
+MSG_SCREEN = 3
+MSG_JOIN = 10
+MSG_LEAVE = 11
+MSG_KEEPALIVE = 12
+
+KEEPALIVE_S = 5.0           # relay bỏ địa chỉ im lặng quá 20 s
+RECONNECT_BASE_S = 0.5      # backoff: chờ ngẫu nhiên trong [0, min(MAX, BASE·2^lần)]
+RECONNECT_MAX_S = 15.0
+RESUME_TIMEOUT_S = 3.0
+REQUEST_TIMEOUT_S = 10.0
+EVENT_BACKLOG = 1024
+MEDIA_BACKLOG = 256
+
+Address = Tuple[str, int]
+
+
+class RequestError(RuntimeError):
+    """Server trả lời `ok: false`; `reply` là nguyên tin lỗi."""
+
+    def __init__(self, reply: dict) -> None:
+        super().__init__(reply.get("error", "request failed"))
+        self.reply = reply
+
+
+class MediaPacket(NamedTuple):
+    kind: int               # MSG_VOICE / MSG_VIDEO / MSG_SCREEN
+    room: str
+    user: str
+    seq: int
+    ts: Optional[int]       # ms theo đồng hồ người gửi (HPH2), None với HPH1
+    payload: bytes
+
+
+def pack_media(mtype: int, room: str, user: str, seq: int, payload: bytes = b"",
+               ts: Optional[int] = None) -> bytes:
+    """ts=None → header HPH1 (gói điều khiển); có ts → HPH2."""
+    room_b, user_b = room.encode(), user.encode()
+    if ts is None:
+        header = _HDR.pack(MAGIC, mtype, len(room_b), len(user_b), seq)
+    else:
+        header = _HDR_TS.pack(MAGIC_TS, mtype, len(room_b), len(user_b), seq, ts & 0xFFFFFFFF)
+    return header + room_b + user_b + payload
+
+
+def parse_media(data: bytes) -> Optional[MediaPacket]:
+    if len(data) < _HDR.size:
+        return None
+    if data[:4] == MAGIC_TS:
+        if len(data) < _HDR_TS.size:
+            return None
+        _, mtype, rlen, ulen, seq, ts = _HDR_TS.unpack_from(data)
+        off = _HDR_TS.size
+    elif data[:4] == MAGIC:
+        _, mtype, rlen, ulen, seq = _HDR.unpack_from(data)
+        ts, off = None, _HDR.size
+    else:
+        return None
+    try:
+        room = data[off:off + rlen].decode()
+        user = data[off + rlen:off + rlen + ulen].decode()
+    except UnicodeDecodeError:
+        return None
+    return MediaPacket(mtype, room, user, seq, ts, data[off + rlen + ulen:])
+
+
+# ---------- hàng đợi người nghe ----------
+class Subscription:
+    """
+    Async iterator trên một hàng đợi giới hạn (đầy thì bỏ tin cũ nhất, đếm ở
+    `dropped`). Đăng ký ngay khi tạo nên không lỡ tin giữa lúc tạo và lúc
+    bắt đầu `async for`; close() (hoặc `with`) để huỷ đăng ký.
+    """
+
+    def __init__(self, registry: list, kinds, backlog: int) -> None:
+        self.kinds = frozenset(kinds) or None
+        self.dropped = 0
+        self._q: asyncio.Queue = asyncio.Queue(maxsize=backlog)
+        self._registry = registry
+        registry.append(self)
+
+    def offer(self, item) -> None:
+        try:
+            self._q.put_nowait(item)
+        except asyncio.QueueFull:
+            self._q.get_nowait()
+            self._q.put_nowait(item)
+            self.dropped += 1
+
+    def end(self) -> None:
+        """Client đóng: người đang chờ thoát khỏi `async for`."""
+        with contextlib.suppress(ValueError):
+            self._registry.remove(self)
+        self.offer(None)
+
+    def close(self) -> None:
+        with contextlib.suppress(ValueError):
+            self._registry.remove(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self):
+        item = await self._q.get()
+        if item is None:
+            self._q.put_nowait(None)        # đọc lại sau khi đóng vẫn kết thúc
+            raise StopAsyncIteration
+        return item
+
+    async def get(self, timeout: Optional[float] = None):
+        """Tin kế tiếp (None nếu client đã đóng); hết `timeout` → asyncio.TimeoutError."""
+        try:
+            return await asyncio.wait_for(self.__anext__(), timeout)
+        except StopAsyncIteration:
+            return None
+
+
+class _MediaProto(asyncio.DatagramProtocol):
+    def __init__(self, client: "MeetingClient") -> None:
+        self.client = client
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.client._on_datagram(data, addr)
+
+    def error_received(self, exc) -> None:
+        pass                                # ICMP unreachable khi relay chưa lên: bỏ qua
+
+
+# ---------- client ----------
+class MeetingClient:
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, username: str = "",
+                 password: str = "", auto_reconnect: bool = True, timeout: float = REQUEST_TIMEOUT_S,
+                 event_backlog: int = EVENT_BACKLOG) -> None:
+        self.host = host or config_client.SERVER_HOST
+        self.port = port or config_client.TCP_PORT
+        self.username = username
+        self.password = password
+        self.auto_reconnect = auto_reconnect
+        self.timeout = timeout
+        self.event_backlog = event_backlog
+        self.token: Optional[str] = None
+        self.aes_key: Optional[bytes] = None
+        self.room: Optional[str] = None
+        self.reconnects = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._rx_task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()       # đã login (và vào lại phòng sau khi nối lại)
+        self._closed = True
+        self._ids = itertools.count(1)
+        self._waiters: "OrderedDict[int, asyncio.Future]" = OrderedDict()
+        self._subs: List[Subscription] = []
+        # media
+        self._udp: Optional[asyncio.DatagramTransport] = None
+        self._targets: Dict[int, Address] = {}
+        self._relays: set = set()
+        self._media_subs: List[Subscription] = []
+        self._seq = {MSG_VOICE: 0, MSG_VIDEO: 0, MSG_SCREEN: 0}
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "MeetingClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set() and not self._closed
+
+    # --- kết nối ---
+    async def connect(self) -> dict:
+        """Mở kết nối và login; trả về login_ok. Sai mật khẩu… → RequestError."""
+        self._closed = False
+        self._ready.clear()
+        reply, _ = await self._open(resume=False)
+        self._rx_task = asyncio.create_task(self._rx_loop())
+        self._ready.set()
+        return reply
+
+    async def _open(self, resume: bool) -> Tuple[dict, bool]:
+        """Kết nối + resume/login; trả về (login_ok, đã resume)."""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self.aes_key = None
+        try:
+            if resume and self.token:
+                await send_msg(self._writer, {"type": "resume",
+                                              "payload": {"username": self.username, "token": self.token}})
+                try:
+                    reply = await asyncio.wait_for(read_msg(self._reader), RESUME_TIMEOUT_S)
+                except asyncio.TimeoutError:
+                    self.token = None       # server không biết `resume`: lần sau login thẳng
+                    raise
+                if reply.get("type") == "login_ok":
+                    self._track(reply)
+                    return reply, True
+            await send_msg(self._writer, {"type": "login", "payload": {"username": self.username,
+                                                                       "password": self.password}})
+            reply = await asyncio.wait_for(read_msg(self._reader), self.timeout)
+            if reply.get("type") != "login_ok":
+                raise RequestError(reply)
+            self._track(reply)
+            return reply, False
+        except BaseException:
+            self._drop_writer()
+            raise
+
+    def _drop_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self) -> None:
+        """Logout (server xoá phiên, không giữ chờ resume) và đóng mọi thứ."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._ready.is_set() and self._writer is not None:
+            with contextlib.suppress(Exception):
+                await asyncio.wait_for(send_any(self._writer, {"type": "logout", "payload": {}}, self.aes_key), 1.0)
+        self.close_media()
+        if self._rx_task is not None:
+            self._rx_task.cancel()
+            await asyncio.gather(self._rx_task, return_exceptions=True)
+            self._rx_task = None
+        self._drop_writer()
+        self._fail_waiters(ConnectionError("client closed"))
+        for sub in self._subs[:] + self._media_subs[:]:
+            sub.end()
+        self._ready.set()                   # ai đang chờ kết nối lại: thức dậy và nhận ConnectionError
+
+    def _fail_waiters(self, exc: Exception) -> None:
+        waiters, self._waiters = self._waiters, OrderedDict()
+        for fut in waiters.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    async def _rx_loop(self) -> None:
+        while True:
+            try:
+                msg = await read_any(self._reader, self.aes_key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if self._closed:
+                    return
+                self._fail_waiters(ConnectionError("connection lost"))
+                if not self.auto_reconnect:
+                    self._ready.clear()
+                    self._drop_writer()
+                    self._publish({"type": "connection_lost"})
+                    return
+                await self._reconnect()
+                continue
+            if isinstance(msg, dict):
+                self._dispatch(msg)
+
+    async def _reconnect(self) -> None:
+        self._ready.clear()
+        self._drop_writer()
+        lost_at = time.monotonic()
+        self._publish({"type": "connection_lost"})
+        attempt = 0
+        while True:
+            # full jitter: cả trăm bot rớt cùng lúc không nối lại cùng một nhịp
+            await asyncio.sleep(random.uniform(0, min(RECONNECT_MAX_S, RECONNECT_BASE_S * 2 ** attempt)))
+            attempt += 1
+            try:
+                _, resumed = await self._open(resume=True)
+                if self.room:
+                    # không chờ join_room_ok (tới qua _rx_loop như một event): tin gửi
+                    # sau khi _ready bật vẫn tới server sau join_room
+                    await send_any(self._writer, {"type": "join_room", "id": next(self._ids),
+                                                  "payload": {"room": self.room}}, self.aes_key)
+                break
+            except Exception:
+                self._drop_writer()
+        self._media_ctrl(MSG_JOIN)
+        self.reconnects += 1
+        self._ready.set()
+        self._publish({"type": "reconnected", "resumed": resumed,
+                       "downtime_s": round(time.monotonic() - lost_at, 3)})
+
+    def _track(self, msg: dict) -> None:
+        t = msg.get("type")
+        if t == "login_ok":
+            key_b64 = msg.get("aes_key_b64")
+            self.aes_key = base64.b64decode(key_b64) if key_b64 else None
+            self.token = msg.get("token")
+            self.username = msg.get("username") or self.username
+        elif t == "join_room_ok":
+            self.room = msg.get("room")
+        elif t == "leave_room_ok":
+            self.room = None
+
+    def _dispatch(self, msg: dict) -> None:
+        self._track(msg)
+        if "ok" in msg:                     # chỉ phản hồi có `ok`; tin server tự đẩy thì không
+            rid = msg.get("id")
+            if rid is not None:
+                fut = self._waiters.pop(rid, None)
+            else:
+                fut = self._waiters.popitem(last=False)[1] if self._waiters else None
+            if fut is not None and not fut.done():
+                fut.set_result(msg)
+                return
+        self._publish(msg)
+
+    def _publish(self, msg: dict) -> None:
+        t = msg.get("type")
+        for sub in self._subs:
+            if sub.kinds is None or t in sub.kinds:
+                sub.offer(msg)
+
+    # --- gửi ---
+    async def _wait_ready(self, timeout: float) -> None:
+        if self._closed:
+            raise ConnectionError("client closed")
+        if not self._ready.is_set():
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            if self._closed:
+                raise ConnectionError("client closed")
+
+    async def send(self, type_: str, payload: Optional[dict] = None) -> None:
+        """Gửi không chờ phản hồi (chat, dm…)."""
+        await self._wait_ready(self.timeout)
+        await send_any(self._writer, {"type": type_, "payload": payload or {}}, self.aes_key)
+
+    async def request(self, type_: str, payload: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        """Gửi và chờ phản hồi; gọi song song thoải mái (các request đi nối đuôi trên một kết nối)."""
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        await self._wait_ready(timeout)
+        rid = next(self._ids)
+        fut = loop.create_future()
+        self._waiters[rid] = fut
+        try:
+            await send_any(self._writer, {"type": type_, "id": rid, "payload": payload or {}}, self.aes_key)
+            reply = await asyncio.wait_for(fut, max(0.0, deadline - loop.time()))
+        finally:
+            self._waiters.pop(rid, None)
+        if not reply.get("ok", True):
+            raise RequestError(reply)
+        return reply
+
+    def events(self, *types: str, backlog: Optional[int] = None) -> Subscription:
+        """Tin server đẩy (lọc theo `type`, không truyền = tất cả)."""
+        return Subscription(self._subs, types, backlog or self.event_backlog)
+
+    # --- tiện ích ---
+    async def create_room(self, room: str) -> dict:
+        return await self.request("create_room", {"room": room})
+
+    async def join_room(self, room: str) -> List[str]:
+        """Vào phòng; trả về danh sách người đang trong phòng."""
+        old = self.room
+        reply = await self.request("join_room", {"room": room})
+        if old and old != self.room:
+            self._media_ctrl(MSG_LEAVE, old)
+        self._media_ctrl(MSG_JOIN)
+        return reply.get("users", [])
+
+    async def leave_room(self) -> None:
+        old = self.room
+        await self.request("leave_room")
+        if old:
+            self._media_ctrl(MSG_LEAVE, old)
+
+    async def list_rooms(self) -> List[dict]:
+        return (await self.request("list_rooms")).get("rooms", [])
+
+    async def chat(self, text: str) -> None:
+        await self.send("chat", {"text": text})
+
+    async def dm(self, to: str, text: str) -> None:
+        await self.send("dm", {"to": to, "text": text})
+
+    # ---------- media UDP (không cần thiết bị) ----------
+    async def open_media(self, voice: bool = True, video: bool = False, host: Optional[str] = None,
+                         voice_port: Optional[int] = None, video_port: Optional[int] = None) -> None:
+        """Một socket UDP cho cả voice và video; đang ở phòng thì JOIN ngay."""
+        if self._udp is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # relay trả gói từ địa chỉ IP: so khớp nguồn theo IP, không theo tên máy
+        host = (await loop.getaddrinfo(host or self.host, None, family=socket.AF_INET))[0][4][0]
+        if voice:
+            self._targets[MSG_VOICE] = (host, voice_port or config_client.UDP_PORT_VOICE)
+        if video:
+            self._targets[MSG_VIDEO] = self._targets[MSG_SCREEN] = (host, video_port or config_client.UDP_PORT_VIDEO)
+        self._relays = set(self._targets.values())
+        self._udp, _ = await loop.create_datagram_endpoint(lambda: _MediaProto(self), local_addr=("0.0.0.0", 0))
+        self._media_ctrl(MSG_JOIN)
+        self._keepalive_task = asyncio.create_task(self._keepalive())
+
+    def close_media(self) -> None:
+        if self._udp is None:
+            return
+        self._media_ctrl(MSG_LEAVE)
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        self._udp.close()
+        self._udp = None
+        self._targets.clear()
+        self._relays.clear()
+
+    def media(self, *kinds: int, backlog: int = MEDIA_BACKLOG) -> Subscription:
+        """Gói media của người khác trong phòng hiện tại (lọc theo MSG_VOICE/MSG_VIDEO/MSG_SCREEN)."""
+        return Subscription(self._media_subs, kinds, backlog)
+
+    def send_voice(self, payload: bytes, ts: Optional[int] = None) -> None:
+        """payload = khung voice_codec (codec_id | dữ liệu); ts mặc định là bây giờ."""
+        self._send_media(MSG_VOICE, payload, ts)
+
+    def send_video(self, payload: bytes, ts: Optional[int] = None) -> None:
+        self._send_media(MSG_VIDEO, payload, ts)
+
+    def _send_media(self, mtype: int, payload: bytes, ts: Optional[int]) -> None:
+        target = self._targets.get(mtype)
+        if self._udp is None or target is None or not self.room:
+            return
+        self._seq[mtype] += 1
+        self._udp.sendto(pack_media(mtype, self.room, self.username, self._seq[mtype], payload,
+                                    MEDIA_CLOCK.now_ms() if ts is None else ts), target)
+
+    def _media_ctrl(self, mtype: int, room: Optional[str] = None) -> None:
+        room = room or self.room
+        if self._udp is None or not room:
+            return
+        pkt = pack_media(mtype, room, self.username, 0)
+        for addr in self._relays:
+            self._udp.sendto(pkt, addr)
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(KEEPALIVE_S)
+            if self._ready.is_set():
+                self._media_ctrl(MSG_KEEPALIVE)
+
+    def _on_datagram(self, data: bytes, addr) -> None:
+        if addr not in self._relays or not self._media_subs:
+            return
+        pkt = parse_media(data)
+        if pkt is None or pkt.room != self.room or pkt.user == self.username:
+            return
+        for sub in self._media_subs:
+            if sub.kinds is None or pkt.kind in sub.kinds:
+                sub.offer(pkt)
@@ -0,0 +1,195 @@
+"""
+Render video từ xa cho RoomView, không chạm Tk ngoài luồng GUI.
+
+- TileCompositor (không phụ thuộc Tk): nhận JPEG từ luồng rx, giải mã trong
+  thread pool (mỗi người tối đa một job; khung mới ghi đè khung chờ), giải mã
+  giảm độ phân giải (IMREAD_REDUCED_*) khi ô nhỏ hơn nhiều so với ảnh gốc, rồi
+  ghi thẳng vào đúng ô của một ảnh ghép RGB duy nhất và đánh dấu dirty.
+- Luồng Tk chỉ việc lấy ảnh ghép khi dirty, với nhịp hiển thị giới hạn
+  (xem RoomView._present), và paste vào một PhotoImage cố định.
+"""
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+BG_COLOR = (11, 18, 32)   # #0b1220
+DEFAULT_SRC = (640, 360)
+_REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def grid_layout(count: int, width: int, height: int) -> Tuple[int, int, int, int]:
+    """(cols, rows, cell_w, cell_h) cho `count` ô trên vùng width x height."""
+    if count <= 0:
+        return 0, 0, 0, 0
+    cols = int(math.ceil(math.sqrt(count)))
+    rows = int(math.ceil(count / cols))
+    return cols, rows, max(1, width // cols), max(1, height // rows)
+
+
+def decode_to_tile(payload: bytes, cell_w: int, cell_h: int,
+                   src_size: Tuple[int, int] = DEFAULT_SRC) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """Giải mã JPEG thẳng về kích thước ô (RGB). Trả về (tile, kích thước ảnh gốc)."""
+    arr = np.frombuffer(payload, dtype=np.uint8)
+    sw, sh = src_size
+    flag, factor = cv2.IMREAD_COLOR, 1
+    for f, fl in _REDUCED:
+        if sw // f >= cell_w and sh // f >= cell_h:
+            flag, factor = fl, f
+            break
+    img = cv2.imdecode(arr, flag)
+    if img is None:
+        return None, src_size
+    src = (img.shape[1] * factor, img.shape[0] * factor)
+    if img.shape[1] != cell_w or img.shape[0] != cell_h:
+        interp = cv2.INTER_AREA if img.shape[1] > cell_w else cv2.INTER_LINEAR
+        img = cv2.resize(img, (cell_w, cell_h), interpolation=interp)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB), src
+
+
+class TileCompositor:
+    def __init__(self, width: int = 640, height: int = 360, workers: int = 2) -> None:
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video-decode")
+        self._users: List[str] = []
+        self._pending: Dict[str, bytes] = {}
+        self._inflight: Set[str] = set()
+        self._tiles: Dict[str, np.ndarray] = {}        # tile RGB đã giải mã (kích thước ô hiện tại)
+        self._src: Dict[str, Tuple[int, int]] = {}
+        self._w, self._h = max(1, width), max(1, height)
+        self._layout = grid_layout(0, self._w, self._h)
+        self._canvas = np.empty((self._h, self._w, 3), dtype=np.uint8)
+        self._canvas[:] = BG_COLOR
+        self._dirty = True
+        self._closed = False
+        # counters
+        self.submitted = 0
+        self.coalesced = 0     # khung bị ghi đè trước khi kịp giải mã
+        self.decoded = 0
+        self.presented = 0
+
+    # ---------- từ luồng rx ----------
+    def submit(self, user: str, payload: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self.submitted += 1
+            if user not in self._users:
+                self._users.append(user)
+                self._relayout()
+            if user in self._pending:
+                self.coalesced += 1
+            self._pending[user] = payload
+            if user in self._inflight:
+                return
+            self._inflight.add(user)
+        self._pool.submit(self._decode_user, user)
+
+    def _decode_user(self, user: str) -> None:
+        while True:
+            with self._lock:
+                payload = self._pending.pop(user, None)
+                if payload is None or user not in self._users:
+                    self._inflight.discard(user)
+                    return
+                cols, rows, cw, ch = self._layout
+                src = self._src.get(user, DEFAULT_SRC)
+            try:
+                tile, src = decode_to_tile(payload, cw, ch, src)
+            except Exception:
+                tile = None
+            if tile is None:
+                continue
+            with self._lock:
+                self.decoded += 1
+                self._src[user] = src
+                if self._layout[2:] != (cw, ch) or user not in self._users:
+                    continue   # layout đổi trong lúc giải mã → bỏ, khung sau sẽ vẽ
+                self._tiles[user] = tile
+                self._blit(user, tile)
+
+    # ---------- layout ----------
+    def remove(self, user: str) -> None:
+        with self._lock:
+            if user in self._users:
+                self._users.remove(user)
+                self._pending.pop(user, None)
+                self._tiles.pop(user, None)
+                self._src.pop(user, None)
+                self._relayout()
+
+    def resize(self, width: int, height: int) -> None:
+        width, height = max(1, width), max(1, height)
+        with self._lock:
+            if (width, height) == (self._w, self._h):
+                return
+            self._w, self._h = width, height
+            self._canvas = np.empty((height, width, 3), dtype=np.uint8)
+            self._relayout()
+
+    def _relayout(self) -> None:
+        """Gọi khi giữ lock: tính lại lưới, co giãn các tile đã có, vẽ lại toàn bộ."""
+        self._layout = grid_layout(len(self._users), self._w, self._h)
+        cols, rows, cw, ch = self._layout
+        self._canvas[:] = BG_COLOR
+        for user in self._users:
+            tile = self._tiles.get(user)
+            if tile is None:
+                continue
+            if tile.shape[1] != cw or tile.shape[0] != ch:
+                tile = cv2.resize(tile, (cw, ch), interpolation=cv2.INTER_AREA)
+                self._tiles[user] = tile
+            self._blit(user, tile)
+        self._dirty = True
+
+    def _blit(self, user: str, tile: np.ndarray) -> None:
+        cols, rows, cw, ch = self._layout
+        idx = self._users.index(user)
+        r, c = divmod(idx, cols)
+        self._canvas[r * ch:(r + 1) * ch, c * cw:(c + 1) * cw] = tile
+        self._dirty = True
+
+    # ---------- từ luồng Tk ----------
+    def take_frame(self) -> Optional[np.ndarray]:
+        """Bản sao ảnh ghép nếu có thay đổi kể từ lần lấy trước, ngược lại None."""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            self.presented += 1
+            return self._canvas.copy()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self._w, self._h
+
+    @property
+    def users(self) -> List[str]:
+        with self._lock:
+            return list(self._users)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._pending.clear()
+            self._tiles.clear()
+            self._src.clear()
+            self._relayout()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "participants": len(self._users),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "decoded": self.decoded,
+                "presented": self.presented,
+            }
@@ -18,4 +18,8 @@ UDP_PORT = UDP_PORT_VOICE
 GATEWAY_PORT = 8765
 WS_PORT = GATEWAY_PORT
 
+# Địa chỉ được mở kết nối mux (gateway gom nhiều phiên, `--gateway-mux`).
+# Gateway chạy máy khác thì thêm IP của nó vào đây (hoặc HPH_MUX_ALLOW).
+MUX_ALLOWED_PEERS = ("127.0.0.1", "::1")
+
 APP_NAME = "HPH Meeting – Server"
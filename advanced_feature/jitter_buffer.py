@@ -0,0 +1,268 @@
+"""
+Jitter buffer thích ứng (per-sender) + mixer cho voice chat.
+
+- JitterBuffer: sắp xếp lại gói theo `seq`, bỏ gói đến trễ, che gói mất (PLC)
+  bằng cách lặp lại khung cuối với biên độ giảm dần. Độ sâu mục tiêu tự điều
+  chỉnh theo jitter đo được (ước lượng kiểu RFC 3550).
+- Gói CN (comfort noise, DTX): khi tới lượt phát, buffer chuyển sang chế độ
+  sinh nhiễu nền cho tới khi có đủ khung thoại mới (thích ứng độ trễ ở đầu
+  mỗi lượt nói).
+- Timestamp media (nếu có, header HPH2) đi kèm từng khung; `played_ts` là ts
+  của khung thoại vừa pop(), dùng cho lip-sync. `extra_depth` (do
+  LipSyncScheduler yêu cầu) cộng thêm vào độ sâu mục tiêu.
+- mix_frames: trộn các khung int16 của nhiều người nói thành một khung.
+"""
+import math
+import time
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from .vad import ComfortNoise
+
+SEQ_MOD = 1 << 32
+
+
+def seq_diff(a: int, b: int) -> int:
+    """a - b theo modulo 2^32 (âm nếu a đứng trước b)."""
+    d = (a - b) & 0xFFFFFFFF
+    return d - SEQ_MOD if d >= 0x80000000 else d
+
+
+class JitterBuffer:
+    """Buffer cho một người gửi; push() từ luồng rx, pop() từ đồng hồ phát."""
+
+    def __init__(self,
+                 frame_samples: int = 320,
+                 frame_ms: int = 20,
+                 min_depth: int = 2,
+                 max_depth: int = 12,
+                 max_plc: int = 5,
+                 cn_timeout: int = 150) -> None:
+        self.frame_samples = frame_samples
+        self.frame_ms = frame_ms
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.max_plc = max_plc
+        self.cn_timeout = cn_timeout   # số khung CN tối đa khi không nhận được gì
+        self.target_depth = min_depth
+        self.extra_depth = 0           # độ sâu thêm cho lip-sync (khung)
+        self.applied_extra = 0         # phần extra_depth đã có hiệu lực (từ lần nạp gần nhất)
+        self._want_depth = min_depth
+
+        self._frames: Dict[int, Union[np.ndarray, int]] = {}   # khung PCM hoặc mức CN
+        self._ts: Dict[int, int] = {}                          # seq -> media ts (ms)
+        self.played_ts: Optional[int] = None
+        self._next_seq: Optional[int] = None
+        self._playing = False
+        self._last: Optional[np.ndarray] = None
+        self._plc_run = 0
+        self._cn = ComfortNoise(frame_samples)
+        self._cn_active = False
+        self._cn_idle = 0
+
+        # ước lượng jitter (ms)
+        self._ref_seq: Optional[int] = None
+        self._ref_arrival = 0.0
+        self._last_transit: Optional[float] = None
+        self.jitter_ms = 0.0
+
+        # counters
+        self.received = 0
+        self.played = 0
+        self.late = 0
+        self.lost = 0
+        self.underrun = 0
+        self.duplicate = 0
+        self.dropped = 0   # bỏ bớt khi buffer quá sâu
+        self.undecodable = 0   # khung sai kích thước
+        self.cn_frames = 0
+        self.last_arrival = 0.0
+
+    # ---------- rx side ----------
+    def push(self, seq: int, pcm: bytes, arrival: Optional[float] = None, ts: Optional[int] = None) -> bool:
+        """Đưa một khung vào buffer. Trả về False nếu gói bị bỏ (trễ/trùng/sai kích thước)."""
+        if len(pcm) != self.frame_samples * 2:
+            # gói PCM lẻ byte / sai cỡ từ một peer bất kỳ: bỏ, không để frombuffer ném lỗi
+            self.undecodable += 1
+            return False
+        return self._insert(seq, np.frombuffer(pcm, dtype=np.int16), arrival, ts)
+
+    def push_cn(self, seq: int, level: int, arrival: Optional[float] = None, ts: Optional[int] = None) -> bool:
+        """Gói mô tả comfort noise (DTX) với mức -dBov."""
+        return self._insert(seq, int(level), arrival, ts)
+
+    def _insert(self, seq: int, item: Union[np.ndarray, int], arrival: Optional[float],
+                ts: Optional[int] = None) -> bool:
+        if arrival is None:
+            arrival = time.monotonic()
+        self.last_arrival = arrival
+        self._cn_idle = 0
+        self._update_jitter(seq, arrival)
+
+        if self._next_seq is None:
+            self._next_seq = seq
+        d = seq_diff(seq, self._next_seq)
+        if d < 0:
+            self.late += 1
+            return False
+        if d > self.max_depth * 4 and not self._cn_active:
+            # người gửi khởi động lại hoặc mất rất nhiều gói → bắt đầu lại
+            self.reset()
+            self._next_seq = seq
+        if seq in self._frames:
+            self.duplicate += 1
+            return False
+
+        self._frames[seq] = item
+        if ts is not None:
+            self._ts[seq] = ts
+        self.received += 1
+        return True
+
+    def _update_jitter(self, seq: int, arrival: float) -> None:
+        if self._ref_seq is None:
+            self._ref_seq = seq
+            self._ref_arrival = arrival
+        transit = (arrival - self._ref_arrival) * 1000.0 - seq_diff(seq, self._ref_seq) * self.frame_ms
+        if self._last_transit is not None:
+            self.jitter_ms += (abs(transit - self._last_transit) - self.jitter_ms) / 16.0
+        self._last_transit = transit
+        self._want_depth = int(math.ceil(2.0 * self.jitter_ms / self.frame_ms)) + 1
+        self._update_target()
+
+    def _update_target(self) -> None:
+        base = max(self.min_depth, min(self.max_depth, self._want_depth))
+        self.target_depth = base + self.extra_depth
+
+    def set_extra_depth(self, frames: int) -> None:
+        """Độ trễ thêm (khung) cho lip-sync; chỉ có hiệu lực khi buffer nạp lại
+        (đầu lượt nói sau DTX/CN) nên không gây méo tiếng."""
+        frames = max(0, int(frames))
+        if frames != self.extra_depth:
+            self.extra_depth = frames
+            self._update_target()
+
+    # ---------- playout side ----------
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def pop(self) -> Optional[np.ndarray]:
+        """Lấy khung 20 ms tiếp theo; None nếu đang nạp lại buffer (không phát gì)."""
+        self.played_ts = None
+        if self._next_seq is None:
+            return None
+        if not self._playing:
+            if len(self._frames) < self.target_depth:
+                return None
+            # bắt đầu phát từ khung sớm nhất đang có
+            self._next_seq = min(self._frames, key=lambda s: seq_diff(s, self._next_seq))
+            self._playing = True
+            self.applied_extra = self.extra_depth
+
+        if self._cn_active:
+            if not self._frames:
+                self._cn_idle += 1
+                if self._cn_idle > self.cn_timeout:
+                    # người gửi đã rời đi / ngừng gửi hẳn
+                    self._playing = False
+                    self._cn_active = False
+                    return None
+                return self._comfort_noise()
+            first = min(self._frames, key=lambda s: seq_diff(s, self._next_seq))
+            if not isinstance(self._frames[first], int) and len(self._frames) < self.target_depth:
+                # đầu lượt nói mới: tiếp tục CN cho tới khi đủ độ sâu mục tiêu
+                return self._comfort_noise()
+            self._next_seq = first
+            self._cn_active = False
+            self.applied_extra = self.extra_depth
+
+        frame = self._frames.pop(self._next_seq, None)
+        ts = self._ts.pop(self._next_seq, None)
+        if isinstance(frame, int):
+            self._next_seq = (self._next_seq + 1) & 0xFFFFFFFF
+            self._cn.level = frame
+            self._cn_active = True
+            self._plc_run = 0
+            return self._comfort_noise()
+        if frame is not None:
+            self._next_seq = (self._next_seq + 1) & 0xFFFFFFFF
+            self._last = frame
+            self._plc_run = 0
+            self.played += 1
+            self.played_ts = ts
+            # buffer sâu hơn mục tiêu nhiều → bỏ một khung để giảm trễ
+            if len(self._frames) > self.target_depth + 2:
+                if self._frames.pop(self._next_seq, None) is not None:
+                    self.dropped += 1
+                self._ts.pop(self._next_seq, None)
+                self._next_seq = (self._next_seq + 1) & 0xFFFFFFFF
+            return frame
+
+        if not self._frames:
+            # buffer rỗng: che lỗi nhưng giữ nguyên next_seq để gói đến muộn
+            # vẫn được phát (buffer tự sâu thêm một khung)
+            if self._plc_run >= self.max_plc:
+                # người gửi ngừng gửi → dừng phát, chờ nạp lại
+                self._playing = False
+                return None
+            self.underrun += 1
+        else:
+            # đã có khung sau → khung này coi như mất
+            self._ts.pop(self._next_seq, None)
+            self.lost += 1
+            self._next_seq = (self._next_seq + 1) & 0xFFFFFFFF
+        self._plc_run += 1
+        return self._conceal()
+
+    def _comfort_noise(self) -> np.ndarray:
+        self.cn_frames += 1
+        return self._cn.frame()
+
+    def _conceal(self) -> np.ndarray:
+        if self._last is None or self._plc_run > self.max_plc:
+            return np.zeros(self.frame_samples, dtype=np.int16)
+        gain = 0.5 ** self._plc_run
+        return (self._last.astype(np.float32) * gain).astype(np.int16)
+
+    def reset(self) -> None:
+        self._frames.clear()
+        self._ts.clear()
+        self._next_seq = None
+        self._playing = False
+        self._last = None
+        self._plc_run = 0
+        self._cn_active = False
+        self._ref_seq = None
+        self._last_transit = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "target_depth": self.target_depth,
+            "extra_depth": self.extra_depth,
+            "jitter_ms": round(self.jitter_ms, 2),
+            "received": self.received,
+            "played": self.played,
+            "late": self.late,
+            "lost": self.lost,
+            "underrun": self.underrun,
+            "duplicate": self.duplicate,
+            "dropped": self.dropped,
+            "undecodable": self.undecodable,
+            "cn_frames": self.cn_frames,
+        }
+
+
+def mix_frames(frames: Iterable[np.ndarray], gain: float = 1.0) -> bytes:
+    """Cộng các khung int16 (int32 để tránh tràn), nhân gain, clip về int16."""
+    frames = list(frames)
+    if not frames:
+        return b""
+    if len(frames) == 1 and gain == 1.0:
+        return frames[0].tobytes()
+    acc = np.sum(np.stack(frames), axis=0, dtype=np.int32)
+    if gain != 1.0:
+        acc = acc.astype(np.float32) * float(gain)
+    return np.clip(acc, -32768, 32767).astype(np.int16).tobytes()
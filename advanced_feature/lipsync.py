@@ -0,0 +1,160 @@
+"""
+Đồng bộ tiếng/hình (lip-sync) giữa VoiceChatClient và VideoCallClient.
+
+- MediaClock: đồng hồ ms dùng chung cho mọi luồng media trong tiến trình;
+  gói voice/video (header HPH2) mang timestamp lúc capture theo đồng hồ này,
+  nên ở bên nhận hai luồng của cùng một người gửi so sánh được với nhau.
+- LipSyncScheduler (bên nhận, dùng chung cho cả hai client):
+    audio_delay = lúc phát - ts   (đo khi jitter buffer trả khung)
+    video_delay = lúc nhận - ts   (đo khi khung video tới)
+  Hình sớm hơn tiếng → giữ khung video tới ts + audio_delay (tối đa
+  max_video_hold_ms). Tiếng sớm hơn hình → xin thêm độ sâu jitter buffer
+  (tối đa max_audio_extra_ms), áp dụng ở đầu lượt nói để không nghe thấy.
+  Chỉ là độ lệch tương đối: gốc đồng hồ của người gửi không cần khớp bên nhận.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+TS_MOD = 1 << 32
+
+
+def ts_diff(a: int, b: int) -> int:
+    """a - b (ms) theo modulo 2^32."""
+    d = (a - b) & 0xFFFFFFFF
+    return d - TS_MOD if d >= 0x80000000 else d
+
+
+class MediaClock:
+    """ms từ lúc khởi tạo (perf_counter), quay vòng 32 bit."""
+
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+
+    def to_ms(self, t_perf: float) -> int:
+        return int((t_perf - self._t0) * 1000) & 0xFFFFFFFF
+
+    def now_ms(self) -> int:
+        return self.to_ms(time.perf_counter())
+
+
+MEDIA_CLOCK = MediaClock()
+
+
+class _SenderSync:
+    __slots__ = ("audio_delay", "audio_base", "audio_at", "audio_extra", "video_delay", "video_at",
+                 "raw_offset", "av_offset", "video_hold", "held", "shown")
+
+    def __init__(self) -> None:
+        self.audio_delay: Optional[float] = None
+        self.audio_base: Optional[float] = None   # audio_delay khi chưa có độ trễ thêm
+        self.audio_at = 0.0
+        self.audio_extra = 0.0      # độ trễ thêm đang có hiệu lực bên voice client
+        self.video_delay: Optional[float] = None
+        self.video_at = 0.0
+        self.raw_offset = 0.0       # video - audio khi chưa chỉnh (dương = hình trễ)
+        self.av_offset = 0.0        # sau khi chỉnh
+        self.video_hold = 0.0
+        self.held = 0
+        self.shown = 0
+
+
+class LipSyncScheduler:
+    def __init__(self,
+                 max_video_hold_ms: float = 400.0,
+                 max_audio_extra_ms: float = 200.0,
+                 smoothing: float = 0.1,
+                 stale_ms: float = 2000.0,
+                 clock: MediaClock = MEDIA_CLOCK) -> None:
+        self.max_video_hold_ms = max_video_hold_ms
+        self.max_audio_extra_ms = max_audio_extra_ms
+        self.smoothing = smoothing
+        self.stale_ms = stale_ms
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._senders: Dict[str, _SenderSync] = {}
+
+    def _ewma(self, old: Optional[float], new: float) -> float:
+        return new if old is None else old + (new - old) * self.smoothing
+
+    def _get(self, user: str) -> _SenderSync:
+        st = self._senders.get(user)
+        if st is None:
+            st = self._senders[user] = _SenderSync()
+        return st
+
+    # ---------- audio ----------
+    def on_audio(self, user: str, ts: int, now_ms: Optional[int] = None, extra_ms: float = 0.0) -> None:
+        """Khung thoại có timestamp `ts` vừa được đưa ra loa (now_ms, đã gồm độ trễ
+        thiết bị); extra_ms = độ trễ thêm đang có hiệu lực cho khung này."""
+        if now_ms is None:
+            now_ms = self.clock.now_ms()
+        with self._lock:
+            st = self._get(user)
+            delay = ts_diff(now_ms, ts)
+            st.audio_delay = self._ewma(st.audio_delay, delay)
+            st.audio_base = self._ewma(st.audio_base, delay - extra_ms)
+            st.audio_at = now_ms
+            st.audio_extra = extra_ms
+
+    def audio_extra_ms(self, user: str, now_ms: Optional[int] = None) -> float:
+        """Độ trễ thêm nên áp cho tiếng của `user` (tiếng đang sớm hơn hình)."""
+        if now_ms is None:
+            now_ms = self.clock.now_ms()
+        with self._lock:
+            st = self._senders.get(user)
+            if st is None or not self._both_active(st, now_ms):
+                return 0.0
+            return max(0.0, min(self.max_audio_extra_ms, st.video_delay - st.audio_base))
+
+    # ---------- video ----------
+    def video_due(self, user: str, ts: int, now_ms: Optional[int] = None) -> int:
+        """Thời điểm (ms theo clock) nên hiển thị khung video `ts` vừa nhận."""
+        if now_ms is None:
+            now_ms = self.clock.now_ms()
+        with self._lock:
+            st = self._get(user)
+            delay = ts_diff(now_ms, ts)
+            if delay > self.stale_ms:
+                return now_ms   # khung cũ (vd. relay gửi lại khi mới JOIN) → hiện ngay, không tính
+            st.video_delay = self._ewma(st.video_delay, delay)
+            st.video_at = now_ms
+            hold = 0.0
+            if self._both_active(st, now_ms):
+                # hiển thị khi tiếng cùng thời điểm capture được phát
+                hold = max(0.0, min(self.max_video_hold_ms, st.audio_delay - delay))
+                st.raw_offset = self._ewma(st.raw_offset, delay - st.audio_delay)
+                st.av_offset = self._ewma(st.av_offset, delay + hold - st.audio_delay)
+            st.video_hold = hold
+            st.shown += 1
+            if hold > 0:
+                st.held += 1
+            return (now_ms + int(hold)) & 0xFFFFFFFF
+
+    def _both_active(self, st: _SenderSync, now_ms: int) -> bool:
+        return (st.audio_delay is not None and st.video_delay is not None
+                and ts_diff(now_ms, st.audio_at) < self.stale_ms
+                and ts_diff(now_ms, st.video_at) < self.stale_ms)
+
+    def forget(self, user: str) -> None:
+        with self._lock:
+            self._senders.pop(user, None)
+
+    def stats(self) -> Dict[str, dict]:
+        """Độ lệch A/V theo người gửi (ms, dương = hình trễ hơn tiếng)."""
+        now_ms = self.clock.now_ms()
+        out = {}
+        with self._lock:
+            for user, st in self._senders.items():
+                out[user] = {
+                    "synced": self._both_active(st, now_ms),
+                    "audio_delay_ms": None if st.audio_delay is None else round(st.audio_delay, 1),
+                    "video_delay_ms": None if st.video_delay is None else round(st.video_delay, 1),
+                    "raw_offset_ms": round(st.raw_offset, 1),
+                    "av_offset_ms": round(st.av_offset, 1),
+                    "video_hold_ms": round(st.video_hold, 1),
+                    "audio_extra_ms": round(st.audio_extra, 1),
+                    "video_frames": st.shown,
+                    "video_held": st.held,
+                }
+        return out
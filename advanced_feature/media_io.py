@@ -0,0 +1,360 @@
+"""
+Nguồn/đích media cắm được cho VoiceChatClient và VideoCallClient.
+
+Giao diện (duck typing, giống cv2.VideoCapture / stream PyAudio):
+- Nguồn video: read() -> (ok, frame BGR), release().
+    CameraSource, VideoFileSource, ImageSequenceSource, SyntheticVideoSource.
+- Đích video: gọi như on_remote_frame(user, jpeg_bytes).
+    NullVideoSink (đếm khung/byte/fps), JpegRecordingSink (ghi ra thư mục).
+- Nguồn audio: read(n_samples) -> bytes PCM16 mono (None = hết dữ liệu), close().
+    PyAudioSource, WavSource, RawPcmSource, PcmSource (mảng NumPy), SilenceSource.
+- Đích audio: write(pcm_bytes), close(), latency_ms.
+    PyAudioSink, NullAudioSink, RecordingSink (WAV hoặc giữ trong bộ nhớ).
+
+Nguồn đọc file tự giữ nhịp như thiết bị thật; speed=2.0 chạy nhanh gấp đôi,
+speed=0 không chờ (chạy hết tốc độ).
+"""
+import glob
+import os
+import threading
+import time
+import wave
+from typing import Dict, List, Optional
+
+try:
+    import cv2
+    import numpy as np
+except Exception:
+    cv2 = None
+    np = None
+
+try:
+    import pyaudio
+except Exception:
+    pyaudio = None
+
+
+class _Pacer:
+    """Chặn tới thời điểm của mục kế tiếp theo `rate` mục/giây × speed."""
+
+    def __init__(self, rate: float, speed: float = 1.0) -> None:
+        self.period = 1.0 / (rate * speed) if rate > 0 and speed > 0 else 0.0
+        self._next = time.perf_counter()
+
+    def wait(self) -> None:
+        if not self.period:
+            return
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        # tụt lại quá xa (máy bận) thì không cố đuổi kịp bằng burst
+        self._next = max(self._next + self.period, time.perf_counter() - self.period)
+
+
+# ---------- video sources ----------
+class CameraSource:
+    """Webcam qua cv2.VideoCapture (thử DirectShow trước trên Windows)."""
+
+    def __init__(self, index: int = 0, width: int = 640, height: int = 360) -> None:
+        cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+        if not cap or not cap.isOpened():
+            cap = cv2.VideoCapture(index)
+        if not cap or not cap.isOpened():
+            raise RuntimeError("Cannot open camera")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self._cap = cap
+
+    def read(self):
+        return self._cap.read()
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+class VideoFileSource:
+    """Phát lại file video (mọi định dạng cv2 đọc được) theo fps của file × speed."""
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True, fps: Optional[float] = None) -> None:
+        self.path = path
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Cannot open video file: {path}")
+        self.fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self._pacer = _Pacer(self.fps, speed)
+
+    def read(self):
+        self._pacer.wait()
+        ok, frame = self._cap.read()
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read()
+        return ok, frame
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+class ImageSequenceSource:
+    """Thư mục ảnh (hoặc danh sách đường dẫn) phát như camera ở `fps`; mỗi ảnh
+    giữ `hold` lần read(). speed=0 không giữ nhịp (người gọi tự giữ, vd. screen_share)."""
+
+    def __init__(self, source, fps: float = 15.0, speed: float = 1.0, loop: bool = True,
+                 hold: int = 1) -> None:
+        if isinstance(source, str):
+            paths = sorted(p for ext in ("png", "jpg", "jpeg", "bmp")
+                           for p in glob.glob(os.path.join(source, f"*.{ext}")))
+        else:
+            paths = list(source)
+        if not paths:
+            raise ValueError("no images found")
+        self.paths = paths
+        self.hold = max(1, hold)
+        self.loop = loop
+        self._i = 0
+        self._pacer = _Pacer(fps, speed)
+        self._cache: Dict[str, "np.ndarray"] = {}
+
+    def read(self):
+        self._pacer.wait()
+        idx = self._i // self.hold
+        if idx >= len(self.paths):
+            if not self.loop:
+                return False, None
+            self._i, idx = 0, 0
+        self._i += 1
+        path = self.paths[idx]
+        img = self._cache.get(path)
+        if img is None:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None:
+                return False, None
+            if len(self.paths) <= 64:   # chuỗi ngắn → giữ trong bộ nhớ
+                self._cache[path] = img
+            else:                       # chuỗi dài → chỉ giữ ảnh đang phát (cho hold)
+                self._cache = {path: img}
+        return True, img
+
+    def release(self) -> None:
+        self._cache.clear()
+
+
+class SyntheticVideoSource:
+    """Giả lập webcam: read() chặn theo nhịp fps như camera thật."""
+
+    def __init__(self, fps: float = 30.0, width: int = 640, height: int = 360,
+                 speed: float = 1.0, offset: int = 0) -> None:
+        self.fps = fps
+        self.width, self.height = width, height
+        self._pacer = _Pacer(fps, speed)
+        self._n = offset
+        yy, xx = np.mgrid[0:height, 0:width]
+        self._base = ((xx + yy) % 256).astype(np.uint8)
+
+    def read(self):
+        self._pacer.wait()
+        self._n += 1
+        frame = np.dstack([np.roll(self._base, self._n * 4, axis=1), self._base,
+                           np.roll(self._base, -self._n * 2, axis=0)])
+        x = (self._n * 7) % (self.width - 80)
+        frame[100:180, x:x + 80] = (0, 0, 255)
+        return True, frame
+
+    def release(self) -> None:
+        pass
+
+
+# ---------- video sinks ----------
+class NullVideoSink:
+    """on_remote_frame bỏ khung, chỉ đếm: số khung/byte/fps theo người gửi."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.frames: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self._first: Dict[str, float] = {}
+        self._last: Dict[str, float] = {}
+
+    def __call__(self, user: str, payload: bytes) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.frames[user] = self.frames.get(user, 0) + 1
+            self.bytes[user] = self.bytes.get(user, 0) + len(payload)
+            self._first.setdefault(user, now)
+            self._last[user] = now
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            out = {}
+            for user, n in self.frames.items():
+                span = self._last[user] - self._first[user]
+                out[user] = {
+                    "frames": n,
+                    "bytes": self.bytes[user],
+                    "fps": round((n - 1) / span, 2) if span > 0 else 0.0,
+                }
+            return out
+
+
+class JpegRecordingSink(NullVideoSink):
+    """Như NullVideoSink nhưng ghi từng khung JPEG: <dir>/<user>/<n>.jpg."""
+
+    def __init__(self, directory: str) -> None:
+        super().__init__()
+        self.directory = directory
+
+    def __call__(self, user: str, payload: bytes) -> None:
+        super().__call__(user, payload)
+        d = os.path.join(self.directory, user)
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"{self.frames[user]:06d}.jpg"), "wb") as f:
+            f.write(payload)
+
+
+# ---------- audio sources ----------
+class PyAudioSource:
+    """Micro qua PyAudio."""
+
+    def __init__(self, pa, rate: int = 16000, frames_per_buffer: int = 320) -> None:
+        self._stream = pa.open(format=pa.get_format_from_width(2), channels=1, rate=rate,
+                               input=True, frames_per_buffer=frames_per_buffer)
+
+    def read(self, n_samples: int) -> Optional[bytes]:
+        return self._stream.read(n_samples, exception_on_overflow=False)
+
+    def close(self) -> None:
+        self._stream.stop_stream()
+        self._stream.close()
+
+
+class PcmSource:
+    """PCM16 mono trong bộ nhớ, phát theo nhịp thời gian thực × speed."""
+
+    def __init__(self, pcm: "np.ndarray", rate: int = 16000, speed: float = 1.0, loop: bool = True) -> None:
+        self.pcm = pcm.astype(np.int16)
+        self.rate = rate
+        self.speed = speed
+        self.loop = loop
+        self._pos = 0
+        self._next = time.perf_counter()
+
+    def read(self, n_samples: int) -> Optional[bytes]:
+        if self.speed > 0:
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            period = n_samples / self.rate / self.speed
+            self._next = max(self._next + period, time.perf_counter() - period)
+        if self._pos >= len(self.pcm):
+            if not self.loop or not len(self.pcm):
+                return None
+            self._pos = 0
+        chunk = self.pcm[self._pos:self._pos + n_samples]
+        self._pos += n_samples
+        if len(chunk) < n_samples:
+            chunk = np.pad(chunk, (0, n_samples - len(chunk)))
+        return chunk.tobytes()
+
+    def close(self) -> None:
+        pass
+
+
+def _to_mono_rate(pcm: "np.ndarray", channels: int, src_rate: int, rate: int) -> "np.ndarray":
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    if src_rate != rate and len(pcm):
+        n = int(len(pcm) * rate / src_rate)
+        pcm = np.interp(np.arange(n) * src_rate / rate, np.arange(len(pcm)), pcm)
+    return np.clip(pcm, -32768, 32767).astype(np.int16)
+
+
+class WavSource(PcmSource):
+    """File WAV 16-bit (mọi sample rate/số kênh → đổi về mono `rate`)."""
+
+    def __init__(self, path: str, rate: int = 16000, speed: float = 1.0, loop: bool = True) -> None:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError(f"{path}: cần WAV 16-bit")
+            raw = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+            pcm = _to_mono_rate(raw, w.getnchannels(), w.getframerate(), rate)
+        super().__init__(pcm, rate, speed, loop)
+
+
+class RawPcmSource(PcmSource):
+    """File PCM thô s16le, mono, đúng `rate`."""
+
+    def __init__(self, path: str, rate: int = 16000, speed: float = 1.0, loop: bool = True) -> None:
+        with open(path, "rb") as f:
+            data = f.read()
+        super().__init__(np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16), rate, speed, loop)
+
+
+class SilenceSource(PcmSource):
+    def __init__(self, rate: int = 16000, speed: float = 1.0) -> None:
+        super().__init__(np.zeros(rate, dtype=np.int16), rate, speed, loop=True)
+
+
+# ---------- audio sinks ----------
+class PyAudioSink:
+    """Loa qua PyAudio."""
+
+    def __init__(self, pa, rate: int = 16000, frames_per_buffer: int = 320) -> None:
+        self._stream = pa.open(format=pa.get_format_from_width(2), channels=1, rate=rate,
+                               output=True, frames_per_buffer=frames_per_buffer)
+        try:
+            self.latency_ms = float(self._stream.get_output_latency()) * 1000
+        except Exception:
+            self.latency_ms = 0.0
+
+    def write(self, pcm: bytes) -> None:
+        self._stream.write(pcm)
+
+    def close(self) -> None:
+        self._stream.stop_stream()
+        self._stream.close()
+
+
+class NullAudioSink:
+    """Bỏ âm thanh, chỉ đếm khung/byte."""
+    latency_ms = 0.0
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, pcm: bytes) -> None:
+        self.frames += 1
+        self.bytes += len(pcm)
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingSink(NullAudioSink):
+    """Ghi lại âm thanh phát ra: vào file WAV (path) hoặc giữ trong bộ nhớ (pcm())."""
+
+    def __init__(self, path: Optional[str] = None, rate: int = 16000) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._wav = None
+        if path:
+            self._wav = wave.open(path, "wb")
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(rate)
+
+    def write(self, pcm: bytes) -> None:
+        super().write(pcm)
+        if self._wav is not None:
+            self._wav.writeframes(pcm)
+        else:
+            self._chunks.append(pcm)
+
+    def pcm(self) -> bytes:
+        return b"".join(self._chunks)
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
@@ -0,0 +1,234 @@
+"""
+Điều khiển bitrate/frame-rate cho video gửi đi.
+
+VideoRateController chỉnh đồng thời chất lượng JPEG, độ phân giải (theo bậc)
+và fps để bám bitrate mục tiêu:
+- Mỗi khung có "ngân sách" = target_bps / fps. Khung lớn hơn ngân sách →
+  giảm quality; quality chạm đáy → xuống bậc độ phân giải; bậc thấp nhất vẫn
+  vượt → giảm fps. Ngược lại thì tăng dần.
+- Bỏ qua khung không thay đổi đáng kể so với khung gửi gần nhất: tỉ lệ điểm
+  ảnh thu nhỏ (80x45, đã lọc nhiễu) thay đổi quá `pixel_delta` mức xám; vẫn
+  gửi làm mới định kỳ cho người mới vào / mất gói.
+- on_feedback(loss): tỉ lệ mất gói từ bên nhận/relay; mất nhiều → giảm target
+  theo cấp số nhân, mất ít → tăng dần (kiểu AIMD).
+
+Gói MSG_FEEDBACK (bên nhận → relay → người gửi):
+    payload = target_len(B) | target (utf-8) | loss_permille(H) | rx_kbps(I)
+"""
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import cv2
+    import numpy as np
+except Exception:
+    cv2 = None
+    np = None
+
+MSG_FEEDBACK = 13
+
+RESOLUTIONS: List[Tuple[int, int]] = [(640, 360), (480, 270), (320, 180)]
+THUMB_SIZE = (80, 45)
+
+
+def pack_feedback(target: str, loss: float, rx_kbps: float) -> bytes:
+    t = target.encode()
+    permille = int(max(0.0, min(1.0, loss)) * 1000)
+    return struct.pack("!B", len(t)) + t + struct.pack("!HI", permille, int(rx_kbps))
+
+
+def parse_feedback(payload: bytes) -> Optional[Tuple[str, float, float]]:
+    if not payload:
+        return None
+    n = payload[0]
+    if len(payload) < 1 + n + 6:
+        return None
+    try:
+        target = payload[1:1 + n].decode()
+    except Exception:
+        return None
+    permille, rx_kbps = struct.unpack("!HI", payload[1 + n:1 + n + 6])
+    return target, permille / 1000.0, float(rx_kbps)
+
+
+def frame_thumb(frame: "np.ndarray") -> "np.ndarray":
+    """Ảnh xám thu nhỏ (lấy trung bình theo vùng → lọc bớt nhiễu cảm biến)."""
+    if cv2 is not None:
+        small = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    else:
+        h, w = frame.shape[:2]
+        small = frame[::max(1, h // THUMB_SIZE[1]), ::max(1, w // THUMB_SIZE[0])]
+    if small.ndim == 3:
+        small = small.mean(axis=2)
+    return small.astype(np.float32)
+
+
+class VideoRateController:
+    def __init__(self,
+                 target_kbps: float = 800.0,
+                 min_kbps: float = 80.0,
+                 max_kbps: float = 1500.0,
+                 max_fps: float = 20.0,
+                 min_fps: float = 3.0,
+                 q_min: int = 30,
+                 q_max: int = 80,
+                 pixel_delta: float = 8.0,
+                 diff_threshold: float = 0.002,
+                 static_refresh_sec: float = 2.0) -> None:
+        self._lock = threading.Lock()
+        self.target_bps = target_kbps * 1000
+        self.min_bps = min_kbps * 1000
+        self.max_bps = max_kbps * 1000
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.fps = max_fps
+        self.q_min, self.q_max = q_min, q_max
+        self.quality = 65
+        self.rung = 0
+        self.pixel_delta = pixel_delta
+        self.diff_threshold = diff_threshold
+        self.static_refresh_sec = static_refresh_sec
+
+        self._last_thumb: Optional["np.ndarray"] = None
+        self._last_sent_at = 0.0
+        self._loss_reports: Dict[str, Tuple[float, float]] = {}   # reporter -> (loss, at)
+        self.last_diff = 0.0
+        # counters
+        self.frames_skipped_static = 0
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+
+    # ---------- decisions ----------
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        return RESOLUTIONS[self.rung]
+
+    def params(self) -> Tuple[int, int, int]:
+        """(width, height, jpeg_quality) cho khung sắp encode."""
+        with self._lock:
+            w, h = RESOLUTIONS[self.rung]
+            return w, h, self.quality
+
+    def should_send(self, frame: "np.ndarray", now: Optional[float] = None) -> bool:
+        """False nếu khung gần như giống khung gửi gần nhất (cảnh tĩnh)."""
+        if now is None:
+            now = time.monotonic()
+        thumb = frame_thumb(frame)
+        with self._lock:
+            if self._last_thumb is not None and self._last_thumb.shape == thumb.shape:
+                self.last_diff = float(np.mean(np.abs(thumb - self._last_thumb) > self.pixel_delta))
+                if (self.last_diff < self.diff_threshold and
+                        now - self._last_sent_at < self.static_refresh_sec):
+                    self.frames_skipped_static += 1
+                    return False
+            self._last_thumb = thumb
+            self._last_sent_at = now
+            return True
+
+    # ---------- feedback ----------
+    def on_encoded(self, nbytes: int) -> None:
+        """Gọi sau mỗi lần encode: so kích thước khung với ngân sách."""
+        with self._lock:
+            self.frames_encoded += 1
+            self.bytes_encoded += nbytes
+            budget = self.target_bps / 8.0 / self.fps
+            ratio = nbytes / max(1.0, budget)
+            if ratio > 1.15:
+                if self.quality > self.q_min:
+                    self.quality = max(self.q_min, self.quality - (10 if ratio > 2 else 4))
+                elif self.rung < len(RESOLUTIONS) - 1:
+                    self.rung += 1
+                    self.quality = (self.q_min + self.q_max) // 2
+                else:
+                    # bậc thấp nhất, quality thấp nhất vẫn vượt → giảm fps
+                    self.fps = max(self.min_fps, min(self.max_fps, self.target_bps / 8.0 / nbytes))
+            elif ratio < 0.7:
+                if self.fps < self.max_fps:
+                    self.fps = min(self.max_fps, self.fps * 1.25)
+                elif self.quality < self.q_max:
+                    self.quality = min(self.q_max, self.quality + 2)
+                elif self.rung > 0 and ratio < 0.4:
+                    self.rung -= 1
+                    self.quality = (self.q_min + self.q_max) // 2
+
+    def on_feedback(self, loss: float, reporter: str = "relay", now: Optional[float] = None) -> None:
+        """Tỉ lệ mất gói (0..1) do một bên nhận hoặc relay báo về."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._loss_reports[reporter] = (loss, now)
+            # người nhận tệ nhất trong 3 s gần nhất quyết định (một luồng cho cả phòng)
+            worst = max((l for l, t in self._loss_reports.values() if now - t < 3.0), default=0.0)
+            if worst > 0.10:
+                self.target_bps = max(self.min_bps, self.target_bps * (1 - 0.5 * worst))
+            elif worst < 0.02:
+                self.target_bps = min(self.max_bps, self.target_bps + 0.03 * self.max_bps)
+
+    def set_target_kbps(self, kbps: float) -> None:
+        with self._lock:
+            self.target_bps = max(self.min_bps, min(self.max_bps, kbps * 1000))
+
+    def stats(self) -> dict:
+        with self._lock:
+            w, h = RESOLUTIONS[self.rung]
+            return {
+                "target_kbps": round(self.target_bps / 1000, 1),
+                "fps": round(self.fps, 2),
+                "quality": self.quality,
+                "resolution": f"{w}x{h}",
+                "frames_encoded": self.frames_encoded,
+                "frames_skipped_static": self.frames_skipped_static,
+                "last_diff": round(self.last_diff, 4),
+            }
+
+
+class LossMonitor:
+    """Bên nhận: đếm mất gói theo seq của từng người gửi, báo định kỳ."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = interval
+        self._state: Dict[str, list] = {}   # user -> [last_seq, expected, received, bytes, window_start]
+
+    def on_packet(self, user: str, seq: int, nbytes: int, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        st = self._state.get(user)
+        if st is None:
+            self._state[user] = [seq, 1, 1, nbytes, now]
+            return
+        gap = (seq - st[0]) & 0xFFFFFFFF
+        if 0 < gap < 1000:
+            st[0] = seq
+            st[1] += gap
+        elif 1000 <= gap <= 0xFFFFFFFF - 1000:
+            # người gửi khởi động lại seq / vào lại sau mất dài: đồng bộ lại và đo cửa sổ mới
+            # (như JitterBuffer._insert gọi reset()); gói đảo thứ tự lùi ít vẫn chỉ cộng received
+            st[:] = [seq, 1, 1, nbytes, now]
+            return
+        st[2] += 1
+        st[3] += nbytes
+
+    def due_reports(self, now: Optional[float] = None) -> List[Tuple[str, float, float]]:
+        """[(user, loss, rx_kbps)] cho các người gửi đã hết một chu kỳ đo."""
+        if now is None:
+            now = time.monotonic()
+        out = []
+        for user, st in list(self._state.items()):
+            elapsed = now - st[4]
+            if elapsed < self.interval:
+                continue
+            if st[2] == 0:
+                # không nhận được gì → không báo; im quá lâu thì quên luôn
+                if elapsed > 10 * self.interval:
+                    del self._state[user]
+                continue
+            loss = max(0.0, 1.0 - st[2] / max(1, st[1]))
+            out.append((user, loss, st[3] * 8 / elapsed / 1000))
+            st[1] = st[2] = st[3] = 0
+            st[4] = now
+        return out
+
+    def forget(self, user: str) -> None:
+        self._state.pop(user, None)
@@ -0,0 +1,395 @@
+"""
+Chia sẻ màn hình qua UDP (MSG_SCREEN), mã hoá theo ô thay đổi.
+
+- Nguồn khung cắm được: đối tượng có read() -> (ok, frame BGR) và release().
+  Có sẵn ScreenGrabProvider (PIL.ImageGrab), ImageSequenceProvider (thư mục/
+  danh sách ảnh) và SyntheticSlides (slide 1080p giả lập, chạy headless).
+- TileEncoder chia khung thành ô cố định, so sánh với khung trước bằng NumPy
+  (reshape thành lưới ô, một phép so sánh cho cả khung), chỉ mã hoá ô đổi:
+  PNG cho ô ít màu (chữ, UI), JPEG cho ô giống ảnh chụp. Mỗi khung còn gửi
+  lại vài ô theo vòng để người mới vào/mất gói tự lành.
+- ScreenFramebuffer (bên nhận) vá các ô vào một framebuffer giữ lâu dài.
+
+Payload một datagram MSG_SCREEN:
+    frame_id(I) | width(H) | height(H) | tile(H) | flags(B) | count(H)
+    count × [ tx(H) | ty(H) | fmt(B) | len(I) | data ]
+flags: bit0 = gói cuối của khung.
+"""
+import socket
+import struct
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import cv2
+    import numpy as np
+except Exception:
+    cv2 = None
+    np = None
+
+from .media_io import ImageSequenceSource
+from .video_call import MSG_JOIN, MSG_KEEPALIVE, MSG_LEAVE, _pack, _parse
+
+MSG_SCREEN = 3
+
+TILE = 64
+MAX_SIDE = 8192        # kích thước khung tối đa bên nhận chấp nhận (w, h đến từ gói relay)
+FMT_JPEG = 0
+FMT_PNG = 1
+FLAG_END = 0x01
+
+MAX_PAYLOAD = 60000
+_FRAME_HDR = "!IHHHBH"
+_FRAME_HDR_SIZE = struct.calcsize(_FRAME_HDR)
+_TILE_HDR = "!HHBI"
+_TILE_HDR_SIZE = struct.calcsize(_TILE_HDR)
+
+Tile = Tuple[int, int, int, bytes]   # (tx, ty, fmt, data)
+
+
+# ---------- frame providers ----------
+class ScreenGrabProvider:
+    """Chụp màn hình thật bằng PIL.ImageGrab (Windows/macOS, X11 có Xlib)."""
+
+    def __init__(self, bbox: Optional[Tuple[int, int, int, int]] = None) -> None:
+        from PIL import ImageGrab   # chỉ cần khi dùng nguồn này
+        self._grab = ImageGrab.grab
+        self.bbox = bbox
+
+    def read(self):
+        try:
+            img = self._grab(bbox=self.bbox)
+        except Exception:
+            return False, None
+        return True, cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+    def release(self) -> None:
+        pass
+
+
+class ImageSequenceProvider(ImageSequenceSource):
+    """media_io.ImageSequenceSource không giữ nhịp (vòng gửi tự giữ fps), mỗi ảnh giữ `hold` lần read()."""
+
+    def __init__(self, source, hold: int = 1, loop: bool = True) -> None:
+        super().__init__(source, speed=0, loop=loop, hold=hold)
+
+
+class SyntheticSlides:
+    """Slide giả lập: tiêu đề, gạch đầu dòng hiện dần như đang gõ, một ảnh
+    "chụp" trên vài slide, con trỏ chuột di chuyển. Đổi slide mỗi `slide_frames`."""
+
+    def __init__(self, width: int = 1920, height: int = 1080, slide_frames: int = 50,
+                 chars_per_frame: int = 3, seed: int = 0) -> None:
+        self.width, self.height = width, height
+        self.slide_frames = slide_frames
+        self.chars_per_frame = chars_per_frame
+        self._rng = np.random.default_rng(seed)
+        self._n = 0
+        self._slide = -1
+        self._base: Optional["np.ndarray"] = None
+        self._lines: List[str] = []
+
+    def _render_slide(self, k: int) -> None:
+        w, h = self.width, self.height
+        s = h / 1080.0
+        base = np.full((h, w, 3), 250, dtype=np.uint8)
+        base[:int(140 * s)] = (120, 60, 30)
+        cv2.putText(base, f"Slide {k + 1}: Quarterly review", (int(60 * s), int(95 * s)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 2.0 * s, (255, 255, 255), max(1, int(3 * s)), cv2.LINE_AA)
+        if k % 2 == 1:
+            # vùng ảnh chụp (nhiễu mịn) → ô kiểu JPEG
+            photo = self._rng.integers(0, 256, (int(420 * s), int(640 * s), 3), dtype=np.uint8)
+            photo = cv2.GaussianBlur(photo, (0, 0), 6)
+            photo = cv2.normalize(photo, None, 0, 255, cv2.NORM_MINMAX)
+            y0, x0 = int(260 * s), w - int(720 * s)
+            base[y0:y0 + photo.shape[0], x0:x0 + photo.shape[1]] = photo
+        self._base = base
+        self._lines = [f"- Point {i + 1}: metric {int(self._rng.integers(10, 99))}% vs target, owner team {chr(65 + i)}"
+                       for i in range(6)]
+
+    def read(self):
+        k = self._n // self.slide_frames
+        if k != self._slide:
+            self._slide = k
+            self._render_slide(k)
+        t = self._n % self.slide_frames
+        self._n += 1
+        s = self.height / 1080.0
+        frame = self._base.copy()
+        budget = t * self.chars_per_frame
+        for i, line in enumerate(self._lines):
+            if budget <= 0:
+                break
+            cv2.putText(frame, line[:budget], (int(80 * s), int((250 + 80 * i) * s)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.1 * s, (40, 40, 40), max(1, int(2 * s)), cv2.LINE_AA)
+            budget -= len(line)
+        # con trỏ chuột
+        cx = int((0.2 + 0.6 * (0.5 + 0.5 * np.sin(self._n / 17.0))) * self.width)
+        cy = int((0.3 + 0.5 * (0.5 + 0.5 * np.cos(self._n / 23.0))) * self.height)
+        pts = np.array([[cx, cy], [cx, cy + 28], [cx + 8, cy + 21], [cx + 19, cy + 21]], dtype=np.int32)
+        cv2.fillPoly(frame, [pts], (0, 0, 0))
+        return True, frame
+
+    def release(self) -> None:
+        pass
+
+
+# ---------- tile codec ----------
+def tile_grid(width: int, height: int, tile: int = TILE) -> Tuple[int, int]:
+    """(số cột, số hàng) ô, làm tròn lên."""
+    return -(-width // tile), -(-height // tile)
+
+
+def _padded(frame: "np.ndarray", tile: int) -> "np.ndarray":
+    h, w = frame.shape[:2]
+    cols, rows = tile_grid(w, h, tile)
+    ph, pw = rows * tile - h, cols * tile - w
+    if ph or pw:
+        frame = np.pad(frame, ((0, ph), (0, pw), (0, 0)), mode="edge")
+    return frame
+
+
+def changed_tiles(prev: "np.ndarray", cur: "np.ndarray", tile: int = TILE) -> "np.ndarray":
+    """Mặt nạ bool (rows, cols): ô nào có ít nhất một điểm ảnh khác nhau."""
+    a, b = _padded(prev, tile), _padded(cur, tile)
+    rows, cols = a.shape[0] // tile, a.shape[1] // tile
+    diff = (a != b).reshape(rows, tile, cols, tile, -1)
+    return diff.any(axis=(1, 3, 4))
+
+
+def _color_count(px: "np.ndarray") -> int:
+    """Số màu khác nhau (lấy mẫu 1/4 điểm ảnh) – đủ để phân biệt chữ/UI với ảnh chụp."""
+    packed = (px[..., 0].astype(np.uint32) << 16) | (px[..., 1].astype(np.uint32) << 8) | px[..., 2]
+    return len(np.unique(packed[::2, ::2]))
+
+
+class TileEncoder:
+    def __init__(self, tile: int = TILE, jpeg_quality: int = 80, png_max_colors: int = 48,
+                 refresh_tiles: int = 4) -> None:
+        self.tile = tile
+        self.jpeg_quality = jpeg_quality
+        self.png_max_colors = png_max_colors
+        self.refresh_tiles = refresh_tiles   # số ô gửi lại theo vòng mỗi khung
+        self._prev: Optional["np.ndarray"] = None
+        self._refresh_at = 0
+        # counters
+        self.tiles_png = 0
+        self.tiles_jpeg = 0
+
+    def reset(self) -> None:
+        """Khung kế tiếp gửi toàn bộ ô (ví dụ khi có người mới vào)."""
+        self._prev = None
+
+    def encode_tile(self, px: "np.ndarray") -> Tuple[int, bytes]:
+        if _color_count(px) <= self.png_max_colors:
+            ok, buf = cv2.imencode(".png", px, [int(cv2.IMWRITE_PNG_COMPRESSION), 6])
+            if ok:
+                self.tiles_png += 1
+                return FMT_PNG, buf.tobytes()
+        ok, buf = cv2.imencode(".jpg", px, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        self.tiles_jpeg += 1
+        return FMT_JPEG, buf.tobytes()
+
+    def encode(self, frame: "np.ndarray") -> List[Tile]:
+        t = self.tile
+        h, w = frame.shape[:2]
+        cols, rows = tile_grid(w, h, t)
+        if self._prev is None or self._prev.shape != frame.shape:
+            mask = np.ones((rows, cols), dtype=bool)
+        else:
+            mask = changed_tiles(self._prev, frame, t)
+            total = rows * cols
+            for _ in range(min(self.refresh_tiles, total)):
+                r, c = divmod(self._refresh_at % total, cols)
+                mask[r, c] = True
+                self._refresh_at += 1
+        self._prev = frame.copy()
+        out: List[Tile] = []
+        for ty, tx in zip(*np.nonzero(mask)):
+            px = frame[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]
+            fmt, data = self.encode_tile(px)
+            out.append((int(tx), int(ty), fmt, data))
+        return out
+
+
+def pack_tiles(frame_id: int, width: int, height: int, tile: int,
+               tiles: Sequence[Tile], max_payload: int = MAX_PAYLOAD) -> List[bytes]:
+    """Gom ô vào các payload ≤ max_payload; payload cuối mang FLAG_END."""
+    groups: List[List[bytes]] = [[]]
+    size = _FRAME_HDR_SIZE
+    for tx, ty, fmt, data in tiles:
+        rec = struct.pack(_TILE_HDR, tx, ty, fmt, len(data)) + data
+        if groups[-1] and size + len(rec) > max_payload:
+            groups.append([])
+            size = _FRAME_HDR_SIZE
+        groups[-1].append(rec)
+        size += len(rec)
+    out = []
+    for i, recs in enumerate(groups):
+        flags = FLAG_END if i == len(groups) - 1 else 0
+        out.append(struct.pack(_FRAME_HDR, frame_id, width, height, tile, flags, len(recs)) + b"".join(recs))
+    return out
+
+
+def parse_tiles(payload: bytes):
+    """(frame_id, width, height, tile, flags, [Tile]) hoặc None nếu hỏng."""
+    if len(payload) < _FRAME_HDR_SIZE:
+        return None
+    frame_id, w, h, tile, flags, count = struct.unpack(_FRAME_HDR, payload[:_FRAME_HDR_SIZE])
+    off = _FRAME_HDR_SIZE
+    tiles: List[Tile] = []
+    for _ in range(count):
+        if off + _TILE_HDR_SIZE > len(payload):
+            return None
+        tx, ty, fmt, n = struct.unpack(_TILE_HDR, payload[off:off + _TILE_HDR_SIZE])
+        off += _TILE_HDR_SIZE
+        if off + n > len(payload):
+            return None
+        tiles.append((tx, ty, fmt, payload[off:off + n]))
+        off += n
+    return frame_id, w, h, tile, flags, tiles
+
+
+class ScreenFramebuffer:
+    """Framebuffer bên nhận: vá ô vào ảnh BGR giữ lâu dài."""
+
+    def __init__(self) -> None:
+        self.frame: Optional["np.ndarray"] = None
+        self.frame_id = 0
+        self.tiles_applied = 0
+        self.rejected = 0      # gói có kích thước khung/ô vô lý
+
+    def apply(self, payload: bytes) -> bool:
+        """Vá các ô trong một payload; True khi đây là gói cuối của khung."""
+        parsed = parse_tiles(payload)
+        if parsed is None:
+            return False
+        frame_id, w, h, t, flags, tiles = parsed
+        if not (0 < w <= MAX_SIDE and 0 < h <= MAX_SIDE) or t == 0:
+            # không cấp phát theo số liệu từ peer lạ (65535² × 3 ≈ 12 GB)
+            self.rejected += 1
+            return False
+        if self.frame is None or self.frame.shape[:2] != (h, w):
+            self.frame = np.zeros((h, w, 3), dtype=np.uint8)
+        for tx, ty, fmt, data in tiles:
+            px = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if px is None:
+                continue
+            y0, x0 = ty * t, tx * t
+            if y0 >= h or x0 >= w:
+                continue
+            ph, pw = min(px.shape[0], h - y0), min(px.shape[1], w - x0)
+            self.frame[y0:y0 + ph, x0:x0 + pw] = px[:ph, :pw]
+            self.tiles_applied += 1
+        self.frame_id = frame_id
+        return bool(flags & FLAG_END)
+
+
+# ---------- client ----------
+class ScreenShareClient:
+    """
+    Gửi/nhận chia sẻ màn hình qua relay video (cùng cổng với VideoCallClient,
+    socket riêng). provider=None → chỉ nhận. on_remote_screen(user, frame BGR)
+    được gọi khi một khung của người chia sẻ đã vá xong.
+    """
+
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 provider=None,
+                 fps: float = 5.0,
+                 on_remote_screen: Optional[Callable[[str, "np.ndarray"], None]] = None,
+                 tile: int = TILE) -> None:
+        if cv2 is None or np is None:
+            raise RuntimeError("OpenCV (opencv-python) is not installed")
+        self.host = host
+        self.port = port
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.room = "default"
+        self.user = "user"
+        self.provider = provider
+        self.fps = float(fps)
+        self.encoder = TileEncoder(tile)
+        self._on_remote_screen = on_remote_screen
+        self._buffers: Dict[str, ScreenFramebuffer] = {}
+        self._alive = False
+        self._seq = 0
+        self._frame_id = 0
+        self._threads: List[threading.Thread] = []
+        # counters
+        self.sent_bytes = 0
+        self.sent_frames = 0
+
+    def start(self, room: str, user: str) -> None:
+        self.room = room
+        self.user = user
+        self._alive = True
+        self.sock.sendto(_pack(MSG_JOIN, self.room, self.user, 0, b""), (self.host, self.port))
+        self._threads = [threading.Thread(target=self._rx_loop, daemon=True)]
+        if self.provider is not None:
+            self._threads.append(threading.Thread(target=self._tx_loop, daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        self._alive = False
+        try:
+            self.sock.sendto(_pack(MSG_LEAVE, self.room, self.user, 0, b""), (self.host, self.port))
+        except Exception:
+            pass
+        time.sleep(0.05)
+        if self.provider is not None:
+            self.provider.release()
+
+    def _send_frame(self, frame: "np.ndarray") -> None:
+        tiles = self.encoder.encode(frame)
+        if not tiles:
+            return
+        self._frame_id = (self._frame_id + 1) & 0xFFFFFFFF
+        h, w = frame.shape[:2]
+        for payload in pack_tiles(self._frame_id, w, h, self.encoder.tile, tiles):
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+            pkt = _pack(MSG_SCREEN, self.room, self.user, self._seq, payload)
+            self.sock.sendto(pkt, (self.host, self.port))
+            self.sent_bytes += len(pkt)
+        self.sent_frames += 1
+
+    def _tx_loop(self) -> None:
+        next_keep = time.time() + 5
+        next_frame = time.perf_counter()
+        while self._alive:
+            try:
+                if time.time() >= next_keep:
+                    self.sock.sendto(_pack(MSG_KEEPALIVE, self.room, self.user, 0, b""), (self.host, self.port))
+                    next_keep = time.time() + 5
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame = max(next_frame + 1.0 / self.fps, time.perf_counter())
+                ok, frame = self.provider.read()
+                if ok:
+                    self._send_frame(frame)
+            except Exception:
+                print("[ScreenShare] Error in _tx_loop:\n", traceback.format_exc())
+                time.sleep(0.1)
+
+    def _rx_loop(self) -> None:
+        self.sock.settimeout(1.0)
+        while self._alive:
+            try:
+                data, _ = self.sock.recvfrom(65535)
+                parsed = _parse(data)
+                if not parsed:
+                    continue
+                mtype, room, user, seq, payload, ts = parsed
+                if mtype != MSG_SCREEN or room != self.room or user == self.user:
+                    continue
+                fb = self._buffers.setdefault(user, ScreenFramebuffer())
+                if fb.apply(payload) and self._on_remote_screen:
+                    self._on_remote_screen(user, fb.frame)
+            except socket.timeout:
+                continue
+            except Exception:
+                print("[ScreenShare] Error in _rx_loop:\n", traceback.format_exc())
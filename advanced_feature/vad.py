@@ -0,0 +1,168 @@
+"""
+VAD (energy + zero-crossing, NumPy) và DTX cho voice chat.
+
+- VoiceActivityDetector: phát hiện tiếng nói theo năng lượng so với nền nhiễu
+  (minimum statistics trên cửa sổ ~2 s), ZCR để bắt phụ âm xát năng lượng
+  thấp, có hangover.
+- DtxController: quyết định mỗi khung 20 ms gửi gì: khung thoại, gói mô tả
+  comfort noise (CN), hoặc không gửi gì.
+- ComfortNoise: bên nhận sinh nhiễu nền theo mức CN nhận được.
+
+Mức CN mã hóa như RFC 3389: 1 byte = -dBov (0..127).
+"""
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+CN_SILENT_LEVEL = 127
+
+
+def level_from_rms(rms: float) -> int:
+    if rms <= 0:
+        return CN_SILENT_LEVEL
+    dbov = 20.0 * math.log10(rms / 32768.0)
+    return int(max(0, min(CN_SILENT_LEVEL, round(-dbov))))
+
+
+def rms_from_level(level: int) -> float:
+    if level >= CN_SILENT_LEVEL:
+        return 0.0
+    return 32768.0 * 10 ** (-level / 20.0)
+
+
+def encode_cn(level: int) -> bytes:
+    return bytes((level & 0x7F,))
+
+
+def decode_cn(data: bytes) -> int:
+    return data[0] & 0x7F if data else CN_SILENT_LEVEL
+
+
+class VoiceActivityDetector:
+    """VAD theo khung: process(frame) -> True nếu (còn) là tiếng nói."""
+
+    def __init__(self,
+                 margin_db: float = 9.0,
+                 abs_floor_db: float = -55.0,
+                 zcr_threshold: float = 0.25,
+                 hangover_frames: int = 10,
+                 noise_window: int = 100) -> None:
+        self.margin_db = margin_db
+        self.abs_floor_db = abs_floor_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = hangover_frames
+        self._hist = np.zeros(noise_window, dtype=np.float32)   # dB các khung gần nhất
+        self._hist_n = 0
+        self.noise_db = -96.0
+        self.noise_rms = 0.0
+        self._hang = 0
+        self.last_db = -96.0
+        self.last_zcr = 0.0
+
+    @staticmethod
+    def frame_features(x: np.ndarray) -> Tuple[float, float, float]:
+        """(rms, dBFS, zero-crossing rate) của một khung int16."""
+        xf = x.astype(np.float32)
+        rms = float(np.sqrt(np.dot(xf, xf) / max(1, xf.size)))
+        db = 20.0 * math.log10(max(rms, 1e-3) / 32768.0)
+        zcr = float(np.count_nonzero(np.diff(np.signbit(x)))) / max(1, x.size - 1)
+        return rms, db, zcr
+
+    def process(self, frame: bytes) -> bool:
+        x = np.frombuffer(frame, dtype=np.int16)
+        rms, db, zcr = self.frame_features(x)
+        self.last_db, self.last_zcr = db, zcr
+        # nền nhiễu = mức thấp nhất trong cửa sổ (khoảng nghỉ giữa các âm tiết)
+        self._hist[self._hist_n % self._hist.size] = db
+        self._hist_n += 1
+        self.noise_db = float(self._hist[:min(self._hist_n, self._hist.size)].min())
+
+        above = db - self.noise_db
+        active = db > self.abs_floor_db and (
+            above > self.margin_db or
+            (above > self.margin_db / 2 and zcr > self.zcr_threshold)
+        )
+        if active:
+            self._hang = self.hangover_frames
+            return True
+
+        self.noise_rms = rms if self.noise_rms == 0 else 0.9 * self.noise_rms + 0.1 * rms
+
+        if self._hang > 0:
+            self._hang -= 1
+            return True
+        return False
+
+
+class DtxController:
+    """
+    Quyết định gửi gì cho mỗi khung:
+      ("voice", pcm) | ("cn", level_byte) | None (không gửi).
+    Gửi CN khi bắt đầu khoảng lặng, rồi định kỳ mỗi `cn_interval` khung
+    hoặc khi mức nhiễu thay đổi quá `cn_delta_db`.
+    """
+
+    def __init__(self, vad: Optional[VoiceActivityDetector] = None,
+                 cn_interval: int = 50, cn_delta_db: int = 3) -> None:
+        self.vad = vad or VoiceActivityDetector()
+        self.cn_interval = cn_interval
+        self.cn_delta_db = cn_delta_db
+        self._in_silence = False
+        self._since_cn = 0
+        self._last_level = CN_SILENT_LEVEL
+        self._muted = False
+        # counters
+        self.voice_frames = 0
+        self.cn_frames = 0
+        self.suppressed_frames = 0
+
+    def process(self, frame: Optional[bytes], muted: bool = False) -> Optional[Tuple[str, bytes]]:
+        if muted or frame is None:
+            # mic tắt: báo một lần CN "im lặng hoàn toàn" rồi không gửi gì nữa
+            # (keepalive do vòng tx tự lo)
+            self._in_silence = False
+            if not self._muted:
+                self._muted = True
+                self.cn_frames += 1
+                return "cn", encode_cn(CN_SILENT_LEVEL)
+            self.suppressed_frames += 1
+            return None
+        self._muted = False
+
+        if self.vad.process(frame):
+            self._in_silence = False
+            self.voice_frames += 1
+            return "voice", frame
+
+        level = level_from_rms(self.vad.noise_rms)
+        self._since_cn += 1
+        if (not self._in_silence or self._since_cn >= self.cn_interval or
+                abs(level - self._last_level) >= self.cn_delta_db):
+            self._in_silence = True
+            self._since_cn = 0
+            self._last_level = level
+            self.cn_frames += 1
+            return "cn", encode_cn(level)
+        self.suppressed_frames += 1
+        return None
+
+
+class ComfortNoise:
+    """Sinh nhiễu nền (lọc thông thấp nhẹ) có RMS theo mức CN."""
+
+    def __init__(self, frame_samples: int = 320, seed: Optional[int] = None) -> None:
+        self.frame_samples = frame_samples
+        self._rng = np.random.default_rng(seed)
+        self.level = CN_SILENT_LEVEL
+        self._prev = 0.0
+
+    def frame(self) -> np.ndarray:
+        rms = rms_from_level(self.level)
+        if rms <= 0:
+            return np.zeros(self.frame_samples, dtype=np.int16)
+        w = self._rng.standard_normal(self.frame_samples + 1).astype(np.float32)
+        w[0] = self._prev
+        self._prev = float(w[-1])
+        x = (w[1:] + w[:-1]) * (rms / math.sqrt(2.0))
+        return np.clip(x, -32768, 32767).astype(np.int16)
@@ -1,9 +1,12 @@
+import heapq
+import itertools
 import socket
 import struct
 import threading
 import time
 import traceback
-from typing import Optional, Callable
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 try:
     import cv2
@@ -12,9 +15,17 @@ except Exception:
     cv2 = None
     np = None
 
+from .lipsync import MEDIA_CLOCK, LipSyncScheduler, ts_diff
+from .media_io import CameraSource
+from .rate_control import MSG_FEEDBACK, LossMonitor, VideoRateController, pack_feedback, parse_feedback
+
 MAGIC = b"HPH1"
 HDR_FMT = "!4sBHHI"
 HDR_SIZE = struct.calcsize(HDR_FMT)
+# HPH2: thêm ts(I) = thời điểm capture (ms, MEDIA_CLOCK) cho gói media
+MAGIC_TS = b"HPH2"
+HDR_TS_FMT = "!4sBHHII"
+HDR_TS_SIZE = struct.calcsize(HDR_TS_FMT)
 
 MSG_VIDEO = 2
 MSG_JOIN = 10
@@ -23,35 +34,138 @@ MSG_KEEPALIVE = 12
 
 MAX_DATAGRAM = 60000
 
+FRAME_W, FRAME_H = 640, 360
+
+
+class LatestSlot:
+    """Hàng đợi 1 chỗ: put() ghi đè phần tử cũ (latest-frame-wins)."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._item: Any = None
+        self._has = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item: Any) -> None:
+        with self._cond:
+            if self._has:
+                self.dropped += 1
+            self._item = item
+            self._has = True
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Lấy phần tử mới nhất; None nếu hết timeout hoặc slot đã đóng."""
+        with self._cond:
+            if not self._has and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has:
+                return None
+            item, self._item, self._has = self._item, None, False
+            return item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Thời gian (ms) của một stage trong pipeline: count/avg/p50/p95/max."""
+
+    def __init__(self, window: int = 300) -> None:
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            xs = sorted(self._samples)
+        if not xs:
+            return {"count": self.count, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": self.count,
+            "avg": round(self.total_ms / max(1, self.count), 3),
+            "p50": round(xs[len(xs) // 2], 3),
+            "p95": round(xs[min(len(xs) - 1, int(len(xs) * 0.95))], 3),
+            "max": round(self.max_ms, 3),
+        }
+
 
-def _pack(mtype: int, room: str, user: str, seq: int, payload: bytes) -> bytes:
+def _pack(mtype: int, room: str, user: str, seq: int, payload: bytes, ts: Optional[int] = None) -> bytes:
+    """ts=None → header HPH1 (gói điều khiển); có ts → HPH2."""
     room_b = room.encode(); user_b = user.encode()
-    header = struct.pack(HDR_FMT, MAGIC, mtype, len(room_b), len(user_b), seq)
+    if ts is None:
+        header = struct.pack(HDR_FMT, MAGIC, mtype, len(room_b), len(user_b), seq)
+    else:
+        header = struct.pack(HDR_TS_FMT, MAGIC_TS, mtype, len(room_b), len(user_b), seq, ts & 0xFFFFFFFF)
     return header + room_b + user_b + payload
 
 
 def _parse(data: bytes):
+    """(mtype, room, user, seq, payload, ts) – ts là None với header HPH1."""
     if len(data) < HDR_SIZE:
         return None
-    magic, mtype, rlen, ulen, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
-    if magic != MAGIC:
-        return None
-    off = HDR_SIZE
+    ts = None
+    if data[:4] == MAGIC_TS:
+        if len(data) < HDR_TS_SIZE:
+            return None
+        magic, mtype, rlen, ulen, seq, ts = struct.unpack(HDR_TS_FMT, data[:HDR_TS_SIZE])
+        off = HDR_TS_SIZE
+    else:
+        magic, mtype, rlen, ulen, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
+        if magic != MAGIC:
+            return None
+        off = HDR_SIZE
     try:
         room = data[off:off + rlen].decode(); off += rlen
         user = data[off:off + ulen].decode(); off += ulen
     except Exception:
         return None
     payload = data[off:]
-    return mtype, room, user, seq, payload
+    return mtype, room, user, seq, payload, ts
 
 
 class VideoCallClient:
+    """
+    UDP video client. Phía gửi là pipeline 3 tầng nối bằng LatestSlot:
+      capture thread → encode worker pool (resize + JPEG) → paced sender.
+    Tầng nào chậm thì khung cũ bị ghi đè thay vì dồn lại, nên độ trễ không tăng.
+    Callback preview (on_local_frame) chạy ở luồng riêng, không chặn capture.
+    - target_fps: nhịp gửi tối đa.
+    - capture: nguồn khung tùy chọn (có read() -> (ok, frame) và release(), xem
+      media_io: VideoFileSource, ImageSequenceSource, SyntheticVideoSource);
+      mặc định mở webcam. on_remote_frame có thể là một đích của media_io
+      (NullVideoSink, JpegRecordingSink).
+    - pipeline_stats(): thời gian từng tầng, glass-to-wire, fps thực tế.
+    - rate_control=True: VideoRateController chỉnh quality/độ phân giải/fps theo
+      target_kbps, bỏ khung tĩnh, nhận MSG_FEEDBACK (mất gói) từ bên nhận. Phía
+      nhận tự đo mất gói theo seq và gửi MSG_FEEDBACK mỗi giây.
+    - Gói video mang timestamp capture (HPH2, MEDIA_CLOCK). lipsync: khung từ
+      xa đến sớm hơn tiếng được giữ lại (luồng present riêng) tới đúng lúc.
+    """
     def __init__(self,
                  host: str,
                  port: int,
                  on_remote_frame: Optional[Callable[[str, bytes], None]] = None,
-                 on_local_frame: Optional[Callable[[np.ndarray], None]] = None) -> None:
+                 on_local_frame: Optional[Callable[[np.ndarray], None]] = None,
+                 target_fps: float = 20.0,
+                 encode_workers: int = 2,
+                 capture: Any = None,
+                 rate_control: bool = True,
+                 target_kbps: float = 800.0,
+                 lipsync: Optional[LipSyncScheduler] = None) -> None:
         if cv2 is None or np is None:
             raise RuntimeError("OpenCV (opencv-python) is not installed")
         self.host = host
@@ -61,37 +175,68 @@ class VideoCallClient:
         self.user = "user"
         self._alive = False
         self._seq = 0
-        self._tx: Optional[threading.Thread] = None
+        self._threads: List[threading.Thread] = []
         self._rx: Optional[threading.Thread] = None
-        self._cap = None
+        self._cap = capture
         self._on_remote_frame = on_remote_frame
         self._on_local_frame = on_local_frame
         self.cam_visible = True  # bật/tắt video
 
+        self.target_fps = float(target_fps)
+        self.encode_workers = max(1, int(encode_workers))
+        self._raw_slot = LatestSlot()    # capture → encode
+        self._enc_slot = LatestSlot()    # encode → send
+        self._local_slot = LatestSlot()  # capture → preview callback
+        self._frame_no = 0
+        self._sent_frame_no = 0
+        self._sent_frames = 0
+        self._sent_bytes = 0
+        self._started_at = 0.0
+        self.rate: Optional[VideoRateController] = (
+            VideoRateController(target_kbps, max_fps=self.target_fps) if rate_control else None
+        )
+        self._loss = LossMonitor()
+        self.lipsync = lipsync
+        self._held: List[Tuple[int, int, str, bytes]] = []   # heap (due_ms, tie, user, payload)
+        self._held_cond = threading.Condition()
+        self._tie = itertools.count()
+        self.stage_stats: Dict[str, StageStats] = {
+            name: StageStats() for name in ("capture", "local_cb", "encode", "send", "glass_to_wire")
+        }
+
     def _open_camera(self):
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        if not cap or not cap.isOpened():
-            cap = cv2.VideoCapture(0)
-        if not cap or not cap.isOpened():
-            raise RuntimeError("Cannot open camera")
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
-        return cap
+        return CameraSource(0, FRAME_W, FRAME_H)
 
     def start(self, room: str, user: str) -> None:
         self.room = room
         self.user = user
         self._alive = True
+        self._started_at = time.perf_counter()
 
-        self._cap = self._open_camera()
+        if self._cap is None:
+            self._cap = self._open_camera()
         self.sock.sendto(_pack(MSG_JOIN, self.room, self.user, 0, b""), (self.host, self.port))
 
-        self._tx = threading.Thread(target=self._tx_loop, daemon=True)
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._encode_loop, daemon=True)
+                          for _ in range(self.encode_workers)]
+        self._threads.append(threading.Thread(target=self._send_loop, daemon=True))
+        if self._on_local_frame:
+            self._threads.append(threading.Thread(target=self._local_loop, daemon=True))
+        if self.lipsync:
+            self._threads.append(threading.Thread(target=self._present_loop, daemon=True))
         self._rx = threading.Thread(target=self._rx_loop, daemon=True)
-        self._tx.start(); self._rx.start()
+        for t in self._threads:
+            t.start()
+        self._rx.start()
 
     def stop(self) -> None:
         self._alive = False
+        self._raw_slot.close()
+        self._enc_slot.close()
+        self._local_slot.close()
+        with self._held_cond:
+            self._held_cond.notify_all()
         try:
             self.sock.sendto(_pack(MSG_LEAVE, self.room, self.user, 0, b""), (self.host, self.port))
         except:
@@ -100,54 +245,127 @@ class VideoCallClient:
         if self._cap:
             self._cap.release()
 
-    def _tx_loop(self) -> None:
-        next_keep = time.time() + 5
+    # ---------- tx pipeline ----------
+    def _capture_loop(self) -> None:
+        next_admit = 0.0
         while self._alive:
             try:
+                t0 = time.perf_counter()
                 ok, frame = self._cap.read() if self._cap else (False, None)
+                t1 = time.perf_counter()
                 if not ok:
                     time.sleep(0.05)
                     continue
+                self.stage_stats["capture"].add((t1 - t0) * 1000)
 
-                # nếu cam OFF → không gửi frame, chỉ gửi keepalive
+                # nếu cam OFF → vẫn đọc để camera không dồn buffer, nhưng không gửi
                 if not self.cam_visible:
-                    if time.time() >= next_keep:
-                        self.sock.sendto(_pack(MSG_KEEPALIVE, self.room, self.user, 0, b""), (self.host, self.port))
-                        next_keep = time.time() + 5
                     continue
 
-                # callback local frame
+                # bỏ khung ngay từ đầu nếu camera nhanh hơn target_fps
+                # (khỏi tốn encode, và khung không phải chờ ở tầng gửi)
+                if t1 >= next_admit:
+                    period = 1.0 / (self.rate.fps if self.rate else self.target_fps)
+                    next_admit = max(next_admit + period, t1 - period / 2)
+                    # cảnh tĩnh → không encode/gửi (khung tự xem vẫn cập nhật)
+                    if not self.rate or self.rate.should_send(frame, t1):
+                        self._frame_no += 1
+                        self._raw_slot.put((self._frame_no, t1, frame))
                 if self._on_local_frame:
-                    self._on_local_frame(frame)
+                    self._local_slot.put(frame)
+            except Exception:
+                print("[VideoCall] Error in _capture_loop:\n", traceback.format_exc())
+                time.sleep(0.1)
 
-                # compress JPEG
-                frame = cv2.resize(frame, (640, 360))
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 65]
-                ok, buf = cv2.imencode('.jpg', frame, encode_param)
-                if not ok:
-                    continue
-                data = buf.tobytes()
-                if len(data) > MAX_DATAGRAM:
-                    encode_param[1] = 55
-                    ok, buf = cv2.imencode('.jpg', frame, encode_param)
-                    if not ok:
-                        continue
-                    data = buf.tobytes()
-                if len(data) > MAX_DATAGRAM:
-                    continue
+    def _local_loop(self) -> None:
+        while self._alive:
+            frame = self._local_slot.get(timeout=0.5)
+            if frame is None:
+                continue
+            try:
+                t0 = time.perf_counter()
+                self._on_local_frame(frame)
+                self.stage_stats["local_cb"].add((time.perf_counter() - t0) * 1000)
+            except Exception:
+                print("[VideoCall] Error in _local_loop:\n", traceback.format_exc())
 
-                self._seq = (self._seq + 1) & 0xFFFFFFFF
-                pkt = _pack(MSG_VIDEO, self.room, self.user, self._seq, data)
-                self.sock.sendto(pkt, (self.host, self.port))
+    def _encode_frame(self, frame: "np.ndarray") -> Optional[bytes]:
+        w, h, quality = self.rate.params() if self.rate else (FRAME_W, FRAME_H, 65)
+        if frame.shape[1] != w or frame.shape[0] != h:
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        for q in (quality, quality - 10, quality - 20):
+            ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), max(10, q)])
+            if not ok:
+                return None
+            if buf.size <= MAX_DATAGRAM:
+                if self.rate:
+                    self.rate.on_encoded(buf.size)
+                return buf.tobytes()
+        return None
+
+    def _encode_loop(self) -> None:
+        while self._alive:
+            item = self._raw_slot.get(timeout=0.5)
+            if item is None:
+                continue
+            frame_no, t_cap, frame = item
+            try:
+                t0 = time.perf_counter()
+                data = self._encode_frame(frame)
+                self.stage_stats["encode"].add((time.perf_counter() - t0) * 1000)
+                if data is not None:
+                    self._enc_slot.put((frame_no, t_cap, data))
+            except Exception:
+                print("[VideoCall] Error in _encode_loop:\n", traceback.format_exc())
 
+    def _send_loop(self) -> None:
+        next_keep = time.time() + 5
+        next_send = 0.0
+        while self._alive:
+            try:
                 if time.time() >= next_keep:
                     self.sock.sendto(_pack(MSG_KEEPALIVE, self.room, self.user, 0, b""), (self.host, self.port))
                     next_keep = time.time() + 5
 
+                # không phát burst: các gói cách nhau ít nhất nửa chu kỳ
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                item = self._enc_slot.get(timeout=0.5)
+                if item is None:
+                    continue
+                frame_no, t_cap, data = item
+                if frame_no <= self._sent_frame_no:
+                    continue   # worker khác đã gửi khung mới hơn
+
+                self._seq = (self._seq + 1) & 0xFFFFFFFF
+                pkt = _pack(MSG_VIDEO, self.room, self.user, self._seq, data, ts=MEDIA_CLOCK.to_ms(t_cap))
+                t0 = time.perf_counter()
+                self.sock.sendto(pkt, (self.host, self.port))
+                t1 = time.perf_counter()
+                self._sent_frame_no = frame_no
+                self._sent_frames += 1
+                self._sent_bytes += len(pkt)
+                self.stage_stats["send"].add((t1 - t0) * 1000)
+                self.stage_stats["glass_to_wire"].add((t1 - t_cap) * 1000)
+                next_send = t1 + 0.5 / self.target_fps
             except Exception:
-                print("[VideoCall] Error in _tx_loop:\n", traceback.format_exc())
+                print("[VideoCall] Error in _send_loop:\n", traceback.format_exc())
                 time.sleep(0.1)
 
+    def pipeline_stats(self) -> Dict[str, Any]:
+        elapsed = max(1e-6, time.perf_counter() - self._started_at) if self._started_at else 0.0
+        out: Dict[str, Any] = {name: st.snapshot() for name, st in self.stage_stats.items()}
+        out["captured_frames"] = self._frame_no
+        out["sent_frames"] = self._sent_frames
+        out["sent_fps"] = round(self._sent_frames / elapsed, 2) if elapsed else 0.0
+        out["sent_kbps"] = round(self._sent_bytes * 8 / elapsed / 1000, 1) if elapsed else 0.0
+        out["dropped_before_encode"] = self._raw_slot.dropped
+        out["dropped_before_send"] = self._enc_slot.dropped
+        if self.rate:
+            out["rate"] = self.rate.stats()
+        return out
+
     def _rx_loop(self) -> None:
         self.sock.settimeout(1.0)
         while self._alive:
@@ -156,14 +374,60 @@ class VideoCallClient:
                 parsed = _parse(data)
                 if not parsed:
                     continue
-                mtype, room, user, seq, payload = parsed
-                if mtype != MSG_VIDEO or room != self.room or user == self.user:
+                mtype, room, user, seq, payload, ts = parsed
+                if room != self.room or user == self.user:
                     continue
 
+                if mtype == MSG_FEEDBACK:
+                    fb = parse_feedback(payload)
+                    if fb and fb[0] == self.user and self.rate:
+                        self.rate.on_feedback(fb[1], reporter=user)
+                    continue
+                if mtype != MSG_VIDEO:
+                    continue
+
+                self._loss.on_packet(user, seq, len(payload))
+                self._send_feedback()
                 if self._on_remote_frame:
-                    self._on_remote_frame(user, payload)
+                    if self.lipsync and ts is not None:
+                        self._schedule_remote(user, ts, payload)
+                    else:
+                        self._on_remote_frame(user, payload)
 
             except socket.timeout:
+                self._send_feedback()
                 continue
             except Exception:
                 print("[VideoCall] Error in _rx_loop:\n", traceback.format_exc())
+
+    # ---------- lip-sync playout ----------
+    def _schedule_remote(self, user: str, ts: int, payload: bytes) -> None:
+        now_ms = MEDIA_CLOCK.now_ms()
+        due = self.lipsync.video_due(user, ts, now_ms)
+        if ts_diff(due, now_ms) <= 0:
+            self._on_remote_frame(user, payload)
+            return
+        with self._held_cond:
+            heapq.heappush(self._held, (due, next(self._tie), user, payload))
+            self._held_cond.notify()
+
+    def _present_loop(self) -> None:
+        while self._alive:
+            with self._held_cond:
+                if not self._held:
+                    self._held_cond.wait(0.5)
+                    continue
+                wait = ts_diff(self._held[0][0], MEDIA_CLOCK.now_ms())
+                if wait > 0:
+                    self._held_cond.wait(wait / 1000.0)
+                    continue
+                _, _, user, payload = heapq.heappop(self._held)
+            try:
+                self._on_remote_frame(user, payload)
+            except Exception:
+                print("[VideoCall] Error in _present_loop:\n", traceback.format_exc())
+
+    def _send_feedback(self) -> None:
+        for sender, loss, rx_kbps in self._loss.due_reports():
+            pkt = _pack(MSG_FEEDBACK, self.room, self.user, 0, pack_feedback(sender, loss, rx_kbps))
+            self.sock.sendto(pkt, (self.host, self.port))
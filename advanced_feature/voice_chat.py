@@ -2,16 +2,28 @@ import socket
 import struct
 import threading
 import time
-from typing import Optional, Callable
+from typing import Dict, Optional, Callable
 
 try:
     import pyaudio
 except Exception:
     pyaudio = None
 
+from .jitter_buffer import JitterBuffer, mix_frames
+from .lipsync import MEDIA_CLOCK, LipSyncScheduler
+from .media_io import PyAudioSink, PyAudioSource
+from .vad import DtxController, decode_cn
+from .voice_codec import (
+    CODEC_CN, DEFAULT_CODEC, VoiceCodec, codec_supported, create_codec, pack_voice, split_voice,
+)
+
 MAGIC = b"HPH1" 
 HDR_FMT = "!4sBHHI"  # magic, type, room_len, user_len, seq
 HDR_SIZE = struct.calcsize(HDR_FMT)
+# HPH2: thêm ts(I) = thời điểm capture (ms, MEDIA_CLOCK) cho gói media
+MAGIC_TS = b"HPH2"
+HDR_TS_FMT = "!4sBHHII"
+HDR_TS_SIZE = struct.calcsize(HDR_TS_FMT)
 
 MSG_VOICE = 1
 MSG_JOIN = 10
@@ -26,26 +38,40 @@ FRAME_MS = 20
 FRAME_SAMPLES = int(AUDIO_RATE * FRAME_MS / 1000)  # 320
 FRAME_BYTES = FRAME_SAMPLES * SAMPLE_WIDTH         # 640
 
+SENDER_IDLE_SEC = 10.0   # xoá jitter buffer của người gửi im lặng quá lâu
+
 # ============== helpers ==============
-def _pack(mtype: int, room: str, user: str, seq: int, payload: bytes) -> bytes:
+def _pack(mtype: int, room: str, user: str, seq: int, payload: bytes, ts: Optional[int] = None) -> bytes:
+    """ts=None → header HPH1 (gói điều khiển); có ts → HPH2."""
     room_b = room.encode(); user_b = user.encode()
-    header = struct.pack(HDR_FMT, MAGIC, mtype, len(room_b), len(user_b), seq)
+    if ts is None:
+        header = struct.pack(HDR_FMT, MAGIC, mtype, len(room_b), len(user_b), seq)
+    else:
+        header = struct.pack(HDR_TS_FMT, MAGIC_TS, mtype, len(room_b), len(user_b), seq, ts & 0xFFFFFFFF)
     return header + room_b + user_b + payload
 
 def _parse(data: bytes):
+    """(mtype, room, user, seq, payload, ts) – ts là None với header HPH1."""
     if len(data) < HDR_SIZE:
         return None
-    magic, mtype, rlen, ulen, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
-    if magic != MAGIC:
-        return None
-    off = HDR_SIZE
+    ts = None
+    if data[:4] == MAGIC_TS:
+        if len(data) < HDR_TS_SIZE:
+            return None
+        magic, mtype, rlen, ulen, seq, ts = struct.unpack(HDR_TS_FMT, data[:HDR_TS_SIZE])
+        off = HDR_TS_SIZE
+    else:
+        magic, mtype, rlen, ulen, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
+        if magic != MAGIC:
+            return None
+        off = HDR_SIZE
     try:
         room = data[off:off + rlen].decode(); off += rlen
         user = data[off:off + ulen].decode(); off += ulen
     except Exception:
         return None
     payload = data[off:]
-    return mtype, room, user, seq, payload
+    return mtype, room, user, seq, payload, ts
 
 
 class VoiceChatClient:
@@ -53,14 +79,30 @@ class VoiceChatClient:
     UDP voice client: gửi/nhận PCM 16kHz mono 16-bit.
     - start(room, user): mở mic/speaker và JOIN.
     - stop(): đóng luồng, LEAVE.
-    - mute: set self.mic_enabled = False để gửi khung im lặng.
+    - mute: set self.mic_enabled = False → ngừng gửi thoại (chỉ còn keepalive).
+    - dtx=True: VAD + DTX, khoảng lặng chỉ gửi gói mô tả comfort noise; bên nhận
+      tự sinh nhiễu nền.
     - volume_playback: 0.0..2.0 (nhân biên độ khi phát).
+    - Mỗi người gửi có một JitterBuffer riêng; luồng playout lấy khung 20 ms
+      từ mọi buffer, trộn bằng NumPy rồi ghi vào `_spk`.
+    - stats(): độ sâu buffer, số gói trễ/mất theo từng người gửi.
+    - codec: "pcm" | "ulaw" | "alaw" | "opus" | "auto"; codec_id nằm ở byte đầu
+      payload nên bên nhận giải mã đúng codec của từng người gửi.
+    - Gói thoại mang timestamp capture (HPH2, MEDIA_CLOCK). lipsync: truyền cùng
+      một LipSyncScheduler cho VideoCallClient để đồng bộ tiếng/hình.
+    - source/sink: nguồn/đích audio (xem media_io: WavSource, RecordingSink,
+      NullAudioSink, ...). Chỉ cần PyAudio khi dùng mic/loa mặc định.
     """
     def __init__(self,
                  host: str,
                  port: int,
-                 on_error: Optional[Callable[[str], None]] = None) -> None:
-        if pyaudio is None:
+                 on_error: Optional[Callable[[str], None]] = None,
+                 codec: str = DEFAULT_CODEC,
+                 dtx: bool = True,
+                 lipsync: Optional[LipSyncScheduler] = None,
+                 source=None,
+                 sink=None) -> None:
+        if pyaudio is None and (source is None or sink is None):
             raise RuntimeError("PyAudio is not installed")
         self.host = host
         self.port = int(port)
@@ -74,10 +116,27 @@ class VoiceChatClient:
 
         self._tx_thread: Optional[threading.Thread] = None
         self._rx_thread: Optional[threading.Thread] = None
+        self._play_thread: Optional[threading.Thread] = None
+
+        self._buffers: Dict[str, JitterBuffer] = {}
+        self._buf_lock = threading.Lock()
 
-        self._pa = pyaudio.PyAudio()
-        self._mic = None   # input stream
-        self._spk = None   # output stream
+        self._codec = create_codec(codec, AUDIO_RATE, FRAME_SAMPLES)
+        self._decoders: Dict[tuple, VoiceCodec] = {}   # (user, codec_id) -> decoder
+        self.undecodable = 0
+
+        self.dtx = dtx
+        self._dtx = DtxController()
+        self.tx_packets = 0
+        self.tx_bytes = 0
+        self.lipsync = lipsync
+        self._out_latency_ms = 0.0   # độ trễ thiết bị phát (cộng vào thời điểm "đã phát")
+
+        self._pa = pyaudio.PyAudio() if source is None or sink is None else None
+        self._source = source
+        self._sink = sink
+        self._mic = None   # nguồn audio: read(n) -> bytes
+        self._spk = None   # đích audio: write(bytes)
 
         self.mic_enabled = True         # tắt/bật mic (nhưng vẫn giữ kết nối)
         self.volume_playback = 1.0       # nhân biên độ khi phát
@@ -90,16 +149,16 @@ class VoiceChatClient:
         self._alive = True
 
         # open streams
-        fmt = self._pa.get_format_from_width(SAMPLE_WIDTH)
-        try:
-            self._mic = self._pa.open(format=fmt, channels=AUDIO_CH, rate=AUDIO_RATE,
-                                      input=True, frames_per_buffer=FRAME_SAMPLES)
-        except Exception:
-            # Không có mic? vẫn chạy nhưng gửi im lặng
-            self._mic = None
+        self._mic = self._source
+        if self._mic is None:
+            try:
+                self._mic = PyAudioSource(self._pa, AUDIO_RATE, FRAME_SAMPLES)
+            except Exception:
+                # Không có mic? vẫn chạy nhưng gửi im lặng
+                self._mic = None
 
-        self._spk = self._pa.open(format=fmt, channels=AUDIO_CH, rate=AUDIO_RATE,
-                                  output=True, frames_per_buffer=FRAME_SAMPLES)
+        self._spk = self._sink if self._sink is not None else PyAudioSink(self._pa, AUDIO_RATE, FRAME_SAMPLES)
+        self._out_latency_ms = float(getattr(self._spk, "latency_ms", 0.0))
 
         # JOIN
         self.sock.sendto(_pack(MSG_JOIN, self.room, self.user, 0, b""), (self.host, self.port))
@@ -107,7 +166,8 @@ class VoiceChatClient:
         # threads
         self._tx_thread = threading.Thread(target=self._tx_loop, daemon=True)
         self._rx_thread = threading.Thread(target=self._rx_loop, daemon=True)
-        self._tx_thread.start(); self._rx_thread.start()
+        self._play_thread = threading.Thread(target=self._play_loop, daemon=True)
+        self._tx_thread.start(); self._rx_thread.start(); self._play_thread.start()
 
     def stop(self) -> None:
         self._alive = False
@@ -118,12 +178,12 @@ class VoiceChatClient:
         time.sleep(0.05)
         try:
             if self._mic:
-                self._mic.stop_stream(); self._mic.close()
+                self._mic.close()
         except Exception:
             pass
         try:
             if self._spk:
-                self._spk.stop_stream(); self._spk.close()
+                self._spk.close()
         except Exception:
             pass
         try:
@@ -139,21 +199,41 @@ class VoiceChatClient:
     # ---------- loops ----------
     def _tx_loop(self) -> None:
         next_keep = time.time() + 5
+        period = FRAME_MS / 1000.0
+        next_tick = time.monotonic()
         while self._alive:
             try:
+                frame = None
                 if self.mic_enabled and self._mic:
                     try:
-                        frame = self._mic.read(FRAME_SAMPLES, exception_on_overflow=False)
+                        frame = self._mic.read(FRAME_SAMPLES)   # None = nguồn file đã hết
                     except Exception:
-                        # đọc lỗi → gửi im lặng
-                        frame = b"\x00" * FRAME_BYTES
-                else:
-                    # mic off → gửi im lặng để giữ đồng bộ
-                    frame = b"\x00" * FRAME_BYTES
+                        frame = None   # đọc lỗi → coi như im lặng
+                ts = MEDIA_CLOCK.now_ms()
+                if frame is None:
+                    # không đọc mic (tắt mic / lỗi) → tự giữ nhịp 20 ms
+                    next_tick = max(next_tick + period, time.monotonic() - period)
+                    delay = next_tick - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
 
+                # seq tăng theo từng khung 20 ms kể cả khi không gửi, để bên nhận
+                # vẫn ước lượng jitter đúng qua các khoảng lặng (DTX)
                 self._seq = (self._seq + 1) & 0xFFFFFFFF
-                pkt = _pack(MSG_VOICE, self.room, self.user, self._seq, frame)
-                self.sock.sendto(pkt, (self.host, self.port))
+                if self.dtx:
+                    decision = self._dtx.process(frame, muted=not self.mic_enabled)
+                else:
+                    decision = ("voice", frame or b"\x00" * FRAME_BYTES)
+                if decision is not None:
+                    kind, body = decision
+                    if kind == "voice":
+                        data = pack_voice(self._codec.codec_id, self._codec.encode(body))
+                    else:
+                        data = pack_voice(CODEC_CN, body)
+                    pkt = _pack(MSG_VOICE, self.room, self.user, self._seq, data, ts=ts)
+                    self.sock.sendto(pkt, (self.host, self.port))
+                    self.tx_packets += 1
+                    self.tx_bytes += len(pkt)
 
                 # keepalive định kỳ
                 if time.time() >= next_keep:
@@ -166,7 +246,6 @@ class VoiceChatClient:
                 time.sleep(0.05)
 
     def _rx_loop(self) -> None:
-        import numpy as np
         while self._alive:
             try:
                 data, _ = self.sock.recvfrom(65535)
@@ -180,19 +259,88 @@ class VoiceChatClient:
             parsed = _parse(data)
             if not parsed:
                 continue
-            mtype, room, user, seq, payload = parsed
+            mtype, room, user, seq, payload, ts = parsed
             if mtype != MSG_VOICE or room != self.room or user == self.user:
                 continue
+            try:
+                parts = split_voice(payload)
+                if parts is None:
+                    continue
+                codec_id, body = parts
+                with self._buf_lock:
+                    if codec_id == CODEC_CN:
+                        self._buffer_for(user).push_cn(seq, decode_cn(body), ts=ts)
+                        continue
+                    pcm = self._decode(user, codec_id, body)
+                    if pcm is None:
+                        continue
+                    self._buffer_for(user).push(seq, pcm, ts=ts)
+            except Exception:
+                # gói hỏng từ một thành viên không được làm chết luồng rx
+                self.undecodable += 1
+
+    def _buffer_for(self, user: str) -> JitterBuffer:
+        jb = self._buffers.get(user)
+        if jb is None:
+            jb = self._buffers[user] = JitterBuffer(FRAME_SAMPLES, FRAME_MS)
+        return jb
+
+    def _decode(self, user: str, codec_id: int, data: bytes) -> Optional[bytes]:
+        dec = self._decoders.get((user, codec_id))
+        if dec is None:
+            if not codec_supported(codec_id):
+                self.undecodable += 1
+                return None
+            dec = self._decoders[(user, codec_id)] = create_codec(codec_id, AUDIO_RATE, FRAME_SAMPLES)
+        try:
+            return dec.decode(data)
+        except Exception:
+            self.undecodable += 1
+            return None
+
+    def _play_loop(self) -> None:
+        """Đồng hồ phát 20 ms: lấy khung từ mọi jitter buffer, trộn, ghi ra loa."""
+        period = FRAME_MS / 1000.0
+        next_tick = time.monotonic()
+        while self._alive:
+            now = time.monotonic()
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            elif now - next_tick > 5 * period:
+                # tụt lại quá xa (máy bận) → không cố đuổi kịp
+                next_tick = now
+            next_tick += period
+
+            with self._buf_lock:
+                frames = []
+                for user, jb in list(self._buffers.items()):
+                    frame = jb.pop()
+                    if frame is not None:
+                        frames.append(frame)
+                        if self.lipsync and jb.played_ts is not None:
+                            self._sync_audio(user, jb)
+                    elif not jb.depth and now - jb.last_arrival > SENDER_IDLE_SEC:
+                        del self._buffers[user]
+                        for key in [k for k in self._decoders if k[0] == user]:
+                            del self._decoders[key]
+                        if self.lipsync:
+                            self.lipsync.forget(user)
+            if not frames or not self._spk:
+                continue
+
+            try:
+                self._spk.write(mix_frames(frames, self.volume_playback))
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Playback error: {e}")
+
+    def _sync_audio(self, user: str, jb: JitterBuffer) -> None:
+        now_ms = MEDIA_CLOCK.now_ms() + int(self._out_latency_ms)
+        self.lipsync.on_audio(user, jb.played_ts, now_ms, extra_ms=jb.applied_extra * FRAME_MS)
+        jb.set_extra_depth(round(self.lipsync.audio_extra_ms(user) / FRAME_MS))
 
-            # scale volume nếu cần
-            if self._spk and payload:
-                if self.volume_playback != 1.0:
-                    # int16 scale
-                    arr = np.frombuffer(payload, dtype=np.int16).astype(np.float32)
-                    arr = np.clip(arr * float(self.volume_playback), -32768, 32767).astype(np.int16)
-                    payload = arr.tobytes()
-                try:
-                    self._spk.write(payload)
-                except Exception as e:
-                    if self.on_error:
-                        self.on_error(f"Playback error: {e}")
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, dict]:
+        """Thống kê jitter buffer theo người gửi: depth, target, late, lost, ..."""
+        with self._buf_lock:
+            return {user: jb.stats() for user, jb in self._buffers.items()}
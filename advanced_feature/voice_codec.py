@@ -0,0 +1,173 @@
+"""
+Lớp codec cho voice chat (PCM 16 kHz mono 16-bit, khung 20 ms).
+
+Payload của gói MSG_VOICE = codec_id (1 byte) | dữ liệu đã mã hóa.
+Bên nhận chọn bộ giải mã theo codec_id trong từng gói, nên mỗi người gửi có
+thể dùng codec khác nhau trong cùng một phòng.
+
+- CODEC_PCM  (0): PCM thô, 640 B/khung (256 kbps).
+- CODEC_ULAW (1): G.711 μ-law, bảng tra NumPy, 320 B/khung (128 kbps).
+- CODEC_ALAW (2): G.711 A-law, bảng tra NumPy, 320 B/khung (128 kbps).
+- CODEC_OPUS (3): Opus qua `opuslib` nếu đã cài (~24 kbps).
+- CODEC_CN  (13): không phải codec âm thanh; gói mô tả comfort noise (DTX),
+  dữ liệu = 1 byte mức nhiễu (xem advanced_feature.vad).
+"""
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+import numpy as np
+
+try:
+    import opuslib
+except Exception:
+    opuslib = None
+
+CODEC_PCM = 0
+CODEC_ULAW = 1
+CODEC_ALAW = 2
+CODEC_OPUS = 3
+CODEC_CN = 13
+
+DEFAULT_CODEC = "ulaw"
+
+
+class VoiceCodec:
+    """Giao diện codec: encode/decode một khung 20 ms."""
+    codec_id = -1
+    name = ""
+
+    def __init__(self, rate: int = 16000, frame_samples: int = 320) -> None:
+        self.rate = rate
+        self.frame_samples = frame_samples
+
+    def encode(self, pcm: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class PCMCodec(VoiceCodec):
+    codec_id = CODEC_PCM
+    name = "pcm"
+
+    def encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+    def decode(self, data: bytes) -> bytes:
+        return data
+
+
+# ---------- G.711 (bảng tra 64K mục để mã hóa, 256 mục để giải mã) ----------
+def _build_ulaw_tables() -> Tuple[np.ndarray, np.ndarray]:
+    bias = 0x84
+    x = np.arange(-32768, 32768, dtype=np.int32) >> 2            # 14-bit
+    mask = np.where(x < 0, 0x7F, 0xFF)
+    mag = np.minimum(np.abs(x), 8159) + 0x21
+    seg = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), mag)
+    uval = np.where(seg >= 8, 0x7F, (np.minimum(seg, 7) << 4) | ((mag >> (seg + 1)) & 0x0F))
+    enc = uval ^ mask
+
+    code = (~np.arange(256, dtype=np.int32)) & 0xFF
+    exp = (code >> 4) & 0x07
+    mant = code & 0x0F
+    val = (((mant << 3) + bias) << exp) - bias
+    dec = np.where(code & 0x80, -val, val)
+    # sắp lại theo chỉ số uint16 (x & 0xFFFF) để tra trực tiếp từ int16.view(uint16)
+    return np.roll(enc, 32768).astype(np.uint8), dec.astype(np.int16)
+
+
+def _build_alaw_tables() -> Tuple[np.ndarray, np.ndarray]:
+    x = np.arange(-32768, 32768, dtype=np.int32)
+    sign = np.where(x >= 0, 0x80, 0)
+    mag = np.minimum(np.where(x >= 0, x, -x - 1), 32767) >> 3   # 13-bit
+    exponent = np.where(mag < 32, 0, np.floor(np.log2(np.maximum(mag, 1))).astype(np.int32) - 4)
+    mantissa = np.where(exponent == 0, mag >> 1, mag >> exponent) & 0x0F
+    enc = (sign | (exponent << 4) | mantissa) ^ 0x55
+
+    code = np.arange(256, dtype=np.int32) ^ 0x55
+    exp = (code >> 4) & 0x07
+    mant = code & 0x0F
+    val = np.where(exp == 0, (mant << 4) + 8, ((mant << 4) + 0x108) << np.maximum(exp - 1, 0))
+    dec = np.where(code & 0x80, val, -val)
+    return np.roll(enc, 32768).astype(np.uint8), dec.astype(np.int16)
+
+
+_ULAW_ENC, _ULAW_DEC = _build_ulaw_tables()
+_ALAW_ENC, _ALAW_DEC = _build_alaw_tables()
+
+
+class _G711Codec(VoiceCodec):
+    _enc: np.ndarray
+    _dec: np.ndarray
+
+    def encode(self, pcm: bytes) -> bytes:
+        idx = np.frombuffer(pcm, dtype=np.uint16)
+        return self._enc[idx].tobytes()
+
+    def decode(self, data: bytes) -> bytes:
+        return self._dec[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+class ULawCodec(_G711Codec):
+    codec_id = CODEC_ULAW
+    name = "ulaw"
+    _enc, _dec = _ULAW_ENC, _ULAW_DEC
+
+
+class ALawCodec(_G711Codec):
+    codec_id = CODEC_ALAW
+    name = "alaw"
+    _enc, _dec = _ALAW_ENC, _ALAW_DEC
+
+
+class OpusCodec(VoiceCodec):
+    codec_id = CODEC_OPUS
+    name = "opus"
+
+    def __init__(self, rate: int = 16000, frame_samples: int = 320, bitrate: int = 24000) -> None:
+        if opuslib is None:
+            raise RuntimeError("Opus bindings (opuslib) are not installed")
+        super().__init__(rate, frame_samples)
+        self._enc = opuslib.Encoder(rate, 1, opuslib.APPLICATION_VOIP)
+        self._enc.bitrate = bitrate
+        self._dec = opuslib.Decoder(rate, 1)
+
+    def encode(self, pcm: bytes) -> bytes:
+        return self._enc.encode(pcm, self.frame_samples)
+
+    def decode(self, data: bytes) -> bytes:
+        return self._dec.decode(data, self.frame_samples)
+
+
+CODECS: Dict[int, Type[VoiceCodec]] = {
+    c.codec_id: c for c in (PCMCodec, ULawCodec, ALawCodec, OpusCodec)
+}
+_BY_NAME = {c.name: c for c in CODECS.values()}
+
+
+def codec_supported(codec_id: int) -> bool:
+    return codec_id in CODECS and (codec_id != CODEC_OPUS or opuslib is not None)
+
+
+def available_codecs() -> List[str]:
+    return [c.name for cid, c in CODECS.items() if codec_supported(cid)]
+
+
+def create_codec(codec: Union[str, int], rate: int = 16000, frame_samples: int = 320) -> VoiceCodec:
+    """Tạo codec theo tên/id. "auto" = Opus nếu có, ngược lại μ-law."""
+    if codec == "auto":
+        codec = "opus" if opuslib is not None else DEFAULT_CODEC
+    cls: Optional[Type[VoiceCodec]] = CODECS.get(codec) if isinstance(codec, int) else _BY_NAME.get(codec)
+    if cls is None:
+        raise ValueError(f"Unknown voice codec: {codec!r}")
+    return cls(rate, frame_samples)
+
+
+def pack_voice(codec_id: int, data: bytes) -> bytes:
+    return bytes((codec_id,)) + data
+
+
+def split_voice(payload: bytes) -> Optional[Tuple[int, bytes]]:
+    if not payload:
+        return None
+    return payload[0], payload[1:]
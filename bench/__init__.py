@@ -0,0 +1 @@
+# Benchmarks / headless harnesses: chạy bằng `python -m bench.<tên>`
@@ -0,0 +1,98 @@
+"""
+Khởi động client GUI: import lười stack media/crypto so với import hết ngay
+(như trước: RoomView → cv2/numpy/PIL/video_call, server.utils → cryptography).
+
+- `-X importtime`: tổng thời gian import `Client.meeting_gui_client` và các
+  gói nặng nhất, ở chế độ lazy (hiện tại) và eager (import thêm đúng những gì
+  bản cũ kéo vào lúc nạp module).
+- Thời gian tới màn hình login: từ lúc spawn tiến trình tới khi cửa sổ đã map
+  và Tk vẽ xong lượt đầu (cần màn hình; không có thì bỏ qua).
+
+Mỗi phép đo chạy `--runs` lần trong tiến trình mới, lấy trung vị.
+
+    python -m bench.client_startup
+    python -m bench.client_startup --runs 9 --top 12
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# những gì bản cũ import khi nạp Client.meeting_gui_client
+EAGER = "import cryptography.hazmat.primitives.ciphers.aead, Client.gui_room; "
+
+
+def _importtime(eager: bool) -> Dict[str, int]:
+    """{module: µs cộng dồn} của một lần import trong tiến trình mới."""
+    code = (EAGER if eager else "") + "import Client.meeting_gui_client"
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                       capture_output=True, text=True, check=True)
+    out = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if not name.startswith("   "):           # chỉ cấp đầu (đã gồm con)
+            out[name.strip()] = int(cum)
+    return out
+
+
+def _to_login(eager: bool) -> float:
+    """ms từ lúc spawn tới khi màn hình login đã vẽ."""
+    code = (EAGER if eager else "") + (
+        "import time, Client.meeting_gui_client as g\n"
+        "app = g.MeetingApp()\n"
+        "def shown(_e=None):\n"
+        "    app.update_idletasks()\n"
+        "    print(time.perf_counter_ns(), flush=True)\n"
+        "    app.after(0, app.destroy)\n"
+        "app.views['LoginView'].bind('<Map>', lambda e: app.after_idle(shown), add='+')\n"
+        "app.mainloop()\n")
+    t0 = time.perf_counter_ns()
+    p = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr.strip().splitlines()[-1] if p.stderr.strip() else "failed")
+    return (int(p.stdout.split()[-1]) - t0) / 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Client startup: lazy vs eager media/crypto imports")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8, help="số gói nặng nhất in ra")
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    res: Dict[str, dict] = {}
+    for mode in ("eager", "lazy"):
+        runs: Dict[str, List[int]] = defaultdict(list)
+        for _ in range(args.runs):
+            for name, us in _importtime(mode == "eager").items():
+                runs[name].append(us)
+        med = {k: statistics.median(v) for k, v in runs.items()}
+        res[mode] = {"import_total_ms": round(sum(med.values()) / 1000, 1),
+                     "heaviest_ms": {k: round(v / 1000, 1)
+                                     for k, v in sorted(med.items(), key=lambda kv: -kv[1])[:args.top]}}
+        try:
+            res[mode]["to_login_ms"] = round(statistics.median(_to_login(mode == "eager") for _ in range(args.runs)), 1)
+        except RuntimeError as e:
+            res[mode]["to_login_ms"] = None
+            res[mode]["to_login_skipped"] = str(e)
+
+    for mode, r in res.items():
+        login = r["to_login_ms"] if r["to_login_ms"] is not None else f"skipped ({r['to_login_skipped']})"
+        print(f"{mode:<5} imports {r['import_total_ms']:>7} ms   time to login screen: {login}")
+        print("      " + ", ".join(f"{k} {v}" for k, v in r["heaviest_ms"].items()))
+    print(f"import time: x{res['eager']['import_total_ms'] / max(0.1, res['lazy']['import_total_ms']):.1f} faster")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
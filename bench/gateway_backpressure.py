@@ -0,0 +1,178 @@
+"""
+Một trình duyệt kẹt (ngừng đọc socket) có làm chậm cả phòng không?
+
+Chạy TCP server + gateway trong tiến trình này, cho một phòng: 1 người nói
+(chat đều đặn qua gateway), vài người nghe khoẻ, 1 người nghe kẹt (join xong
+thì không đọc nữa, buffer nhận nhỏ) và 1 người ra/vào phòng liên tục (sinh
+presence). Đo độ trễ/tỉ lệ nhận chat của người nghe khoẻ ở hai chế độ:
+
+- inline: Gateway(down_queue=0), gửi WS ngay trong vòng đọc TCP như trước:
+  người kẹt chặn gateway → server kẹt ở drain() → vòng broadcast của phòng
+  đứng;
+- queued: hàng đợi có giới hạn (bỏ presence, gộp rooms, ngắt khi kẹt quá
+  stall_timeout).
+
+Thoát mã 1 nếu ở chế độ queued người nghe khoẻ vẫn bị ảnh hưởng.
+
+    python -m bench.gateway_backpressure
+    python -m bench.gateway_backpressure --seconds 20 --size 16000 --rate 100
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import websockets
+
+
+def _pct(v: List[float], q: float) -> float:
+    return round(float(np.percentile(v, q)), 1) if v else float("nan")
+
+
+async def _login(port: int, name: str, room: str, sock: socket.socket = None):
+    kw = {"sock": sock} if sock is not None else {}
+    ws = await websockets.connect(f"ws://127.0.0.1:{port}", ping_interval=None, compression=None,
+                                  max_size=2**22, max_queue=1 if sock is not None else 64, **kw)
+    await ws.send(json.dumps({"type": "login", "payload": {"username": name, "password": "x"}}))
+    while json.loads(await ws.recv()).get("type") != "login_ok":
+        pass
+    await ws.send(json.dumps({"type": "join_room", "payload": {"room": room}}))
+    while json.loads(await ws.recv()).get("type") != "join_room_ok":
+        pass
+    return ws
+
+
+async def _listener(ws, lat: List[float], got: list) -> None:
+    try:
+        async for text in ws:
+            msg = json.loads(text)
+            if msg.get("type") == "chat":
+                sent_ns = int(msg["payload"]["text"].split(":", 2)[1])
+                lat.append((time.perf_counter_ns() - sent_ns) / 1e6)
+                got[0] += 1
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def _churner(port: int, name: str, room: str, stop: asyncio.Event) -> None:
+    ws = await _login(port, name, room)
+    drain = asyncio.create_task(_listener(ws, [], [0]))
+    while not stop.is_set():
+        await ws.send(json.dumps({"type": "leave_room", "payload": {}}))
+        await asyncio.sleep(0.05)
+        await ws.send(json.dumps({"type": "join_room", "payload": {"room": room}}))
+        await asyncio.sleep(0.05)
+    drain.cancel()
+    await ws.close()
+
+
+async def run(mode: str, args) -> dict:
+    from gateway.gateway_ws import Gateway
+    from server.tcp_server import handle_client
+
+    srv = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+    tcp_port = srv.sockets[0].getsockname()[1]
+    gw = Gateway("127.0.0.1", tcp_port, 0, "127.0.0.1", down_queue=0 if mode == "inline" else args.down_queue,
+                 stall_timeout=args.stall_timeout)
+    ws_srv = await websockets.serve(gw._handle_ws, "127.0.0.1", 0, ping_interval=None, compression=None,
+                                    max_size=2**22)
+    port = ws_srv.sockets[0].getsockname()[1]
+    room = f"bp-{mode}"
+
+    talker = await _login(port, f"{mode}-talker", room)
+    talker_drain = asyncio.create_task(_listener(talker, [], [0]))
+    listeners = [await _login(port, f"{mode}-l{i}", room) for i in range(args.listeners)]
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8192)
+    s.connect(("127.0.0.1", port))
+    stalled = await _login(port, f"{mode}-stalled", room, sock=s)   # từ đây không đọc nữa
+    lat: List[float] = []
+    got = [0]
+    tasks = [asyncio.create_task(_listener(ws, lat, got)) for ws in listeners]
+    stop = asyncio.Event()
+    churn = asyncio.create_task(_churner(port, f"{mode}-churn", room, stop))
+
+    sent = 0
+    pad_len = max(0, args.size - 60)
+    t0 = time.perf_counter()
+    blocked_at = None
+    while time.perf_counter() - t0 < args.seconds:
+        text = f"t:{time.perf_counter_ns()}:" + os.urandom(pad_len // 2).hex()
+        t_send = time.perf_counter()
+        try:
+            # inline: server kẹt → gateway ngừng đọc người nói → chính send() này kẹt
+            await asyncio.wait_for(talker.send(json.dumps({"type": "chat", "payload": {"text": text}})),
+                                   max(0.01, t0 + args.seconds - time.perf_counter()))
+        except asyncio.TimeoutError:
+            blocked_at = round(t_send - t0, 1)
+            break
+        sent += 1
+        await asyncio.sleep(max(0.0, t0 + sent / args.rate - time.perf_counter()))
+    await asyncio.sleep(1.0)
+    stop.set()
+    gstats = gw.stats()
+
+    for t in tasks + [talker_drain]:
+        t.cancel()
+    churn.cancel()
+    for ws in listeners + [talker, stalled]:
+        ws.transport.abort()
+    await asyncio.gather(churn, return_exceptions=True)
+    ws_srv.close()
+    srv.close()
+    await asyncio.sleep(0.5)
+
+    expected = sent * args.listeners
+    # nửa sau của phiên: khi buffer kernel đã đầy, ảnh hưởng của người kẹt lộ rõ
+    tail = lat[len(lat) // 2:]
+    return {"mode": mode, "sent": sent, "talker_blocked_at_s": blocked_at,
+            "delivered_pct": round(100 * got[0] / max(1, expected), 1),
+            "latency_p50_ms": _pct(lat, 50), "latency_p99_ms": _pct(lat, 99),
+            "late_half_p99_ms": _pct(tail, 99), "latency_max_ms": round(max(lat), 1) if lat else None,
+            "closed_stalled": gstats["closed_stalled"], "closed_overflow": gstats["closed_overflow"],
+            "down_peak_max": gstats["down_peak_max"], "dropped_presence": gstats["dropped_presence"]}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Stalled browser vs the rest of the room, inline vs queued gateway")
+    ap.add_argument("--seconds", type=float, default=15.0)
+    ap.add_argument("--rate", type=float, default=100.0, help="tin chat/giây của người nói")
+    ap.add_argument("--size", type=int, default=16000, help="byte mỗi tin chat")
+    ap.add_argument("--listeners", type=int, default=4)
+    ap.add_argument("--down-queue", type=int, default=256)
+    ap.add_argument("--stall-timeout", type=float, default=3.0)
+    ap.add_argument("--mode", choices=["inline", "queued", "both"], default="both")
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    os.environ.setdefault("HPH_USERS_DB", os.path.join(tempfile.mkdtemp(), "users.json"))
+    modes = ["inline", "queued"] if args.mode == "both" else [args.mode]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):   # server in log mỗi tin chat
+        results = [asyncio.run(run(m, args)) for m in modes]
+
+    print(f"{args.listeners} healthy listeners + 1 stalled, {args.rate:.0f} msg/s × {args.size} B for {args.seconds}s")
+    for r in results:
+        print(f"{r['mode']:<7} sent {r['sent']:>5}  delivered {r['delivered_pct']:>5}%  p50 {r['latency_p50_ms']:>8} ms  "
+              f"p99 {r['latency_p99_ms']:>8} ms  late-half p99 {r['late_half_p99_ms']:>8} ms")
+        blocked = "-" if r["talker_blocked_at_s"] is None else f"{r['talker_blocked_at_s']}s"
+        print(f"        room stalled at {blocked}  stalled-closed {r['closed_stalled']}  "
+              f"overflow-closed {r['closed_overflow']}  peak queue {r['down_peak_max']}  "
+              f"presence dropped {r['dropped_presence']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    queued = next((r for r in results if r["mode"] == "queued"), None)
+    if queued and (queued["delivered_pct"] < 99 or queued["late_half_p99_ms"] > 250):
+        print("FAIL: healthy listeners were slowed down by the stalled browser")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Chế độ all-in-one (main.py --component all): gateway nối vào TCP server qua
+loopback + AES như trước, hay gắn thẳng vào handle_client bằng LocalPipe.
+
+Tiến trình con chạy TCP server + gateway trong cùng event loop; tiến trình đo
+mở N người dùng WebSocket trong một phòng, mỗi người chat `--rate` tin/giây.
+Báo độ trễ chat (gửi → người khác trong phòng nhận) và CPU của tiến trình
+server trên mỗi tin được giao.
+
+    python -m bench.gateway_local
+    python -m bench.gateway_local --users 30 --rate 5 --seconds 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import websockets
+
+from bench.gateway_mux import _free_port, _wait_port
+from bench.loadgen import _ProcMonitor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOM = "local-bench"
+
+
+async def _user(port: int, name: str, lat: List[float], got: list, ready: asyncio.Event, go: asyncio.Event,
+                stop: asyncio.Event, rate: float, size: int) -> None:
+    async with websockets.connect(f"ws://127.0.0.1:{port}", ping_interval=None, max_size=2**20) as ws:
+        await ws.send(json.dumps({"type": "login", "payload": {"username": name, "password": "x"}}))
+        while json.loads(await ws.recv()).get("type") != "login_ok":
+            pass
+        await ws.send(json.dumps({"type": "join_room", "payload": {"room": ROOM}}))
+
+        async def rx() -> None:
+            async for text in ws:
+                msg = json.loads(text)
+                if msg.get("type") == "chat" and go.is_set():
+                    lat.append((time.perf_counter_ns() - int(msg["payload"]["text"].split(":", 2)[1])) / 1e6)
+                    got[0] += 1
+
+        task = asyncio.create_task(rx())
+        ready.set()
+        await go.wait()
+        pad = "x" * max(0, size - 30)
+        k = 0
+        t0 = time.perf_counter()
+        while not stop.is_set():
+            await ws.send(json.dumps({"type": "chat", "payload": {"text": f"t:{time.perf_counter_ns()}:{pad}"}}))
+            k += 1
+            await asyncio.sleep(max(0.0, t0 + k / rate - time.perf_counter()))
+        await asyncio.sleep(0.5)
+        task.cancel()
+
+
+async def _measure(args, port: int, pid: int) -> dict:
+    lat: List[float] = []
+    got = [0]
+    go, stop = asyncio.Event(), asyncio.Event()
+    readies = [asyncio.Event() for _ in range(args.users)]
+    tasks = []
+    for i, ev in enumerate(readies):
+        tasks.append(asyncio.create_task(_user(port, f"u{i}", lat, got, ev, go, stop, args.rate, args.size)))
+        await ev.wait()                 # login lần lượt (PBKDF2 chặn loop server)
+    await asyncio.sleep(0.5)
+    mon = _ProcMonitor(pid)
+    go.set()
+    await asyncio.sleep(args.warmup)
+    lat.clear()
+    got[0] = 0
+    c0, t0 = mon._cpu_seconds(), time.perf_counter()
+    await asyncio.sleep(args.seconds)
+    c1, t1 = mon._cpu_seconds(), time.perf_counter()
+    n = got[0]
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    cpu = c1 - c0
+    return {"delivered_per_s": round(n / (t1 - t0)), "server_cpu_pct": round(100 * cpu / (t1 - t0), 1),
+            "cpu_us_per_delivery": round(1e6 * cpu / max(1, n), 1),
+            "latency_p50_ms": round(float(np.percentile(lat, 50)), 2) if lat else None,
+            "latency_p99_ms": round(float(np.percentile(lat, 99)), 2) if lat else None}
+
+
+async def _serve(ws_port: int, tcp_port: int, local: bool) -> None:
+    from gateway.gateway_ws import Gateway
+    from server.tcp_server import handle_client, main as tcp_main
+    gw = Gateway(tcp_host="127.0.0.1", tcp_port=tcp_port, web_port=ws_port, host="127.0.0.1",
+                 local_handler=handle_client if local else None)
+    await asyncio.gather(tcp_main("127.0.0.1", tcp_port), gw.start())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="All-in-one gateway: loopback TCP+AES vs in-process LocalPipe")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=2.0, help="tin chat / người / giây")
+    ap.add_argument("--size", type=int, default=120)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--json", default="")
+    ap.add_argument("--serve", choices=["local", "loopback"], default="", help=argparse.SUPPRESS)
+    ap.add_argument("--ports", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        ws_port, tcp_port = map(int, args.ports.split(","))
+        asyncio.run(_serve(ws_port, tcp_port, args.serve == "local"))
+        return
+
+    results = {}
+    for mode in ("loopback", "local"):
+        ws_port, tcp_port = _free_port(), _free_port()
+        env = dict(os.environ, HPH_USERS_DB=os.path.join(tempfile.mkdtemp(), "users.json"))
+        p = subprocess.Popen([sys.executable, "-m", "bench.gateway_local", "--serve", mode,
+                              "--ports", f"{ws_port},{tcp_port}"],
+                             cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_port(p, ws_port)
+            results[mode] = asyncio.run(_measure(args, ws_port, p.pid))
+        finally:
+            p.kill()
+            p.wait()
+
+    print(f"{args.users} web users in one room, {args.rate} chat/s each ({args.size} B), {args.seconds}s")
+    for mode, r in results.items():
+        print(f"{mode:<9} {r['delivered_per_s']:>6} deliveries/s  p50 {r['latency_p50_ms']:>6} ms  "
+              f"p99 {r['latency_p99_ms']:>6} ms  server CPU {r['server_cpu_pct']:>5}%  "
+              f"{r['cpu_us_per_delivery']:>6} µs CPU/delivery")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
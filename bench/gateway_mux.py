@@ -0,0 +1,174 @@
+"""
+So sánh gateway WebSocket ở hai chế độ upstream:
+- direct: mỗi tab một kết nối TCP tới server (mặc định cũ);
+- mux:    các phiên ghép trên vài kết nối dài hạn (Gateway(upstream_pool=K)).
+
+Chạy TCP server và gateway trong hai tiến trình con riêng, mở N WebSocket
+(mỗi cái gửi list_rooms và chờ trả lời để chắc phiên thông tới server), rồi đo
+RSS và số file descriptor của từng tiến trình.
+
+    python -m bench.gateway_mux                       # 1k, 5k, 10k × direct/mux
+    python -m bench.gateway_mux --clients 1000 --pool 8 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import websockets
+
+from bench.loadgen import _ProcMonitor, _raise_fd_limit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(proc: subprocess.Popen, port: int, timeout: float = 20.0) -> None:
+    deadline = time.time() + timeout
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("child process exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                proc.kill()
+                raise RuntimeError(f"port {port} did not open")
+            time.sleep(0.1)
+
+
+def _spawn(*args: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "bench.gateway_mux", *args], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _sample(pid: int) -> dict:
+    m = _ProcMonitor(pid)
+    m._sample_mem()
+    return {"rss_mb": round(m.rss_mb[-1], 1) if m.rss_mb else None, "fds": m.fds}
+
+
+async def _open_clients(port: int, n: int, concurrency: int) -> tuple:
+    sem = asyncio.Semaphore(concurrency)
+    socks: List[websockets.WebSocketClientProtocol] = []
+    errors = {}
+
+    async def one() -> None:
+        async with sem:
+            try:
+                ws = await websockets.connect(f"ws://127.0.0.1:{port}", ping_interval=None, open_timeout=30)
+                await ws.send(json.dumps({"type": "list_rooms"}))
+                reply = json.loads(await asyncio.wait_for(ws.recv(), 30))
+                if reply.get("type") != "rooms":
+                    raise RuntimeError("bad reply")
+                socks.append(ws)
+            except Exception as e:
+                k = type(e).__name__
+                errors[k] = errors.get(k, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return socks, errors, time.perf_counter() - t0
+
+
+async def _close_clients(socks: list) -> None:
+    for i in range(0, len(socks), 500):
+        await asyncio.gather(*(ws.close() for ws in socks[i:i + 500]), return_exceptions=True)
+
+
+def run(mode: str, clients: int, pool: int, concurrency: int) -> dict:
+    tcp_port, ws_port = _free_port(), _free_port()
+    server = _spawn("--serve-tcp", str(tcp_port))
+    gateway: Optional[subprocess.Popen] = None
+    try:
+        _wait_port(server, tcp_port)
+        gateway = _spawn("--serve-gateway", str(ws_port), "--tcp-port", str(tcp_port),
+                         "--pool", str(pool if mode == "mux" else 0))
+        _wait_port(gateway, ws_port)
+        time.sleep(0.3)
+        idle = {"server": _sample(server.pid), "gateway": _sample(gateway.pid)}
+        loaded, errors, secs = asyncio.run(_hold(ws_port, clients, concurrency, server.pid, gateway.pid))
+    finally:
+        for p in (gateway, server):
+            if p is not None:
+                p.kill()
+                p.wait()
+    out = {"mode": mode, "clients": clients, "pool": pool if mode == "mux" else 0,
+           "connected": loaded["connected"], "errors": errors, "connect_s": round(secs, 1)}
+    for who in ("server", "gateway"):
+        a, b = idle[who], loaded[who]
+        out[who] = {"rss_mb": b["rss_mb"], "fds": b["fds"],
+                    "kb_per_client": round((b["rss_mb"] - a["rss_mb"]) * 1024 / max(1, loaded["connected"]), 1)}
+    return out
+
+
+async def _hold(port: int, n: int, concurrency: int, server_pid: int, gateway_pid: int) -> tuple:
+    socks, errors, secs = await _open_clients(port, n, concurrency)
+    await asyncio.sleep(1.0)
+    loaded = {"connected": len(socks), "server": _sample(server_pid), "gateway": _sample(gateway_pid)}
+    await _close_clients(socks)
+    return loaded, errors, secs
+
+
+# ---------- tiến trình con ----------
+async def _serve_tcp(port: int) -> None:
+    from server.tcp_server import main as tcp_main
+    await tcp_main("127.0.0.1", port)
+
+
+async def _serve_gateway(port: int, tcp_port: int, pool: int) -> None:
+    from gateway.gateway_ws import Gateway
+    await Gateway(tcp_host="127.0.0.1", tcp_port=tcp_port, web_port=port, host="127.0.0.1",
+                  upstream_pool=pool).start()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Gateway upstream: one TCP per tab vs multiplexed pool")
+    ap.add_argument("--clients", type=int, action="append", default=None, help="mặc định 1000, 5000, 10000")
+    ap.add_argument("--mode", choices=["direct", "mux", "both"], default="both")
+    ap.add_argument("--pool", type=int, default=4, help="số kết nối upstream ở chế độ mux")
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--json", default="")
+    ap.add_argument("--serve-tcp", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--serve-gateway", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--tcp-port", type=int, default=0, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    _raise_fd_limit(max(args.clients or [10000]))   # tiến trình con thừa kế giới hạn
+    if args.serve_tcp:
+        asyncio.run(_serve_tcp(args.serve_tcp))
+        return
+    if args.serve_gateway:
+        asyncio.run(_serve_gateway(args.serve_gateway, args.tcp_port, args.pool))
+        return
+
+    modes = ["direct", "mux"] if args.mode == "both" else [args.mode]
+    results = []
+    print(f"{'mode':<7}{'clients':>8}{'ok':>7}{'conn s':>8} | {'gw MB':>7}{'gw fds':>7}{'KB/cl':>7}"
+          f" | {'srv MB':>7}{'srv fds':>8}{'KB/cl':>7}  errors")
+    for n in args.clients or [1000, 5000, 10000]:
+        for mode in modes:
+            r = run(mode, n, args.pool, args.concurrency)
+            results.append(r)
+            g, s = r["gateway"], r["server"]
+            print(f"{r['mode']:<7}{n:>8}{r['connected']:>7}{r['connect_s']:>8} | {g['rss_mb']:>7}{g['fds']:>7}"
+                  f"{g['kb_per_client']:>7} | {s['rss_mb']:>7}{s['fds']:>8}{s['kb_per_client']:>7}  "
+                  f"{r['errors'] or ''}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
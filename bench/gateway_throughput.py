@@ -0,0 +1,138 @@
+"""
+Thông lượng chuyển tiếp của gateway WebSocket: tin/giây trên mỗi core CPU
+của tiến trình gateway, đường parse JSON cũ so với passthrough byte thô.
+
+Gateway chạy trong tiến trình con; upstream là một TCP server giả trong tiến
+trình đo (trả login_ok với khoá AES ngay, rồi gửi lại nguyên blob đã mã hoá)
+nên gần như toàn bộ CPU đo được là của gateway: mỗi tin = WS→TCP (mã hoá) +
+TCP→WS (giải mã), tức 2 lần chuyển tiếp.
+
+    python -m bench.gateway_throughput
+    python -m bench.gateway_throughput --conns 50 --window 16 --size 400 --seconds 10
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import websockets
+
+from bench.gateway_mux import _free_port, _wait_port
+from bench.loadgen import _ProcMonitor
+from server.protocol import read_msg, send_msg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---------- upstream giả ----------
+async def _echo_upstream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        msg = await read_msg(reader)
+        user = msg.get("payload", {}).get("username", "?")
+        await send_msg(writer, {"ok": True, "type": "login_ok", "username": user, "token": "bench",
+                                "aes_key_b64": base64.b64encode(os.urandom(32)).decode()})
+        while True:
+            header = await reader.readexactly(4)
+            (ln,) = struct.unpack("!I", header)
+            writer.write(header + await reader.readexactly(ln))   # cùng khoá hai chiều: echo nguyên blob
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+# ---------- client WS ----------
+async def _client(port: int, idx: int, window: int, size: int, stop: asyncio.Event, counts: list) -> None:
+    async with websockets.connect(f"ws://127.0.0.1:{port}", ping_interval=None, max_size=2**20) as ws:
+        await ws.send(json.dumps({"type": "login", "payload": {"username": f"b{idx}", "password": "x"}}))
+        await ws.recv()
+        body = json.dumps({"type": "chat", "payload": {"text": "x" * max(0, size - 40)}})
+
+        async def rx() -> None:
+            async for _ in ws:
+                counts[0] += 1
+                if stop.is_set():
+                    return
+                await ws.send(body)          # giữ `window` tin đang bay
+
+        task = asyncio.create_task(rx())
+        for _ in range(window):
+            await ws.send(body)
+        await stop.wait()
+        task.cancel()
+
+
+async def _measure(args, passthrough: bool) -> dict:
+    up = await asyncio.start_server(_echo_upstream, "127.0.0.1", 0)
+    tcp_port = up.sockets[0].getsockname()[1]
+    ws_port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "bench.gateway_throughput", "--serve-gateway", str(ws_port),
+                             "--tcp-port", str(tcp_port), "--passthrough", str(int(passthrough))],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _wait_port, proc, ws_port)
+        stop = asyncio.Event()
+        counts = [0]
+        clients = [asyncio.create_task(_client(ws_port, i, args.window, args.size, stop, counts))
+                   for i in range(args.conns)]
+        await asyncio.sleep(args.warmup)
+        mon = _ProcMonitor(proc.pid)
+        c0, n0, t0 = mon._cpu_seconds(), counts[0], time.perf_counter()
+        await asyncio.sleep(args.seconds)
+        c1, n1, t1 = mon._cpu_seconds(), counts[0], time.perf_counter()
+        stop.set()
+        await asyncio.gather(*clients, return_exceptions=True)
+    finally:
+        proc.kill()
+        proc.wait()
+        up.close()
+        await asyncio.sleep(0.2)     # để các kết nối upstream nhận EOF trước khi loop đóng
+    msgs, cpu, wall = n1 - n0, max(1e-6, c1 - c0), t1 - t0
+    return {"mode": "passthrough" if passthrough else "parse", "round_trips": msgs,
+            "round_trips_per_s": round(msgs / wall), "gateway_cpu_pct": round(100 * cpu / wall, 1),
+            "msgs_per_core_s": round(2 * msgs / cpu)}
+
+
+async def _serve_gateway(port: int, tcp_port: int, passthrough: bool) -> None:
+    from gateway.gateway_ws import Gateway
+    await Gateway(tcp_host="127.0.0.1", tcp_port=tcp_port, web_port=port, host="127.0.0.1",
+                  passthrough=passthrough).start()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Gateway relay throughput: JSON parse vs raw passthrough")
+    ap.add_argument("--conns", type=int, default=20)
+    ap.add_argument("--window", type=int, default=8, help="số tin đang bay mỗi kết nối")
+    ap.add_argument("--size", type=int, default=200, help="cỡ tin chat (byte JSON)")
+    ap.add_argument("--seconds", type=float, default=8.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--json", default="")
+    ap.add_argument("--serve-gateway", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--tcp-port", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--passthrough", type=int, default=1, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve_gateway:
+        asyncio.run(_serve_gateway(args.serve_gateway, args.tcp_port, bool(args.passthrough)))
+        return
+
+    results = [asyncio.run(_measure(args, p)) for p in (False, True)]
+    print(f"{args.conns} conns × window {args.window}, {args.size} B messages, {args.seconds}s")
+    for r in results:
+        print(f"{r['mode']:<12} {r['round_trips_per_s']:>8} rt/s  gateway CPU {r['gateway_cpu_pct']:>5}%  "
+              f"{r['msgs_per_core_s']:>8} msgs/core-s")
+    base, new = results[0]["msgs_per_core_s"], results[1]["msgs_per_core_s"]
+    print(f"passthrough: x{new / max(1, base):.2f} msgs per gateway core-second")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
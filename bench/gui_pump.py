@@ -0,0 +1,210 @@
+"""
+Bơm mạng của client Tkinter: poll after(60) + vét hết hàng đợi (cũ) so với
+đánh thức theo sự kiện + giới hạn thời gian mỗi lượt + gộp danh sách phòng.
+
+Mỗi chế độ chạy MeetingApp thật trong một tiến trình con, nối tới một server
+giả (luồng trong cùng tiến trình): login → join_room_ok → chat thưa
+(`--trickle` tin/s) rồi một đợt dồn dập `--rate` tin/s, cứ `--rooms-every`
+tin chèn một danh sách phòng. Đo:
+- độ trễ hiển thị: từ lúc server gửi tới lúc Tk chạy xong idle (đã vẽ) sau
+  khi dòng chat được chèn;
+- khựng UI: khoảng hở của một nhịp after(5) — hở lớn = cửa sổ không vẽ,
+  không nhận phím/chuột trong khoảng đó.
+
+Cần màn hình (X/Wayland/Windows); không có thì thoát mã 2.
+
+    python -m bench.gui_pump
+    python -m bench.gui_pump --rate 2000 --seconds 5
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICK_MS = 5
+STALL_MS = (50, 100)
+
+
+# ---------- server giả ----------
+def _feeder(srv: socket.socket, args, state: dict) -> None:
+    conn, _ = srv.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send(obj: dict) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        conn.sendall(struct.pack("!I", len(data)) + data)
+
+    (ln,) = struct.unpack("!I", conn.recv(4, socket.MSG_WAITALL))
+    conn.recv(ln, socket.MSG_WAITALL)                        # login
+    send({"ok": True, "type": "login_ok", "username": "bench", "token": "bench"})   # không khoá → plain
+    send({"ok": True, "type": "join_room_ok", "room": "bench", "users": [f"u{i}" for i in range(20)]})
+    time.sleep(1.0)
+    rooms = [{"name": f"room{i}", "users": i % 7} for i in range(args.rooms_size)]
+    for phase, rate, seconds in (("trickle", args.trickle, args.trickle_seconds), ("burst", args.rate, args.seconds)):
+        t0 = time.perf_counter()
+        n = int(rate * seconds)
+        for i in range(n):
+            send({"type": "chat", "from": "peer", "payload": {"text": f"{phase}:{time.perf_counter_ns()}"}})
+            if phase == "burst" and i % args.rooms_every == 0:
+                send({"type": "rooms", "rooms": rooms})
+                state["rooms_sent"] += 1
+            state["sent"][phase] += 1
+            time.sleep(max(0.0, t0 + (i + 1) / rate - time.perf_counter()))
+    time.sleep(args.drain)
+    state["done"] = True
+    conn.close()
+
+
+# ---------- tiến trình con ----------
+def _run(mode: str, args) -> dict:
+    import tkinter as tk
+    from advanced_feature import config_client
+    import Client.meeting_gui_client as gui
+
+    class _PollingApp(gui.MeetingApp):
+        """Bơm cũ: after(60), vét hết hàng đợi mỗi lượt."""
+
+        def _init_wakeup(self) -> None:
+            self._pump_after = None
+            self.after(60, self._poll)
+
+        def _wake_from_rx(self) -> None:
+            pass
+
+        def _poll(self) -> None:
+            while True:
+                msg = self.client.get_message_nowait()
+                if msg is None:
+                    break
+                self._handle_message(msg)
+            self.after(60, self._poll)
+
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+    config_client.SERVER_HOST, config_client.TCP_PORT = "127.0.0.1", srv.getsockname()[1]
+    state = {"sent": {"trickle": 0, "burst": 0}, "rooms_sent": 0, "done": False}
+
+    try:
+        app = (_PollingApp if mode == "poll" else gui.MeetingApp)()
+    except tk.TclError as e:
+        print(f"no display: {e}", file=sys.stderr)
+        sys.exit(2)
+    if mode == "poll":
+        app.client.coalesce = frozenset()
+
+    lat: Dict[str, List[float]] = {"trickle": [], "burst": []}
+    pending: List[tuple] = []
+    rooms_applied = [0]
+    rv, lobby = app._view("RoomView"), app.views["LobbyView"]
+    orig_append, orig_populate = rv.append_chat, lobby.populate_rooms
+
+    def painted() -> None:
+        now = time.perf_counter_ns()
+        for phase, sent_ns in pending:
+            lat[phase].append((now - sent_ns) / 1e6)
+        pending.clear()
+
+    def append_chat(line: str) -> None:
+        orig_append(line)
+        if line.startswith("peer: "):
+            phase, ns = line[6:].split(":", 1)
+            if not pending:
+                app.after_idle(painted)          # chạy sau lượt vẽ lại do insert đăng ký
+            pending.append((phase, int(ns)))
+
+    def populate_rooms(rooms) -> None:
+        rooms_applied[0] += 1
+        orig_populate(rooms)
+
+    rv.append_chat, lobby.populate_rooms = append_chat, populate_rooms
+
+    gaps: Dict[str, List[float]] = {"trickle": [], "burst": []}
+    last = [time.perf_counter()]
+
+    def tick() -> None:
+        now = time.perf_counter()
+        if state["done"]:
+            app.quit()
+            return
+        if state["sent"]["trickle"]:
+            gaps["burst" if state["sent"]["burst"] else "trickle"].append((now - last[0]) * 1000)
+        last[0] = now
+        app.after(TICK_MS, tick)
+
+    threading.Thread(target=_feeder, args=(srv, args, state), daemon=True).start()
+    app.after(TICK_MS, tick)
+    app.after(100, lambda: app.do_login("bench", "x"))
+    app.mainloop()
+    app.client.close()
+    app.destroy()
+
+    out = {"mode": mode, "rooms_sent": state["rooms_sent"], "rooms_applied": rooms_applied[0]}
+    for phase in ("trickle", "burst"):
+        v, g = lat[phase], gaps[phase]
+        out[phase] = {"sent": state["sent"][phase], "shown": len(v),
+                      "latency_p50_ms": round(float(np.percentile(v, 50)), 1) if v else None,
+                      "latency_p99_ms": round(float(np.percentile(v, 99)), 1) if v else None,
+                      "latency_max_ms": round(max(v), 1) if v else None,
+                      "tick_gap_p99_ms": round(float(np.percentile(g, 99)), 1) if g else None,
+                      "tick_gap_max_ms": round(max(g), 1) if g else None,
+                      **{f"stalls_over_{ms}ms": sum(1 for x in g if x > ms) for ms in STALL_MS}}
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Tkinter client network pump: 60 ms polling vs event-driven")
+    ap.add_argument("--rate", type=float, default=1000.0, help="tin/s trong đợt dồn dập")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--trickle", type=float, default=20.0, help="tin/s giai đoạn thưa")
+    ap.add_argument("--trickle-seconds", type=float, default=3.0)
+    ap.add_argument("--rooms-every", type=int, default=10, help="chèn danh sách phòng sau mỗi N tin")
+    ap.add_argument("--rooms-size", type=int, default=200)
+    ap.add_argument("--drain", type=float, default=3.0, help="giây chờ UI vét nốt sau đợt dồn")
+    ap.add_argument("--json", default="")
+    ap.add_argument("--run", choices=["poll", "event"], default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run:
+        print(json.dumps(_run(args.run, args)))
+        return
+
+    results = []
+    for mode in ("poll", "event"):
+        p = subprocess.run([sys.executable, "-m", "bench.gui_pump", "--run", mode, *sys.argv[1:]],
+                           cwd=ROOT, capture_output=True, text=True)
+        if p.returncode == 2:
+            print(p.stderr.strip() or "no display")
+            sys.exit(2)
+        if p.returncode != 0:
+            print(p.stderr)
+            sys.exit(p.returncode)
+        results.append(json.loads(p.stdout.strip().splitlines()[-1]))
+
+    print(f"trickle {args.trickle:.0f} msg/s for {args.trickle_seconds}s, burst {args.rate:.0f} msg/s for "
+          f"{args.seconds}s (+1 room list / {args.rooms_every} msgs)")
+    for r in results:
+        for phase in ("trickle", "burst"):
+            x = r[phase]
+            print(f"{r['mode']:<6} {phase:<8} shown {x['shown']:>5}/{x['sent']:<5} display p50 "
+                  f"{x['latency_p50_ms']:>7} ms  p99 {x['latency_p99_ms']:>7} ms  "
+                  f"UI gap p99 {x['tick_gap_p99_ms']:>6} ms  max {x['tick_gap_max_ms']:>6} ms  "
+                  f">{STALL_MS[0]}ms {x[f'stalls_over_{STALL_MS[0]}ms']:>3}  >{STALL_MS[1]}ms "
+                  f"{x[f'stalls_over_{STALL_MS[1]}ms']:>3}")
+        print(f"{r['mode']:<6} room lists: {r['rooms_applied']} rendered of {r['rooms_sent']} received")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
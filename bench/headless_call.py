@@ -0,0 +1,114 @@
+"""
+Cuộc gọi đầy đủ (relay UDP + N người, voice + video) chạy headless, không
+cần mic/loa/camera: nguồn là file hoặc tín hiệu tổng hợp (media_io), đích là
+sink ghi/đếm. Dùng làm khung đo cho các thay đổi trong pipeline media.
+
+    python -m bench.headless_call
+    python -m bench.headless_call --participants 6 --seconds 20
+    python -m bench.headless_call --wav speech.wav --video clip.mp4 --record out/
+    python -m bench.headless_call --impair hotel_wifi --seed 3   # qua bench.impair
+    python -m bench.headless_call --capture call.hphcap          # rồi: python -m bench.replay call.hphcap
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from advanced_feature.media_io import (
+    JpegRecordingSink, NullVideoSink, PcmSource, RecordingSink, SyntheticVideoSource,
+    VideoFileSource, WavSource,
+)
+from advanced_feature.video_call import MSG_VIDEO, VideoCallClient
+from advanced_feature.voice_chat import AUDIO_RATE, MSG_VOICE, VoiceChatClient
+from bench.impair import PROFILES, ImpairmentProxy, format_report
+from bench.voice_codec import _speech_like
+from server.media_capture import CaptureWriter
+from server.udp_server import _UDPWorker
+
+ROOM = "bench-headless"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Headless voice+video call through the UDP relay")
+    ap.add_argument("--participants", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--codec", default="ulaw")
+    ap.add_argument("--wav", default="", help="file WAV cho mọi người nói (mặc định: tổng hợp)")
+    ap.add_argument("--video", default="", help="file video thay cho nguồn tổng hợp")
+    ap.add_argument("--fps", type=float, default=15.0)
+    ap.add_argument("--no-video", action="store_true")
+    ap.add_argument("--record", default="", help="thư mục ghi WAV/JPEG nhận được")
+    ap.add_argument("--impair", default="", choices=[""] + sorted(PROFILES), help="profile mạng xấu")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--capture", default="", help="relay ghi mọi datagram vào file này")
+    args = ap.parse_args()
+
+    capture = CaptureWriter(args.capture) if args.capture else None
+    voice_relay = _UDPWorker("127.0.0.1", 0, MSG_VOICE, capture=capture)
+    video_relay = _UDPWorker("127.0.0.1", 0, MSG_VIDEO, capture=capture)
+    voice_relay.start(); video_relay.start()
+    vport = voice_relay.sock.getsockname()[1]
+    pport = video_relay.sock.getsockname()[1]
+    proxy = None
+    if args.impair:
+        proxy = ImpairmentProxy([("127.0.0.1", vport), ("127.0.0.1", pport)], args.impair, args.seed).start()
+        vport, pport = proxy.ports
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+
+    rng = np.random.default_rng(0)
+    people = []
+    for i in range(args.participants):
+        name = f"p{i}"
+        src = WavSource(args.wav) if args.wav else \
+            PcmSource(_speech_like(8.0, 100 + 25 * i, rng), AUDIO_RATE)
+        sink = RecordingSink(os.path.join(args.record, f"{name}.wav")) if args.record else RecordingSink()
+        voice = VoiceChatClient("127.0.0.1", vport, codec=args.codec, source=src, sink=sink)
+        voice.start(ROOM, name)
+        video = vsink = None
+        if not args.no_video:
+            cap = VideoFileSource(args.video) if args.video else SyntheticVideoSource(30.0, offset=i * 17)
+            vsink = JpegRecordingSink(os.path.join(args.record, name)) if args.record else NullVideoSink()
+            video = VideoCallClient("127.0.0.1", pport, on_remote_frame=vsink,
+                                    target_fps=args.fps, capture=cap)
+            video.start(ROOM, name)
+        people.append((name, voice, sink, video, vsink))
+
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    time.sleep(args.seconds)
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - c0
+
+    print(f"participants={args.participants} seconds={args.seconds} codec={args.codec} "
+          f"video={'off' if args.no_video else (args.video or 'synthetic')}  CPU {100 * cpu / wall:.0f}%")
+    for name, voice, sink, video, vsink in people:
+        jb = voice.stats()
+        late = sum(s["late"] for s in jb.values())
+        lost = sum(s["lost"] for s in jb.values())
+        print(f"  {name}: voice tx={voice.tx_packets} pkt, played {sink.frames * 0.02:5.1f}s "
+              f"from {len(jb)} senders (late={late} lost={lost})")
+        if video:
+            st = video.pipeline_stats()
+            rx = vsink.stats()
+            rx_fps = np.mean([r["fps"] for r in rx.values()]) if rx else 0.0
+            print(f"        video tx {st['sent_fps']:.1f} fps {st['sent_kbps']:.0f} kbps, "
+                  f"glass_to_wire p95 {st['glass_to_wire']['p95']:.1f} ms, rx {rx_fps:.1f} fps from {len(rx)}")
+
+    for name, voice, sink, video, vsink in people:
+        voice.stop()
+        sink.close()
+        if video:
+            video.stop()
+    if proxy:
+        proxy.stop()
+        print(format_report(proxy.stats()))
+    voice_relay.stop(); video_relay.stop()
+    if capture:
+        capture.close()
+        print("capture:", capture.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Proxy UDP giả lập mạng xấu giữa client (VoiceChatClient/VideoCallClient) và
+relay _UDPWorker, không cần root hay `tc`: mất gói (ngẫu nhiên hoặc theo
+cụm, Gilbert-Elliott), trễ + jitter, đảo thứ tự, nhân đôi, giới hạn băng
+thông (hàng đợi có tail-drop). Kịch bản (profile) là chuỗi pha theo thời
+gian, vd. "hotel_wifi", "4g_handover".
+
+Mỗi client có địa chỉ/socket upstream riêng (relay vẫn thấy từng người một).
+Mô hình đường truyền tính theo (chiều, tên người dùng đọc từ header HPH) và
+RNG seed theo đúng khoá đó, nên cùng --seed cho cùng chuỗi quyết định với
+cùng chuỗi gói, không phụ thuộc port hay thứ tự kết nối.
+
+Dùng trong tiến trình:
+
+    with ImpairmentProxy([("127.0.0.1", voice_port), ("127.0.0.1", video_port)],
+                         profile="hotel_wifi", seed=3) as proxy:
+        VoiceChatClient("127.0.0.1", proxy.ports[0], ...)
+        ...
+        print(format_report(proxy.stats()))
+
+Chạy riêng (trước một server thật):
+
+    python -m bench.impair --list
+    python -m bench.impair --upstream 127.0.0.1:9999 --listen-port 19999 \\
+        --upstream 127.0.0.1:10000 --listen-port 20000 --profile 4g_handover --seed 7
+    python -m bench.headless_call --impair hotel_wifi --seed 3
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Address = Tuple[str, int]
+
+_HDR = struct.Struct("!4sBHH")   # phần đầu chung của HPH1/HPH2
+_MEDIA_NAMES = {1: "voice", 2: "video", 3: "screen", 10: "ctrl", 11: "ctrl", 12: "ctrl", 13: "ctrl"}
+
+
+@dataclass(frozen=True)
+class LinkParams:
+    loss: float = 0.0          # tỉ lệ mất trung bình
+    burst: float = 1.0         # độ dài trung bình một cụm mất (1 = ngẫu nhiên độc lập)
+    delay_ms: float = 0.0
+    jitter_ms: float = 0.0     # độ lệch chuẩn, không đảo thứ tự
+    reorder: float = 0.0       # tỉ lệ gói bị giữ thêm reorder_ms (vượt qua gói sau)
+    reorder_ms: float = 40.0
+    dup: float = 0.0
+    rate_kbps: float = 0.0     # 0 = không giới hạn
+    queue_ms: float = 250.0    # hàng đợi cổ chai dài hơn thì drop
+
+
+# profile: [(thời lượng giây, tham số)], lặp lại từ đầu khi hết
+PROFILES: Dict[str, List[Tuple[float, LinkParams]]] = {
+    "clean": [(1.0, LinkParams())],
+    "lan": [(1.0, LinkParams(delay_ms=1, jitter_ms=0.5))],
+    "lossy_5": [(1.0, LinkParams(delay_ms=20, jitter_ms=5, loss=0.05))],
+    "hotel_wifi": [
+        (8.0, LinkParams(delay_ms=25, jitter_ms=30, loss=0.02, burst=3, rate_kbps=2000, queue_ms=300)),
+        (2.0, LinkParams(delay_ms=80, jitter_ms=60, loss=0.08, burst=4, rate_kbps=600, queue_ms=400)),
+    ],
+    "4g_handover": [
+        (10.0, LinkParams(delay_ms=45, jitter_ms=12, loss=0.005, rate_kbps=8000)),
+        (0.3, LinkParams(loss=1.0)),
+        (3.0, LinkParams(delay_ms=120, jitter_ms=40, loss=0.03, burst=2, reorder=0.02, dup=0.01,
+                         rate_kbps=3000, queue_ms=400)),
+    ],
+    "satellite": [(1.0, LinkParams(delay_ms=300, jitter_ms=20, loss=0.01, rate_kbps=5000, queue_ms=600))],
+}
+
+
+class Profile:
+    def __init__(self, phases: Sequence[Tuple[float, LinkParams]], name: str = "custom") -> None:
+        self.name = name
+        self.phases = list(phases)
+        self.period = sum(d for d, _ in self.phases)
+
+    @classmethod
+    def named(cls, name: str, **overrides) -> "Profile":
+        phases = PROFILES[name]
+        if overrides:
+            phases = [(d, replace(p, **overrides)) for d, p in phases]
+        return cls(phases, name)
+
+    def at(self, t: float) -> LinkParams:
+        if len(self.phases) == 1 or self.period <= 0:
+            return self.phases[0][1]
+        t %= self.period
+        for d, p in self.phases:
+            if t < d:
+                return p
+            t -= d
+        return self.phases[-1][1]
+
+
+class LinkModel:
+    """Một chiều của một người dùng: quyết định mất/nhân đôi và thời điểm ra của từng gói."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self._bad = False
+        self._free = 0.0       # cổ chai rảnh lúc nào
+        self._last_due = 0.0
+
+    def decide(self, t: float, size: int, p: LinkParams) -> Tuple[List[float], str]:
+        """([thời điểm ra], ghi chú) – danh sách rỗng = bỏ gói ("loss"/"queue"), "reorder" = bị giữ lại."""
+        rng = self.rng
+        if p.loss >= 1.0:
+            return [], "loss"
+        if p.loss > 0:
+            # Gilbert-Elliott: bad = mất hết; P(bad) = loss, cụm trung bình = burst gói
+            r = 1.0 / max(1.0, p.burst)
+            g = p.loss * r / (1.0 - p.loss)
+            self._bad = rng.random() >= r if self._bad else rng.random() < g
+            if self._bad:
+                return [], "loss"
+        depart = t
+        if p.rate_kbps > 0:
+            start = max(t, self._free)
+            if start - t > p.queue_ms / 1000.0:
+                return [], "queue"
+            self._free = start + size * 8 / (p.rate_kbps * 1000.0)
+            depart = self._free
+        due = depart + (p.delay_ms + abs(rng.gauss(0.0, p.jitter_ms))) / 1000.0
+        note = ""
+        if rng.random() < p.reorder:
+            due += p.reorder_ms / 1000.0
+            note = "reorder"
+        else:
+            due = max(due, self._last_due)   # jitter không tự đảo thứ tự
+            self._last_due = due
+        out = [due]
+        if rng.random() < p.dup:
+            out.append(due + 0.001)
+        return out, note
+
+
+DELAY_SAMPLES = 10000      # reservoir mỗi luồng: phân vị trễ không làm RAM tăng theo thời gian chạy
+
+
+class _Stream:
+    __slots__ = ("packets", "bytes", "delivered", "lost", "queue_drop", "dup", "reordered",
+                 "_delays", "_rng")
+
+    def __init__(self) -> None:
+        self.packets = self.bytes = self.delivered = 0
+        self.lost = self.queue_drop = self.dup = self.reordered = 0
+        self._delays: List[float] = []
+        self._rng = random.Random(0)      # rng riêng: không làm lệch chuỗi suy hao theo seed
+
+    def add_delay(self, ms: float) -> None:
+        """Reservoir sampling (như bench.loadgen): giữ tối đa DELAY_SAMPLES mẫu đều."""
+        if len(self._delays) < DELAY_SAMPLES:
+            self._delays.append(ms)
+            return
+        j = self._rng.randrange(self.delivered)
+        if j < DELAY_SAMPLES:
+            self._delays[j] = ms
+
+    def summary(self) -> dict:
+        d = sorted(self._delays)
+        pct = lambda q: round(d[min(len(d) - 1, int(q * len(d)))], 1) if d else None
+        return {"packets": self.packets, "bytes": self.bytes, "delivered": self.delivered,
+                "lost": self.lost, "queue_drop": self.queue_drop, "dup": self.dup,
+                "reordered": self.reordered,
+                "loss_pct": round(100.0 * (self.lost + self.queue_drop) / max(1, self.packets), 2),
+                "delay_p50_ms": pct(0.50), "delay_p95_ms": pct(0.95), "delay_p99_ms": pct(0.99)}
+
+
+def _peek(data: bytes) -> Tuple[Optional[str], str]:
+    """(user, media) từ header HPH; user=None nếu không phải gói HPH."""
+    if len(data) < _HDR.size + 4 or data[:3] != b"HPH":
+        return None, "raw"
+    _magic, mtype, rlen, ulen = _HDR.unpack_from(data)
+    off = _HDR.size + 4 + (4 if data[3:4] == b"2" else 0) + rlen   # bỏ qua seq (+ ts) và room
+    try:
+        user = data[off:off + ulen].decode()
+    except Exception:
+        return None, "raw"
+    return user, _MEDIA_NAMES.get(mtype, "other")
+
+
+class ImpairmentProxy:
+    def __init__(self, upstreams: Sequence[Address], profile="clean", seed: int = 0,
+                 listen_host: str = "127.0.0.1", listen_ports: Optional[Sequence[int]] = None,
+                 direction: str = "both") -> None:
+        self.upstreams = [tuple(u) for u in upstreams]
+        self.profile = profile if isinstance(profile, Profile) else Profile.named(profile)
+        self.seed = seed
+        self.direction = direction
+        self._sel = selectors.DefaultSelector()
+        self._listen: List[socket.socket] = []
+        for i, _ in enumerate(self.upstreams):
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.bind((listen_host, listen_ports[i] if listen_ports else 0))
+            s.setblocking(False)
+            self._sel.register(s, selectors.EVENT_READ, ("listen", i, None))
+            self._listen.append(s)
+        self.ports = [s.getsockname()[1] for s in self._listen]
+        self._up: Dict[Tuple[int, Address], socket.socket] = {}
+        self._names: Dict[Tuple[int, Address], str] = {}   # client → tên (học từ gói lên)
+        self._links: Dict[Tuple[str, str], LinkModel] = {}
+        self._streams: Dict[Tuple[str, str, str], _Stream] = {}
+        self._heap: List[Tuple[float, int, socket.socket, bytes, Address]] = []
+        self._tie = itertools.count()
+        self._lock = threading.Lock()
+        self._alive = False
+        self._thread: Optional[threading.Thread] = None
+        self._t0 = time.perf_counter()
+
+    # ---------- lifecycle ----------
+    def start(self) -> "ImpairmentProxy":
+        self._t0 = time.perf_counter()
+        self._alive = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._alive = False
+        if self._thread:
+            self._thread.join(timeout=2)
+        for s in self._listen + list(self._up.values()):
+            try:
+                s.close()
+            except Exception:
+                pass
+        self._sel.close()
+
+    def __enter__(self) -> "ImpairmentProxy":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---------- core ----------
+    def _serve(self) -> None:
+        while self._alive:
+            timeout = 0.2
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.perf_counter()))
+            for key, _ in self._sel.select(timeout):
+                sock = key.fileobj
+                for _ in range(64):   # vét socket trước khi quay lại select
+                    try:
+                        data, addr = sock.recvfrom(65535)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        break
+                    self._on_packet(key.data, data, addr)
+            self._flush()
+
+    def _on_packet(self, tag, data: bytes, addr: Address) -> None:
+        now = time.perf_counter()
+        kind, i, client = tag
+        if kind == "listen":
+            client = addr
+            sock = self._up.get((i, client))
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((self._listen[i].getsockname()[0], 0))
+                sock.setblocking(False)
+                self._sel.register(sock, selectors.EVENT_READ, ("up", i, client))
+                self._up[(i, client)] = sock
+            user, media = _peek(data)
+            if user is not None:
+                self._names[(i, client)] = user
+            direction, out_sock, dst = "up", sock, self.upstreams[i]
+        else:
+            _sender, media = _peek(data)
+            direction, out_sock, dst = "down", self._listen[i], client
+        name = self._names.get((i, client), f"{client[0]}:{client[1]}")
+        with self._lock:
+            st = self._streams.get((direction, name, media))
+            if st is None:
+                st = self._streams[(direction, name, media)] = _Stream()
+            st.packets += 1
+            st.bytes += len(data)
+            if media != "ctrl" and self.direction in ("both", direction):
+                link = self._links.get((direction, name))
+                if link is None:
+                    link = self._links[(direction, name)] = LinkModel(
+                        random.Random(f"{self.seed}/{direction}/{name}"))
+                dues, reason = link.decide(now, len(data), self.profile.at(now - self._t0))
+            else:
+                dues, reason = [now], ""   # JOIN/LEAVE/KEEPALIVE/FEEDBACK không bị làm xấu
+            if not dues:
+                if reason == "queue":
+                    st.queue_drop += 1
+                else:
+                    st.lost += 1
+                return
+            if len(dues) > 1:
+                st.dup += 1
+            if reason == "reorder":
+                st.reordered += 1
+            st.delivered += 1
+            st.add_delay((dues[0] - now) * 1000)
+        for due in dues:
+            heapq.heappush(self._heap, (due, next(self._tie), out_sock, data, dst))
+
+    def _flush(self) -> None:
+        now = time.perf_counter()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, sock, data, dst = heapq.heappop(self._heap)
+            try:
+                sock.sendto(data, dst)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            streams = {f"{d} {name} {media}": st.summary()
+                       for (d, name, media), st in sorted(self._streams.items())}
+        return {"profile": self.profile.name, "seed": self.seed, "direction": self.direction,
+                "elapsed_s": round(time.perf_counter() - self._t0, 2), "streams": streams}
+
+
+def format_report(stats: dict, include_ctrl: bool = False) -> str:
+    lines = [f"impairment profile={stats['profile']} seed={stats['seed']} "
+             f"direction={stats['direction']} t={stats['elapsed_s']}s",
+             f"  {'stream':<28}{'pkts':>7}{'lost':>6}{'qdrop':>6}{'dup':>5}{'reord':>6}{'loss%':>7}"
+             f"{'p50':>7}{'p95':>7}{'p99':>7}"]
+    for key, s in stats["streams"].items():
+        if key.endswith(" ctrl") and not include_ctrl:
+            continue
+        fmt = lambda v: "-" if v is None else v
+        lines.append(f"  {key:<28}{s['packets']:>7}{s['lost']:>6}{s['queue_drop']:>6}{s['dup']:>5}"
+                     f"{s['reordered']:>6}{s['loss_pct']:>7}{fmt(s['delay_p50_ms']):>7}"
+                     f"{fmt(s['delay_p95_ms']):>7}{fmt(s['delay_p99_ms']):>7}")
+    return "\n".join(lines)
+
+
+def _addr(s: str) -> Address:
+    host, port = s.rsplit(":", 1)
+    return host, int(port)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="UDP network impairment proxy")
+    ap.add_argument("--list", action="store_true", help="liệt kê profile")
+    ap.add_argument("--upstream", action="append", type=_addr, default=[], help="host:port relay (lặp lại được)")
+    ap.add_argument("--listen-port", action="append", type=int, default=[], help="port nghe tương ứng từng upstream")
+    ap.add_argument("--listen-host", default="127.0.0.1")
+    ap.add_argument("--profile", default="hotel_wifi", choices=sorted(PROFILES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--direction", choices=("both", "up", "down"), default="both")
+    for field in ("loss", "burst", "delay_ms", "jitter_ms", "reorder", "dup", "rate_kbps", "queue_ms"):
+        ap.add_argument("--" + field.replace("_", "-"), type=float, default=None,
+                        help=f"ghi đè {field} cho mọi pha của profile")
+    ap.add_argument("--report-every", type=float, default=10.0)
+    ap.add_argument("--json", default="", help="ghi báo cáo cuối ra file JSON")
+    args = ap.parse_args()
+
+    if args.list:
+        for name, phases in PROFILES.items():
+            print(name)
+            for d, p in phases:
+                print(f"    {d:>5.1f}s  {p}")
+        return
+    if not args.upstream:
+        ap.error("cần ít nhất một --upstream")
+    if args.listen_port and len(args.listen_port) != len(args.upstream):
+        ap.error("số --listen-port phải bằng số --upstream")
+    overrides = {f: getattr(args, f) for f in ("loss", "burst", "delay_ms", "jitter_ms", "reorder", "dup",
+                                               "rate_kbps", "queue_ms") if getattr(args, f) is not None}
+    proxy = ImpairmentProxy(args.upstream, Profile.named(args.profile, **overrides), args.seed,
+                            args.listen_host, args.listen_port or None, args.direction).start()
+    for port, up in zip(proxy.ports, proxy.upstreams):
+        print(f"[impair] {args.listen_host}:{port} -> {up[0]}:{up[1]} ({args.profile}, seed {args.seed})")
+    try:
+        while True:
+            time.sleep(args.report_every)
+            print(format_report(proxy.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+        print(format_report(proxy.stats()))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(proxy.stats(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
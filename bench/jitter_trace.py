@@ -0,0 +1,138 @@
+"""
+Chạy JitterBuffer + mixer trên các trace gói tin tổng hợp (không cần PyAudio).
+
+    python -m bench.jitter_trace
+    python -m bench.jitter_trace --seconds 30 --seed 7
+
+Thoát 1 nếu một sender vượt ngưỡng late/lost (% số khung gửi) hoặc underrun
+(số lần) trong LIMITS.
+"""
+import argparse
+import random
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from advanced_feature.jitter_buffer import JitterBuffer, mix_frames
+from advanced_feature.voice_chat import FRAME_MS, FRAME_SAMPLES
+
+Packet = Tuple[float, int, bytes]   # (arrival_sec, seq, pcm)
+
+
+def _tone(freq: float, seq: int) -> bytes:
+    t = (np.arange(FRAME_SAMPLES) + seq * FRAME_SAMPLES) / 16000.0
+    return (np.sin(2 * np.pi * freq * t) * 8000).astype(np.int16).tobytes()
+
+
+def make_trace(seconds: float, freq: float, rng: random.Random,
+               base_ms: float = 40.0, jitter_ms: float = 0.0,
+               loss: float = 0.0, reorder: float = 0.0, dup: float = 0.0,
+               start_seq: int = 1) -> List[Packet]:
+    out: List[Packet] = []
+    n = int(seconds * 1000 / FRAME_MS)
+    for i in range(n):
+        if rng.random() < loss:
+            continue
+        seq = (start_seq + i) & 0xFFFFFFFF
+        delay = base_ms + abs(rng.gauss(0, jitter_ms))
+        if rng.random() < reorder:
+            delay += FRAME_MS * rng.randint(1, 3)
+        arrival = (i * FRAME_MS + delay) / 1000.0
+        pcm = _tone(freq, i)
+        out.append((arrival, seq, pcm))
+        if rng.random() < dup:
+            out.append((arrival + 0.001, seq, pcm))
+    out.sort(key=lambda p: p[0])
+    return out
+
+
+def simulate(traces: List[List[Packet]]) -> dict:
+    """Phát lại các trace theo đồng hồ ảo 20 ms; trả về thống kê mỗi sender."""
+    bufs = [JitterBuffer(FRAME_SAMPLES, FRAME_MS) for _ in traces]
+    idx = [0] * len(traces)
+    end = max(t[-1][0] for t in traces if t) + 1.0
+    tick = 0.0
+    underruns = mixed = 0
+    depth_sum = 0
+    while tick < end:
+        for k, tr in enumerate(traces):
+            while idx[k] < len(tr) and tr[idx[k]][0] <= tick:
+                arrival, seq, pcm = tr[idx[k]]
+                bufs[k].push(seq, pcm, arrival)
+                idx[k] += 1
+        frames = [f for f in (b.pop() for b in bufs) if f is not None]
+        if frames:
+            mix_frames(frames)
+            mixed += 1
+        else:
+            underruns += 1
+        depth_sum += sum(b.depth for b in bufs)
+        tick += FRAME_MS / 1000.0
+    ticks = max(1, int(end * 1000 / FRAME_MS))
+    return {
+        "mixed_ticks": mixed,
+        "silent_ticks": underruns,
+        "avg_total_depth": round(depth_sum / ticks, 2),
+        "senders": [b.stats() for b in bufs],
+    }
+
+
+SCENARIOS = {
+    "clean": dict(jitter_ms=0.0),
+    "jitter_30ms": dict(jitter_ms=30.0),
+    "loss_5pct": dict(jitter_ms=10.0, loss=0.05),
+    "reorder_dup": dict(jitter_ms=10.0, reorder=0.05, dup=0.02),
+    "seq_wrap": dict(jitter_ms=10.0, start_seq=0xFFFFFF00),
+}
+
+# Ngưỡng mỗi sender: late/lost tính theo % khung đã gửi, underrun là số lần
+# (vài lần lúc mồi đệm và khi trace kết thúc là bình thường). Có dư cho --seconds ngắn.
+LIMITS = {
+    "clean": dict(late=0.0, lost=0.0, underrun=10),
+    "jitter_30ms": dict(late=10.0, lost=10.0, underrun=10),
+    "loss_5pct": dict(late=1.0, lost=15.0, underrun=10),
+    "reorder_dup": dict(late=10.0, lost=10.0, underrun=10),
+    "seq_wrap": dict(late=2.0, lost=2.0, underrun=10),
+}
+
+
+def check(name: str, res: dict, frames: int) -> List[str]:
+    """Các vi phạm LIMITS của một kịch bản (rỗng nếu đạt)."""
+    lim = LIMITS[name]
+    bad = []
+    for i, st in enumerate(res["senders"]):
+        for key in ("late", "lost"):
+            pct = 100.0 * st[key] / max(1, frames)
+            if pct > lim[key]:
+                bad.append(f"{name} sender{i}: {key} {pct:.1f}% > {lim[key]}%")
+        if st["underrun"] > lim["underrun"]:
+            bad.append(f"{name} sender{i}: underrun {st['underrun']} > {lim['underrun']}")
+    return bad
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Jitter buffer trace simulation")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    failures: List[str] = []
+    for name, kw in SCENARIOS.items():
+        rng = random.Random(args.seed)
+        traces = [make_trace(args.seconds, 440.0, rng, **kw),
+                  make_trace(args.seconds, 660.0, rng, **kw)]
+        res = simulate(traces)
+        print(f"== {name}: mixed={res['mixed_ticks']} silent={res['silent_ticks']} "
+              f"avg_depth={res['avg_total_depth']}")
+        for i, st in enumerate(res["senders"]):
+            print(f"   sender{i}: {st}")
+        failures += check(name, res, int(args.seconds * 1000 / FRAME_MS))
+    if failures:
+        for f in failures:
+            print(f"FAIL: {f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Đo time-to-first-frame của người vào phòng muộn (mặc định phòng 12 người),
+có và không có cache khung cuối trên relay, cùng dung lượng bộ nhớ cache.
+
+Relay thật (_UDPWorker) chạy trên localhost; 11 người gửi JPEG 640x360 ở
+nhịp --fps, trong đó --cams-off người đã tắt cam (chỉ gửi vài khung đầu rồi thôi).
+
+    python -m bench.join_cache
+    python -m bench.join_cache --participants 25 --fps 10 --join-rate-mbps 8
+"""
+import argparse
+import random
+import socket
+import threading
+import time
+from typing import Dict, List
+
+import cv2
+
+from advanced_feature.media_io import SyntheticVideoSource
+from advanced_feature.video_call import MSG_JOIN, MSG_VIDEO, _pack, _parse
+from server.frame_cache import FrameCache
+from server.udp_server import _UDPWorker
+
+ROOM = "bench-join"
+
+
+def _frames(n: int) -> List[bytes]:
+    cap = SyntheticVideoSource(speed=0)
+    return [cv2.imencode(".jpg", cap.read()[1], [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1].tobytes()
+            for _ in range(n)]
+
+
+def run(args, cached: bool) -> dict:
+    cache = FrameCache(int(args.cache_mb * (1 << 20))) if cached else None
+    relay = _UDPWorker("127.0.0.1", 0, MSG_VIDEO, frame_cache=cache, join_rate_bps=args.join_rate_mbps * 1e6)
+    relay.start()
+    dst = relay.sock.getsockname()
+    jpgs = _frames(8)
+
+    senders = []
+    for i in range(args.participants - 1):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.sendto(_pack(MSG_JOIN, ROOM, f"u{i}", 0, b""), dst)
+        senders.append(s)
+    stop = threading.Event()
+    cams_on = args.participants - 1 - args.cams_off
+
+    def send_loop() -> None:
+        seq = 0
+        while not stop.is_set():
+            seq += 1
+            for i, s in enumerate(senders):
+                # người tắt cam chỉ gửi vài khung đầu rồi thôi
+                if i >= cams_on and seq > 3:
+                    continue
+                s.sendto(_pack(MSG_VIDEO, ROOM, f"u{i}", seq, jpgs[(seq + i) % len(jpgs)]), dst)
+            time.sleep(1.0 / args.fps)
+
+    th = threading.Thread(target=send_loop, daemon=True)
+    th.start()
+    time.sleep(args.warmup + random.uniform(0, 1.0 / args.fps))   # vào phòng ở pha ngẫu nhiên
+
+    late = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    late.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    late.settimeout(0.05)
+    first: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    late.sendto(_pack(MSG_JOIN, ROOM, "late", 0, b""), dst)
+    while time.perf_counter() - t0 < args.timeout and len(first) < len(senders):
+        try:
+            data, _ = late.recvfrom(65535)
+        except socket.timeout:
+            continue
+        p = _parse(data)
+        if p and p[0] == MSG_VIDEO and p[2] not in first:
+            first[p[2]] = (time.perf_counter() - t0) * 1000
+
+    stop.set()
+    th.join()
+    stats = cache.stats() if cache else {}
+    relay.stop()
+    for s in senders + [late]:
+        s.close()
+    ttff = sorted(first.values())
+    return {
+        "tiles": len(first),
+        "expected": len(senders),
+        "first_ms": ttff[0] if ttff else None,
+        "median_ms": ttff[len(ttff) // 2] if ttff else None,
+        "last_ms": ttff[-1] if ttff else None,
+        "cache": stats,
+    }
+
+
+def _avg(runs: List[dict], key: str):
+    vals = [r[key] for r in runs if r[key] is not None]
+    return sum(vals) / len(vals) if vals else None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Late-joiner time-to-first-frame with relay frame cache")
+    ap.add_argument("--participants", type=int, default=12)
+    ap.add_argument("--cams-off", type=int, default=3)
+    ap.add_argument("--fps", type=float, default=5.0, help="fps của người gửi (thấp = lộ rõ chờ khung)")
+    ap.add_argument("--warmup", type=float, default=1.0)
+    ap.add_argument("--timeout", type=float, default=3.0)
+    ap.add_argument("--cache-mb", type=float, default=16.0)
+    ap.add_argument("--join-rate-mbps", type=float, default=16.0)
+    ap.add_argument("--trials", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    random.seed(args.seed)
+
+    def fmt(v):
+        return "   -  " if v is None else f"{v:6.1f}"
+
+    print(f"room={args.participants} cams_off={args.cams_off} sender_fps={args.fps} "
+          f"join pacing={args.join_rate_mbps} Mbps")
+    print(f"mean of {args.trials} trials; tiles = tối thiểu số người thấy được trong {args.timeout}s")
+    print(f"{'mode':8} {'tiles':>6} {'first ms':>9} {'median ms':>10} {'last ms':>8}")
+    for cached in (False, True):
+        runs = [run(args, cached) for _ in range(args.trials)]
+        tiles = f"{min(r['tiles'] for r in runs)}/{runs[0]['expected']}"
+        print(f"{'cache' if cached else 'nocache':8} {tiles:>6} {fmt(_avg(runs, 'first_ms')):>9} "
+              f"{fmt(_avg(runs, 'median_ms')):>10} {fmt(_avg(runs, 'last_ms')):>8}")
+        if runs[-1]["cache"]:
+            c = runs[-1]["cache"]
+            print(f"   cache: {c['entries']} entries, {c['bytes'] / 1024:.1f} KiB "
+                  f"({c['bytes'] / max(1, c['entries']) / 1024:.1f} KiB/sender), served={c['served']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Kiểm tra LipSyncScheduler headless trên trace có timestamp tổng hợp.
+
+Người gửi: thoại 20 ms (lượt nói 3 s / lặng 1 s, DTX gửi CN đầu khoảng lặng)
+và video 20 fps, cùng một đồng hồ. Mạng: trễ nền + jitter riêng cho từng
+luồng. Bên nhận dùng JitterBuffer thật + LipSyncScheduler với đồng hồ giả
+(ms), giống VoiceChatClient._sync_audio / VideoCallClient._schedule_remote.
+
+Độ lệch A/V = trễ hiển thị hình - trễ phát tiếng (dương = hình trễ hơn).
+Cửa sổ khó nhận ra theo ITU-R BT.1359: -125 ms .. +45 ms.
+
+    python -m bench.lipsync
+    python -m bench.lipsync --seconds 120 --seed 3
+
+Thoát 1 nếu với lipsync bật, một kịch bản giữ < 90% khung trong cửa sổ hoặc
+độ lệch trung bình nằm ngoài cửa sổ. Cần --seconds đủ dài để bộ lập lịch hội
+tụ và gồm cả đợt tải 20–35 s của load_spike (mặc định 60).
+"""
+import argparse
+import sys
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from advanced_feature.jitter_buffer import JitterBuffer
+from advanced_feature.lipsync import LipSyncScheduler, ts_diff
+
+FRAME_MS = 20
+VIDEO_MS = 50
+PCM = b"\x00" * 640
+WINDOW = (-125.0, 45.0)
+
+Delay = Callable[[float], float]   # trễ mạng nền (ms) theo thời điểm gửi
+
+
+SCENARIOS: Dict[str, Tuple[Delay, float, Delay, float]] = {
+    # tên: (trễ nền audio, jitter audio, trễ nền video, jitter video)
+    "video_late": (lambda t: 30, 5, lambda t: 190, 15),
+    "audio_jittery": (lambda t: 30, 35, lambda t: 45, 8),
+    "load_spike": (lambda t: 30, 8,
+                   lambda t: 60 + (160 if 20000 <= t < 35000 else 0), 20),
+}
+
+
+def build_trace(seconds: float, a_delay: Delay, a_jit: float, v_delay: Delay, v_jit: float,
+                rng: np.random.Generator) -> List[tuple]:
+    """[(arrival_ms, kind, seq, ts)] đã sắp theo thời điểm tới. kind: voice/cn/video."""
+    ev = []
+    total = int(seconds * 1000)
+    for seq, t in enumerate(range(0, total, FRAME_MS)):
+        in_talk = (t % 4000) < 3000
+        if in_talk:
+            kind = "voice"
+        elif (t % 4000) == 3000:
+            kind = "cn"
+        else:
+            continue
+        ev.append((t + a_delay(t) + abs(rng.normal(0, a_jit)), kind, seq, t))
+    for seq, t in enumerate(range(0, total, VIDEO_MS)):
+        ev.append((t + v_delay(t) + abs(rng.normal(0, v_jit)), "video", seq, t))
+    ev.sort(key=lambda e: e[0])
+    return ev
+
+
+def simulate(trace: List[tuple], seconds: float, use_sync: bool) -> Dict[str, float]:
+    sched = LipSyncScheduler()
+    jb = JitterBuffer(320, FRAME_MS)
+    audio_delay = None
+    offsets: List[float] = []
+    holds: List[float] = []
+    i = 0
+    end = int(seconds * 1000) + 1000
+    for now in range(0, end, FRAME_MS):
+        # gói tới trước tick này
+        while i < len(trace) and trace[i][0] <= now:
+            arrival, kind, seq, ts = trace[i]
+            i += 1
+            if kind == "voice":
+                jb.push(seq, PCM, arrival / 1000.0, ts=ts)
+            elif kind == "cn":
+                jb.push_cn(seq, 60, arrival / 1000.0, ts=ts)
+            else:
+                t_arr = int(arrival)
+                if use_sync:
+                    shown = sched.video_due("alice", ts, t_arr)
+                else:
+                    shown = t_arr
+                holds.append(ts_diff(shown, t_arr))
+                if audio_delay is not None and (ts % 4000) < 3000:
+                    offsets.append(ts_diff(shown, ts) - audio_delay)
+        # đồng hồ phát 20 ms
+        jb.pop()
+        if jb.played_ts is not None:
+            audio_delay = ts_diff(now, jb.played_ts)
+            if use_sync:
+                sched.on_audio("alice", jb.played_ts, now, extra_ms=jb.applied_extra * FRAME_MS)
+                jb.set_extra_depth(round(sched.audio_extra_ms("alice", now) / FRAME_MS))
+
+    off = np.array(offsets)
+    inside = np.mean((off >= WINDOW[0]) & (off <= WINDOW[1])) * 100 if off.size else 0.0
+    return {
+        "mean": float(off.mean()) if off.size else 0.0,
+        "p95_abs": float(np.percentile(np.abs(off), 95)) if off.size else 0.0,
+        "in_window": float(inside),
+        "hold_avg": float(np.mean(holds)) if holds else 0.0,
+        "extra_ms": jb.extra_depth * FRAME_MS,
+        "audio_delay": float(audio_delay or 0.0),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Lip-sync scheduler on synthetic timestamped traces")
+    ap.add_argument("--seconds", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"offset = video - audio (ms); window {WINDOW[0]:.0f}..+{WINDOW[1]:.0f} ms")
+    print(f"{'scenario':14} {'mode':9} {'mean':>7} {'p95|off|':>9} {'in-win %':>9} "
+          f"{'hold ms':>8} {'a-extra':>8} {'a-delay':>8}")
+    ok = True
+    for name, (ad, aj, vd, vj) in SCENARIOS.items():
+        trace = build_trace(args.seconds, ad, aj, vd, vj, np.random.default_rng(args.seed))
+        for use_sync in (False, True):
+            r = simulate(trace, args.seconds, use_sync)
+            print(f"{name:14} {'lipsync' if use_sync else 'off':9} {r['mean']:7.1f} {r['p95_abs']:9.1f} "
+                  f"{r['in_window']:9.1f} {r['hold_avg']:8.1f} {r['extra_ms']:8.0f} {r['audio_delay']:8.0f}")
+            if use_sync and (r["in_window"] < 90.0 or not WINDOW[0] <= r["mean"] <= WINDOW[1]):
+                print(f"FAIL: {name}: in-window {r['in_window']:.1f}% (< 90%) "
+                      f"or mean offset {r['mean']:.1f} ms outside the window")
+                ok = False
+    if not ok:
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Danh sách lớn của GUI: cách cũ (Listbox/Text giữ toàn bộ, rời phòng dựng lại
+cả Listbox, danh sách phòng xoá/chèn lại hết) so với model + widget ảo hoá
+(Client/list_views.py).
+
+Kịch bản: 2.000 người vào rồi rời phòng, 100.000 dòng chat (vẽ lại mỗi
+`--tick` dòng như một lượt bơm mạng), `--refreshes` lần làm mới danh sách
+`--rooms` phòng, mỗi lần vài phòng đổi số người.
+
+- Phần model chạy ở mọi nơi (không cần Tk): thời gian thao tác + bộ nhớ giữ lại.
+- Phần widget cần màn hình; không có thì bỏ qua và ghi chú.
+
+    python -m bench.list_views
+    python -m bench.list_views --participants 5000 --chat 200000
+"""
+import argparse
+import json
+import random
+import time
+import tkinter as tk
+import tracemalloc
+
+from Client.list_views import ChatBuffer, ParticipantModel
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _room_lists(args):
+    rnd = random.Random(1)
+    rooms = {f"room{i}": rnd.randint(1, 50) for i in range(args.rooms)}
+    out = []
+    for _ in range(args.refreshes):
+        for name in rnd.sample(list(rooms), 5):
+            rooms[name] = max(0, rooms[name] + rnd.choice((-1, 1)))
+        out.append([{"name": n, "users": u} for n, u in rooms.items()])
+    return out
+
+
+# ---------- model (không Tk) ----------
+def bench_models(args) -> dict:
+    names = [f"user{i:05d}" for i in range(args.participants)]
+    order = names[:]
+    random.Random(2).shuffle(order)
+    res = {}
+
+    def old_people():
+        items = []
+        for n in names:
+            items.append(n)
+        for who in order:                       # user_left cũ: đọc hết rồi dựng lại
+            items = [x for x in items if x != who]
+
+    def new_people():
+        m = ParticipantModel()
+        for n in names:
+            m.add(n)
+        for who in order:
+            m.remove(who)
+
+    res["participants_old_ms"] = _timed(old_people)
+    res["participants_new_ms"] = _timed(new_people)
+
+    def fill(buf) -> None:
+        for i in range(args.chat):              # chuỗi tạo mới mỗi dòng: bộ nhớ giữ lại là thật
+            buf.append(f"user{i % 2000}: message number {i} " + "x" * 40)
+
+    for label, make in (("old", list), ("new", ChatBuffer)):
+        res[f"chat_{label}_ms"] = _timed(lambda: fill(make()))
+        tracemalloc.start()
+        buf = make()
+        fill(buf)
+        kept = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        res[f"chat_{label}_kept_lines"] = len(buf)
+        res[f"chat_{label}_kept_kb"] = round(kept / 1024)
+        del buf
+    return res
+
+
+# ---------- widget (cần màn hình) ----------
+def bench_widgets(args) -> dict:
+    from Client.list_views import VirtualList, sync_listbox
+
+    root = tk.Tk()
+    root.geometry("900x600")
+    names = [f"user{i:05d}" for i in range(args.participants)]
+    order = names[:]
+    random.Random(2).shuffle(order)
+    chat = [f"user{i % 2000}: message number {i} " + "x" * 40 for i in range(args.chat)]
+    room_lists = _room_lists(args)
+    res = {}
+
+    def pump():
+        root.update_idletasks()
+        root.update()
+
+    # --- cách cũ ---
+    lb = tk.Listbox(root, height=18, width=26)
+    txt = tk.Text(root, height=18, wrap=tk.WORD)
+    rooms_lb = tk.Listbox(root, height=14)
+    for w in (lb, txt, rooms_lb):
+        w.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    pump()
+
+    def old_people():
+        for i, n in enumerate(names):
+            lb.insert(tk.END, n)
+            if i % args.tick == 0:
+                pump()
+        for i, who in enumerate(order):
+            items = [lb.get(j) for j in range(lb.size())]
+            lb.delete(0, tk.END)
+            for x in items:
+                if x != who:
+                    lb.insert(tk.END, x)
+            if i % args.tick == 0:
+                pump()
+        pump()
+
+    def old_chat():
+        for i, line in enumerate(chat):
+            txt.configure(state=tk.NORMAL)
+            txt.insert(tk.END, line + "\n")
+            txt.configure(state=tk.DISABLED)
+            txt.see(tk.END)
+            if i % args.tick == 0:
+                pump()
+        pump()
+
+    def old_rooms():
+        for rooms in room_lists:
+            rooms_lb.delete(0, tk.END)
+            for r in rooms:
+                rooms_lb.insert(tk.END, f"{r['name']}  [{r['users']}]")
+            pump()
+
+    res["participants_old_ms"] = _timed(old_people)
+    res["chat_old_ms"] = _timed(old_chat)
+    res["chat_old_text_lines"] = int(txt.index("end-1c").split(".")[0])
+    res["rooms_old_ms"] = _timed(old_rooms)
+    for w in (lb, txt, rooms_lb):
+        w.destroy()
+
+    # --- model + ảo hoá ---
+    people = ParticipantModel()
+    buf = ChatBuffer()
+    vl_people = VirtualList(root, people, height=18, width=26, wrap=tk.NONE)
+    vl_chat = VirtualList(root, buf, follow_tail=True, height=18, wrap=tk.WORD)
+    rooms_lb = tk.Listbox(root, height=14)
+    for w in (vl_people, vl_chat, rooms_lb):
+        w.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    pump()
+
+    def new_people():
+        for i, n in enumerate(names):
+            people.add(n)
+            vl_people.refresh()
+            if i % args.tick == 0:
+                pump()
+        for i, who in enumerate(order):
+            people.remove(who)
+            vl_people.refresh()
+            if i % args.tick == 0:
+                pump()
+        pump()
+
+    def new_chat():
+        for i, line in enumerate(chat):
+            buf.append(line)
+            vl_chat.refresh()
+            if i % args.tick == 0:
+                pump()
+        pump()
+
+    touched = [0]
+
+    def new_rooms():
+        cur = []
+        for rooms in room_lists:
+            new = [(r["name"], f"{r['name']}  [{r['users']}]") for r in rooms]
+            touched[0] += sync_listbox(rooms_lb, cur, new)
+            cur = new
+            pump()
+
+    res["participants_new_ms"] = _timed(new_people)
+    res["chat_new_ms"] = _timed(new_chat)
+    res["chat_new_text_lines"] = int(vl_chat.text.index("end-1c").split(".")[0])
+    res["rooms_new_ms"] = _timed(new_rooms)
+    res["rooms_new_rows_touched"] = touched[0]
+    root.destroy()
+    return res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Large GUI lists: rebuild-everything widgets vs models + virtualized views")
+    ap.add_argument("--participants", type=int, default=2000)
+    ap.add_argument("--chat", type=int, default=100_000)
+    ap.add_argument("--rooms", type=int, default=500)
+    ap.add_argument("--refreshes", type=int, default=200)
+    ap.add_argument("--tick", type=int, default=50, help="vẽ lại sau mỗi N thao tác (một lượt bơm)")
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    out = {"models": bench_models(args)}
+    try:
+        out["widgets"] = bench_widgets(args)
+    except tk.TclError as e:            # không có màn hình → chỉ phần model
+        out["widgets"] = None
+        out["widgets_skipped"] = str(e)
+
+    m = out["models"]
+    print(f"{args.participants} participants join+leave, {args.chat} chat lines")
+    print(f"models   participants: old {m['participants_old_ms']:>9} ms  new {m['participants_new_ms']:>7} ms")
+    print(f"models   chat:         old {m['chat_old_ms']:>9} ms ({m['chat_old_kept_lines']} lines, "
+          f"{m['chat_old_kept_kb']} KB)  new {m['chat_new_ms']:>7} ms ({m['chat_new_kept_lines']} lines, "
+          f"{m['chat_new_kept_kb']} KB)")
+    w = out["widgets"]
+    if w is None:
+        print(f"widgets  skipped: {out['widgets_skipped']}")
+    else:
+        print(f"widgets  participants: old {w['participants_old_ms']:>9} ms  new {w['participants_new_ms']:>7} ms")
+        print(f"widgets  chat:         old {w['chat_old_ms']:>9} ms ({w['chat_old_text_lines']} lines in Text)  "
+              f"new {w['chat_new_ms']:>7} ms ({w['chat_new_text_lines']} lines in Text)")
+        print(f"widgets  rooms ×{args.refreshes}:  old {w['rooms_old_ms']:>9} ms  new {w['rooms_new_ms']:>7} ms "
+              f"({w['rooms_new_rows_touched']} rows touched)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,725 @@
+"""
+Bộ sinh tải asyncio: mô phỏng N người dùng trong M phòng, nói đúng giao thức
+thật để tìm điểm gãy của server:
+- TCP: JSON có tiền tố độ dài, AES-GCM sau login_ok (server.protocol);
+  một phần người dùng đi qua gateway WebSocket (--ws-fraction).
+- UDP: JOIN/KEEPALIVE/LEAVE + gói HPH2 voice/video qua relay.
+Chat, đổi phòng/kết nối lại (churn) và gửi media theo tỉ lệ cấu hình;
+báo throughput, p50/p95/p99 độ trễ, lỗi, và CPU/RSS của tiến trình server.
+
+Mặc định tự chạy server (TCP + UDP + gateway) trong một tiến trình con trên
+localhost với users DB tạm (HPH_USERS_DB), nên không đụng users_db.json.
+
+    python -m bench.loadgen
+    python -m bench.loadgen --users 500 --rooms 50 --duration 60 --ramp 50
+    python -m bench.loadgen --ws-fraction 0.3 --chat-rate 12 --churn 2
+    python -m bench.loadgen --target 10.0.0.5 --server-pid 1234 --json out.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except Exception:   # Windows
+    resource = None
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+try:
+    import websockets
+except Exception:
+    websockets = None
+
+from advanced_feature.lipsync import MEDIA_CLOCK, ts_diff
+from advanced_feature.voice_chat import MSG_JOIN, MSG_KEEPALIVE, MSG_LEAVE, MSG_VOICE, _pack, _parse
+from advanced_feature.video_call import MSG_VIDEO
+from server.protocol import read_any, send_any
+
+CHAT_TAG = "lg:"
+MAX_SEQ_GAP = 100          # nhảy seq lớn hơn = luồng mới (người gửi đổi phòng), không tính mất
+KEEPALIVE_SEC = 5.0
+
+
+# ---------- metrics ----------
+class _Reservoir:
+    """Giữ tối đa `size` mẫu (reservoir sampling) để tính percentile với bộ nhớ cố định."""
+
+    def __init__(self, rng: random.Random, size: int = 50000) -> None:
+        self.rng = rng
+        self.size = size
+        self.samples: List[float] = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, v: float) -> None:
+        self.count += 1
+        self.total += v
+        self.max = max(self.max, v)
+        if len(self.samples) < self.size:
+            self.samples.append(v)
+        else:
+            j = self.rng.randrange(self.count)
+            if j < self.size:
+                self.samples[j] = v
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": 0}
+        s = sorted(self.samples)
+        pct = lambda p: s[min(len(s) - 1, int(p * len(s)))]
+        return {"count": self.count, "mean": round(self.total / self.count, 2),
+                "p50": round(pct(0.50), 2), "p95": round(pct(0.95), 2),
+                "p99": round(pct(0.99), 2), "max": round(self.max, 2)}
+
+
+class Metrics:
+    def __init__(self, seed: int) -> None:
+        self._rng = random.Random(seed)
+        self.counters: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.latency: Dict[str, _Reservoir] = {}
+
+    def observe(self, name: str, ms: float) -> None:
+        r = self.latency.get(name)
+        if r is None:
+            r = self.latency[name] = _Reservoir(self._rng)
+        r.add(ms)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] += 1
+
+
+class _ProcMonitor:
+    """Lấy mẫu CPU%/RSS/threads/fds của một tiến trình (psutil, hoặc /proc trên Linux)."""
+
+    def __init__(self, pid: int, interval: float = 0.5) -> None:
+        self.pid = pid
+        self.interval = interval
+        self.cpu: List[float] = []
+        self.rss_mb: List[float] = []
+        self.threads = 0
+        self.fds = 0
+        self._proc = psutil.Process(pid) if psutil else None
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def _cpu_seconds(self) -> Optional[float]:
+        if self._proc:
+            t = self._proc.cpu_times()
+            return t.user + t.system
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._tick
+        except Exception:
+            return None
+
+    def _sample_mem(self) -> None:
+        if self._proc:
+            self.rss_mb.append(self._proc.memory_info().rss / 2**20)
+            self.threads = max(self.threads, self._proc.num_threads())
+            try:
+                self.fds = max(self.fds, self._proc.num_fds())
+            except Exception:
+                pass
+            return
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        self.rss_mb.append(int(line.split()[1]) / 1024)
+                    elif line.startswith("Threads:"):
+                        self.threads = max(self.threads, int(line.split()[1]))
+            self.fds = max(self.fds, len(os.listdir(f"/proc/{self.pid}/fd")))
+        except Exception:
+            pass
+
+    async def run(self, stop: asyncio.Event) -> None:
+        last_cpu, last_t = self._cpu_seconds(), time.perf_counter()
+        if last_cpu is None:
+            return
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            cpu, t = self._cpu_seconds(), time.perf_counter()
+            if cpu is None:
+                return
+            self.cpu.append(100.0 * (cpu - last_cpu) / max(1e-6, t - last_t))
+            last_cpu, last_t = cpu, t
+            self._sample_mem()
+
+    def summary(self) -> dict:
+        if not self.cpu:
+            return {}
+        return {"cpu_avg": round(sum(self.cpu) / len(self.cpu), 1), "cpu_max": round(max(self.cpu), 1),
+                "rss_max_mb": round(max(self.rss_mb), 1) if self.rss_mb else None,
+                "threads_max": self.threads, "fds_max": self.fds}
+
+
+# ---------- control links ----------
+class _TcpLink:
+    """Kết nối thẳng tới TCP server: plain trước login_ok, AES-GCM sau đó."""
+
+    def __init__(self) -> None:
+        self.key: Optional[bytes] = None
+        self._reader = self._writer = None
+
+    async def open(self, host: str, port: int) -> None:
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+
+    async def send(self, obj: dict) -> None:
+        await send_any(self._writer, obj, self.key)
+
+    async def recv(self) -> dict:
+        msg = await read_any(self._reader, self.key)
+        if msg.get("type") == "login_ok" and msg.get("aes_key_b64"):
+            self.key = base64.b64decode(msg["aes_key_b64"])   # trước khi đọc gói kế tiếp
+        return msg
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+
+
+class _WsLink:
+    """Qua gateway WebSocket: JSON text, gateway lo phần mã hoá."""
+
+    def __init__(self) -> None:
+        self._ws = None
+
+    async def open(self, host: str, port: int) -> None:
+        self._ws = await websockets.connect(f"ws://{host}:{port}", max_size=2**20, ping_interval=None)
+
+    async def send(self, obj: dict) -> None:
+        await self._ws.send(json.dumps(obj))
+
+    async def recv(self) -> dict:
+        return json.loads(await self._ws.recv())
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+
+
+# ---------- media ----------
+class _MediaProto(asyncio.DatagramProtocol):
+    def __init__(self, user: "_User") -> None:
+        self.user = user
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.user.on_datagram(data)
+
+
+class _Stream:
+    __slots__ = ("last", "count", "lost")
+
+    def __init__(self, seq: int) -> None:
+        self.last = seq
+        self.count = 1
+        self.lost = 0
+
+
+# ---------- simulated participant ----------
+class _User:
+    def __init__(self, lg: "LoadGen", name: str, via_ws: bool, talker: bool, video: bool) -> None:
+        self.lg = lg
+        self.name = name
+        self.via_ws = via_ws
+        self.talker = talker
+        self.video = video
+        self.room: Optional[str] = None
+        self.link = None
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.udp = None
+        self._joined_ms = 0
+        self._streams: Dict[tuple, _Stream] = {}
+        self._seq = {MSG_VOICE: 0, MSG_VIDEO: 0}
+
+    # --- TCP / WS control ---
+    async def _request(self, obj: dict, reply: str, metric: str) -> Optional[dict]:
+        m = self.lg.metrics
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(reply, []).append(fut)
+        t0 = time.perf_counter()
+        try:
+            await self.link.send(obj)
+            msg = await asyncio.wait_for(fut, self.lg.args.timeout)
+        except asyncio.TimeoutError:
+            m.error(f"timeout:{reply}")
+            return None
+        except Exception:
+            m.error("send_failed")
+            return None
+        finally:
+            if fut in self._pending.get(reply, []):
+                self._pending[reply].remove(fut)
+        if not msg.get("ok", True):
+            m.error(f"rejected:{msg.get('error', reply)}")
+            return None
+        m.observe(metric, (time.perf_counter() - t0) * 1000)
+        return msg
+
+    def _resolve(self, reply: str, msg: dict) -> bool:
+        waiters = self._pending.get(reply)
+        while waiters:
+            fut = waiters.pop(0)
+            if not fut.done():
+                fut.set_result(msg)
+                return True
+        return False
+
+    async def _read_loop(self) -> None:
+        m = self.lg.metrics
+        while True:
+            try:
+                msg = await self.link.recv()
+            except Exception:
+                if not self._closing:
+                    m.error("disconnected")
+                for waiters in self._pending.values():
+                    for fut in waiters:
+                        if not fut.done():
+                            fut.set_exception(ConnectionError("closed"))
+                return
+            t = msg.get("type")
+            m.counters["ctrl_rx"] += 1
+            if t == "chat":
+                text = (msg.get("payload") or {}).get("text", "")
+                if text.startswith(CHAT_TAG):
+                    sent_ns = int(text[len(CHAT_TAG):].split(":", 1)[0])
+                    m.observe("chat_fanout", (time.perf_counter_ns() - sent_ns) / 1e6)
+                    m.counters["chat_delivered"] += 1
+            elif t in ("participant_joined", "participant_left"):
+                m.counters[t] += 1
+            elif t == "error":
+                self._resolve("login_ok", msg)
+            elif not self._resolve(t, msg):
+                m.counters["unsolicited:" + str(t)] += 1
+
+    async def connect(self) -> bool:
+        args, m = self.lg.args, self.lg.metrics
+        self.link = _WsLink() if self.via_ws else _TcpLink()
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.link.open(args.host, args.ws_port if self.via_ws else args.tcp_port),
+                                   args.timeout)
+        except Exception:
+            m.error("connect_failed")
+            return False
+        m.observe("connect", (time.perf_counter() - t0) * 1000)
+        self._closing = False
+        self._reader_task = asyncio.create_task(self._read_loop())
+        ok = await self._request({"type": "login", "payload": {"username": self.name, "password": "lg-pass"}},
+                                 "login_ok", "login")
+        if ok:
+            m.counters["logins"] += 1
+        return bool(ok)
+
+    async def disconnect(self) -> None:
+        self._closing = True
+        try:
+            await self.link.send({"type": "logout", "payload": {}})
+        except Exception:
+            pass
+        await self.link.close()
+        if self._reader_task:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    async def join(self, room: str) -> bool:
+        if not await self._request({"type": "join_room", "payload": {"room": room}}, "join_room_ok", "join_room"):
+            return False
+        if self.room:
+            self._udp_ctrl(MSG_LEAVE)
+        self.room = room
+        self._streams.clear()
+        self._joined_ms = MEDIA_CLOCK.now_ms()
+        self._udp_ctrl(MSG_JOIN)
+        return True
+
+    async def leave(self) -> None:
+        await self._request({"type": "leave_room", "payload": {}}, "leave_room_ok", "leave_room")
+        if self.room:
+            self._udp_ctrl(MSG_LEAVE)
+        self.room = None
+
+    async def chat(self) -> None:
+        text = f"{CHAT_TAG}{time.perf_counter_ns()}:" + "x" * self.lg.args.chat_size
+        try:
+            await self.link.send({"type": "chat", "payload": {"text": text}})
+            self.lg.metrics.counters["chat_sent"] += 1
+        except Exception:
+            self.lg.metrics.error("send_failed")
+
+    # --- UDP media ---
+    async def open_udp(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.udp, _ = await loop.create_datagram_endpoint(lambda: _MediaProto(self),
+                                                          local_addr=(self.lg.local_ip, 0))
+
+    def _udp_send(self, data: bytes, port: int) -> None:
+        try:
+            self.udp.sendto(data, (self.lg.args.host, port))
+        except Exception:
+            self.lg.metrics.error("udp_send_failed")
+
+    def _udp_ctrl(self, mtype: int) -> None:
+        if self.udp is None or not self.room:
+            return
+        pkt = _pack(mtype, self.room, self.name, 0, b"")
+        self._udp_send(pkt, self.lg.args.voice_port)
+        self._udp_send(pkt, self.lg.args.video_port)
+
+    def send_media(self, mtype: int, payload: bytes) -> None:
+        if self.udp is None or not self.room:
+            return
+        self._seq[mtype] += 1
+        pkt = _pack(mtype, self.room, self.name, self._seq[mtype], payload, ts=MEDIA_CLOCK.now_ms())
+        self._udp_send(pkt, self.lg.args.voice_port if mtype == MSG_VOICE else self.lg.args.video_port)
+        c = self.lg.metrics.counters
+        key = "voice" if mtype == MSG_VOICE else "video"
+        c[f"{key}_sent"] += 1
+        c[f"{key}_sent_bytes"] += len(pkt)
+
+    def on_datagram(self, data: bytes) -> None:
+        parsed = _parse(data)
+        if not parsed:
+            return
+        mtype, room, user, seq, _payload, ts = parsed
+        if mtype not in (MSG_VOICE, MSG_VIDEO) or ts is None or room != self.room:
+            return
+        m = self.lg.metrics
+        key = "voice" if mtype == MSG_VOICE else "video"
+        now = MEDIA_CLOCK.now_ms()
+        if ts_diff(ts, self._joined_ms) < 0:
+            m.counters[f"{key}_cached"] += 1   # khung cache relay gửi lại khi JOIN
+            return
+        m.counters[f"{key}_recv"] += 1
+        m.counters[f"{key}_recv_bytes"] += len(data)
+        m.observe(f"{key}_owd", ts_diff(now, ts))
+        st = self._streams.get((mtype, user))
+        if st is None or seq - st.last > MAX_SEQ_GAP or st.last - seq > MAX_SEQ_GAP:
+            self._streams[(mtype, user)] = _Stream(seq)
+        elif seq > st.last:
+            st.lost += seq - st.last - 1
+            st.last = seq
+            st.count += 1
+        else:
+            m.counters[f"{key}_reordered"] += 1
+            st.lost = max(0, st.lost - 1)
+
+    def flush_loss(self) -> None:
+        for (mtype, _), st in self._streams.items():
+            self.lg.metrics.counters[("voice" if mtype == MSG_VOICE else "video") + "_lost"] += st.lost
+        self._streams.clear()
+
+    def close_udp(self) -> None:
+        self.flush_loss()
+        if self.udp is not None:
+            self.udp.close()
+            self.udp = None
+
+
+# ---------- driver ----------
+class LoadGen:
+    def __init__(self, args) -> None:
+        self.args = args
+        self.metrics = Metrics(args.seed)
+        self.rng = random.Random(args.seed)
+        self.rooms = [f"lg-room-{i}" for i in range(args.rooms)]
+        self.local_ip = "127.0.0.1" if args.host in ("127.0.0.1", "localhost") else "0.0.0.0"
+        self.stop = asyncio.Event()
+        self.users: List[_User] = []
+        self.ready = 0
+        run = f"{int(time.time()) % 100000:05d}{self.rng.randrange(1000):03d}"
+        for i in range(args.users):
+            self.users.append(_User(self, f"lg{run}_{i}",
+                                    via_ws=self.rng.random() < args.ws_fraction,
+                                    talker=self.rng.random() < args.talkers,
+                                    video=self.rng.random() < args.video_senders))
+
+    async def _media_loop(self) -> None:
+        """Một nhịp 20 ms cho cả đám: voice mỗi tick, video mỗi tick_per_frame tick."""
+        a = self.args
+        voice = os.urandom(max(1, int(a.voice_kbps * 1000 / 8 * 0.02)))
+        video = os.urandom(max(1, min(60000, int(a.video_kbps * 1000 / 8 / a.video_fps)))) if a.video_fps else b""
+        every = max(1, round(50 / a.video_fps)) if a.video_fps else 0
+        tick, t_next, t_ka = 0, time.perf_counter(), time.perf_counter()
+        while not self.stop.is_set():
+            t_next += 0.02
+            await asyncio.sleep(max(0.0, t_next - time.perf_counter()))
+            tick += 1
+            for u in self.users:
+                if u.talker and a.voice_kbps > 0:
+                    u.send_media(MSG_VOICE, voice)
+                if u.video and every and a.video_kbps > 0 and (tick + hash(u.name)) % every == 0:
+                    u.send_media(MSG_VIDEO, video)
+            if time.perf_counter() - t_ka >= KEEPALIVE_SEC:
+                t_ka = time.perf_counter()
+                for u in self.users:
+                    u._udp_ctrl(MSG_KEEPALIVE)
+
+    async def _user_life(self, u: _User) -> None:
+        a, m, rng = self.args, self.metrics, random.Random(u.name)
+        if not await u.connect():
+            return
+        await u.open_udp()
+        if not await u.join(rng.choice(self.rooms)):
+            return
+        self.ready += 1
+        chat_rate = a.chat_rate / 60.0
+        churn_rate = a.churn / 60.0
+        total = chat_rate + churn_rate
+        while not self.stop.is_set():
+            if total <= 0:
+                await self.stop.wait()
+                break
+            try:
+                await asyncio.wait_for(self.stop.wait(), rng.expovariate(total))
+                break
+            except asyncio.TimeoutError:
+                pass
+            if rng.random() < chat_rate / total:
+                await u.chat()
+                continue
+            # churn: đổi phòng, hoặc rớt hẳn rồi kết nối lại
+            m.counters["churn"] += 1
+            if rng.random() < a.reconnect:
+                m.counters["reconnects"] += 1
+                u.flush_loss()
+                if u.room:
+                    u._udp_ctrl(MSG_LEAVE)
+                u.room = None
+                await u.disconnect()
+                if not await u.connect():
+                    continue
+            else:
+                await u.leave()
+            u.flush_loss()
+            await u.join(rng.choice(self.rooms))
+        try:
+            if u.room:
+                await u.leave()
+            await u.disconnect()
+        finally:
+            u.close_udp()
+
+    async def run(self, server_pid: Optional[int]) -> dict:
+        a, m = self.args, self.metrics
+        monitors = {}
+        if server_pid:
+            monitors["server"] = _ProcMonitor(server_pid)
+        monitors["loadgen"] = _ProcMonitor(os.getpid())
+        mon_stop = asyncio.Event()
+        mon_tasks = [asyncio.create_task(mon.run(mon_stop)) for mon in monitors.values()]
+
+        t0 = time.perf_counter()
+        media = asyncio.create_task(self._media_loop())
+        lives = []
+        for u in self.users:
+            lives.append(asyncio.create_task(self._user_life(u)))
+            await asyncio.sleep(1.0 / a.ramp if a.ramp > 0 else 0)
+        # chờ mọi người login + join xong (hoặc lỗi) rồi mới đo steady state
+        while self.ready < len(self.users) and any(not t.done() for t in lives) \
+                and time.perf_counter() - t0 < a.ramp_timeout:
+            await asyncio.sleep(0.1)
+        ramp_s = time.perf_counter() - t0
+        before = Counter(m.counters)
+        t1 = time.perf_counter()
+        await asyncio.sleep(a.duration)
+        steady = Counter(m.counters)
+        steady.subtract(before)
+        elapsed = time.perf_counter() - t1
+        self.stop.set()
+        await asyncio.gather(*lives, return_exceptions=True)
+        await asyncio.gather(media, return_exceptions=True)
+        mon_stop.set()
+        await asyncio.gather(*mon_tasks, return_exceptions=True)
+        return self._report(ramp_s, elapsed, steady, monitors)
+
+    def _report(self, ramp_s: float, elapsed: float, steady: Counter, monitors: dict) -> dict:
+        a, m = self.args, self.metrics
+        c = m.counters
+        rate = lambda k: round(steady[k] / elapsed, 1)
+        loss = lambda k: round(100.0 * c[f"{k}_lost"] / max(1, c[f"{k}_lost"] + c[f"{k}_recv"]), 2)
+        return {
+            "config": {k: v for k, v in vars(a).items() if k not in ("serve", "json")},
+            "ready": self.ready,
+            "ramp_s": round(ramp_s, 2),
+            "steady_s": round(elapsed, 2),
+            "latency_ms": {k: r.summary() for k, r in sorted(m.latency.items())},
+            "throughput": {
+                "chat_sent_per_s": rate("chat_sent"),
+                "chat_delivered_per_s": rate("chat_delivered"),
+                "voice_sent_pps": rate("voice_sent"),
+                "voice_recv_pps": rate("voice_recv"),
+                "video_sent_pps": rate("video_sent"),
+                "video_recv_pps": rate("video_recv"),
+                "udp_in_mbps": round(8 * (steady["voice_sent_bytes"] + steady["video_sent_bytes"]) / elapsed / 1e6, 2),
+                "udp_out_mbps": round(8 * (steady["voice_recv_bytes"] + steady["video_recv_bytes"]) / elapsed / 1e6, 2),
+                "voice_loss_pct": loss("voice"),
+                "video_loss_pct": loss("video"),
+            },
+            "counters": dict(c),
+            "errors": dict(m.errors),
+            "resources": {k: mon.summary() for k, mon in monitors.items()},
+        }
+
+
+def print_report(r: dict) -> None:
+    cfg = r["config"]
+    print(f"users={cfg['users']} rooms={cfg['rooms']} ws={cfg['ws_fraction']:.0%} "
+          f"talkers={cfg['talkers']:.0%} video={cfg['video_senders']:.0%}  "
+          f"ready {r['ready']}/{cfg['users']} after {r['ramp_s']}s, steady {r['steady_s']}s")
+    print(f"{'latency (ms)':<14}{'count':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in r["latency_ms"].items():
+        if s.get("count"):
+            print(f"{name:<14}{s['count']:>9}{s['p50']:>9}{s['p95']:>9}{s['p99']:>9}{s['max']:>9}")
+    t = r["throughput"]
+    print(f"chat   sent {t['chat_sent_per_s']}/s  delivered {t['chat_delivered_per_s']}/s")
+    print(f"voice  sent {t['voice_sent_pps']} pps  recv {t['voice_recv_pps']} pps  loss {t['voice_loss_pct']}%")
+    print(f"video  sent {t['video_sent_pps']} pps  recv {t['video_recv_pps']} pps  loss {t['video_loss_pct']}%")
+    print(f"udp    in {t['udp_in_mbps']} Mbps  out {t['udp_out_mbps']} Mbps")
+    print("errors:", ", ".join(f"{k}={v}" for k, v in sorted(r["errors"].items())) or "none")
+    for who, s in r["resources"].items():
+        if s:
+            print(f"{who:<8} cpu avg {s['cpu_avg']}% max {s['cpu_max']}%  rss {s['rss_max_mb']} MB  "
+                  f"threads {s['threads_max']}  fds {s['fds_max']}")
+    lg = r["resources"].get("loadgen") or {}
+    if lg.get("cpu_avg", 0) > 90:
+        print("!! loadgen gần 100% CPU – kết quả bị giới hạn bởi bộ sinh tải, hãy giảm tải hoặc chạy nhiều tiến trình")
+
+
+# ---------- server subprocess ----------
+async def _serve(args) -> None:
+    """Chạy TCP + UDP relay (+ gateway) trong tiến trình này (dùng cho --serve)."""
+    from server.tcp_server import main as tcp_main
+    from server.udp_server import UDPServer
+    udp = UDPServer(host=args.host, voice_port=args.voice_port, video_port=args.video_port)
+    tasks = [tcp_main(args.host, args.tcp_port), udp.start()]
+    if websockets is not None and args.ws_fraction > 0:
+        from gateway.gateway_ws import Gateway
+        tasks.append(Gateway(tcp_host=args.host, tcp_port=args.tcp_port, web_port=args.ws_port,
+                             host=args.host).start())
+    await asyncio.gather(*tasks)
+
+
+def _spawn_server(args, db_path: str) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "bench.loadgen", "--serve", "--host", args.host,
+           "--tcp-port", str(args.tcp_port), "--voice-port", str(args.voice_port),
+           "--video-port", str(args.video_port), "--ws-port", str(args.ws_port),
+           "--ws-fraction", str(args.ws_fraction)]
+    env = dict(os.environ, HPH_USERS_DB=db_path)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = open(args.server_log, "wb") if args.server_log else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, cwd=root, env=env, stdout=out, stderr=subprocess.STDOUT)
+    deadline = time.time() + 20
+    ports = [args.tcp_port] + ([args.ws_port] if args.ws_fraction > 0 else [])
+    for port in ports:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("server process exited during startup")
+            try:
+                socket.create_connection((args.host, port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    proc.kill()
+                    raise RuntimeError(f"server did not open port {port}")
+                time.sleep(0.1)
+    return proc
+
+
+def _raise_fd_limit(users: int) -> None:
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, users * 4 + 256))
+    if want > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Asyncio load generator for the meeting servers")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--rooms", type=int, default=10)
+    ap.add_argument("--duration", type=float, default=20.0, help="giây đo steady state sau khi ramp xong")
+    ap.add_argument("--ramp", type=float, default=20.0, help="số người bắt đầu kết nối mỗi giây")
+    ap.add_argument("--ramp-timeout", type=float, default=120.0)
+    ap.add_argument("--chat-rate", type=float, default=6.0, help="tin chat / người / phút")
+    ap.add_argument("--chat-size", type=int, default=80)
+    ap.add_argument("--churn", type=float, default=0.5, help="lần đổi phòng / người / phút")
+    ap.add_argument("--reconnect", type=float, default=0.2, help="tỉ lệ churn là rớt kết nối + login lại")
+    ap.add_argument("--ws-fraction", type=float, default=0.0, help="tỉ lệ người đi qua gateway WebSocket")
+    ap.add_argument("--talkers", type=float, default=0.3, help="tỉ lệ người gửi voice")
+    ap.add_argument("--voice-kbps", type=float, default=24.0)
+    ap.add_argument("--video-senders", type=float, default=0.2, help="tỉ lệ người gửi video")
+    ap.add_argument("--video-kbps", type=float, default=300.0)
+    ap.add_argument("--video-fps", type=float, default=15.0)
+    ap.add_argument("--timeout", type=float, default=10.0, help="timeout mỗi request (s)")
+    ap.add_argument("--target", default="", help="host server có sẵn (không tự chạy server)")
+    ap.add_argument("--server-pid", type=int, default=0, help="pid server để đo CPU/RSS khi dùng --target")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--tcp-port", type=int, default=18888)
+    ap.add_argument("--voice-port", type=int, default=19999)
+    ap.add_argument("--video-port", type=int, default=20000)
+    ap.add_argument("--ws-port", type=int, default=18765)
+    ap.add_argument("--server-log", default="", help="ghi stdout của server con ra file")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default="", help="ghi kết quả ra file JSON")
+    ap.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        asyncio.run(_serve(args))
+        return
+    if args.ws_fraction > 0 and websockets is None:
+        sys.exit("--ws-fraction cần gói 'websockets'")
+    if args.target:
+        args.host = args.target
+    _raise_fd_limit(args.users)
+
+    proc = None
+    tmpdir = tempfile.TemporaryDirectory(prefix="hph-loadgen-")
+    try:
+        if not args.target:
+            proc = _spawn_server(args, os.path.join(tmpdir.name, "users_db.json"))
+        report = asyncio.run(LoadGen(args).run(proc.pid if proc else args.server_pid))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        tmpdir.cleanup()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
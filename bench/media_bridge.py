@@ -0,0 +1,249 @@
+"""
+Cầu media WebSocket của gateway: độ trễ gateway thêm vào và CPU gateway trên
+mỗi Mbps chuyển tiếp.
+
+Tiến trình con 1: TCP server + relay UDP; tiến trình con 2: gateway (có
+media_ports). Trong tiến trình đo: vài người dùng "trình duyệt" (WS chat để
+login lấy token + WS /media) và vài người dùng UDP gốc, cùng một phòng, mỗi
+người gửi voice 50 gói/s và video `--fps` khung/s. Mỗi gói mang thời điểm gửi
+nên so được độ trễ theo cặp (người gửi → người nhận):
+
+    udp→udp   chỉ relay (mốc so sánh)
+    udp→ws    relay + gateway chiều xuống
+    ws→udp    gateway chiều lên + relay
+    ws→ws     cả hai
+
+    python -m bench.media_bridge
+    python -m bench.media_bridge --browsers 4 --natives 2 --fps 30 --video-bytes 12000 --seconds 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+import websockets
+
+from advanced_feature.voice_chat import MSG_JOIN, MSG_KEEPALIVE, MSG_LEAVE, MSG_VOICE, _pack, _parse
+from bench.gateway_mux import _free_port, _wait_port
+from bench.loadgen import _ProcMonitor
+from server.udp_server import MSG_VIDEO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOM = "media-bench"
+STAMP = struct.Struct("!Q")
+CH = {MSG_VOICE: 0, MSG_VIDEO: 1}
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lat: Dict[str, List[float]] = defaultdict(list)
+        self.browser_bytes = 0       # byte qua gateway (lên + xuống), tính ở phía trình duyệt
+
+    def on_packet(self, me: str, data: bytes) -> None:
+        p = _parse(data)
+        if not p or p[0] not in CH or len(p[4]) < STAMP.size:
+            return
+        (sent_ns,) = STAMP.unpack_from(p[4])
+        pair = f"{'ws' if p[2].startswith('b') else 'udp'}→{'ws' if me.startswith('b') else 'udp'}"
+        self.lat[f"{pair} {'voice' if p[0] == MSG_VOICE else 'video'}"].append(
+            (time.perf_counter_ns() - sent_ns) / 1e6)
+
+
+# ---------- người dùng ----------
+class _Browser:
+    def __init__(self, name: str, st: _Stats) -> None:
+        self.name, self.st = name, st
+        self.chat = self.media = None
+        self._rx = None
+
+    async def open(self, ws_port: int) -> None:
+        self.chat = await websockets.connect(f"ws://127.0.0.1:{ws_port}", ping_interval=None)
+        await self.chat.send(json.dumps({"type": "login", "payload": {"username": self.name, "password": "x"}}))
+        while True:
+            msg = json.loads(await self.chat.recv())
+            if msg.get("type") == "login_ok":
+                break
+        self.media = await websockets.connect(f"ws://127.0.0.1:{ws_port}/media?token={msg['token']}",
+                                              ping_interval=None, compression=None, max_size=2**20)
+        self._rx = asyncio.create_task(self._rx_loop())
+        for ch in CH.values():
+            await self.media.send(bytes([ch]) + _pack(MSG_JOIN, ROOM, self.name, 0, b""))
+
+    async def _rx_loop(self) -> None:
+        try:
+            async for data in self.media:
+                self.st.browser_bytes += len(data)
+                self.st.on_packet(self.name, data)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send(self, mtype: int, pkt: bytes) -> None:
+        frame = bytes([CH.get(mtype, 0)]) + pkt
+        self.st.browser_bytes += len(frame)
+        await self.media.send(frame)
+
+    async def close(self) -> None:
+        for ch in CH.values():
+            await self.media.send(bytes([ch]) + _pack(MSG_LEAVE, ROOM, self.name, 0, b""))
+        self._rx.cancel()
+        await self.media.close()
+        await self.chat.close()
+
+
+class _Native(asyncio.DatagramProtocol):
+    def __init__(self, name: str, st: _Stats, ports: Dict[int, int]) -> None:
+        self.name, self.st, self.ports = name, st, ports
+        self.transport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.st.on_packet(self.name, data)
+
+    async def open(self) -> None:
+        await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=("127.0.0.1", 0))
+        for port in self.ports.values():
+            self.transport.sendto(_pack(MSG_JOIN, ROOM, self.name, 0, b""), ("127.0.0.1", port))
+
+    async def send(self, mtype: int, pkt: bytes) -> None:
+        self.transport.sendto(pkt, ("127.0.0.1", self.ports[mtype]))
+
+    async def close(self) -> None:
+        for port in self.ports.values():
+            self.transport.sendto(_pack(MSG_LEAVE, ROOM, self.name, 0, b""), ("127.0.0.1", port))
+        self.transport.close()
+
+
+async def _traffic(users, args, seconds: float) -> None:
+    seq = 0
+    pad_v = os.urandom(max(0, args.voice_bytes - STAMP.size))
+    pad_f = os.urandom(max(0, args.video_bytes - STAMP.size))
+    t0 = time.perf_counter()
+    next_frame = t0
+    last_ka = t0
+    while time.perf_counter() - t0 < seconds:
+        seq += 1
+        video = time.perf_counter() >= next_frame
+        if video:
+            next_frame += 1.0 / args.fps
+        for u in users:
+            ts = int(time.time() * 1000)
+            await u.send(MSG_VOICE, _pack(MSG_VOICE, ROOM, u.name, seq, STAMP.pack(time.perf_counter_ns()) + pad_v, ts))
+            if video:
+                await u.send(MSG_VIDEO, _pack(MSG_VIDEO, ROOM, u.name, seq, STAMP.pack(time.perf_counter_ns()) + pad_f, ts))
+            if time.perf_counter() - last_ka > 5:
+                for mtype in CH:
+                    await u.send(mtype, _pack(MSG_KEEPALIVE, ROOM, u.name, 0, b""))
+        if time.perf_counter() - last_ka > 5:
+            last_ka = time.perf_counter()
+        await asyncio.sleep(max(0.0, t0 + seq * 0.02 - time.perf_counter()))
+
+
+async def _measure(args, ws_port: int, ports: Dict[int, int], gateway_pid: int) -> dict:
+    st = _Stats()
+    browsers = [_Browser(f"b{i}", st) for i in range(args.browsers)]
+    natives = [_Native(f"n{i}", st, ports) for i in range(args.natives)]
+    for u in browsers:
+        await u.open(ws_port)
+    for u in natives:
+        await u.open()
+    users = browsers + natives
+    await _traffic(users, args, args.warmup)
+    st.lat.clear()
+    st.browser_bytes = 0
+    mon = _ProcMonitor(gateway_pid)
+    c0, t0 = mon._cpu_seconds(), time.perf_counter()
+    await _traffic(users, args, args.seconds)
+    await asyncio.sleep(0.3)
+    c1, t1 = mon._cpu_seconds(), time.perf_counter()
+    for u in users:
+        await u.close()
+    mbps = st.browser_bytes * 8 / (t1 - t0) / 1e6
+    cpu_pct = 100 * (c1 - c0) / (t1 - t0)
+    lat = {k: {"n": len(v), "p50": round(float(np.percentile(v, 50)), 2), "p99": round(float(np.percentile(v, 99)), 2)}
+           for k, v in sorted(st.lat.items())}
+    return {"gateway_mbps": round(mbps, 2), "gateway_cpu_pct": round(cpu_pct, 1),
+            "cpu_pct_per_mbps": round(cpu_pct / max(mbps, 1e-6), 2), "latency_ms": lat}
+
+
+# ---------- tiến trình con ----------
+async def _serve_backend(tcp_port: int, voice_port: int, video_port: int) -> None:
+    from server.tcp_server import main as tcp_main
+    from server.udp_server import UDPServer
+    udp = UDPServer(host="127.0.0.1", voice_port=voice_port, video_port=video_port)
+    await asyncio.gather(tcp_main("127.0.0.1", tcp_port), udp.start())
+
+
+async def _serve_gateway(ws_port: int, tcp_port: int, voice_port: int, video_port: int) -> None:
+    from gateway.gateway_ws import Gateway
+    await Gateway(tcp_host="127.0.0.1", tcp_port=tcp_port, web_port=ws_port, host="127.0.0.1",
+                  media_ports=(voice_port, video_port)).start()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Gateway WebSocket media bridge: added latency and CPU per Mbps")
+    ap.add_argument("--browsers", type=int, default=3)
+    ap.add_argument("--natives", type=int, default=2)
+    ap.add_argument("--fps", type=float, default=15.0)
+    ap.add_argument("--video-bytes", type=int, default=8000)
+    ap.add_argument("--voice-bytes", type=int, default=80)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--json", default="")
+    ap.add_argument("--serve", choices=["backend", "gateway"], default="", help=argparse.SUPPRESS)
+    ap.add_argument("--ports", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        ws_port, tcp_port, voice_port, video_port = map(int, args.ports.split(","))
+        if args.serve == "backend":
+            asyncio.run(_serve_backend(tcp_port, voice_port, video_port))
+        else:
+            asyncio.run(_serve_gateway(ws_port, tcp_port, voice_port, video_port))
+        return
+
+    ws_port, tcp_port, voice_port, video_port = _free_port(), _free_port(), _free_port(), _free_port()
+    ports = ",".join(map(str, (ws_port, tcp_port, voice_port, video_port)))
+    env = dict(os.environ, HPH_USERS_DB=os.path.join(tempfile.mkdtemp(), "users.json"))
+    procs = []
+    try:
+        for role, port in (("backend", tcp_port), ("gateway", ws_port)):
+            p = subprocess.Popen([sys.executable, "-m", "bench.media_bridge", "--serve", role, "--ports", ports],
+                                 cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            procs.append(p)
+            _wait_port(p, port)
+        r = asyncio.run(_measure(args, ws_port, {MSG_VOICE: voice_port, MSG_VIDEO: video_port}, procs[1].pid))
+    finally:
+        for p in procs:
+            p.kill()
+            p.wait()
+
+    print(f"{args.browsers} browsers + {args.natives} UDP users, voice 50 pps × {args.voice_bytes} B, "
+          f"video {args.fps:.0f} fps × {args.video_bytes} B")
+    for k, v in r["latency_ms"].items():
+        print(f"  {k:<16} n={v['n']:>6}  p50 {v['p50']:>7} ms  p99 {v['p99']:>7} ms")
+    lat = r["latency_ms"]
+    for kind in ("voice", "video"):
+        base = lat.get(f"udp→udp {kind}")
+        if base:
+            down = lat.get(f"udp→ws {kind}", {}).get("p50", float("nan")) - base["p50"]
+            up = lat.get(f"ws→udp {kind}", {}).get("p50", float("nan")) - base["p50"]
+            print(f"  gateway adds ({kind}, p50): down {down:.2f} ms, up {up:.2f} ms")
+    print(f"gateway: {r['gateway_mbps']} Mbps bridged, CPU {r['gateway_cpu_pct']}% "
+          f"→ {r['cpu_pct_per_mbps']}% CPU per Mbps")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
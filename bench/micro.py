@@ -0,0 +1,411 @@
+"""
+Microbenchmark các đường nóng (protocol, AES, mật khẩu, relay UDP, header
+voice, JPEG video, ghép lưới RoomView) với baseline JSON để so sánh trước/sau
+mỗi thay đổi hiệu năng.
+
+    python -m bench.micro list
+    python -m bench.micro run                      # in kết quả
+    python -m bench.micro run --save default       # ghi bench/baselines/default.json
+    python -m bench.micro compare default          # chạy lại và so với baseline
+    python -m bench.micro compare default --against new.json --threshold 0.05
+    python -m bench.micro run -k protocol --quick
+
+compare trả exit code 1 nếu có bench chậm hơn baseline quá --threshold.
+Mặc định so min của các lần lặp (như khuyến nghị của timeit: ít nhiễu nhất
+trên máy dùng chung), --stat median để so median. Chỉ so baseline đo trên
+cùng máy/Python mới có ý nghĩa.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# name -> (setup() -> (fn, cleanup | None))
+BENCHES: Dict[str, Callable[[], Tuple[Callable[[], object], Optional[Callable[[], None]]]]] = {}
+
+
+def bench(name: str):
+    def deco(setup):
+        BENCHES[name] = setup
+        return setup
+    return deco
+
+
+def _run_sync(coro):
+    """Chạy coroutine không bao giờ phải chờ (stream trong bộ nhớ) mà không cần event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    coro.close()
+    raise RuntimeError("coroutine suspended")
+
+
+class _SinkWriter:
+    """Thay StreamWriter: nhận byte, drain() trả về ngay."""
+
+    def __init__(self) -> None:
+        self.nbytes = 0
+
+    def write(self, data: bytes) -> None:
+        self.nbytes += len(data)
+
+    async def drain(self) -> None:
+        pass
+
+
+def _chat_msg() -> dict:
+    return {"type": "chat", "payload": {"text": "xin chào mọi người " * 8}}
+
+
+def _frame(w: int = 640, h: int = 360) -> np.ndarray:
+    from advanced_feature.media_io import SyntheticVideoSource
+    return SyntheticVideoSource(width=w, height=h, speed=0).read()[1]
+
+
+# ---------- protocol ----------
+def _framed(secure: bool) -> Tuple[bytes, Optional[bytes]]:
+    from server.protocol import send_msg, send_msg_secure
+    key = os.urandom(32) if secure else None
+    w = _SinkWriter()
+    captured: List[bytes] = []
+    w.write = captured.append
+    _run_sync(send_msg_secure(w, _chat_msg(), key) if secure else send_msg(w, _chat_msg()))
+    return b"".join(captured), key
+
+
+def _reader() -> asyncio.StreamReader:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return asyncio.StreamReader(loop=loop)
+
+
+@bench("protocol.send_msg")
+def _():
+    from server.protocol import send_msg
+    w, msg = _SinkWriter(), _chat_msg()
+    return (lambda: _run_sync(send_msg(w, msg))), None
+
+
+@bench("protocol.read_msg")
+def _():
+    from server.protocol import read_msg
+    blob, _key = _framed(False)
+    r = _reader()
+
+    def fn():
+        r.feed_data(blob)
+        return _run_sync(read_msg(r))
+    return fn, None
+
+
+@bench("protocol.send_msg_secure")
+def _():
+    from server.protocol import send_msg_secure
+    w, msg, key = _SinkWriter(), _chat_msg(), os.urandom(32)
+    return (lambda: _run_sync(send_msg_secure(w, msg, key))), None
+
+
+@bench("protocol.read_msg_secure")
+def _():
+    from server.protocol import read_msg_secure
+    blob, key = _framed(True)
+    r = _reader()
+
+    def fn():
+        r.feed_data(blob)
+        return _run_sync(read_msg_secure(r, key))
+    return fn, None
+
+
+# ---------- utils ----------
+@bench("utils.aes_encrypt_1k")
+def _():
+    from server.utils import aes_encrypt
+    key, data = os.urandom(32), os.urandom(1024)
+    return (lambda: aes_encrypt(data, key)), None
+
+
+@bench("utils.aes_decrypt_1k")
+def _():
+    from server.utils import aes_decrypt, aes_encrypt
+    key = os.urandom(32)
+    blob = aes_encrypt(os.urandom(1024), key)
+    return (lambda: aes_decrypt(blob, key)), None
+
+
+@bench("utils.hash_password")
+def _():
+    from server.utils import hash_password
+    return (lambda: hash_password("correct horse battery")), None
+
+
+@bench("utils.verify_password")
+def _():
+    from server.utils import hash_password, verify_password
+    salt, h = hash_password("correct horse battery")
+    return (lambda: verify_password("correct horse battery", salt, h)), None
+
+
+# ---------- UDP relay ----------
+def _voice_packet(size: int = 80) -> bytes:
+    from advanced_feature.voice_chat import MSG_VOICE, _pack
+    return _pack(MSG_VOICE, "room-1", "alice", 1234, os.urandom(size), ts=5678)
+
+
+@bench("udp._parse_packet")
+def _():
+    from server.udp_server import MSG_VOICE, _UDPWorker
+    worker = _UDPWorker("127.0.0.1", 0, MSG_VOICE)
+    pkt = _voice_packet()
+    return (lambda: worker._parse_packet(pkt)), worker.stop
+
+
+@bench("udp._broadcast_9")
+def _():
+    """Một gói voice tới 9 người trong phòng (socket nhận thật trên localhost)."""
+    from server.udp_server import MSG_VOICE, RoomState, _UDPWorker
+    worker = _UDPWorker("127.0.0.1", 0, MSG_VOICE)
+    sinks = []
+    state = RoomState()
+    for i in range(9):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind(("127.0.0.1", 0))
+        sinks.append(s)
+        state.users[s.getsockname()] = f"u{i}"
+    worker.rooms["room-1"] = state
+    pkt = _voice_packet()
+
+    def cleanup():
+        worker.stop()
+        for s in sinks:
+            s.close()
+    return (lambda: worker._broadcast("room-1", pkt)), cleanup
+
+
+# ---------- voice header ----------
+@bench("voice._pack")
+def _():
+    from advanced_feature.voice_chat import MSG_VOICE, _pack
+    payload = os.urandom(80)
+    return (lambda: _pack(MSG_VOICE, "room-1", "alice", 1234, payload, ts=5678)), None
+
+
+@bench("voice._parse")
+def _():
+    from advanced_feature.voice_chat import _parse
+    pkt = _voice_packet()
+    return (lambda: _parse(pkt)), None
+
+
+# ---------- video JPEG ----------
+@bench("video.encode_frame_640x360")
+def _():
+    from advanced_feature.video_call import VideoCallClient
+    client = VideoCallClient("127.0.0.1", 9, rate_control=False)
+    frame = _frame()
+    return (lambda: client._encode_frame(frame)), client.sock.close
+
+
+@bench("video.decode_jpeg_640x360")
+def _():
+    jpg = cv2.imencode(".jpg", _frame(), [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1]
+    return (lambda: cv2.imdecode(jpg, cv2.IMREAD_COLOR)), None
+
+
+# ---------- RoomView rendering ----------
+@bench("room.grid_layout")
+def _():
+    from Client.video_grid import grid_layout
+    return (lambda: [grid_layout(n, 1280, 720) for n in range(1, 26)]), None
+
+
+@bench("room.decode_to_tile_9")
+def _():
+    """Giải mã một khung 640x360 xuống ô của lưới 3x3 trên canvas 1280x720."""
+    from Client.video_grid import decode_to_tile, grid_layout
+    _c, _r, cw, ch = grid_layout(9, 1280, 720)
+    jpg = cv2.imencode(".jpg", _frame(), [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1].tobytes()
+    return (lambda: decode_to_tile(jpg, cw, ch, (640, 360))), None
+
+
+@bench("room.compose_9")
+def _():
+    """Một nhịp present của RoomView không có Tk: blit 9 ô + take_frame + PIL."""
+    from PIL import Image
+    from Client.video_grid import TileCompositor, decode_to_tile, grid_layout
+    comp = TileCompositor(1280, 720, workers=1)
+    users = [f"u{i}" for i in range(9)]
+    with comp._lock:
+        comp._users.extend(users)
+        comp._relayout()
+    _c, _r, cw, ch = grid_layout(9, 1280, 720)
+    jpg = cv2.imencode(".jpg", _frame(), [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1].tobytes()
+    tile, _src = decode_to_tile(jpg, cw, ch, (640, 360))
+
+    def fn():
+        for u in users:
+            comp._blit(u, tile)
+        return Image.fromarray(comp.take_frame())
+    return fn, comp.close
+
+
+@bench("room.local_preview")
+def _():
+    from PIL import Image
+    from Client.gui_room import LOCAL_SIZE
+    frame = _frame()
+    return (lambda: Image.fromarray(cv2.cvtColor(cv2.resize(frame, LOCAL_SIZE, interpolation=cv2.INTER_AREA),
+                                                 cv2.COLOR_BGR2RGB))), None
+
+
+# ---------- runner ----------
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    runs = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {"median_us": round(statistics.median(runs), 3), "min_us": round(min(runs), 3),
+            "loops": number, "repeat": repeat}
+
+
+def run(pattern: str = "", repeat: int = 7, min_time: float = 0.2) -> dict:
+    results = {}
+    for name, setup in BENCHES.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        try:
+            fn, cleanup = setup()
+        except Exception as e:
+            print(f"  {name:<28} skipped: {e}")
+            continue
+        try:
+            fn()   # warm-up (import, cache)
+            results[name] = measure(fn, repeat, min_time)
+        finally:
+            if cleanup:
+                cleanup()
+        r = results[name]
+        print(f"  {name:<28} {r['median_us']:>12.2f} us  (min {r['min_us']:.2f}, {r['loops']} loops)")
+    return {"meta": _meta(), "results": results}
+
+
+def _meta() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _baseline_path(name: str) -> str:
+    if os.sep in name or "/" in name or name.endswith(".json"):
+        return name
+    return os.path.join(BASELINE_DIR, name + ".json")
+
+
+def save(data: dict, name: str) -> str:
+    path = _baseline_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return path
+
+
+def load(name: str) -> dict:
+    with open(_baseline_path(name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(base: dict, cur: dict, threshold: float, stat: str = "min_us", partial: bool = False) -> int:
+    """In bảng so sánh; trả về số bench bị chậm đi quá ngưỡng."""
+    for key in ("python", "machine", "cpu_count"):
+        if base["meta"].get(key) != cur["meta"].get(key):
+            print(f"!! baseline khác môi trường: {key} {base['meta'].get(key)} → {cur['meta'].get(key)}")
+    print(f"{'bench':<28}{'base us':>12}{'now us':>12}{'ratio':>8}  status")
+    regressions = 0
+    for name, r in cur["results"].items():
+        b = base["results"].get(name)
+        if b is None:
+            print(f"{name:<28}{'-':>12}{r[stat]:>12.2f}{'':>8}  new")
+            continue
+        ratio = r[stat] / b[stat] if b[stat] else float("inf")
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"{name:<28}{b[stat]:>12.2f}{r[stat]:>12.2f}{ratio:>8.2f}  {status}")
+    for name in base["results"]:
+        if name not in cur["results"] and not partial:
+            print(f"{name:<28}{base['results'][name][stat]:>12.2f}{'-':>12}{'':>8}  missing")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Hot-path microbenchmarks with JSON baselines")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    for cmd in ("run", "compare"):
+        p = sub.add_parser(cmd)
+        p.add_argument("-k", dest="pattern", default="", help="regex lọc tên bench")
+        p.add_argument("--repeat", type=int, default=7)
+        p.add_argument("--min-time", type=float, default=0.2, help="giây tối thiểu mỗi lần lặp")
+        p.add_argument("--quick", action="store_true", help="repeat=3, min-time=0.05")
+        if cmd == "run":
+            p.add_argument("--save", default="", help="tên baseline (bench/baselines/<tên>.json) hoặc đường dẫn")
+        else:
+            p.add_argument("baseline")
+            p.add_argument("--against", default="", help="so với file kết quả có sẵn thay vì chạy lại")
+            p.add_argument("--threshold", type=float, default=0.10, help="tỉ lệ chậm đi coi là regression")
+            p.add_argument("--stat", choices=("min", "median"), default="min")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        for name, setup in BENCHES.items():
+            print(f"{name:<28} {(setup.__doc__ or '').strip()}")
+        return
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.05
+
+    if args.cmd == "run":
+        data = run(args.pattern, args.repeat, args.min_time)
+        if args.save:
+            print("saved", save(data, args.save))
+        return
+
+    base = load(args.baseline)
+    if args.against:
+        cur = load(args.against)
+    else:
+        pattern = args.pattern or "^(" + "|".join(re.escape(n) for n in base["results"]) + ")$"
+        cur = run(pattern, args.repeat, args.min_time)
+    n = compare(base, cur, args.threshold, args.stat + "_us", partial=bool(args.pattern))
+    if n:
+        print(f"{n} regression(s) > {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
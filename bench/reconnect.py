@@ -0,0 +1,234 @@
+"""
+Thời gian phục hồi của TCPJsonClient khi rớt kết nối.
+
+TCP server thật chạy trong tiến trình con (users DB tạm); K client nối qua
+một proxy TCP trong tiến trình này, login rồi vào cùng một phòng. Mỗi lượt,
+proxy cắt mọi kết nối; đo từ lúc cắt tới khi từng client đã vào lại
+phòng (join_room_ok sau `reconnected`). Khi client 0 đã thấy `connection_lost`
+nó gửi một tin chat: tin nằm trong hàng đợi, được xả sau khi nối lại; đếm số
+người khác nhận được (ai chưa vào lại phòng lúc đó thì lỡ tin — server không
+lưu lịch sử chat).
+
+Kịch bản:
+- resume:   cắt kết nối, server còn phiên → nối lại bằng token (không PBKDF2);
+- login:    như trên nhưng client quên token → login lại đầy đủ;
+- restart:  tắt hẳn server `--down` giây rồi bật lại (mất hết phiên) →
+            resume bị từ chối → login lại. Báo thời gian phục hồi tính từ lúc
+            server lên lại.
+
+    python -m bench.reconnect
+    python -m bench.reconnect --clients 20 --drops 10
+"""
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bench.gateway_mux import _free_port, _wait_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOM = "reconnect-bench"
+RECONNECT_SLACK = 20.0          # restart: backoff có thể đang ở mức trần khi server lên lại
+
+
+# ---------- proxy cắt được kết nối ----------
+class _Proxy:
+    def __init__(self, upstream_port: int) -> None:
+        self.upstream = ("127.0.0.1", upstream_port)
+        self.srv = socket.create_server(("127.0.0.1", 0))
+        self.port = self.srv.getsockname()[1]
+        self._lock = threading.Lock()
+        self._socks: List[socket.socket] = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                a, _ = self.srv.accept()
+            except OSError:
+                return
+            try:
+                b = socket.create_connection(self.upstream)
+            except OSError:
+                a.close()
+                continue
+            with self._lock:
+                self._socks += [a, b]
+            for src, dst in ((a, b), (b, a)):
+                threading.Thread(target=self._pipe, args=(src, dst), daemon=True).start()
+
+    @staticmethod
+    def _pipe(src: socket.socket, dst: socket.socket) -> None:
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        with contextlib.suppress(OSError):
+            dst.shutdown(socket.SHUT_WR)
+
+    def drop_all(self) -> None:
+        with self._lock:
+            socks, self._socks = self._socks, []
+        for s in socks:
+            with contextlib.suppress(OSError):
+                s.shutdown(socket.SHUT_RDWR)    # đánh thức cả luồng đang chặn trong recv()
+            s.close()
+
+
+# ---------- client ----------
+def _wait_for(client, pred, timeout: float, inbox: List[dict]) -> float:
+    """Đọc hàng đợi của client tới khi pred(msg) đúng; trả về thời điểm (perf_counter) hoặc nan."""
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        msg = client.get_message_nowait()
+        if msg is None:
+            time.sleep(0.001)
+            continue
+        inbox.append(msg)
+        if pred(msg):
+            return time.perf_counter()
+    return float("nan")
+
+
+def _open_clients(port: int, k: int, prefix: str):
+    from Client.meeting_gui_client import TCPJsonClient
+    clients = []
+    for i in range(k):
+        c = TCPJsonClient("127.0.0.1", port)
+        c.connect()
+        c.send({"type": "login", "payload": {"username": f"{prefix}{i}", "password": "x"}})
+        _wait_for(c, lambda m: m.get("type") == "login_ok", 10, [])
+        c.send({"type": "join_room", "payload": {"room": ROOM}})
+        _wait_for(c, lambda m: m.get("type") == "join_room_ok", 10, [])
+        clients.append(c)
+    return clients
+
+
+def _send_queued(client, marker: str, timeout: float) -> List[dict]:
+    """Chờ client thấy mất kết nối rồi gửi `marker` (vào hàng đợi). Trả về các tin đã đọc."""
+    inbox: List[dict] = []
+    _wait_for(client, lambda m: m.get("type") == "connection_lost", timeout, inbox)
+    client.send({"type": "chat", "payload": {"text": marker}})
+    return inbox
+
+
+def _recover(clients, t_ref: float, timeout: float, marker: str, seen0: List[dict]) -> Dict[str, object]:
+    """Chờ mọi client vào lại phòng; đo từ t_ref. Đếm người khác nhận được tin `marker`."""
+    times, resumed, got_marker = [], 0, 0
+    for i, c in enumerate(clients):
+        inbox: List[dict] = list(seen0) if i == 0 else []
+        if i == 0 and any(m.get("type") == "join_room_ok" for m in inbox):
+            t = float("nan")                    # không xảy ra: join_room_ok tới trước connection_lost
+        else:
+            t = _wait_for(c, lambda m: m.get("type") == "join_room_ok", timeout, inbox)
+        times.append((t - t_ref) * 1000)
+        resumed += any(m.get("type") == "reconnected" and m.get("resumed") for m in inbox)
+    for c in clients[1:]:
+        inbox = []
+        if not np.isnan(_wait_for(c, lambda m: m.get("type") == "chat" and m["payload"]["text"] == marker,
+                                  2.0, inbox)):
+            got_marker += 1
+    return {"times": times, "resumed": resumed, "queued_chat_delivered": got_marker}
+
+
+def _spawn_server(port: int, env: dict) -> subprocess.Popen:
+    p = subprocess.Popen([sys.executable, "-c",
+                          f"import asyncio; from server.tcp_server import main; asyncio.run(main('127.0.0.1', {port}))"],
+                         cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_port(p, port)
+    return p
+
+
+def run(args) -> Dict[str, dict]:
+    env = dict(os.environ, HPH_USERS_DB=os.path.join(tempfile.mkdtemp(), "users.json"))
+    tcp_port = _free_port()
+    server = _spawn_server(tcp_port, env)
+    proxy = _Proxy(tcp_port)
+    out: Dict[str, dict] = {}
+    try:
+        for mode in ("resume", "login"):
+            clients = _open_clients(proxy.port, args.clients, f"{mode}-")
+            times, resumed, delivered = [], 0, 0
+            for n in range(args.drops):
+                time.sleep(args.gap)
+                if mode == "login":
+                    for c in clients:
+                        c.token = None
+                t0 = time.perf_counter()
+                proxy.drop_all()
+                marker = f"{mode}-queued-{n}"
+                seen0 = _send_queued(clients[0], marker, args.timeout)
+                r = _recover(clients, t0, args.timeout, marker, seen0)
+                times += r["times"]
+                resumed += r["resumed"]
+                delivered += r["queued_chat_delivered"]
+            for c in clients:
+                c.close()
+            out[mode] = {"recovery_ms": times, "resumed": resumed, "queued_chat_delivered": delivered,
+                         "queued_chat_expected": args.drops * (args.clients - 1)}
+
+        clients = _open_clients(proxy.port, args.clients, "restart-")
+        times, delivered = [], 0
+        for n in range(max(1, args.drops // 3)):
+            time.sleep(args.gap)
+            server.kill()
+            server.wait()
+            proxy.drop_all()
+            marker = f"restart-queued-{n}"
+            seen0 = _send_queued(clients[0], marker, args.timeout)
+            time.sleep(args.down)
+            server = _spawn_server(tcp_port, env)
+            t_up = time.perf_counter()
+            r = _recover(clients, t_up, args.timeout + RECONNECT_SLACK, marker, seen0)
+            times += r["times"]
+            delivered += r["queued_chat_delivered"]
+        for c in clients:
+            c.close()
+        out["restart"] = {"recovery_ms": times, "resumed": 0, "queued_chat_delivered": delivered,
+                          "queued_chat_expected": max(1, args.drops // 3) * (args.clients - 1)}
+    finally:
+        server.kill()
+        server.wait()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="TCPJsonClient time-to-recovery after connection drops")
+    ap.add_argument("--clients", type=int, default=10)
+    ap.add_argument("--drops", type=int, default=6)
+    ap.add_argument("--gap", type=float, default=1.0, help="giây giữa các lần cắt")
+    ap.add_argument("--down", type=float, default=3.0, help="giây server tắt ở kịch bản restart")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    res = run(args)
+    print(f"{args.clients} clients in one room, {args.drops} drops")
+    for mode, r in res.items():
+        v = [x for x in r["recovery_ms"] if not np.isnan(x)]
+        failed = len(r["recovery_ms"]) - len(v)
+        since = " after server up" if mode == "restart" else " after drop"
+        print(f"{mode:<8} recovery{since}: p50 {np.percentile(v, 50):7.0f} ms  p95 {np.percentile(v, 95):7.0f} ms  "
+              f"max {max(v):7.0f} ms  failed {failed}  resumed {r['resumed']}  "
+              f"queued chat reached {r['queued_chat_delivered']}/{r['queued_chat_expected']} peers")
+    print("(peers still reconnecting when client 0 flushes its queue miss that chat: no server-side history)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Ảnh hưởng của ghi cuộc họp phía server (server/recorder) lên độ trễ chuyển
+tiếp của relay: cùng một lưu lượng tổng hợp (R phòng × U người, voice 50 gói/s
++ video JPEG) chạy qua cặp _UDPWorker thật ở ba chế độ:
+  off       – không ghi
+  on        – ghi mọi phòng ra thư mục tạm
+  slow_disk – như on nhưng đĩa giả lập chỉ --disk-mbps → bộ ghi phải bỏ video
+
+    python -m bench.record_impact
+    python -m bench.record_impact --rooms 4 --users 6 --seconds 15 --disk-mbps 1
+"""
+import argparse
+import os
+import shutil
+import socket
+import tempfile
+import time
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from advanced_feature.media_io import SyntheticVideoSource
+from advanced_feature.voice_chat import MSG_VOICE, _pack
+from advanced_feature.voice_codec import CODEC_ULAW, create_codec, pack_voice
+from bench.replay import Replayer, _pct
+from server.frame_cache import FrameCache
+from server.recorder import MeetingRecorder
+from server.udp_server import MSG_VIDEO, _UDPWorker
+
+
+class _SlowDiskRecorder(MeetingRecorder):
+    """Giả lập đĩa chậm: mỗi lần ghi ngủ theo băng thông disk_bps."""
+
+    def __init__(self, *args, disk_bps: float, **kwargs) -> None:
+        self.disk_bps = disk_bps
+        super().__init__(*args, **kwargs)
+
+    def _write(self, write, data: bytes) -> None:
+        super()._write(write, data)
+        time.sleep(len(data) / self.disk_bps)
+
+
+def _traffic(rooms: int, users: int, seconds: float, fps: float) -> List[Tuple[float, int, tuple, bytes]]:
+    codec = create_codec(CODEC_ULAW)
+    t = np.arange(320) / 16000.0
+    voice = pack_voice(CODEC_ULAW, codec.encode((np.sin(2 * np.pi * 220 * t) * 6000).astype(np.int16).tobytes()))
+    cap = SyntheticVideoSource(speed=0)
+    jpgs = [cv2.imencode(".jpg", cap.read()[1], [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1].tobytes()
+            for _ in range(8)]
+    events = []
+    for r in range(rooms):
+        for u in range(users):
+            room, user = f"room{r}", f"u{u}"
+            phase = (r * users + u) * 0.0013
+            for i in range(int(seconds * 50)):
+                ts = i * 20
+                events.append((phase + ts / 1000, MSG_VOICE, (f"10.0.{r}.{u}", 1),
+                               _pack(MSG_VOICE, room, user, i + 1, voice, ts=ts)))
+            for i in range(int(seconds * fps)):
+                ts = int(i * 1000 / fps)
+                events.append((phase + ts / 1000, MSG_VIDEO, (f"10.0.{r}.{u}", 2),
+                               _pack(MSG_VIDEO, room, user, i + 1, jpgs[i % len(jpgs)], ts=ts)))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def run(mode: str, events, args) -> dict:
+    out_dir = tempfile.mkdtemp(prefix="hph-rec-")
+    recorder = None
+    if mode == "on":
+        recorder = MeetingRecorder(out_dir, max_queue_bytes=int(args.queue_mb * (1 << 20)))
+    elif mode == "slow_disk":
+        recorder = _SlowDiskRecorder(out_dir, max_queue_bytes=int(args.queue_mb * (1 << 20)),
+                                     disk_bps=args.disk_mbps * 1e6 / 8)
+    voice = _UDPWorker("127.0.0.1", 0, MSG_VOICE, recorder=recorder)
+    video = _UDPWorker("127.0.0.1", 0, MSG_VIDEO, frame_cache=FrameCache(), recorder=recorder)
+    for w in (voice, video):
+        w.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        w.start()
+    rp = Replayer({MSG_VOICE: voice.sock.getsockname(), MSG_VIDEO: video.sock.getsockname()})
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    for t, media, addr, data in events:
+        delay = t0 + t - time.perf_counter()
+        if delay > 0.0005:
+            time.sleep(delay)
+        rp.send(media, addr, data, 0.0)
+    rp.close()
+    voice.stop(); video.stop()
+    stats = {}
+    if recorder:
+        recorder.close()
+        stats = recorder.stats()
+        stats["files"] = sum(len(f) for _, _, f in os.walk(out_dir))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return {"mode": mode, "sent": rp.sent, "forwarded": rp.received,
+            "latency": _pct(rp.latency_ms), "recorder": stats}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Forwarding latency with/without server-side recording")
+    ap.add_argument("--rooms", type=int, default=3)
+    ap.add_argument("--users", type=int, default=5)
+    ap.add_argument("--seconds", type=float, default=8.0)
+    ap.add_argument("--fps", type=float, default=15.0)
+    ap.add_argument("--queue-mb", type=float, default=8.0)
+    ap.add_argument("--disk-mbps", type=float, default=4.0, help="băng thông đĩa giả lập cho slow_disk")
+    args = ap.parse_args()
+
+    events = _traffic(args.rooms, args.users, args.seconds, args.fps)
+    mbps = sum(len(e[3]) for e in events) * 8 / args.seconds / 1e6
+    print(f"{args.rooms} rooms x {args.users} users, {len(events)} datagrams in {args.seconds}s ({mbps:.1f} Mbps in)")
+    print(f"{'mode':<10}{'fwd':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'written MB':>12}{'video drop':>12}{'audio drop':>12}")
+    for mode in ("off", "on", "slow_disk"):
+        r = run(mode, events, args)
+        lat, rec = r["latency"], r["recorder"]
+        print(f"{mode:<10}{r['forwarded']:>8}{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}{lat['max']:>9}"
+              f"{rec.get('written_bytes', 0) / 1e6:>12.1f}{rec.get('video_dropped', 0):>12}"
+              f"{rec.get('audio_dropped', 0):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Phát lại file capture của relay (server/media_capture, `main.py --capture`)
+vào một _UDPWorker (mặc định: cặp voice/video chạy ngay trong tiến trình)
+hoặc relay khác, đúng nhịp gốc hoặc nhanh/chậm hơn, mỗi địa chỉ nguồn gốc
+thành một socket riêng (tuỳ chọn rải trên nhiều IP 127.0.0.x).
+
+Đo độ trễ chuyển tiếp (gửi → nhận lại từ relay) và fanout, để regression-test
+relay với nhịp gói thật của các cuộc họp.
+
+    python -m bench.headless_call --seconds 20 --capture /tmp/call.hphcap
+    python -m bench.replay /tmp/call.hphcap
+    python -m bench.replay /tmp/call.hphcap --speed 4 --loop 3 --bind-ips 16
+    python -m bench.replay prod.hphcap --voice-target 10.0.0.5:9999 --video-target 10.0.0.5:10000
+"""
+import argparse
+import json
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from advanced_feature.voice_chat import _pack, _parse
+from server.frame_cache import FrameCache
+from server.media_capture import read_capture
+from server.udp_server import MSG_JOIN, MSG_VIDEO, MSG_VOICE, _UDPWorker
+
+Address = Tuple[str, int]
+MATCH_WINDOW = 5.0      # giây giữ gói đã gửi để ghép với gói relay trả về
+
+
+def _addr(s: str) -> Address:
+    host, port = s.rsplit(":", 1)
+    return host, int(port)
+
+
+class Replayer:
+    def __init__(self, targets: Dict[int, Address], bind_ips: int = 1, synth_join: bool = True) -> None:
+        self.targets = targets
+        self.bind_ips = max(1, bind_ips)
+        self.synth_join = synth_join
+        self._sel = selectors.DefaultSelector()
+        self._socks: Dict[Tuple[int, Address], socket.socket] = {}
+        self._sent: Dict[bytes, float] = {}
+        self._sent_order: List[Tuple[float, bytes]] = []
+        self._lock = threading.Lock()
+        self._alive = True
+        # counters
+        self.sent = 0
+        self.sent_bytes = 0
+        self.received = 0
+        self.unmatched = 0
+        self.latency_ms: List[float] = []
+        self.lag_ms: List[float] = []
+        self._rx = threading.Thread(target=self._rx_loop, daemon=True)
+        self._rx.start()
+
+    def _sock_for(self, media: int, addr: Address, data: bytes) -> socket.socket:
+        key = (media, addr)
+        s = self._socks.get(key)
+        if s is not None:
+            return s
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        ip = f"127.0.0.{1 + len(self._socks) % self.bind_ips}"
+        try:
+            s.bind((ip, 0))
+        except OSError:
+            s.bind(("127.0.0.1", 0))
+        s.setblocking(False)
+        self._socks[key] = s
+        self._sel.register(s, selectors.EVENT_READ)
+        parsed = _parse(data)
+        if self.synth_join and parsed and parsed[0] != MSG_JOIN:
+            # capture bắt đầu giữa cuộc họp → tự JOIN thay người gửi
+            s.sendto(_pack(MSG_JOIN, parsed[1], parsed[2], 0, b""), self.targets[media])
+        return s
+
+    def send(self, media: int, addr: Address, data: bytes, lag: float) -> None:
+        target = self.targets.get(media)
+        if target is None:
+            return
+        s = self._sock_for(media, addr, data)
+        now = time.perf_counter()
+        with self._lock:
+            self._sent[data] = now
+            self._sent_order.append((now, data))
+        try:
+            s.sendto(data, target)
+        except OSError:
+            return
+        self.sent += 1
+        self.sent_bytes += len(data)
+        self.lag_ms.append(lag * 1000)
+
+    def _expire(self, now: float) -> None:
+        cut = 0
+        while cut < len(self._sent_order) and now - self._sent_order[cut][0] > MATCH_WINDOW:
+            t, data = self._sent_order[cut]
+            if self._sent.get(data) == t:
+                del self._sent[data]
+            cut += 1
+        if cut:
+            del self._sent_order[:cut]
+
+    def _rx_loop(self) -> None:
+        last_gc = time.perf_counter()
+        while self._alive:
+            for key, _ in self._sel.select(0.1):
+                while True:
+                    try:
+                        data = key.fileobj.recv(65535)
+                    except (BlockingIOError, InterruptedError, OSError):
+                        break
+                    now = time.perf_counter()
+                    with self._lock:
+                        t = self._sent.get(data)
+                    if t is None:
+                        self.unmatched += 1   # vd. khung cache relay gửi khi JOIN
+                        continue
+                    self.received += 1
+                    self.latency_ms.append((now - t) * 1000)
+            now = time.perf_counter()
+            if now - last_gc > 1.0:
+                last_gc = now
+                with self._lock:
+                    self._expire(now)
+
+    def close(self, drain: float = 0.5) -> None:
+        time.sleep(drain)
+        self._alive = False
+        self._rx.join(timeout=2)
+        for s in self._socks.values():
+            s.close()
+        self._sel.close()
+
+    @property
+    def sources(self) -> int:
+        return len(self._socks)
+
+
+def replay(path: str, rp: Replayer, speed: float = 1.0, loops: int = 1) -> float:
+    """Gửi theo nhịp gốc / speed (speed=0: hết tốc độ). Trả về thời gian chạy."""
+    t_start = time.perf_counter()
+    offset = 0.0
+    for _ in range(loops):
+        first = last = None
+        for rec in read_capture(path):
+            if first is None:
+                first = rec.t
+            last = rec.t
+            lag = 0.0
+            if speed > 0:
+                due = t_start + offset + (rec.t - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0.0005:
+                    time.sleep(delay)
+                lag = max(0.0, time.perf_counter() - due)
+            rp.send(rec.media, rec.addr, rec.data, lag)
+        if first is not None and speed > 0:
+            offset += (last - first) / speed + 0.02
+    return time.perf_counter() - t_start
+
+
+def _pct(v: List[float]) -> dict:
+    if not v:
+        return {"count": 0}
+    a = np.asarray(v)
+    return {"count": len(v), "p50": round(float(np.percentile(a, 50)), 3),
+            "p95": round(float(np.percentile(a, 95)), 3), "p99": round(float(np.percentile(a, 99)), 3),
+            "max": round(float(a.max()), 3)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Replay a relay media capture")
+    ap.add_argument("capture")
+    ap.add_argument("--speed", type=float, default=1.0, help="1 = nhịp gốc, 4 = nhanh gấp 4, 0 = hết tốc độ")
+    ap.add_argument("--loop", type=int, default=1)
+    ap.add_argument("--voice-target", type=_addr, default=None, help="relay voice khác (host:port)")
+    ap.add_argument("--video-target", type=_addr, default=None, help="relay video khác (host:port)")
+    ap.add_argument("--bind-ips", type=int, default=1, help="rải nguồn trên 127.0.0.1..N")
+    ap.add_argument("--no-synth-join", action="store_true")
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    workers = []
+    targets: Dict[int, Address] = {}
+    if args.voice_target or args.video_target:
+        if args.voice_target:
+            targets[MSG_VOICE] = args.voice_target
+        if args.video_target:
+            targets[MSG_VIDEO] = args.video_target
+    else:
+        voice = _UDPWorker("127.0.0.1", 0, MSG_VOICE)
+        video = _UDPWorker("127.0.0.1", 0, MSG_VIDEO, frame_cache=FrameCache())
+        for w in (voice, video):
+            w.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+            w.start()
+            workers.append(w)
+            targets[w.media_type] = w.sock.getsockname()
+
+    rp = Replayer(targets, args.bind_ips, synth_join=not args.no_synth_join)
+    c0 = time.process_time()
+    elapsed = replay(args.capture, rp, args.speed, args.loop)
+    rp.close()
+    cpu = time.process_time() - c0
+    for w in workers:
+        w.stop()
+
+    report = {
+        "capture": args.capture, "speed": args.speed, "loops": args.loop,
+        "sources": rp.sources, "elapsed_s": round(elapsed, 2),
+        "sent": rp.sent, "sent_pps": round(rp.sent / max(elapsed, 1e-6), 1),
+        "sent_mbps": round(rp.sent_bytes * 8 / max(elapsed, 1e-6) / 1e6, 2),
+        "forwarded": rp.received, "fanout": round(rp.received / max(1, rp.sent), 2),
+        "unmatched": rp.unmatched,
+        "forward_latency_ms": _pct(rp.latency_ms),
+        "send_lag_ms": _pct(rp.lag_ms),
+        "process_cpu_pct": round(100 * cpu / max(elapsed, 1e-6), 1),
+    }
+    print(f"replayed {report['sent']} datagrams from {report['sources']} sources in {report['elapsed_s']}s "
+          f"({report['sent_pps']} pps, {report['sent_mbps']} Mbps, speed {args.speed}x)")
+    print(f"relay forwarded {report['forwarded']} (fanout {report['fanout']}), unmatched {report['unmatched']}")
+    print("forward latency ms:", report["forward_latency_ms"])
+    print("send lag ms:      ", report["send_lag_ms"], " (lớn = bộ phát lại không theo kịp nhịp)")
+    print(f"process CPU {report['process_cpu_pct']}% (relay + replayer)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
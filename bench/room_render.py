@@ -0,0 +1,131 @@
+"""
+Đo CPU phía client khi hiển thị N luồng video từ xa (mặc định 9 và 25).
+
+So sánh cách render cũ của RoomView (mỗi khung nhận: imdecode full-size,
+đổi màu, rồi resize lại toàn bộ lưới bằng PIL) với TileCompositor (giải mã
+trong pool, giảm độ phân giải theo ô, chỉ ghi ô thay đổi, ghép ở nhịp hiển
+thị cố định). Chạy headless: bỏ qua bước upload lên Tk ở cả hai cách.
+
+    python -m bench.room_render
+    python -m bench.room_render --streams 4 9 16 25 --fps 15 --seconds 5
+"""
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from advanced_feature.media_io import SyntheticVideoSource
+from Client.video_grid import TileCompositor, grid_layout
+
+CANVAS = (1280, 720)
+DISPLAY_FPS = 20
+
+
+def make_streams(n: int, frames: int = 8) -> List[List[bytes]]:
+    """Mỗi luồng: vài JPEG 640x360 q65 mã hoá sẵn (không tính vào CPU đo)."""
+    out = []
+    for i in range(n):
+        cap = SyntheticVideoSource(speed=0, offset=i * 13)
+        out.append([cv2.imencode(".jpg", cap.read()[1], [int(cv2.IMWRITE_JPEG_QUALITY), 65])[1].tobytes()
+                    for _ in range(frames)])
+    return out
+
+
+def _feed(streams: List[List[bytes]], fps: float, seconds: float, deliver, skip_late: bool = False) -> int:
+    """Giả lập luồng rx: gửi lần lượt khung của mọi người theo nhịp fps.
+    skip_late: bỏ khung đã trễ quá 1/fps (khung mới hơn của người đó đã tới),
+    nên vòng luôn dừng sau `seconds` dù deliver chậm. Trả về số khung đã gửi."""
+    n = len(streams)
+    period = 1.0 / (fps * n)
+    t0 = time.perf_counter()
+    k = sent = 0
+    while True:
+        due = t0 + k * period
+        if due - t0 >= seconds:
+            return sent
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elif skip_late and -delay > 1.0 / fps:
+            k += 1
+            continue
+        who = k % n
+        deliver(f"u{who}", streams[who][(k // n) % len(streams[who])])
+        k += 1
+        sent += 1
+
+
+def run_legacy(streams, fps: float, seconds: float) -> dict:
+    frames: Dict[str, np.ndarray] = {}
+    w, h = CANVAS
+
+    def deliver(user: str, payload: bytes) -> None:
+        img = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        frames[user] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        cols, rows, cw, ch = grid_layout(len(frames), w, h)
+        for f in frames.values():
+            Image.fromarray(f).resize((cw, ch))
+
+    c0, w0 = time.process_time(), time.perf_counter()
+    # không theo kịp thì bỏ khung cũ (như compositor gộp khung): cùng thời gian chạy với compositor
+    n = _feed(streams, fps, seconds, deliver, skip_late=True)
+    offered = int(seconds * fps) * len(streams)
+    return {"cpu": time.process_time() - c0, "wall": time.perf_counter() - w0,
+            "frames_in": n, "presented": n, "skipped": max(0, offered - n)}
+
+
+def run_compositor(streams, fps: float, seconds: float, workers: int) -> dict:
+    grid = TileCompositor(*CANVAS, workers=workers)
+    stop = threading.Event()
+
+    def present() -> None:
+        # thay cho RoomView._present: lấy ảnh ghép khi dirty ở nhịp cố định
+        while not stop.wait(1.0 / DISPLAY_FPS):
+            frame = grid.take_frame()
+            if frame is not None:
+                Image.fromarray(frame)
+
+    c0, w0 = time.process_time(), time.perf_counter()
+    th = threading.Thread(target=present, daemon=True)
+    th.start()
+    _feed(streams, fps, seconds, grid.submit)
+    stop.set()
+    th.join()
+    cpu, wall = time.process_time() - c0, time.perf_counter() - w0
+    st = grid.stats()
+    grid.close()
+    return {"cpu": cpu, "wall": wall, "frames_in": st["submitted"], "presented": st["presented"],
+            "decoded": st["decoded"], "coalesced": st["coalesced"]}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="RoomView remote video render benchmark")
+    ap.add_argument("--streams", type=int, nargs="+", default=[9, 25])
+    ap.add_argument("--fps", type=float, default=15.0, help="fps mỗi luồng từ xa")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    print(f"canvas={CANVAS[0]}x{CANVAS[1]} per-stream fps={args.fps} display fps={DISPLAY_FPS}")
+    print(f"{'streams':>7} {'mode':11} {'CPU %':>7} {'ms/frame':>9} {'presented':>9} {'wall s':>7}  extra")
+    for n in args.streams:
+        streams = make_streams(n)
+        for mode in ("legacy", "compositor"):
+            if mode == "legacy":
+                r = run_legacy(streams, args.fps, args.seconds)
+                extra = f"skipped={r['skipped']}"
+            else:
+                r = run_compositor(streams, args.fps, args.seconds, args.workers)
+                extra = f"decoded={r['decoded']} coalesced={r['coalesced']}"
+            # legacy: skipped > 0 nghĩa là không theo kịp luồng vào (rx bị dồn)
+            cpu_pct = 100 * r["cpu"] / r["wall"]
+            per = 1000 * r["cpu"] / max(1, r["frames_in"])
+            print(f"{n:7d} {mode:11} {cpu_pct:7.1f} {per:9.2f} {r['presented']:9d} {r['wall']:7.1f}  {extra}")
+
+
+if __name__ == "__main__":
+    main()
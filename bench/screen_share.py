@@ -0,0 +1,84 @@
+"""
+Đo băng thông chia sẻ màn hình 1080p: mã hoá theo ô thay đổi (TileEncoder)
+so với JPEG toàn khung mỗi lần gửi. Kiểm tra luôn chất lượng framebuffer bên
+nhận (PSNR so với khung gốc) và thời gian encode.
+
+    python -m bench.screen_share
+    python -m bench.screen_share --frames 300 --fps 5 --images ./slides
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from advanced_feature.screen_share import (
+    ImageSequenceProvider, ScreenFramebuffer, SyntheticSlides, TileEncoder, pack_tiles,
+)
+from bench.voice_codec import IP_UDP_OVERHEAD
+from advanced_feature.video_call import HDR_SIZE
+
+PKT_OVERHEAD = HDR_SIZE + 16 + IP_UDP_OVERHEAD   # header HPH + room/user + IP/UDP
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    mse = float(np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2))
+    return 99.0 if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Screen share tile encoding benchmark")
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--fps", type=float, default=5.0)
+    ap.add_argument("--quality", type=int, default=80, help="JPEG quality cho cả hai cách")
+    ap.add_argument("--tile", type=int, default=64)
+    ap.add_argument("--images", default="", help="thư mục ảnh thay cho slide tổng hợp")
+    args = ap.parse_args()
+
+    provider = ImageSequenceProvider(args.images, hold=10) if args.images else SyntheticSlides()
+    enc = TileEncoder(args.tile, jpeg_quality=args.quality)
+    fb = ScreenFramebuffer()
+
+    full_bytes = tile_bytes = pkts = tiles = 0
+    enc_ms = full_ms = 0.0
+    psnrs = []
+    w = h = 0
+    for i in range(args.frames):
+        ok, frame = provider.read()
+        if not ok:
+            break
+        h, w = frame.shape[:2]
+
+        t0 = time.perf_counter()
+        ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), args.quality])
+        full_ms += (time.perf_counter() - t0) * 1000
+        # JPEG toàn khung 1080p thường > 1 datagram → tính theo số mảnh 60 KB
+        full_bytes += buf.size + PKT_OVERHEAD * (1 + buf.size // 60000)
+
+        t0 = time.perf_counter()
+        encoded = enc.encode(frame)
+        payloads = pack_tiles(i + 1, w, h, args.tile, encoded) if encoded else []
+        enc_ms += (time.perf_counter() - t0) * 1000
+        tiles += len(encoded)
+        for p in payloads:
+            tile_bytes += len(p) + PKT_OVERHEAD
+            pkts += 1
+            fb.apply(p)
+        if fb.frame is not None and i % 10 == 9:
+            psnrs.append(psnr(fb.frame, frame))
+
+    n = i + 1
+    secs = n / args.fps
+    cols, rows = -(-w // args.tile), -(-h // args.tile)
+    print(f"{w}x{h} @ {args.fps} fps, {n} frames, tile={args.tile} ({cols}x{rows} grid), q={args.quality}")
+    print(f"  full-frame JPEG : {full_bytes * 8 / secs / 1e3:9.1f} kbps   encode {full_ms / n:6.1f} ms/frame")
+    print(f"  dirty tiles     : {tile_bytes * 8 / secs / 1e3:9.1f} kbps   encode {enc_ms / n:6.1f} ms/frame "
+          f"(diff + encode), {pkts / secs:.1f} pkt/s")
+    print(f"  ratio           : {100 * tile_bytes / max(1, full_bytes):5.1f}% of full-frame bytes")
+    print(f"  tiles/frame     : {tiles / n:.1f} of {cols * rows}  (png={enc.tiles_png} jpeg={enc.tiles_jpeg})")
+    if psnrs:
+        print(f"  receiver PSNR   : min {min(psnrs):.1f} dB, mean {np.mean(psnrs):.1f} dB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Nhiều phiên bot trong một tiến trình: Client.sdk.MeetingClient (asyncio, một
+task đọc mỗi phiên) so với TCPJsonClient của GUI (một luồng rx mỗi phiên,
+socket chặn, queue.Queue).
+
+TCP server thật chạy trong tiến trình con (users DB tạm). Mỗi chế độ chạy
+trong một tiến trình con riêng: `--bots` phiên login, chia đều vào `--rooms`
+phòng, rồi mỗi bot gửi `--chats` tin chat. Đo ở tiến trình bot:
+- RSS và số luồng thêm vào mỗi phiên (khi mọi phiên đã vào phòng);
+- CPU tiến trình bot cho mỗi tin nhận được trong pha chat, và thời gian tới
+  khi mọi tin đã tới nơi.
+Riêng SDK: `--requests` lần list_rooms chờ từng phản hồi so với gửi nối đuôi
+(pipelined) trên cùng một kết nối.
+
+    python -m bench.sdk_bots
+    python -m bench.sdk_bots --bots 500 --rooms 50 --chats 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict
+
+from bench.gateway_mux import _free_port
+from bench.reconnect import _spawn_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource                         # không có /proc: đỉnh RSS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _plan(args) -> Dict[str, str]:
+    """bot → phòng."""
+    return {f"{args.prefix}{i}": f"room{i % args.rooms}" for i in range(args.bots)}
+
+
+def _expected(plan: Dict[str, str], chats: int) -> int:
+    """Mỗi tin tới m-1 người cùng phòng."""
+    sizes: Dict[str, int] = {}
+    for room in plan.values():
+        sizes[room] = sizes.get(room, 0) + 1
+    return sum(m * (m - 1) * chats for m in sizes.values())
+
+
+def _result(base_rss: int, rss: int, base_threads: int, threads: int, n: int, cpu: float, wall: float,
+            got: int, expected: int) -> dict:
+    return {"rss_per_bot_kb": round((rss - base_rss) / n, 1),
+            "threads_per_bot": round((threads - base_threads) / n, 2),
+            "chat_delivered": got, "chat_expected": expected,
+            "cpu_us_per_delivery": round(cpu / max(1, got) * 1e6, 1),
+            "chat_wall_s": round(wall, 2)}
+
+
+# ---------- chế độ SDK ----------
+async def _run_sdk(args) -> dict:
+    from Client.sdk import MeetingClient
+    from server.utils import preload_crypto
+    preload_crypto()
+    plan = _plan(args)
+    expected = _expected(plan, args.chats)
+    base_rss, base_threads = _rss_kb(), threading.active_count()
+
+    bots = [MeetingClient("127.0.0.1", args.port, name, "x") for name in plan]
+    sem = asyncio.Semaphore(32)
+
+    async def start(c: MeetingClient) -> None:
+        async with sem:
+            await c.connect()
+            await c.join_room(plan[c.username])
+
+    await asyncio.gather(*(start(c) for c in bots))
+    subs = [c.events("chat") for c in bots]
+    rss_bots, threads_bots = _rss_kb(), threading.active_count()
+
+    got = [0]
+    done = asyncio.Event()
+
+    async def drain(sub) -> None:
+        async for _ in sub:
+            got[0] += 1
+            if got[0] >= expected:
+                done.set()
+
+    readers = [asyncio.create_task(drain(s)) for s in subs]
+
+    async def talk(c: MeetingClient) -> None:
+        for i in range(args.chats):
+            await c.chat(f"{c.username} {i}")
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(talk(c) for c in bots))
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - t0
+    out = _result(base_rss, rss_bots, base_threads, threads_bots, len(bots), cpu, wall, got[0], expected)
+    for r in readers:
+        r.cancel()
+
+    c = bots[0]
+    t0 = time.perf_counter()
+    for _ in range(args.requests):
+        await c.list_rooms()
+    out["serial_req_per_s"] = round(args.requests / (time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(c.list_rooms() for _ in range(args.requests)))
+    out["pipelined_req_per_s"] = round(args.requests / (time.perf_counter() - t0))
+
+    await asyncio.gather(*(c.close() for c in bots))
+    return out
+
+
+# ---------- chế độ luồng (TCPJsonClient) ----------
+def _wait_type(c, t: str, timeout: float) -> dict:
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        msg = c.get_message_nowait()
+        if msg is None:
+            time.sleep(0.001)
+        elif msg.get("type") == t or not msg.get("ok", True):
+            return msg
+    raise TimeoutError(t)
+
+
+def _run_threads(args) -> dict:
+    from Client.meeting_gui_client import TCPJsonClient
+    from server.utils import preload_crypto
+    preload_crypto()
+    plan = _plan(args)
+    expected = _expected(plan, args.chats)
+    base_rss, base_threads = _rss_kb(), threading.active_count()
+
+    bots = []
+    for name, room in plan.items():
+        c = TCPJsonClient("127.0.0.1", args.port, auto_reconnect=False)
+        c.connect()
+        c.send({"type": "login", "payload": {"username": name, "password": "x"}})
+        _wait_type(c, "login_ok", args.timeout)
+        c.send({"type": "join_room", "payload": {"room": room}})
+        _wait_type(c, "join_room_ok", args.timeout)
+        bots.append((name, c))
+    rss_bots, threads_bots = _rss_kb(), threading.active_count()
+
+    got = 0
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for i in range(args.chats):
+        for name, c in bots:
+            c.send({"type": "chat", "payload": {"text": f"{name} {i}"}})
+    end = time.perf_counter() + args.timeout
+    while got < expected and time.perf_counter() < end:
+        idle = True
+        for _, c in bots:
+            while True:
+                msg = c.get_message_nowait()
+                if msg is None:
+                    break
+                got += msg.get("type") == "chat"     # participant_joined của bot vào sau cũng nằm đây
+                idle = False
+        if idle:
+            time.sleep(0.001)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - t0
+    out = _result(base_rss, rss_bots, base_threads, threads_bots, len(bots), cpu, wall, got, expected)
+    for _, c in bots:
+        c.close()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Many bot sessions in one process: asyncio SDK vs thread-per-client")
+    ap.add_argument("--bots", type=int, default=300)
+    ap.add_argument("--rooms", type=int, default=30)
+    ap.add_argument("--chats", type=int, default=20, help="tin chat mỗi bot gửi")
+    ap.add_argument("--requests", type=int, default=2000, help="list_rooms: tuần tự vs pipelined (SDK)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--json", default="")
+    ap.add_argument("--run", choices=["sdk", "threads"], default="", help=argparse.SUPPRESS)
+    ap.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--prefix", default="bot", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run:
+        res = asyncio.run(_run_sdk(args)) if args.run == "sdk" else _run_threads(args)
+        print(json.dumps(res))
+        return
+
+    env = dict(os.environ, HPH_USERS_DB=os.path.join(tempfile.mkdtemp(), "users.json"))
+    port = _free_port()
+    server = _spawn_server(port, env)
+    results: Dict[str, dict] = {}
+    try:
+        for mode in ("threads", "sdk"):
+            p = subprocess.run([sys.executable, "-m", "bench.sdk_bots", "--run", mode, "--port", str(port),
+                                "--prefix", f"{mode}-", *sys.argv[1:]],
+                               cwd=ROOT, capture_output=True, text=True)
+            if p.returncode != 0:
+                print(p.stderr)
+                sys.exit(p.returncode)
+            results[mode] = json.loads(p.stdout.strip().splitlines()[-1])
+    finally:
+        server.kill()
+        server.wait()
+
+    print(f"{args.bots} bots in {args.rooms} rooms, {args.chats} chats each")
+    for mode, r in results.items():
+        print(f"{mode:<8} RSS/bot {r['rss_per_bot_kb']:>7} KB  threads/bot {r['threads_per_bot']:>5}  "
+              f"CPU/delivery {r['cpu_us_per_delivery']:>7} µs  delivered {r['chat_delivered']}/"
+              f"{r['chat_expected']} in {r['chat_wall_s']} s")
+    s = results["sdk"]
+    print(f"sdk      list_rooms: serial {s['serial_req_per_s']} req/s  pipelined {s['pipelined_req_per_s']} req/s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Đo pipeline gửi video của VideoCallClient với nguồn khung tổng hợp:
+glass-to-wire (capture → sendto), fps thực tế, thời gian từng tầng.
+So sánh với vòng lặp tuần tự cũ (capture → callback → resize → JPEG → sendto).
+
+    python -m bench.video_pipeline
+    python -m bench.video_pipeline --camera-fps 30 --target-fps 20 --local-cb-ms 15
+"""
+import argparse
+import socket
+import threading
+import time
+
+from advanced_feature.media_io import SyntheticVideoSource
+from advanced_feature.video_call import (
+    FRAME_H, FRAME_W, MSG_VIDEO, StageStats, VideoCallClient, _pack,
+)
+
+
+def _sink() -> socket.socket:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    s.settimeout(0.2)
+    threading.Thread(target=_drain, args=(s,), daemon=True).start()
+    return s
+
+
+def _drain(s: socket.socket) -> None:
+    while True:
+        try:
+            s.recvfrom(65535)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+
+
+def run_pipeline(args) -> dict:
+    sink = _sink()
+    cb = (lambda f: time.sleep(args.local_cb_ms / 1000)) if args.local_cb_ms else None
+    cli = VideoCallClient("127.0.0.1", sink.getsockname()[1], on_local_frame=cb,
+                          target_fps=args.target_fps, encode_workers=args.workers,
+                          capture=SyntheticVideoSource(args.camera_fps))
+    cli.start("bench", "pipeline")
+    time.sleep(args.seconds)
+    st = cli.pipeline_stats()
+    cli.stop()
+    sink.close()
+    return st
+
+
+def run_sequential(args) -> dict:
+    """Vòng lặp cũ: mọi thứ tuần tự trong một luồng, không giữ nhịp."""
+    import cv2
+    sink = _sink()
+    cap = SyntheticVideoSource(args.camera_fps)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    g2w = StageStats()
+    sent = 0
+    t_end = time.perf_counter() + args.seconds
+    seq = 0
+    while time.perf_counter() < t_end:
+        ok, frame = cap.read()
+        t_cap = time.perf_counter()
+        if args.local_cb_ms:
+            time.sleep(args.local_cb_ms / 1000)
+        frame = cv2.resize(frame, (FRAME_W, FRAME_H))
+        ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 65])
+        seq += 1
+        sock.sendto(_pack(MSG_VIDEO, "bench", "seq", seq, buf.tobytes()), sink.getsockname())
+        g2w.add((time.perf_counter() - t_cap) * 1000)
+        sent += 1
+    sink.close()
+    return {"glass_to_wire": g2w.snapshot(), "sent_fps": round(sent / args.seconds, 2)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="VideoCallClient tx pipeline benchmark")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--camera-fps", type=float, default=30.0)
+    ap.add_argument("--target-fps", type=float, default=20.0)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--local-cb-ms", type=float, default=10.0, help="giả lập preview GUI chậm")
+    args = ap.parse_args()
+
+    seq = run_sequential(args)
+    print(f"sequential : fps={seq['sent_fps']:6.2f}  glass_to_wire={seq['glass_to_wire']}")
+    st = run_pipeline(args)
+    print(f"pipelined  : fps={st['sent_fps']:6.2f}  glass_to_wire={st['glass_to_wire']}")
+    for stage in ("capture", "local_cb", "encode", "send"):
+        print(f"   {stage:9}: {st[stage]}")
+    print(f"   dropped before encode={st['dropped_before_encode']} before send={st['dropped_before_send']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Đo bytes/giây của video gửi đi với VideoRateController so với cấu hình cố định
+cũ (640x360, JPEG q65, mọi khung) trên 3 chuỗi tổng hợp: cảnh tĩnh,
+talking-head, chuyển động mạnh. Có thêm kịch bản bên nhận báo mất gói.
+
+    python -m bench.video_rate
+    python -m bench.video_rate --seconds 20 --target-kbps 500
+"""
+import argparse
+from typing import Callable, Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+
+from advanced_feature.rate_control import VideoRateController
+
+W, H = 640, 360
+CAMERA_FPS = 30.0
+
+
+def _noise(rng: np.random.Generator, sigma: float = 2.0) -> np.ndarray:
+    return rng.normal(0, sigma, (H, W, 1)).astype(np.int16)
+
+
+def _background() -> np.ndarray:
+    yy, xx = np.mgrid[0:H, 0:W]
+    bg = np.dstack([(xx * 255 // W), (yy * 255 // H), ((xx + yy) * 127 // (W + H)) + 60])
+    bg[40:120, 420:600] = (200, 200, 210)       # "kệ sách"/khung tranh
+    return bg.astype(np.int16)
+
+
+def static_scene(n: int, seed: int = 0) -> Iterator[np.ndarray]:
+    """Webcam nhìn cảnh cố định: chỉ có nhiễu cảm biến."""
+    rng = np.random.default_rng(seed)
+    bg = _background()
+    for _ in range(n):
+        yield np.clip(bg + _noise(rng), 0, 255).astype(np.uint8)
+
+
+def talking_head(n: int, seed: int = 0) -> Iterator[np.ndarray]:
+    """Nền tĩnh + đầu lắc nhẹ + miệng mở/đóng."""
+    rng = np.random.default_rng(seed)
+    bg = _background()
+    for i in range(n):
+        f = bg.copy()
+        cx = 320 + int(12 * np.sin(i / 15.0)); cy = 200 + int(5 * np.sin(i / 9.0))
+        cv2.ellipse(f, (cx, cy), (80, 105), 0, 0, 360, (150, 170, 210), -1)
+        cv2.circle(f, (cx - 28, cy - 25), 8, (40, 40, 40), -1)
+        cv2.circle(f, (cx + 28, cy - 25), 8, (40, 40, 40), -1)
+        mouth = 4 + int(14 * abs(np.sin(i / 3.0)))
+        cv2.ellipse(f, (cx, cy + 45), (30, mouth), 0, 0, 360, (60, 30, 120), -1)
+        yield np.clip(f + _noise(rng), 0, 255).astype(np.uint8)
+
+
+def high_motion(n: int, seed: int = 0) -> Iterator[np.ndarray]:
+    """Lia máy qua cảnh nhiều chi tiết."""
+    rng = np.random.default_rng(seed)
+    world = rng.integers(0, 256, (H * 2, W * 3, 3), dtype=np.uint8)
+    world = cv2.GaussianBlur(world, (7, 7), 0)
+    for i in range(n):
+        x = (i * 11) % (W * 2); y = int((H / 2) * (1 + np.sin(i / 20.0)))
+        yield np.ascontiguousarray(world[y:y + H, x:x + W])
+
+
+SEQUENCES: Dict[str, Callable[[int], Iterator[np.ndarray]]] = {
+    "static": static_scene,
+    "talking_head": talking_head,
+    "high_motion": high_motion,
+}
+
+
+def run_fixed(frames: Iterator[np.ndarray], seconds: float) -> dict:
+    total = sent = 0
+    for f in frames:
+        ok, buf = cv2.imencode(".jpg", f, [int(cv2.IMWRITE_JPEG_QUALITY), 65])
+        total += buf.size; sent += 1
+    return {"Bps": total / seconds, "fps": sent / seconds}
+
+
+def run_controlled(frames: Iterator[np.ndarray], seconds: float, target_kbps: float,
+                   loss_at: Optional[tuple] = None) -> dict:
+    rc = VideoRateController(target_kbps, max_fps=20.0)
+    total = sent = 0
+    next_admit = 0.0
+    next_fb = 1.0
+    for i, f in enumerate(frames):
+        t = i / CAMERA_FPS
+        if t >= next_fb:
+            loss = loss_at[2] if loss_at and loss_at[0] <= t < loss_at[1] else 0.0
+            rc.on_feedback(loss, reporter="rx", now=t)
+            next_fb += 1.0
+        if t < next_admit:
+            continue
+        period = 1.0 / rc.fps
+        next_admit = max(next_admit + period, t - period / 2)
+        if not rc.should_send(f, now=t):
+            continue
+        w, h, q = rc.params()
+        small = cv2.resize(f, (w, h), interpolation=cv2.INTER_AREA) if (w, h) != (W, H) else f
+        ok, buf = cv2.imencode(".jpg", small, [int(cv2.IMWRITE_JPEG_QUALITY), q])
+        rc.on_encoded(buf.size)
+        total += buf.size; sent += 1
+    return {"Bps": total / seconds, "fps": sent / seconds, "final": rc.stats()}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Video rate controller benchmark")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--target-kbps", type=float, default=800.0)
+    args = ap.parse_args()
+    n = int(args.seconds * CAMERA_FPS)
+
+    print(f"{'sequence':13} {'mode':10} {'KB/s':>8} {'fps':>6}  final state")
+    for name, gen in SEQUENCES.items():
+        fixed = run_fixed(gen(n), args.seconds)
+        print(f"{name:13} {'fixed':10} {fixed['Bps'] / 1024:8.1f} {fixed['fps']:6.1f}")
+        rc = run_controlled(gen(n), args.seconds, args.target_kbps)
+        print(f"{name:13} {'adaptive':10} {rc['Bps'] / 1024:8.1f} {rc['fps']:6.1f}  {rc['final']}")
+    lossy = run_controlled(talking_head(n), args.seconds, args.target_kbps,
+                           loss_at=(args.seconds * 0.3, args.seconds * 0.6, 0.2))
+    print(f"{'talking_head':13} {'20% loss':10} {lossy['Bps'] / 1024:8.1f} {lossy['fps']:6.1f}  {lossy['final']}")
+
+
+if __name__ == "__main__":
+    main()
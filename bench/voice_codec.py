@@ -0,0 +1,121 @@
+"""
+Đo các codec voice: bitrate trên dây, CPU encode/decode mỗi khung, chất lượng
+khách quan (SNR và segmental SNR) trên một tập tín hiệu tổng hợp hoặc file WAV.
+
+    python -m bench.voice_codec
+    python -m bench.voice_codec --wav sample1.wav sample2.wav
+"""
+import argparse
+import time
+import wave
+from typing import Dict, List
+
+import numpy as np
+
+from advanced_feature.voice_chat import AUDIO_RATE, FRAME_BYTES, FRAME_MS, FRAME_SAMPLES, HDR_SIZE
+from advanced_feature.voice_codec import available_codecs, create_codec
+
+IP_UDP_OVERHEAD = 28
+ROOM_USER_BYTES = 16   # độ dài room + user điển hình trong header
+
+
+# ---------- corpus ----------
+def _speech_like(seconds: float, f0: float, rng: np.random.Generator) -> np.ndarray:
+    """Nguyên âm có hài âm + đường pitch + bao biên độ âm tiết + đoạn xát (nhiễu)."""
+    n = int(seconds * AUDIO_RATE)
+    t = np.arange(n) / AUDIO_RATE
+    pitch = f0 * (1 + 0.1 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / AUDIO_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllable = np.clip(np.sin(2 * np.pi * 3.5 * t), 0, None) ** 0.6
+    fricative = rng.normal(0, 0.3, n) * (np.sin(2 * np.pi * 1.3 * t) > 0.85)
+    x = voiced * syllable + fricative
+    return (x / np.max(np.abs(x)) * 12000).astype(np.int16)
+
+
+def build_corpus(seconds: float = 5.0, seed: int = 0) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    n = int(seconds * AUDIO_RATE)
+    t = np.arange(n) / AUDIO_RATE
+    return {
+        "speech_male": _speech_like(seconds, 110.0, rng),
+        "speech_female": _speech_like(seconds, 210.0, rng),
+        "quiet_speech": (_speech_like(seconds, 150.0, rng) // 20).astype(np.int16),
+        "tone_1k": (np.sin(2 * np.pi * 1000 * t) * 10000).astype(np.int16),
+        "noise": rng.normal(0, 3000, n).clip(-32768, 32767).astype(np.int16),
+    }
+
+
+def load_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2 or w.getnchannels() != 1 or w.getframerate() != AUDIO_RATE:
+            raise ValueError(f"{path}: cần WAV 16 kHz mono 16-bit")
+        return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+
+# ---------- metrics ----------
+def snr_db(ref: np.ndarray, out: np.ndarray) -> float:
+    ref = ref.astype(np.float64); err = ref - out.astype(np.float64)
+    return min(99.0, 10 * np.log10(np.sum(ref ** 2) / max(np.sum(err ** 2), 1e-9)))
+
+
+def segmental_snr_db(ref: np.ndarray, out: np.ndarray) -> float:
+    n = len(ref) // FRAME_SAMPLES * FRAME_SAMPLES
+    r = ref[:n].astype(np.float64).reshape(-1, FRAME_SAMPLES)
+    e = r - out[:n].astype(np.float64).reshape(-1, FRAME_SAMPLES)
+    seg = 10 * np.log10(np.sum(r ** 2, axis=1) / np.maximum(np.sum(e ** 2, axis=1), 1e-9) + 1e-12)
+    active = np.sum(r ** 2, axis=1) > 1e3 * FRAME_SAMPLES     # bỏ khung im lặng
+    return float(np.mean(np.clip(seg[active], -10, 35))) if active.any() else float("nan")
+
+
+def run_codec(name: str, signal: np.ndarray) -> dict:
+    enc = create_codec(name, AUDIO_RATE, FRAME_SAMPLES)
+    dec = create_codec(name, AUDIO_RATE, FRAME_SAMPLES)
+    frames = [signal[i:i + FRAME_SAMPLES].tobytes()
+              for i in range(0, len(signal) - FRAME_SAMPLES + 1, FRAME_SAMPLES)]
+    out: List[bytes] = []
+    payload = 0
+    t_enc = t_dec = 0.0
+    for f in frames:
+        t0 = time.perf_counter(); data = enc.encode(f); t1 = time.perf_counter()
+        pcm = dec.decode(data); t2 = time.perf_counter()
+        t_enc += t1 - t0; t_dec += t2 - t1
+        payload += len(data) + 1            # + byte codec_id
+        out.append(pcm)
+    n = len(frames)
+    per_pkt = payload / n + HDR_SIZE + ROOM_USER_BYTES + IP_UDP_OVERHEAD
+    decoded = np.frombuffer(b"".join(out), dtype=np.int16)
+    ref = signal[:len(decoded)]
+    return {
+        "payload_kbps": payload / n * 8 * 1000 / FRAME_MS / 1000,
+        "wire_kbps": per_pkt * 8 * 1000 / FRAME_MS / 1000,
+        "enc_us": t_enc / n * 1e6,
+        "dec_us": t_dec / n * 1e6,
+        "snr_db": snr_db(ref, decoded),
+        "segsnr_db": segmental_snr_db(ref, decoded),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Voice codec benchmark")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--wav", nargs="*", default=[])
+    ap.add_argument("--codecs", nargs="*", default=None)
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.seconds)
+    for path in args.wav:
+        corpus[path] = load_wav(path)
+    codecs = args.codecs or available_codecs()
+
+    print(f"raw PCM frame = {FRAME_BYTES} B / {FRAME_MS} ms; codecs: {', '.join(codecs)}")
+    print(f"{'codec':6} {'signal':14} {'payload':>8} {'wire':>8} {'enc_us':>7} {'dec_us':>7} {'SNR':>6} {'segSNR':>7}")
+    for name in codecs:
+        for sig_name, sig in corpus.items():
+            r = run_codec(name, sig)
+            print(f"{name:6} {sig_name[:14]:14} {r['payload_kbps']:7.1f}k {r['wire_kbps']:7.1f}k "
+                  f"{r['enc_us']:7.1f} {r['dec_us']:7.1f} {r['snr_db']:6.1f} {r['segsnr_db']:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Đo tiết kiệm gói/băng thông của VAD + DTX trên trace cuộc họp.
+
+Mặc định sinh một cuộc họp tổng hợp: N người, lần lượt nói (đôi khi chen
+nhau), mỗi mic có nền nhiễu riêng, một phần người tham gia tắt mic. Có thể
+thay bằng file WAV ghi từng người (16 kHz mono 16-bit) qua --wav.
+
+    python -m bench.voice_dtx
+    python -m bench.voice_dtx --participants 50 --talkers 2 --seconds 60
+    python -m bench.voice_dtx --wav alice.wav bob.wav carol.wav
+"""
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from advanced_feature.vad import DtxController
+from advanced_feature.voice_chat import AUDIO_RATE, FRAME_BYTES, FRAME_MS, FRAME_SAMPLES, HDR_SIZE
+from advanced_feature.voice_codec import create_codec
+from bench.voice_codec import ROOM_USER_BYTES, IP_UDP_OVERHEAD, _speech_like, load_wav
+
+Track = Tuple[np.ndarray, np.ndarray, bool]   # (pcm, speech_mask theo khung, muted)
+
+
+def synth_meeting(participants: int, seconds: float, talkers: int, muted_frac: float,
+                  seed: int = 0) -> List[Track]:
+    rng = np.random.default_rng(seed)
+    n_frames = int(seconds * 1000 / FRAME_MS)
+    n = n_frames * FRAME_SAMPLES
+    # lịch nói: mỗi lượt 2–8 s, chọn `talkers` người nói đồng thời (tối đa)
+    mask = np.zeros((participants, n_frames), dtype=bool)
+    f = 0
+    while f < n_frames:
+        turn = int(rng.uniform(2, 8) * 1000 / FRAME_MS)
+        k = rng.integers(1, talkers + 1)
+        who = rng.choice(participants, size=k, replace=False)
+        mask[who, f:f + turn] = True
+        f += turn + int(rng.uniform(0.2, 1.0) * 1000 / FRAME_MS)
+
+    muted = rng.random(participants) < muted_frac
+    tracks: List[Track] = []
+    for p in range(participants):
+        if muted[p]:
+            mask[p] = False
+        noise_db = rng.uniform(-70, -50)
+        noise = rng.normal(0, 32768 * 10 ** (noise_db / 20), n)
+        speech = _speech_like(seconds, rng.uniform(100, 230), rng).astype(np.float64)[:n]
+        speech = np.pad(speech, (0, n - speech.size))
+        gate = np.repeat(mask[p], FRAME_SAMPLES)
+        pcm = np.clip(noise + speech * gate, -32768, 32767).astype(np.int16)
+        tracks.append((pcm, mask[p], bool(muted[p])))
+    return tracks
+
+
+def wav_tracks(paths: List[str]) -> List[Track]:
+    out: List[Track] = []
+    for path in paths:
+        pcm = load_wav(path)
+        n_frames = len(pcm) // FRAME_SAMPLES
+        out.append((pcm[:n_frames * FRAME_SAMPLES], np.zeros(n_frames, dtype=bool), False))
+    return out
+
+
+def run(tracks: List[Track], codec: str, has_truth: bool) -> None:
+    enc = create_codec(codec)
+    voice_bytes = len(enc.encode(b"\x00" * FRAME_BYTES)) + 1
+    overhead = HDR_SIZE + ROOM_USER_BYTES + IP_UDP_OVERHEAD
+    n = len(tracks)
+
+    base_pkts = base_bytes = 0
+    pkts = byts = cn = 0
+    missed = speech_total = 0
+    for pcm, mask, muted in tracks:
+        dtx = DtxController()
+        frames = pcm.reshape(-1, FRAME_SAMPLES)
+        base_pkts += len(frames)
+        base_bytes += len(frames) * (FRAME_BYTES + overhead)   # PCM thô, kể cả khi tắt mic
+        for i, fr in enumerate(frames):
+            d: Optional[tuple] = dtx.process(fr.tobytes(), muted=muted)
+            if d is None:
+                continue
+            kind, body = d
+            pkts += 1
+            if kind == "voice":
+                byts += voice_bytes + overhead
+            else:
+                byts += len(body) + 1 + overhead
+                cn += 1
+            if has_truth and mask[i] and kind != "voice":
+                missed += 1
+        if has_truth:
+            speech_total += int(mask.sum())
+
+    secs = len(tracks[0][0]) / AUDIO_RATE
+    print(f"participants={n} duration={secs:.0f}s codec={codec}")
+    print(f"  baseline : {base_pkts / secs:8.0f} pkt/s  {base_bytes * 8 / secs / 1e3:9.1f} kbps upstream")
+    print(f"  VAD+DTX  : {pkts / secs:8.0f} pkt/s  {byts * 8 / secs / 1e3:9.1f} kbps upstream "
+          f"(CN descriptors {cn})")
+    print(f"  savings  : {100 * (1 - pkts / base_pkts):5.1f}% packets, {100 * (1 - byts / base_bytes):5.1f}% bytes")
+    print(f"  relay fan-out (x{n - 1}): {base_pkts * (n - 1) / secs:,.0f} -> {pkts * (n - 1) / secs:,.0f} pkt/s")
+    if has_truth and speech_total:
+        print(f"  speech frames not sent as voice: {100 * missed / speech_total:.2f}%")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="VAD/DTX savings on meeting traces")
+    ap.add_argument("--participants", type=int, default=50)
+    ap.add_argument("--talkers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=60.0)
+    ap.add_argument("--muted", type=float, default=0.5, help="tỉ lệ người tắt mic")
+    ap.add_argument("--codec", default="ulaw")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--wav", nargs="*", default=[])
+    args = ap.parse_args()
+
+    if args.wav:
+        run(wav_tracks(args.wav), args.codec, has_truth=False)
+    else:
+        tracks = synth_meeting(args.participants, args.seconds, args.talkers, args.muted, args.seed)
+        run(tracks, args.codec, has_truth=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@ import asyncio
 import base64
 import json
 import logging
-from typing import Optional
+import socket
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
 
 import websockets
 from websockets.server import WebSocketServerProtocol
@@ -13,12 +16,127 @@ from server.protocol import (
     read_msg as tcp_read_plain,
     send_msg_secure as tcp_send_secure,
     read_msg_secure as tcp_read_secure,
+    read_raw as tcp_read_raw,
+    send_raw as tcp_send_raw,
+    LocalPipe,
 )
+from server.tcp_mux import UpstreamPool
+from .media_bridge import CH_VIDEO, CH_VOICE, MediaBridge
 
 
 logger = logging.getLogger("GatewayWS")
 logger.setLevel(logging.INFO)
 
+MAX_PASSTHROUGH = 256 * 1024     # frame lớn hơn thì đi đường parse đầy đủ
+
+
+def _passthrough_ok(data: bytes) -> bool:
+    """Kiểm tra rẻ (không parse) cho frame trình duyệt sau login: cỡ và hình dạng object.
+
+    Tin có chữ "login" đi đường parse vì login luôn phải gửi plaintext;
+    JSON hỏng bên trong {...} thì server trả lỗi "Invalid JSON" như trước.
+    """
+    return (0 < len(data) <= MAX_PASSTHROUGH and data[:1] == b"{" and data[-1:] == b"}"
+            and b'"login"' not in data)
+
+
+# ---------- hàng đợi TCP→WS ----------
+PRESENCE_TYPES = ("participant_joined", "participant_left")
+_PRESENCE_RAW = tuple(f'"type": "{t}"'.encode() for t in PRESENCE_TYPES)
+_ROOMS_RAW = b'"type": "rooms"'
+_ID_RAW, _NO_ID_RAW = b'"id": ', b'"id": null'
+
+
+def _kind_raw(data: bytes) -> str:
+    """Phân loại tin server đã serialize (json.dumps mặc định) mà không parse."""
+    head = data[:80]
+    if any(p in head for p in _PRESENCE_RAW):
+        return "presence"
+    # chỉ gộp bản không có id: phản hồi gắn id là của một request đang chờ đúng nó
+    if _ROOMS_RAW in head and (_ID_RAW not in head or _NO_ID_RAW in head):
+        return "rooms"
+    return "normal"
+
+
+def _kind_msg(msg) -> str:
+    t = msg.get("type") if isinstance(msg, dict) else None
+    if t in PRESENCE_TYPES:
+        return "presence"
+    return "rooms" if t == "rooms" and msg.get("id") is None else "normal"
+
+
+class _DownQueue:
+    """
+    Hàng đợi có giới hạn server → một trình duyệt, để luồng đọc TCP không bao
+    giờ phải chờ trình duyệt chậm (nếu chờ, server bị kẹt ở writer.drain() và
+    cả vòng broadcast của phòng đứng theo).
+
+    Khi vượt `limit` tin / `max_bytes`: bỏ presence (participant_*) trước;
+    danh sách phòng ("rooms") không gắn id được gộp, chỉ giữ bản mới nhất chưa gửi.
+    Vượt gấp đôi mà không còn gì để bỏ → put() trả False (ngắt kết nối).
+    """
+
+    def __init__(self, limit: int, max_bytes: int) -> None:
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self._q: deque = deque()       # phần tử: [kind, data]
+        self._rooms: Optional[list] = None
+        self._ready = asyncio.Event()
+        self.bytes = 0
+        # counters
+        self.peak = 0
+        self.sent = 0
+        self.dropped_presence = 0
+        self.coalesced_rooms = 0
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def put(self, kind: str, data) -> bool:
+        size = len(data)
+        if kind == "rooms" and self._rooms is not None:
+            self.bytes += size - len(self._rooms[1])
+            self._rooms[1] = data
+            self.coalesced_rooms += 1
+            return True
+        if len(self._q) >= self.limit or self.bytes + size > self.max_bytes:
+            if kind == "presence":
+                self.dropped_presence += 1
+                return True
+            for i, (k, d) in enumerate(self._q):
+                if k == "presence":
+                    del self._q[i]
+                    self.bytes -= len(d)
+                    self.dropped_presence += 1
+                    break
+            else:
+                if len(self._q) >= 2 * self.limit or self.bytes + size > 2 * self.max_bytes:
+                    return False
+        entry = [kind, data]
+        self._q.append(entry)
+        if kind == "rooms":
+            self._rooms = entry
+        self.bytes += size
+        self.peak = max(self.peak, len(self._q))
+        self._ready.set()
+        return True
+
+    def close(self, code: int, reason: str) -> None:
+        """Xếp lệnh đóng WS sau các tin còn lại (không tính giới hạn)."""
+        self._q.append(["close", (code, reason)])
+        self._ready.set()
+
+    async def get(self) -> list:
+        while not self._q:
+            self._ready.clear()
+            await self._ready.wait()
+        entry = self._q.popleft()
+        if entry is self._rooms:
+            self._rooms = None
+        if entry[0] != "close":
+            self.bytes -= len(entry[1])
+        return entry
+
 
 class Gateway:
     """
@@ -30,69 +148,187 @@ class Gateway:
       TCP server returns in `login_ok`).
     - TCP responses are decrypted (if needed) and forwarded back to WS as JSON
       text.
+    - `upstream_pool > 0`: instead of one TCP socket per tab, sessions are
+      multiplexed over that many long-lived connections (server.tcp_mux);
+      each tab still has its own server-side Client and AES key.
+    - `passthrough` (default): after login, frames are relayed as raw UTF-8
+      bytes in both directions (decrypt → WS text, WS text → encrypt) without
+      json.loads/json.dumps; only pre-login traffic is parsed (for login_ok).
+    - Each direction has a bounded queue. Browser → TCP: `up_queue` frames,
+      when full the gateway stops reading that WebSocket. TCP → browser: see
+      _DownQueue; the TCP leg is always read, and a browser whose send makes
+      no progress for `stall_timeout` seconds is disconnected.
+      `down_queue=0` sends inline (old behaviour, stalls propagate upstream).
+    - `media_ports=(voice, video)`: browsers may open `/media?token=...` (token
+      from their login_ok) to exchange HPH voice/video packets with the UDP
+      relay on `tcp_host` (see media_bridge).
+    - `local_handler`: when the gateway runs in the same event loop as the
+      TCP server (main.py --component all), pass `server.tcp_server.handle_client`
+      and each browser is attached to it through a pair of LocalPipe: dicts
+      go straight to the dispatch layer, no loopback socket and no AES.
     """
 
     def __init__(self, tcp_host: str = "127.0.0.1", tcp_port: int = 8888, web_port: int = 8765,
-                 host: str = "0.0.0.0") -> None:
+                 host: str = "0.0.0.0", upstream_pool: int = 0, passthrough: bool = True,
+                 up_queue: int = 64, down_queue: int = 256, down_queue_bytes: int = 4 << 20,
+                 stall_timeout: float = 10.0, media_ports: Optional[Tuple[int, int]] = None,
+                 local_handler=None) -> None:
         self.tcp_host = tcp_host
         self.tcp_port = tcp_port
         self.web_port = web_port
         self.host = host
+        self.passthrough = passthrough
+        self.up_queue = up_queue
+        self.down_queue = down_queue
+        self.down_queue_bytes = down_queue_bytes
+        self.stall_timeout = stall_timeout
+        self._links: Set[tuple] = set()     # (peer, up Queue, _DownQueue) của các kết nối đang mở
+        self.media_ports = media_ports
+        self.local_handler = local_handler
+        self._tokens: Dict[str, str] = {}   # token login_ok → username (để mở /media)
+        self._media: Set[MediaBridge] = set()
+        # counters
+        self.closed_stalled = 0
+        self.closed_overflow = 0
+        self.dropped_presence = 0      # cộng dồn cả các kết nối đã đóng
+        self.coalesced_rooms = 0
+        self.down_peak_max = 0
         self._server: Optional[websockets.server.Serve] = None
+        self._pool: Optional[UpstreamPool] = UpstreamPool(tcp_host, tcp_port, upstream_pool) if upstream_pool > 0 else None
 
     async def _handle_ws(self, ws: WebSocketServerProtocol):
         peer = f"{ws.remote_address[0]}:{ws.remote_address[1]}" if ws.remote_address else "?"
         reader: asyncio.StreamReader
         writer: asyncio.StreamWriter
+        local_task: Optional[asyncio.Task] = None
+        passthrough = self.passthrough and self.local_handler is None   # local: không có byte để chuyển
         try:
-            reader, writer = await asyncio.open_connection(self.tcp_host, self.tcp_port)
+            if self.local_handler is not None:
+                to_server = LocalPipe(ws.remote_address, max(1, self.up_queue))
+                to_browser = LocalPipe(ws.remote_address, max(1, self.down_queue or 256))
+                local_task = asyncio.create_task(self.local_handler(to_server, to_browser))
+                reader, writer = to_browser, to_server
+            elif self._pool is not None:
+                reader, writer = await self._pool.open_session(ws.remote_address)
+            else:
+                reader, writer = await asyncio.open_connection(self.tcp_host, self.tcp_port)
         except Exception as e:  # TCP connect failed
             logger.error("TCP connect error from %s: %s", peer, e)
             await ws.close(code=1011, reason="TCP upstream unavailable")
             return
 
         aes_key: Optional[bytes] = None
-        closed = False
+        token: Optional[str] = None
+        up: asyncio.Queue = asyncio.Queue(maxsize=max(1, self.up_queue))
+        down = _DownQueue(max(1, self.down_queue), self.down_queue_bytes)
+        link = (peer, up, down)
+        self._links.add(link)
+
+        def drop_browser(why: str) -> None:
+            # trình duyệt không nhận nữa: close handshake cũng sẽ kẹt, cắt thẳng TCP
+            logger.warning("Disconnecting %s: %s (queued %d msgs, %d bytes)", peer, why, len(down), down.bytes)
+            ws.transport.abort()
+
+        async def ws_send(data) -> None:
+            if isinstance(data, bytes):
+                await ws.send(data, text=True)   # server đã serialize JSON: nguyên byte thành WS text frame
+            else:
+                await ws.send(data)
+
+        async def deliver(kind: str, data) -> bool:
+            if self.down_queue <= 0:
+                await ws_send(data)
+                return True
+            if down.put(kind, data):
+                return True
+            self.closed_overflow += 1
+            drop_browser("send queue overflow")
+            return False
 
         async def ws_to_tcp():
-            nonlocal aes_key
-            async for text in ws:
-                try:
-                    obj = json.loads(text)
-                except Exception:
-                    await ws.send(json.dumps({"ok": False, "type": "error", "error": "Invalid JSON"}))
-                    continue
-                # Before login we must talk in plaintext; after login we encrypt
-                t = obj.get("type")
+            while True:
                 try:
-                    if t == "login" or aes_key is None:
-                        await tcp_send_plain(writer, obj)
-                    else:
-                        await tcp_send_secure(writer, obj, aes_key)
-                except Exception as e:
-                    logger.error("Upstream send failed: %s", e)
-                    await ws.close(code=1011, reason="Upstream error")
+                    data = await ws.recv(decode=False)   # bytes UTF-8, không giải mã
+                except websockets.ConnectionClosed:
                     break
+                await up.put(data)            # đầy → ngừng đọc WS, backpressure về trình duyệt
+            await up.put(None)                # gửi nốt phần còn lại rồi up_sender đóng upstream
+
+        async def upstream_failed(e: Exception) -> None:
+            logger.error("Upstream send failed: %s", e)
+            down.close(1011, "Upstream error")
+            # up_sender xong là finally huỷ ws_sender: chờ nó gửi nốt hàng đợi và close frame
+            await asyncio.wait([tasks[1]], timeout=self.stall_timeout)
+
+        async def up_sender():
+            try:
+                while True:
+                    data = await up.get()
+                    if data is None:
+                        break
+                    try:
+                        if aes_key is not None and passthrough and _passthrough_ok(data):
+                            await tcp_send_raw(writer, data, aes_key)
+                            continue
+                    except Exception as e:
+                        await upstream_failed(e)
+                        break
+                    try:
+                        obj = json.loads(data)
+                    except Exception:
+                        await deliver("normal", json.dumps({"ok": False, "type": "error", "error": "Invalid JSON"}))
+                        continue
+                    # Before login we must talk in plaintext; after login we encrypt
+                    t = obj.get("type") if isinstance(obj, dict) else None
+                    if t == "mux_hello":
+                        # kết nối upstream đến từ địa chỉ gateway: trình duyệt không được tự mở mux
+                        await deliver("normal", json.dumps({"ok": False, "type": "error", "error": "Mux not allowed"}))
+                        continue
+                    try:
+                        if t == "login" or aes_key is None:
+                            await tcp_send_plain(writer, obj)
+                        else:
+                            await tcp_send_secure(writer, obj, aes_key)
+                    except Exception as e:
+                        await upstream_failed(e)
+                        break
+            finally:
+                # browser đã đi: đóng phía upstream để tcp_to_ws nhận EOF và server dọn phiên
+                writer.close()
 
         async def tcp_to_ws():
-            nonlocal aes_key
+            nonlocal aes_key, token
             while True:
+                raw = None
                 try:
                     if aes_key is None:
                         msg = await tcp_read_plain(reader)
+                    elif passthrough:
+                        raw = await tcp_read_raw(reader, aes_key)
                     else:
                         msg = await tcp_read_secure(reader, aes_key)
                 except asyncio.IncompleteReadError:
                     logger.info("TCP closed by upstream")
-                    await ws.close(code=1011, reason="Upstream closed")
+                    down.close(1011, "Upstream closed")
                     break
                 except Exception as e:
                     logger.error("Error reading from upstream: %s", e)
-                    await ws.close(code=1011, reason="Upstream error")
+                    down.close(1011, "Upstream error")
                     break
 
+                if raw is not None:
+                    try:
+                        if not await deliver(_kind_raw(raw), raw):
+                            break
+                    except Exception:
+                        break
+                    continue
+
                 # Capture AES key after login_ok
                 if isinstance(msg, dict) and msg.get("type") == "login_ok":
+                    if msg.get("token") and msg.get("username"):
+                        token = msg["token"]
+                        self._tokens[token] = msg["username"]
                     k = msg.get("aes_key_b64")
                     if k:
                         try:
@@ -102,21 +338,98 @@ class Gateway:
                             aes_key = None
 
                 try:
-                    await ws.send(json.dumps(msg))
+                    if not await deliver(_kind_msg(msg), json.dumps(msg)):
+                        break
                 except Exception:
                     break
 
-        try:
-            await asyncio.gather(ws_to_tcp(), tcp_to_ws())
-        finally:
-            if not closed:
+        async def ws_sender():
+            while True:
+                kind, data = await down.get()
+                if kind == "close":
+                    await ws.close(code=data[0], reason=data[1])
+                    return
                 try:
-                    writer.close()
-                    await writer.wait_closed()
+                    await asyncio.wait_for(ws_send(data), self.stall_timeout)
+                except asyncio.TimeoutError:
+                    self.closed_stalled += 1
+                    drop_browser(f"no progress for {self.stall_timeout:.0f}s")
+                    return
                 except Exception:
-                    pass
+                    return
+                down.sent += 1
+
+        tasks = [asyncio.create_task(c) for c in (up_sender(), ws_sender(), ws_to_tcp(), tcp_to_ws())]
+        try:
+            # xong khi một trong hai đầu ghi kết thúc (browser đi / upstream đóng / browser kẹt)
+            await asyncio.wait(tasks[:2], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._links.discard(link)
+            self._tokens.pop(token, None)
+            self.dropped_presence += down.dropped_presence
+            self.coalesced_rooms += down.coalesced_rooms
+            self.down_peak_max = max(self.down_peak_max, down.peak)
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+            if local_task is not None:
+                # không ai đọc to_browser nữa: đóng để broadcast của người khác vào đây
+                # bị bỏ thay vì chờ chỗ trống mãi (cả những put() đang chờ)
+                reader.close()
+                # handle_client nhận EOF và dọn clients/rooms/session như khi socket đóng
+                await asyncio.wait([local_task], timeout=5)
+
+    async def _handle_media(self, ws):
+        query = parse_qs(urlsplit(ws.request.path).query)
+        user = self._tokens.get((query.get("token") or [""])[0])
+        if self.media_ports is None or user is None:
+            await ws.close(code=1008, reason="media bridge unavailable or not logged in")
+            return
+        host = self.tcp_host if self.tcp_host not in ("0.0.0.0", "") else "127.0.0.1"
+        # relay trả gói từ IP này, bridge lọc theo nó; resolver của loop không chặn vòng sự kiện
+        ip = (await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET))[0][4][0]
+        bridge = MediaBridge(ws, user, {CH_VOICE: (ip, self.media_ports[0]), CH_VIDEO: (ip, self.media_ports[1])},
+                             stall_timeout=self.stall_timeout)
+        self._media.add(bridge)
+        try:
+            await bridge.run()
+        finally:
+            self._media.discard(bridge)
+
+    async def _route(self, ws):
+        if ws.request.path.startswith("/media"):
+            await self._handle_media(ws)
+        else:
+            await self._handle_ws(ws)
+
+    def connection_stats(self) -> List[dict]:
+        """Độ sâu hàng đợi từng kết nối (metrics)."""
+        return [{"peer": peer, "up_depth": up.qsize(), "down_depth": len(down), "down_bytes": down.bytes,
+                 "down_peak": down.peak, "sent": down.sent, "dropped_presence": down.dropped_presence,
+                 "coalesced_rooms": down.coalesced_rooms}
+                for peer, up, down in list(self._links)]
+
+    def stats(self) -> dict:
+        conns = self.connection_stats()
+        return {"connections": len(conns),
+                "down_depth_max": max((c["down_depth"] for c in conns), default=0),
+                "down_bytes_total": sum(c["down_bytes"] for c in conns),
+                "down_peak_max": max([self.down_peak_max] + [c["down_peak"] for c in conns]),
+                "dropped_presence": self.dropped_presence + sum(c["dropped_presence"] for c in conns),
+                "coalesced_rooms": self.coalesced_rooms + sum(c["coalesced_rooms"] for c in conns),
+                "closed_stalled": self.closed_stalled, "closed_overflow": self.closed_overflow,
+                "media": [b.stats() for b in list(self._media)]}
 
     async def start(self):
         logger.info("Starting WebSocket Gateway on %s:%s → TCP %s:%s", self.host, self.web_port, self.tcp_host, self.tcp_port)
-        async with websockets.serve(self._handle_ws, self.host, self.web_port, ping_interval=20, ping_timeout=20, max_size=2**20):
-            await asyncio.Future()  # run forever
+        async with websockets.serve(self._route, self.host, self.web_port, ping_interval=20, ping_timeout=20, max_size=2**20):
+            try:
+                await asyncio.Future()  # run forever
+            finally:
+                if self._pool is not None:
+                    await self._pool.close()
@@ -0,0 +1,180 @@
+"""
+Cầu media WebSocket ⇄ relay UDP cho người dùng trình duyệt.
+
+Trình duyệt mở một WS riêng `/media?token=<token của login_ok>` (tách khỏi WS
+chat nên chat không bao giờ phải xếp sau khung video):
+
+    browser → gateway   binary = kênh(1B: 0 voice, 1 video) + gói HPH1/HPH2
+    gateway → browser   binary = nguyên datagram relay gửi (VOICE/VIDEO/SCREEN/FEEDBACK)
+
+Gateway dùng một socket UDP cho mỗi trình duyệt nên relay thấy nó như một
+client UDP bình thường (JOIN/KEEPALIVE/LEAVE do trình duyệt tự gửi).
+Chiều lên gửi thẳng memoryview (bỏ byte kênh không copy); chiều xuống chuyển
+nguyên bytes nhận được. Hàng đợi xuống: voice FIFO ngắn (bỏ gói cũ), video
+"khung mới nhất thắng" theo từng người gửi, SCREEN/FEEDBACK FIFO có giới hạn.
+"""
+import asyncio
+import logging
+import socket
+import struct
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import websockets
+
+from server.udp_server import (HDR_FMT, HDR_SIZE, HDR_TS_SIZE, MAGIC, MAGIC_TS, MSG_FEEDBACK, MSG_SCREEN,
+                               MSG_VIDEO, MSG_VOICE)
+
+logger = logging.getLogger("GatewayMedia")
+
+Address = Tuple[str, int]
+CH_VOICE, CH_VIDEO = 0, 1
+VOICE_BACKLOG = 25          # ~0.5 s tiếng; cũ hơn thì vô dụng, bỏ
+OTHER_BACKLOG = 512         # SCREEN (ô thay đổi) / FEEDBACK: không gộp được
+_HDR = struct.Struct(HDR_FMT)
+
+
+def _header(data) -> Optional[Tuple[int, int, int, int]]:
+    """(mtype, off_room, room_len, user_len) hoặc None; chỉ đọc header, không copy payload."""
+    if len(data) < HDR_SIZE:
+        return None
+    magic, mtype, rlen, ulen, _ = _HDR.unpack_from(data)
+    if magic == MAGIC_TS:
+        off = HDR_TS_SIZE
+    elif magic == MAGIC:
+        off = HDR_SIZE
+    else:
+        return None
+    if off + rlen + ulen > len(data):
+        return None
+    return mtype, off, rlen, ulen
+
+
+class MediaBridge:
+    def __init__(self, ws, user: str, targets: Dict[int, Address], stall_timeout: float = 5.0) -> None:
+        self.ws = ws
+        self.user_b = user.encode()
+        self.targets = targets                  # kênh → (host, port) relay
+        self._from = {a: ch for ch, a in targets.items()}
+        self.stall_timeout = stall_timeout
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind(("0.0.0.0", 0))
+        self.sock.setblocking(False)
+        self._voice: deque = deque()
+        self._other: deque = deque()
+        self._video: Dict[bytes, bytes] = {}    # room+user → khung mới nhất chưa gửi
+        self._ready = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        # counters
+        self.up_packets = 0
+        self.up_bytes = 0
+        self.down_packets = 0
+        self.down_bytes = 0
+        self.rejected = 0
+        self.voice_dropped = 0
+        self.other_dropped = 0
+        self.video_replaced = 0
+
+    # ---------- browser → relay ----------
+    def from_browser(self, frame) -> None:
+        if not isinstance(frame, (bytes, bytearray)) or len(frame) < 1 + HDR_SIZE:
+            self.rejected += 1
+            return
+        target = self.targets.get(frame[0])
+        pkt = memoryview(frame)[1:]
+        h = _header(pkt)
+        # chỉ cho gửi dưới tên đã login (relay không tự xác thực)
+        if target is None or h is None or pkt[h[1] + h[2]:h[1] + h[2] + h[3]] != self.user_b:
+            self.rejected += 1
+            return
+        try:
+            self.sock.sendto(pkt, target)
+        except OSError:
+            return
+        self.up_packets += 1
+        self.up_bytes += len(pkt)
+
+    # ---------- relay → browser ----------
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                return
+            if addr not in self._from:
+                continue
+            h = _header(data)
+            if h is None:
+                continue
+            mtype = h[0]
+            if mtype == MSG_VIDEO:
+                key = data[h[1]:h[1] + h[2] + h[3]]
+                if key in self._video:
+                    self.video_replaced += 1     # trình duyệt chưa nhận khung trước: chỉ giữ khung mới
+                self._video[key] = data
+            elif mtype == MSG_VOICE:
+                if len(self._voice) >= VOICE_BACKLOG:
+                    self._voice.popleft()
+                    self.voice_dropped += 1
+                self._voice.append(data)
+            elif mtype in (MSG_SCREEN, MSG_FEEDBACK):
+                if len(self._other) >= OTHER_BACKLOG:
+                    self._other.popleft()
+                    self.other_dropped += 1
+                self._other.append(data)
+            else:
+                continue
+            self._ready.set()
+
+    def _next(self) -> Optional[bytes]:
+        if self._voice:
+            return self._voice.popleft()
+        if self._other:
+            return self._other.popleft()
+        if self._video:
+            key = next(iter(self._video))
+            return self._video.pop(key)
+        return None
+
+    async def _sender(self) -> None:
+        while True:
+            data = self._next()
+            if data is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            try:
+                await asyncio.wait_for(self.ws.send(data), self.stall_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Media WS stalled for %.0fs, disconnecting", self.stall_timeout)
+                self.ws.transport.abort()
+                return
+            except Exception:
+                return
+            self.down_packets += 1
+            self.down_bytes += len(data)
+
+    async def run(self) -> None:
+        self._loop.add_reader(self.sock.fileno(), self._on_readable)
+        sender = asyncio.create_task(self._sender())
+        try:
+            while True:
+                try:
+                    frame = await self.ws.recv()
+                except websockets.ConnectionClosed:
+                    break
+                self.from_browser(frame)
+        finally:
+            sender.cancel()
+            self._loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+
+    def stats(self) -> dict:
+        return {"up_packets": self.up_packets, "up_bytes": self.up_bytes,
+                "down_packets": self.down_packets, "down_bytes": self.down_bytes,
+                "rejected": self.rejected, "voice_dropped": self.voice_dropped,
+                "other_dropped": self.other_dropped, "video_replaced": self.video_replaced,
+                "pending": len(self._voice) + len(self._other) + len(self._video)}
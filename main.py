@@ -7,7 +7,7 @@ import signal
 import sys
 
 # Import các server components
-from server.tcp_server import main as tcp_main
+from server.tcp_server import main as tcp_main, handle_client
 from server.udp_server import UDPServer
 from Client.gateway import Gateway
 from advanced_feature import config_server
@@ -21,7 +21,9 @@ logger = logging.getLogger("HPH-Main")
 
 
 class HPHMeetingSystem:
-    def __init__(self, host: str, tcp_port: int, udp_port: int, gateway_port: int):
+    def __init__(self, host: str, tcp_port: int, udp_port: int, gateway_port: int,
+                 capture_path: str | None = None, record_dir: str | None = None,
+                 record_rooms: list | None = None, gateway_mux: int = 0, gateway_loopback: bool = False):
         self.tcp_task: asyncio.Task | None = None
         self.udp_task: asyncio.Task | None = None
         self.gateway_task: asyncio.Task | None = None
@@ -30,6 +32,11 @@ class HPHMeetingSystem:
         self.tcp_port = tcp_port
         self.udp_port = udp_port
         self.gateway_port = gateway_port
+        self.capture_path = capture_path
+        self.record_dir = record_dir
+        self.record_rooms = record_rooms
+        self.gateway_mux = gateway_mux
+        self.gateway_loopback = gateway_loopback
 
     async def start_tcp_server(self):
         logger.info("Starting TCP server...")
@@ -44,7 +51,8 @@ class HPHMeetingSystem:
     async def start_udp_server(self):
         logger.info("Starting UDP server...")
         try:
-            udp_server = UDPServer(host=self.server_host, port=self.udp_port)
+            udp_server = UDPServer(host=self.server_host, port=self.udp_port, capture_path=self.capture_path,
+                                   record_dir=self.record_dir, record_rooms=self.record_rooms)
             await udp_server.start()
         except asyncio.CancelledError:
             logger.info("UDP server task cancelled")
@@ -52,13 +60,17 @@ class HPHMeetingSystem:
         except Exception as e:
             logger.exception(f"UDP server error: {e}")
 
-    async def start_gateway(self):
-        logger.info("Starting WebSocket gateway...")
+    async def start_gateway(self, local: bool = False):
+        logger.info("Starting WebSocket gateway%s...", " (in-process)" if local else "")
         try:
             gateway = Gateway(
                 tcp_host=self.server_host,
                 tcp_port=self.tcp_port,
                 web_port=self.gateway_port,
+                upstream_pool=self.gateway_mux,
+                media_ports=(self.udp_port, config_server.UDP_PORT_VIDEO),
+                # cùng tiến trình với TCP server: gắn thẳng vào handle_client, bỏ loopback + AES
+                local_handler=handle_client if local else None,
             )
             await gateway.start()
         except asyncio.CancelledError:
@@ -86,7 +98,7 @@ class HPHMeetingSystem:
         logger.info("=" * 56)
         self.tcp_task = asyncio.create_task(self.start_tcp_server())
         self.udp_task = asyncio.create_task(self.start_udp_server())
-        self.gateway_task = asyncio.create_task(self.start_gateway())
+        self.gateway_task = asyncio.create_task(self.start_gateway(local=not self.gateway_loopback))
         await self._run_tasks([self.tcp_task, self.udp_task, self.gateway_task])
 
     async def start_servers(self):
@@ -141,10 +153,21 @@ async def main():
     parser.add_argument("--tcp-port", type=int, default=config_server.TCP_PORT)
     parser.add_argument("--udp-port", type=int, default=config_server.UDP_PORT)
     parser.add_argument("--gateway-port", type=int, default=config_server.GATEWAY_PORT)
+    parser.add_argument("--capture", default=None,
+                        help="Record all UDP media datagrams to this file (replay: python -m bench.replay)")
+    parser.add_argument("--record-dir", default=None,
+                        help="Record meetings (WAV/MJPEG segments) into this directory")
+    parser.add_argument("--record-room", action="append", default=None,
+                        help="Only record this room (repeatable; default: all rooms)")
+    parser.add_argument("--gateway-mux", type=int, default=0,
+                        help="Multiplex gateway sessions over N upstream TCP connections (0 = one per browser)")
+    parser.add_argument("--gateway-loopback", action="store_true",
+                        help="With --component all: still connect the gateway over loopback TCP + AES")
 
     args = parser.parse_args()
 
-    system = HPHMeetingSystem(args.host, args.tcp_port, args.udp_port, args.gateway_port)
+    system = HPHMeetingSystem(args.host, args.tcp_port, args.udp_port, args.gateway_port, args.capture,
+                              args.record_dir, args.record_room, args.gateway_mux, args.gateway_loopback)
     setup_signal_handlers(system)
 
     try:
@@ -1,5 +1,5 @@
 """time: làm việc với timestamp, uuid: tạo id duy nhất cho session token, base64: mã hóa/giải mã dữ liệu"""
-import time, uuid, base64
+import os, time, uuid, base64, hmac
 from typing import Dict, Optional, Tuple
 from pathlib import Path
 
@@ -8,7 +8,8 @@ from .utils import (
     generate_session_key
 )
 
-USERS_DB = Path(__file__).with_name("users_db.json")
+# HPH_USERS_DB: trỏ sang file khác (vd. DB tạm khi chạy bench.loadgen)
+USERS_DB = Path(os.environ.get("HPH_USERS_DB") or Path(__file__).with_name("users_db.json"))
 
 # ===============================
 # Quản lý người dùng
@@ -61,6 +62,10 @@ if not _store.exists("test"):
 # ===============================
 _sessions: Dict[str, Dict] = {}
 
+# Phiên rớt kết nối (không logout) được giữ RESUME_GRACE giây: client nối lại
+# bằng token (`resume`) mà không phải login lại (không tốn PBKDF2).
+RESUME_GRACE = 60.0
+
 
 # ===============================
 # API chính cho TCP server gọi
@@ -99,6 +104,35 @@ def end_session(username: str) -> None:
     _sessions.pop(username, None)
 
 
+def detach_session(username: str, room: Optional[str] = None) -> None:
+    """Kết nối rớt: giữ phiên (và phòng đang ở) trong RESUME_GRACE giây."""
+    _purge_detached()
+    sess = _sessions.get(username)
+    if sess:
+        sess["detached_at"] = time.time()
+        sess["room"] = room
+
+
+def resume_session(username: str, token: str) -> Optional[Tuple[str, bytes, Optional[str]]]:
+    """
+    Token khớp phiên còn sống hoặc mới rớt → cấp token + khóa AES mới.
+    Trả về (token, key, phòng lúc rớt) hoặc None.
+    """
+    _purge_detached()
+    sess = _sessions.get(username or "")
+    if not sess or not hmac.compare_digest(sess["token"].encode(), str(token or "").encode()):
+        return None
+    room = sess.get("room")
+    new_token, key = create_session(username)
+    return new_token, key, room
+
+
+def _purge_detached() -> None:
+    now = time.time()
+    for u in [u for u, s in _sessions.items() if s.get("detached_at") and now - s["detached_at"] > RESUME_GRACE]:
+        del _sessions[u]
+
+
 def touch_session(username: str) -> None:
     if username in _sessions:
         _sessions[username]["last_seen"] = time.time()
@@ -0,0 +1,142 @@
+"""
+Cache khung video gần nhất của từng người gửi (phía relay UDP).
+
+Mỗi khung video là một datagram HPH hoàn chỉnh nên cache giữ nguyên datagram
+và gửi lại y hệt cho người mới JOIN. Giới hạn theo tổng byte (LRU theo thời
+điểm cập nhật), có tính cả chi phí mỗi entry để con số bộ nhớ không bị ảo.
+"""
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+Address = Tuple[str, int]
+ENTRY_OVERHEAD = 200   # ước lượng: key tuple + str + bytes header + node OrderedDict
+
+
+class FrameCache:
+    def __init__(self, max_bytes: int = 16 << 20, max_age: float = 300.0) -> None:
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        # counters
+        self.stored = 0
+        self.evicted = 0
+        self.served = 0
+
+    @staticmethod
+    def _cost(data: bytes, room: str, user: str) -> int:
+        return len(data) + len(room) + len(user) + ENTRY_OVERHEAD
+
+    def put(self, room: str, user: str, data: bytes, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        key = (room, user)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= self._cost(old[0], room, user)
+        cost = self._cost(data, room, user)
+        if cost > self.max_bytes:
+            return
+        self._entries[key] = (data, now)
+        self.bytes += cost
+        self.stored += 1
+        while self.bytes > self.max_bytes:
+            (r, u), (d, _) = self._entries.popitem(last=False)
+            self.bytes -= self._cost(d, r, u)
+            self.evicted += 1
+
+    def frames_for(self, room: str, exclude_user: str = "", now: Optional[float] = None) -> List[bytes]:
+        """Các khung còn hạn trong phòng, trừ khung của chính người hỏi."""
+        if now is None:
+            now = time.time()
+        out = []
+        for (r, u), (data, ts) in self._entries.items():
+            if r == room and u != exclude_user and now - ts <= self.max_age:
+                out.append(data)
+        self.served += len(out)
+        return out
+
+    def drop(self, room: str, user: Optional[str] = None) -> None:
+        """Bỏ khung của một người (hoặc cả phòng khi user=None)."""
+        for key in [k for k in self._entries if k[0] == room and (user is None or k[1] == user)]:
+            data, _ = self._entries.pop(key)
+            self.bytes -= self._cost(data, *key)
+
+    def expire(self, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        for key in [k for k, (_, ts) in self._entries.items() if now - ts > self.max_age]:
+            data, _ = self._entries.pop(key)
+            self.bytes -= self._cost(data, *key)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "served": self.served,
+        }
+
+
+class PacedSender:
+    """Hàng đợi gửi có giãn nhịp theo byte cho từng địa chỉ đích.
+
+    Dùng trong vòng _serve (một luồng): enqueue() xếp lịch, flush() gửi các gói
+    đã đến hạn, next_delay() cho biết nên chờ recvfrom bao lâu.
+    """
+
+    def __init__(self, send: Callable[[bytes, Address], None], rate_bps: float = 16e6,
+                 max_queued: int = 512) -> None:
+        self._send = send
+        self.rate_bps = rate_bps
+        self.max_queued = max_queued
+        self._heap: List[Tuple[float, int, bytes, Address]] = []
+        self._next_free: Dict[Address, float] = {}
+        self._tie = itertools.count()
+        self.sent = 0
+        self.dropped = 0
+
+    def enqueue(self, packets: List[bytes], addr: Address, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        due = max(now, self._next_free.get(addr, now))
+        for data in packets:
+            if len(self._heap) >= self.max_queued:
+                self.dropped += 1
+                continue
+            heapq.heappush(self._heap, (due, next(self._tie), data, addr))
+            due += len(data) * 8 / self.rate_bps
+        self._next_free[addr] = due
+
+    def flush(self, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self._heap)
+            try:
+                self._send(data, addr)
+                self.sent += 1
+            except Exception:
+                pass
+        if not self._heap:
+            self._next_free.clear()
+
+    def next_deadline(self) -> Optional[float]:
+        """Thời điểm (monotonic) gói kế tiếp tới hạn, None nếu hàng đợi rỗng."""
+        return self._heap[0][0] if self._heap else None
+
+    def next_delay(self, now: Optional[float] = None) -> Optional[float]:
+        if not self._heap:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self._heap[0][0] - now)
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -0,0 +1,116 @@
+"""
+Ghi lại mọi datagram relay UDP nhận được (kèm thời điểm tới) vào file dạng
+pcap thu gọn, chỉ ghi nối (append-only), để phát lại sau bằng bench.replay.
+
+Định dạng: header 8 byte "HPHCAP01" rồi các bản ghi
+    t_us(Q) media(B) src_ip(4s) src_port(H) len(H) | datagram
+t_us là wall clock (µs) nên file nối nhiều phiên vẫn đọc được; media là
+media_type của worker nhận gói (1 = cổng voice, 2 = cổng video).
+
+_UDPWorker chỉ gọi offer() (put_nowait vào hàng đợi có giới hạn); luồng ghi
+riêng gom lô và ghi buffer lớn. Hàng đợi đầy thì bỏ gói capture (đếm
+dropped) chứ không bao giờ làm chậm việc chuyển tiếp.
+"""
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+MAGIC = b"HPHCAP01"
+REC = struct.Struct("!QB4sHH")
+
+Address = Tuple[str, int]
+
+
+class CaptureRecord(NamedTuple):
+    t: float          # giây (wall clock)
+    media: int
+    addr: Address
+    data: bytes
+
+
+class CaptureWriter:
+    def __init__(self, path: str, max_queue: int = 20000, buffer_bytes: int = 1 << 20) -> None:
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "ab", buffering=buffer_bytes)
+        if new:
+            self._f.write(MAGIC)
+        self._q: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="media-capture", daemon=True)
+        self._closed = False
+        # counters
+        self.captured = 0
+        self.dropped = 0
+        self.bytes = 0
+        self._thread.start()
+
+    def offer(self, media: int, addr: Address, data: bytes, t: Optional[float] = None) -> None:
+        """Gọi từ luồng _serve: không chặn."""
+        if self._closed:
+            return
+        try:
+            self._q.put_nowait((time.time() if t is None else t, media, addr, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        buf = bytearray()
+        while True:
+            item = self._q.get()
+            batch = [item]
+            while len(batch) < 4096:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for it in batch:
+                if it is None:
+                    stop = True
+                    continue
+                t, media, (ip, port), data = it
+                try:
+                    ip_b = socket.inet_aton(ip)
+                except OSError:
+                    ip_b = b"\0\0\0\0"   # IPv6/khác: chỉ giữ port
+                buf += REC.pack(int(t * 1e6), media, ip_b, port, len(data))
+                buf += data
+                self.captured += 1
+            self._f.write(buf)
+            self.bytes += len(buf)
+            buf.clear()
+            if stop:
+                self._f.flush()
+                return
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._thread.join(timeout=5)
+        self._f.close()
+
+    def stats(self) -> dict:
+        return {"path": self.path, "captured": self.captured, "dropped": self.dropped,
+                "bytes": self.bytes, "queued": self._q.qsize()}
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+    """Đọc tuần tự; bản ghi cuối bị cắt dở (server chết giữa chừng) thì bỏ qua."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a media capture file: {path}")
+        while True:
+            head = f.read(REC.size)
+            if len(head) < REC.size:
+                return
+            t_us, media, ip_b, port, ln = REC.unpack(head)
+            data = f.read(ln)
+            if len(data) < ln:
+                return
+            yield CaptureRecord(t_us / 1e6, media, (socket.inet_ntoa(ip_b), port), data)
@@ -1,19 +1,81 @@
 import json, struct, asyncio
+from collections import deque
 from typing import Optional
 from .utils import aes_encrypt, aes_decrypt, CRYPTO_AVAILABLE
 
+
+class LocalPipe:
+    """
+    Một chiều trong tiến trình thay cho socket TCP khi gateway chạy chung
+    tiến trình với server: chuyển thẳng dict, không serialize, không AES.
+    Mọi hàm send_*/read_* bên dưới nhận LocalPipe ở vị trí writer/reader
+    (khoá AES bị bỏ qua), nên handle_client chạy nguyên như với socket.
+    """
+
+    def __init__(self, peer=None, maxsize: int = 256) -> None:
+        self.peer = peer
+        self.maxsize = maxsize
+        self._q: deque = deque()
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    async def put(self, obj: dict) -> None:
+        # đầy thì chờ chỗ trống; đã đóng (kể cả trong lúc chờ) thì bỏ như socket đã đóng,
+        # để một đầu đọc chết/kẹt không giữ người gửi (vd. broadcast của handle_client) mãi
+        while not self._closed:
+            if len(self._q) < self.maxsize:
+                self._q.append(obj)
+                self._readable.set()
+                return
+            self._writable.clear()
+            await self._writable.wait()
+
+    async def get(self) -> dict:
+        while not self._q:
+            if self._closed:
+                raise asyncio.IncompleteReadError(b"", 4)     # đọc lại sau EOF vẫn EOF
+            self._readable.clear()
+            await self._readable.wait()
+        obj = self._q.popleft()
+        self._writable.set()
+        return obj
+
+    def close(self) -> None:
+        """Tin đã xếp hàng vẫn đọc được rồi mới tới EOF; put() đang chờ thì thoát ngay."""
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+    async def wait_closed(self) -> None:
+        return None
+
+    def is_closing(self) -> bool:
+        return self._closed
+
+    def get_extra_info(self, name: str, default=None):
+        return self.peer if name == "peername" else default
+
+
 async def send_msg(writer: asyncio.StreamWriter, obj: dict):
+    if isinstance(writer, LocalPipe):
+        return await writer.put(obj)
     data = json.dumps(obj).encode()
     writer.write(struct.pack("!I", len(data)) + data)
     await writer.drain()
 
 async def read_msg(reader: asyncio.StreamReader):
+    if isinstance(reader, LocalPipe):
+        return await reader.get()
     header = await reader.readexactly(4)
     (ln,) = struct.unpack("!I", header)
     data = await reader.readexactly(ln)
     return json.loads(data.decode())
 
 async def send_msg_secure(writer: asyncio.StreamWriter, obj: dict, key: bytes):
+    if isinstance(writer, LocalPipe):
+        return await writer.put(obj)
     if not CRYPTO_AVAILABLE:
         raise RuntimeError("send_msg_secure: 'cryptography' chưa được cài")
     plaintext = json.dumps(obj).encode()
@@ -22,6 +84,8 @@ async def send_msg_secure(writer: asyncio.StreamWriter, obj: dict, key: bytes):
     await writer.drain()
 
 async def read_msg_secure(reader: asyncio.StreamReader, key: bytes):
+    if isinstance(reader, LocalPipe):
+        return await reader.get()
     if not CRYPTO_AVAILABLE:
         raise RuntimeError("read_msg_secure: 'cryptography' chưa được cài")
     header = await reader.readexactly(4)
@@ -39,3 +103,18 @@ async def send_any(writer, obj: dict, key: Optional[bytes]):
     if key:
         return await send_msg_secure(writer, obj, key)
     return await send_msg(writer, obj)
+
+# ---------- byte thô (gateway chuyển tiếp không parse JSON) ----------
+async def read_raw(reader: asyncio.StreamReader, key: Optional[bytes] = None) -> bytes:
+    """Đọc một tin, trả về plaintext JSON dạng bytes (giải mã nếu có key)."""
+    header = await reader.readexactly(4)
+    (ln,) = struct.unpack("!I", header)
+    data = await reader.readexactly(ln)
+    return aes_decrypt(data, key) if key else data
+
+async def send_raw(writer: asyncio.StreamWriter, data: bytes, key: Optional[bytes] = None):
+    """Gửi plaintext JSON đã serialize sẵn (mã hoá nếu có key)."""
+    if key:
+        data = aes_encrypt(data, key)
+    writer.write(struct.pack("!I", len(data)) + data)
+    await writer.drain()
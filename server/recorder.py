@@ -0,0 +1,279 @@
+"""
+Ghi lại cuộc họp phía server: relay tee gói voice/video của các phòng được
+chọn vào đây, một luồng ghi riêng giải mã/ghép và ghi ra đĩa theo đoạn.
+
+Cấu trúc thư mục:
+    <dir>/<room>/<user>/audio_<start_ms>.wav     PCM16 16 kHz mono, khoảng lặng/mất gói = 0
+    <dir>/<room>/<user>/video_<start_ms>.mjpeg   các JPEG nối tiếp
+    <dir>/<room>/<user>/video_<start_ms>.idx     mỗi dòng: wall_ms ts_ms offset size
+    <dir>/<room>/index.jsonl                     một dòng JSON cho mỗi đoạn đã đóng
+
+Tiếng được đặt theo timestamp capture (HPH2) nên track giữ đúng thời gian
+kể cả khi DTX/mất gói. Đoạn mới mỗi segment_sec giây.
+
+offer() gọi từ _serve và không bao giờ chặn: hàng đợi tính theo byte; vượt
+video_limit thì bỏ khung video, vượt max_queue_bytes mới bỏ tiếng.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+import wave
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from advanced_feature.voice_codec import CODEC_CN, create_codec, split_voice
+except Exception:   # không có numpy: chỉ ghi được video
+    create_codec = None
+
+MSG_VOICE = 1
+MSG_VIDEO = 2
+RATE = 16000
+FRAME_SAMPLES = 320
+SAMPLES_PER_MS = RATE // 1000
+MAX_GAP_MS = 10_000          # im lâu hơn thế thì mở đoạn mới thay vì ghi 0
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name)[:64] or "_"
+
+
+class _Segment:
+    def __init__(self, rec: "MeetingRecorder", room: str, user: str, kind: str, now: float) -> None:
+        self.rec = rec
+        self.room, self.user, self.kind = room, user, kind
+        self.start = now
+        self.last = now
+        self.count = 0
+        d = os.path.join(rec.directory, _safe(room), _safe(user))
+        os.makedirs(d, exist_ok=True)
+        base = os.path.join(d, f"{kind}_{int(now * 1000)}")
+        if kind == "audio":
+            self.path = base + ".wav"
+            self._f = open(self.path, "wb", buffering=rec.buffer_bytes)
+            self._wav = wave.open(self._f, "wb")
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(RATE)
+            self.first_ts: Optional[int] = None
+            self.pos = 0   # mẫu đã ghi
+        else:
+            self.path = base + ".mjpeg"
+            self._f = open(self.path, "wb", buffering=rec.buffer_bytes)
+            self._idx = open(base + ".idx", "w", buffering=rec.buffer_bytes // 8)
+            self.offset = 0
+
+    # ---------- audio ----------
+    def write_audio(self, ts: Optional[int], pcm: bytes, now: float) -> bool:
+        """False nếu khung phải sang đoạn mới (nhảy ts quá xa)."""
+        n = len(pcm) // 2
+        if ts is not None:
+            if self.first_ts is None:
+                self.first_ts = ts - self.pos // SAMPLES_PER_MS
+            at = ((ts - self.first_ts) & 0xFFFFFFFF) * SAMPLES_PER_MS
+            if at >= 0x80000000 * SAMPLES_PER_MS:
+                return True    # ts lùi (đảo thứ tự/trùng) → bỏ
+            gap = at - self.pos
+            if gap < 0:
+                return True    # khung đến muộn, chỗ đã ghi rồi
+            if gap > MAX_GAP_MS * SAMPLES_PER_MS:
+                return False
+            if gap:
+                self.rec._write(self._wav.writeframesraw, bytes(gap * 2))
+                self.pos += gap
+        self.rec._write(self._wav.writeframesraw, pcm)
+        self.pos += n
+        self.count += 1
+        self.last = now
+        return True
+
+    # ---------- video ----------
+    def write_video(self, ts: Optional[int], jpeg: bytes, now: float) -> None:
+        self.rec._write(self._f.write, jpeg)
+        self._idx.write(f"{int(now * 1000)} {-1 if ts is None else ts} {self.offset} {len(jpeg)}\n")
+        self.offset += len(jpeg)
+        self.count += 1
+        self.last = now
+
+    def close(self) -> dict:
+        if self.kind == "audio":
+            self._wav.close()     # vá header WAV (nframes)
+            self._f.close()
+            extra = {"samples": self.pos, "first_ts": self.first_ts}
+        else:
+            self._f.close()
+            self._idx.close()
+            extra = {"frames": self.count, "bytes": self.offset,
+                     "index": os.path.basename(self.path[:-6] + ".idx")}
+        return dict({"user": self.user, "kind": self.kind, "file": os.path.relpath(self.path, self.rec.directory),
+                     "start": round(self.start, 3), "end": round(self.last, 3), "packets": self.count}, **extra)
+
+
+class MeetingRecorder:
+    def __init__(self, directory: str, rooms: Optional[Iterable[str]] = None,
+                 segment_sec: float = 60.0, idle_sec: float = 10.0,
+                 max_queue_bytes: int = 64 << 20, video_limit: float = 0.5,
+                 buffer_bytes: int = 1 << 20) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.rooms = None if rooms is None else set(rooms)   # None = mọi phòng
+        self.segment_sec = segment_sec
+        self.idle_sec = idle_sec
+        self.max_queue_bytes = max_queue_bytes
+        self.video_limit_bytes = int(max_queue_bytes * video_limit)
+        self.buffer_bytes = buffer_bytes
+        self._q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._qlock = threading.Lock()
+        self._queued = 0
+        self._segments: Dict[Tuple[str, str, str], _Segment] = {}
+        self._decoders: Dict[Tuple[str, str, int], object] = {}
+        self._closed = False
+        # counters
+        self.offered = 0
+        self.video_dropped = 0
+        self.audio_dropped = 0
+        self.undecodable = 0
+        self.written_bytes = 0
+        self.segments_closed = 0
+        self.queue_peak = 0
+        self._thread = threading.Thread(target=self._run, name="meeting-recorder", daemon=True)
+        self._thread.start()
+
+    # ---------- chọn phòng ----------
+    def wants(self, room: str) -> bool:
+        return self.rooms is None or room in self.rooms
+
+    def start_room(self, room: str) -> None:
+        if self.rooms is not None:
+            self.rooms.add(room)
+
+    def stop_room(self, room: str) -> None:
+        if self.rooms is None:
+            self.rooms = set()
+        self.rooms.discard(room)
+        self._q.put(("close_room", room))
+
+    # ---------- từ _serve (không chặn) ----------
+    def offer(self, mtype: int, room: str, user: str, ts: Optional[int], payload: bytes,
+              now: Optional[float] = None) -> None:
+        if self._closed or not self.wants(room):
+            return
+        size = len(payload)
+        with self._qlock:
+            if mtype == MSG_VIDEO and self._queued + size > self.video_limit_bytes:
+                self.video_dropped += 1   # đĩa không theo kịp: hy sinh hình trước
+                return
+            if self._queued + size > self.max_queue_bytes:
+                self.audio_dropped += 1
+                return
+            self._queued += size
+            self.queue_peak = max(self.queue_peak, self._queued)
+        self.offered += 1
+        self._q.put((mtype, room, user, ts, payload, time.time() if now is None else now))
+
+    # ---------- luồng ghi ----------
+    def _write(self, write, data: bytes) -> None:
+        """Mọi byte ra đĩa đi qua đây (bench thay bằng bản chậm để giả lập đĩa yếu)."""
+        write(data)
+        self.written_bytes += len(data)
+
+    def _run(self) -> None:
+        last_idle = time.time()
+        while True:
+            try:
+                item = self._q.get(timeout=1.0)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if len(item) == 2:
+                self._close_where(lambda k: k[0] == item[1])
+            elif item:
+                mtype, room, user, ts, payload, now = item
+                with self._qlock:
+                    self._queued -= len(payload)
+                try:
+                    if mtype == MSG_VOICE:
+                        self._on_voice(room, user, ts, payload, now)
+                    elif mtype == MSG_VIDEO:
+                        self._on_video(room, user, ts, payload, now)
+                except Exception as e:
+                    print("[Recorder] write error:", e)
+            t = time.time()
+            if t - last_idle > 1.0:
+                last_idle = t
+                self._close_where(lambda k: t - self._segments[k].last > self.idle_sec)
+        self._close_where(lambda k: True)
+
+    def _segment(self, room: str, user: str, kind: str, now: float) -> _Segment:
+        key = (room, user, kind)
+        seg = self._segments.get(key)
+        if seg is not None and now - seg.start >= self.segment_sec:
+            self._close(key)
+            seg = None
+        if seg is None:
+            seg = self._segments[key] = _Segment(self, room, user, kind, now)
+        return seg
+
+    def _on_voice(self, room: str, user: str, ts: Optional[int], payload: bytes, now: float) -> None:
+        parts = split_voice(payload) if create_codec else None
+        if not parts:
+            self.undecodable += 1
+            return
+        codec_id, body = parts
+        if codec_id == CODEC_CN:
+            pcm = bytes(FRAME_SAMPLES * 2)     # DTX/comfort noise → lặng
+        else:
+            dec = self._decoders.get((room, user, codec_id))
+            if dec is None:
+                try:
+                    dec = self._decoders[(room, user, codec_id)] = create_codec(codec_id, RATE, FRAME_SAMPLES)
+                except Exception:
+                    self.undecodable += 1
+                    return
+            try:
+                pcm = dec.decode(body)
+            except Exception:
+                pcm = None
+            if pcm is None or len(pcm) != FRAME_SAMPLES * 2:
+                # khung PCM lẻ byte/sai cỡ sẽ làm lệch mọi mẫu sau trong WAV → bỏ
+                self.undecodable += 1
+                return
+        seg = self._segment(room, user, "audio", now)
+        if not seg.write_audio(ts, pcm, now):
+            self._close((room, user, "audio"))
+            self._segment(room, user, "audio", now).write_audio(ts, pcm, now)
+
+    def _on_video(self, room: str, user: str, ts: Optional[int], payload: bytes, now: float) -> None:
+        self._segment(room, user, "video", now).write_video(ts, payload, now)
+
+    def _close(self, key: Tuple[str, str, str]) -> None:
+        seg = self._segments.pop(key)
+        entry = seg.close()
+        with open(os.path.join(self.directory, _safe(key[0]), "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.segments_closed += 1
+
+    def _close_where(self, pred) -> None:
+        for key in [k for k in self._segments if pred(k)]:
+            self._close(key)
+        live = {k[:2] for k in self._segments}
+        for key in [k for k in self._decoders if k[:2] not in live]:
+            self._decoders.pop(key, None)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        with self._qlock:
+            queued = self._queued
+        return {"offered": self.offered, "queued_bytes": queued, "queue_peak": self.queue_peak,
+                "video_dropped": self.video_dropped, "audio_dropped": self.audio_dropped,
+                "undecodable": self.undecodable, "written_bytes": self.written_bytes,
+                "open_segments": len(self._segments), "segments_closed": self.segments_closed}
@@ -0,0 +1,281 @@
+"""
+Ghép kênh (multiplex) nhiều phiên TCP logic trên ít kết nối thật giữa
+gateway WebSocket và TCP server.
+
+Gateway mở kết nối, gửi {"type": "mux_hello"} (plain, như tin đầu tiên của
+client thường), server trả {"type": "mux_ok"} rồi hai bên chỉ trao đổi khung:
+
+    sid(I) kind(B) len(I) | data
+
+    OPEN   data = JSON {"peer": [ip, port]} của trình duyệt
+    DATA   data = đúng các byte mà phiên đó lẽ ra ghi lên socket riêng
+           (tin JSON có tiền tố độ dài, AES-GCM sau login_ok như cũ)
+    CLOSE  phiên kết thúc (bên nào đóng trước cũng được)
+
+Mỗi phiên được trình bày như cặp (asyncio.StreamReader, MuxSessionWriter)
+nên handle_client phía server và _handle_ws phía gateway chạy nguyên như
+với socket riêng: mỗi phiên vẫn có Client, khoá AES và session riêng.
+
+`peer` trong OPEN được server tin như peername của phiên (udp_register dùng
+IP này), nên chỉ kết nối từ địa chỉ gateway đã cấu hình mới được mux
+(config_server.MUX_ALLOWED_PEERS, hoặc biến môi trường HPH_MUX_ALLOW
+= danh sách IP cách nhau bởi dấu phẩy).
+
+Một phiên đọc chậm (vd. handle_client kẹt ở drain) không được làm vòng đọc
+chung phình bộ nhớ: khi DATA chờ đọc của phiên vượt SESSION_MAX_BUFFERED,
+riêng phiên đó bị đóng (gửi CLOSE). Không tạm dừng vòng đọc chung, vì như
+thế một phiên chậm sẽ chặn mọi phiên khác trên cùng kết nối.
+"""
+import asyncio
+import json
+import os
+import struct
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from advanced_feature import config_server
+from .protocol import read_msg, send_msg
+
+MUX_VERSION = 1
+FRAME = struct.Struct("!IBI")
+OPEN, DATA, CLOSE = 1, 2, 3
+MAX_FRAME = 16 << 20
+SESSION_LIMIT = 1 << 20          # giới hạn buffer đọc của mỗi phiên (như StreamReader mặc định x16)
+SESSION_MAX_BUFFERED = 4 << 20   # DATA chưa đọc tối đa mỗi phiên, quá thì đóng phiên đó
+
+Session = Tuple[asyncio.StreamReader, "MuxSessionWriter"]
+
+MUX_ALLOWED = frozenset(ip.strip() for ip in
+                        (os.environ.get("HPH_MUX_ALLOW") or ",".join(config_server.MUX_ALLOWED_PEERS)).split(",")
+                        if ip.strip())
+
+
+def mux_allowed(peer) -> bool:
+    """Kết nối từ `peer` có được gửi mux_hello không (chỉ gateway tin cậy)."""
+    if not peer:
+        return False
+    ip = str(peer[0])
+    if ip.startswith("::ffff:"):                # IPv4 qua socket IPv6
+        ip = ip[len("::ffff:"):]
+    return ip in MUX_ALLOWED
+
+
+class MuxSessionWriter:
+    """Thay asyncio.StreamWriter cho một phiên: write() đóng khung DATA lên kết nối chung."""
+
+    def __init__(self, conn: "MuxConnection", sid: int, peer) -> None:
+        self._conn = conn
+        self.sid = sid
+        self.peer = peer
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        if self._closed or not data:
+            return      # như socket đã đóng: bỏ, lỗi sẽ lộ ở drain()/read
+        self._conn._send_frame(self.sid, DATA, data)
+
+    async def drain(self) -> None:
+        await self._conn.writer.drain()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._conn._end_session(self.sid, notify=True)
+
+    async def wait_closed(self) -> None:
+        return None
+
+    def is_closing(self) -> bool:
+        return self._closed or self._conn.writer.is_closing()
+
+    def get_extra_info(self, name: str, default=None):
+        if name == "peername":
+            return self.peer
+        return self._conn.writer.get_extra_info(name, default)
+
+
+class MuxConnection:
+    """Một kết nối TCP thật mang nhiều phiên; dùng chung cho cả hai phía."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 on_open: Optional[Callable[[asyncio.StreamReader, MuxSessionWriter], None]] = None) -> None:
+        self.reader = reader
+        self.writer = writer
+        self._on_open = on_open
+        self.sessions: Dict[int, Session] = {}
+        self._next_sid = 1
+        self.closed = False
+        # counters
+        self.opened = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.overflow_closed = 0
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def _send_frame(self, sid: int, kind: int, data: bytes = b"") -> None:
+        if self.closed:
+            return
+        # một lần write() cho cả khung: các phiên không bao giờ chen nhau giữa khung
+        self.writer.write(FRAME.pack(sid, kind, len(data)) + data)
+        self.frames_out += 1
+
+    def _new_session(self, sid: int, peer) -> Session:
+        reader = asyncio.StreamReader(limit=SESSION_LIMIT)
+        writer = MuxSessionWriter(self, sid, peer)
+        self.sessions[sid] = (reader, writer)
+        self.opened += 1
+        return reader, writer
+
+    def _end_session(self, sid: int, notify: bool) -> None:
+        s = self.sessions.pop(sid, None)
+        if s is None:
+            return
+        s[0].feed_eof()
+        s[1]._closed = True
+        if notify:
+            self._send_frame(sid, CLOSE)
+
+    # ---------- phía gateway ----------
+    def open_session(self, peer=None) -> Session:
+        sid = self._next_sid
+        self._next_sid = (self._next_sid % 0xFFFFFFFF) + 1
+        session = self._new_session(sid, tuple(peer) if peer else None)
+        self._send_frame(sid, OPEN, json.dumps({"peer": list(peer) if peer else None}).encode())
+        return session
+
+    # ---------- vòng đọc khung ----------
+    async def run(self) -> None:
+        try:
+            while True:
+                head = await self.reader.readexactly(FRAME.size)
+                sid, kind, ln = FRAME.unpack(head)
+                if ln > MAX_FRAME:
+                    raise ValueError(f"mux frame too large: {ln}")
+                data = await self.reader.readexactly(ln) if ln else b""
+                self.frames_in += 1
+                if kind == DATA:
+                    s = self.sessions.get(sid)
+                    if s is None:
+                        continue
+                    # StreamReader không có API độ sâu; _buffer là bytearray chờ đọc
+                    if len(s[0]._buffer) + len(data) > SESSION_MAX_BUFFERED:
+                        self.overflow_closed += 1
+                        self._end_session(sid, notify=True)
+                        continue
+                    s[0].feed_data(data)
+                elif kind == OPEN:
+                    if sid in self.sessions or self._on_open is None:
+                        continue
+                    try:
+                        peer = json.loads(data or b"{}").get("peer")
+                    except ValueError:
+                        peer = None
+                    self._on_open(*self._new_session(sid, tuple(peer) if peer else None))
+                elif kind == CLOSE:
+                    self._end_session(sid, notify=False)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:                 # khung quá lớn: luồng byte không còn tin được
+            print(f"[TCP] mux connection {self.writer.get_extra_info('peername')} dropped: {e}")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for sid in list(self.sessions):
+            self._end_session(sid, notify=False)
+        self.closed = True
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+# ---------- phía server ----------
+async def serve_mux(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    handler: Callable[[asyncio.StreamReader, MuxSessionWriter], Awaitable[None]]) -> None:
+    """Gọi sau khi handle_client nhận mux_hello: mỗi OPEN chạy handler như một kết nối mới."""
+    tasks = set()
+
+    def on_open(r: asyncio.StreamReader, w: MuxSessionWriter) -> None:
+        task = asyncio.create_task(handler(r, w))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await send_msg(writer, {"ok": True, "type": "mux_ok", "version": MUX_VERSION})
+    conn = MuxConnection(reader, writer, on_open)
+    peer = writer.get_extra_info("peername")
+    print(f"[TCP] mux upstream from {peer}")
+    await conn.run()
+    if tasks:
+        # EOF đã được đẩy vào mọi phiên: chờ handler dọn state (clients/rooms/session)
+        await asyncio.wait(list(tasks), timeout=10)
+    print(f"[TCP] mux upstream {peer} closed ({conn.opened} sessions)")
+
+
+# ---------- phía gateway ----------
+class UpstreamPool:
+    """Vài kết nối mux dài hạn tới TCP server; phiên mới vào kết nối ít phiên nhất."""
+
+    def __init__(self, host: str, port: int, size: int = 4, connect_timeout: float = 5.0) -> None:
+        self.host = host
+        self.port = port
+        self.size = max(1, size)
+        self.connect_timeout = connect_timeout
+        self._conns: list = []
+        self._tasks: Dict[MuxConnection, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> MuxConnection:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                self.connect_timeout)
+        try:
+            await send_msg(writer, {"type": "mux_hello", "payload": {"version": MUX_VERSION}})
+            reply = await asyncio.wait_for(read_msg(reader), self.connect_timeout)
+        except Exception:
+            writer.close()
+            raise
+        if reply.get("type") != "mux_ok":
+            writer.close()
+            raise ConnectionError(f"upstream does not support mux: {reply}")
+        conn = MuxConnection(reader, writer)
+        self._conns.append(conn)
+        self._tasks[conn] = asyncio.create_task(self._run(conn))
+        return conn
+
+    async def _run(self, conn: MuxConnection) -> None:
+        try:
+            await conn.run()
+        finally:
+            # phiên trên kết nối này đã nhận EOF → WS tương ứng tự đóng; lần sau nối lại
+            if conn in self._conns:
+                self._conns.remove(conn)
+            self._tasks.pop(conn, None)
+
+    async def open_session(self, peer=None) -> Session:
+        async with self._lock:
+            live = [c for c in self._conns if not c.closed]
+            if len(live) < self.size:
+                try:
+                    conn = await self._connect()
+                except Exception:
+                    if not live:
+                        raise
+                    conn = min(live, key=len)   # chưa mở thêm được: dồn vào kết nối đang sống
+            else:
+                conn = min(live, key=len)
+        return conn.open_session(peer)
+
+    async def close(self) -> None:
+        for conn in list(self._conns):
+            conn.close()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"connections": len(self._conns),
+                "sessions": [len(c) for c in self._conns],
+                "opened": sum(c.opened for c in self._conns)}
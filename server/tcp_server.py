@@ -2,17 +2,29 @@ import asyncio, base64
 from .protocol import send_msg, read_msg, send_msg_secure, read_msg_secure, read_any, send_any
 from .tcp_state import clients, rooms, Client
 from .routing import send_to_user
-from .auth import login_or_register, create_session, end_session, get_session_key, touch_session
+from .auth import (login_or_register, create_session, end_session, detach_session, resume_session,
+                   get_session_key, touch_session)
+from .tcp_mux import serve_mux, mux_allowed
 
 
 async def handle_client(reader, writer):
     peer = writer.get_extra_info("peername")
     username = None
     aes_key = None
+    me = None               # Client của kết nối này (resume có thể thay nó bằng kết nối mới)
+    logged_out = False
 
     try:
         while True:
-            msg = await read_any(reader, aes_key)
+            try:
+                msg = await read_any(reader, aes_key)
+            except ValueError:
+                # JSON hỏng (gateway chuyển thẳng byte của trình duyệt): báo lỗi, giữ phiên
+                await send_any(writer, {"ok": False, "type": "error", "error": "Invalid JSON"}, aes_key)
+                continue
+            if not isinstance(msg, dict):
+                await send_any(writer, {"ok": False, "type": "error", "error": "Invalid JSON"}, aes_key)
+                continue
             t = msg.get("type")
             p = msg.get("payload", {})
 
@@ -22,26 +34,27 @@ async def handle_client(reader, writer):
                 password = p.get("password", "")
 
                 if not username:
-                    await send_msg(writer, {"ok": False, "type": "error", "error": "Missing username"})
+                    await send_msg(writer, {"ok": False, "id": msg.get("id"), "type": "error", "error": "Missing username"})
                     continue
 
                 if username in clients:
-                    await send_msg(writer, {"ok": False, "type": "error", "error": "Username in use"})
+                    await send_msg(writer, {"ok": False, "id": msg.get("id"), "type": "error", "error": "Username in use"})
                     continue
 
                 ok, message = login_or_register(username, password)
                 if not ok:
-                    await send_msg(writer, {"ok": False, "type": "error", "error": message})
+                    await send_msg(writer, {"ok": False, "id": msg.get("id"), "type": "error", "error": message})
                     continue
 
                 token, key = create_session(username)
                 aes_key = key
 
-                clients[username] = Client(username=username, writer=writer)
-                clients[username].aes_key = aes_key
+                me = clients[username] = Client(username=username, writer=writer)
+                me.aes_key = aes_key
 
                 await send_msg(writer, {
                     "ok": True,
+                    "id": msg.get("id"),
                     "type": "login_ok",
                     "username": username,   # thêm username để gateway nhớ
                     "token": token,
@@ -49,15 +62,55 @@ async def handle_client(reader, writer):
                 })
                 print(f"[TCP] {username} logged in from {peer} ({message})")
 
+            # ===== RESUME (nối lại bằng token, không login/PBKDF2 lại) =====
+            elif t == "resume" and username is None:
+                name = p.get("username")
+                res = resume_session(name, p.get("token"))
+                if res is None:
+                    await send_msg(writer, {"ok": False, "id": msg.get("id"), "type": "error", "error": "Resume rejected"})
+                    continue
+                token, aes_key, room = res
+                old = clients.pop(name, None)
+                if old is not None:
+                    # kết nối cũ chưa bị phát hiện là chết: kết nối mới thay chỗ
+                    room = room or old.room
+                    if old.room:
+                        rooms.get(old.room, set()).discard(name)
+                    old.writer.close()
+                username = name
+                me = clients[username] = Client(username=username, writer=writer)
+                me.aes_key = aes_key
+                await send_msg(writer, {
+                    "ok": True,
+                    "id": msg.get("id"),
+                    "type": "login_ok",
+                    "username": username,
+                    "token": token,
+                    "aes_key_b64": base64.b64encode(aes_key).decode(),
+                    "resumed": True,
+                    "room": room
+                })
+                print(f"[TCP] {username} resumed from {peer}")
+
+            # ===== MUX (gateway gom nhiều phiên trên một kết nối) =====
+            elif t == "mux_hello" and username is None:
+                if not mux_allowed(peer):
+                    # peer trong OPEN sẽ được tin như peername: chỉ gateway đã cấu hình
+                    await send_msg(writer, {"ok": False, "type": "error", "error": "Mux not allowed"})
+                    continue
+                await serve_mux(reader, writer, handle_client)
+                break
+
             # ===== LOGOUT =====
             elif t == "logout":
+                logged_out = True
                 break
 
             # ===== ROOMS =====
             elif t == "create_room":
                 r = p["room"]
                 rooms.setdefault(r, set())
-                await send_any(writer, {"ok": True, "type": "create_room_ok", "room": r}, aes_key)
+                await send_any(writer, {"ok": True, "id": msg.get("id"), "type": "create_room_ok", "room": r}, aes_key)
 
             elif t == "join_room":
                 r = p["room"]
@@ -106,7 +159,7 @@ async def handle_client(reader, writer):
 
             elif t == "list_rooms":
                 room_list = [{"name": room, "users": len(users)} for room, users in rooms.items()]
-                await send_any(writer, {"ok": True, "type": "rooms", "rooms": room_list}, aes_key)
+                await send_any(writer, {"ok": True, "id": msg.get("id"), "type": "rooms", "rooms": room_list}, aes_key)
 
             # ===== CHAT / DM =====
             elif t == "chat":
@@ -131,7 +184,7 @@ async def handle_client(reader, writer):
                 media, port = p["media"], p["port"]
                 ip = writer.get_extra_info("peername")[0]
                 clients[username].udp_endpoints[media] = (ip, port)
-                await send_any(writer, {"ok": True, "type": "udp_register_ok", "registered": media}, aes_key)
+                await send_any(writer, {"ok": True, "id": msg.get("id"), "type": "udp_register_ok", "registered": media}, aes_key)
 
             if username:
                 touch_session(username)
@@ -139,12 +192,15 @@ async def handle_client(reader, writer):
     except Exception as e:
         print(f"[TCP] Error {peer}:", e)
     finally:
-        if username:
-            r = clients.get(username, Client(username, writer)).room
+        if username and clients.get(username) is me:
+            r = me.room
             if r and username in rooms.get(r, set()):
                 rooms[r].discard(username)
             clients.pop(username, None)
-            end_session(username)
+            if logged_out:
+                end_session(username)
+            else:
+                detach_session(username, r)     # giữ phiên chờ resume
             print(f"[TCP] {username} logged out")
 
         writer.close()
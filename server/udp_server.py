@@ -7,18 +7,27 @@ from dataclasses import dataclass, field
 from typing import Dict, Tuple, Set
 
 from advanced_feature import config_client
+from server.frame_cache import FrameCache, PacedSender
+from server.media_capture import CaptureWriter
+from server.recorder import MeetingRecorder
 
 MAGIC = b"HPH1"  # 4 bytes
 # Header: magic(4s) type(B) room_len(H) user_len(H) seq(I)
 HDR_FMT = "!4sBHHI"
 HDR_SIZE = struct.calcsize(HDR_FMT)
+# HPH2 = HPH1 + ts(I) (thời điểm capture, ms). Relay chỉ đọc, chuyển nguyên gói.
+MAGIC_TS = b"HPH2"
+HDR_TS_FMT = "!4sBHHII"
+HDR_TS_SIZE = struct.calcsize(HDR_TS_FMT)
 
 # Message types
 MSG_VOICE = 1
 MSG_VIDEO = 2
+MSG_SCREEN = 3      # chia sẻ màn hình (ô thay đổi), đi chung cổng video
 MSG_JOIN = 10
 MSG_LEAVE = 11
 MSG_KEEPALIVE = 12
+MSG_FEEDBACK = 13   # bên nhận → người gửi video (mất gói, bitrate nhận)
 
 Address = Tuple[str, int]
 
@@ -30,7 +39,10 @@ class RoomState:
 
 
 class _UDPWorker:
-    def __init__(self, host: str, port: int, media_type: int) -> None:
+    def __init__(self, host: str, port: int, media_type: int,
+                 frame_cache: FrameCache | None = None, join_rate_bps: float = 16e6,
+                 capture: CaptureWriter | None = None,
+                 recorder: MeetingRecorder | None = None) -> None:
         self.host = host
         self.port = port
         self.media_type = media_type
@@ -40,6 +52,13 @@ class _UDPWorker:
         self.rooms: Dict[str, RoomState] = {}
         self._alive = False
         self._thread: threading.Thread | None = None
+        # khung video gần nhất của từng người → gửi ngay (có giãn nhịp) cho người mới JOIN
+        self.frame_cache = frame_cache
+        self._paced = PacedSender(self.sock.sendto, rate_bps=join_rate_bps)
+        # ghi lại mọi datagram nhận được (luồng ghi riêng, không chặn _serve)
+        self.capture = capture
+        # tee voice/video của các phòng được chọn sang bộ ghi cuộc họp (không chặn)
+        self.recorder = recorder
 
     @property
     def media_name(self) -> str:
@@ -61,17 +80,24 @@ class _UDPWorker:
     def _parse_packet(self, data: bytes):
         if len(data) < HDR_SIZE:
             return None
-        magic, mtype, room_len, user_len, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
-        if magic != MAGIC:
-            return None
-        off = HDR_SIZE
+        if data[:4] == MAGIC_TS:
+            if len(data) < HDR_TS_SIZE:
+                return None
+            magic, mtype, room_len, user_len, seq, ts = struct.unpack(HDR_TS_FMT, data[:HDR_TS_SIZE])
+            off = HDR_TS_SIZE
+        else:
+            ts = None
+            magic, mtype, room_len, user_len, seq = struct.unpack(HDR_FMT, data[:HDR_SIZE])
+            if magic != MAGIC:
+                return None
+            off = HDR_SIZE
         try:
             room = data[off:off + room_len].decode("utf-8"); off += room_len
             user = data[off:off + user_len].decode("utf-8"); off += user_len
         except Exception:
             return None
         payload = data[off:]
-        return mtype, room, user, seq, payload
+        return mtype, room, user, seq, payload, ts
 
     def _broadcast(self, room: str, payload: bytes, exclude: Address | None = None) -> None:
         state = self.rooms.get(room)
@@ -86,35 +112,81 @@ class _UDPWorker:
                 pass
 
     def _serve(self) -> None:
-        self.sock.settimeout(1.0)
+        stale = object()
+        timeout_for: object = stale             # hạn giãn nhịp mà timeout hiện tại được đặt theo
         while self._alive:
+            # settimeout là một syscall: chỉ đặt lại khi hạn giãn nhịp đổi (gói tới
+            # trước hạn thì flush ở dưới đã lo, timeout cũ dài hơn chút không sao)
+            deadline = self._paced.next_deadline()
+            if deadline != timeout_for:
+                delay = self._paced.next_delay()
+                self.sock.settimeout(1.0 if delay is None else min(1.0, max(0.001, delay)))
+                timeout_for = deadline
             try:
                 data, addr = self.sock.recvfrom(65535)
             except socket.timeout:
-                self._gc()
+                self._paced.flush()
+                if deadline is None:
+                    self._gc()
+                timeout_for = stale             # hết giờ trước hạn (trần 1 s): tính lại
                 continue
             except OSError:
                 break
+            if len(self._paced):
+                self._paced.flush()
+            now = time.time()
+            if self.capture is not None:
+                self.capture.offer(self.media_type, addr, data, now)
 
             parsed = self._parse_packet(data)
             if not parsed:
                 continue
-            mtype, room, user, seq, payload = parsed
+            mtype, room, user, seq, payload, ts = parsed
 
             rs = self.rooms.setdefault(room, RoomState())
-            rs.last_seen[addr] = time.time()
+            rs.last_seen[addr] = now
 
             if mtype in (MSG_JOIN, MSG_KEEPALIVE):
+                is_new = addr not in rs.users
                 rs.users[addr] = user
+                if mtype == MSG_JOIN and is_new and self.frame_cache is not None:
+                    self._paced.enqueue(self.frame_cache.frames_for(room, exclude_user=user), addr)
                 continue
             if mtype == MSG_LEAVE:
                 rs.users.pop(addr, None)
                 rs.last_seen.pop(addr, None)
+                self._forget(room, rs, user)
                 continue
 
-            if mtype in (MSG_VOICE, MSG_VIDEO):
+            if mtype in (MSG_VOICE, MSG_VIDEO, MSG_SCREEN):
+                if mtype == MSG_VIDEO and self.frame_cache is not None:
+                    self.frame_cache.put(room, user, data)
+                if self.recorder is not None and mtype != MSG_SCREEN:
+                    self.recorder.offer(mtype, room, user, ts, payload, now)
                 # forward to peers in same room (except sender)
                 self._broadcast(room, data, exclude=addr)
+            elif mtype == MSG_FEEDBACK:
+                self._forward_feedback(rs, payload, data)
+
+    def _forward_feedback(self, rs: RoomState, payload: bytes, data: bytes) -> None:
+        """Chỉ chuyển feedback tới người gửi được nhắc tới (byte đầu = độ dài tên)."""
+        if not payload:
+            return
+        try:
+            target = payload[1:1 + payload[0]].decode("utf-8")
+        except Exception:
+            return
+        for addr, name in list(rs.users.items()):
+            if name == target:
+                try:
+                    self.sock.sendto(data, addr)
+                except Exception:
+                    pass
+
+    def _forget(self, room: str, rs: RoomState, user: str) -> None:
+        """Bỏ khung cache khi người gửi không còn địa chỉ nào trong phòng."""
+        if self.frame_cache is not None and user not in rs.users.values():
+            self.frame_cache.drop(room, user)
 
     def _gc(self) -> None:
         now = time.time()
@@ -124,10 +196,16 @@ class _UDPWorker:
                 if now - ts > 20:
                     dead.add(addr)
             for addr in dead:
-                rs.users.pop(addr, None)
+                user = rs.users.pop(addr, None)
                 rs.last_seen.pop(addr, None)
+                if user is not None:
+                    self._forget(room, rs, user)
             if not rs.users:
                 self.rooms.pop(room, None)
+                if self.frame_cache is not None:
+                    self.frame_cache.drop(room)
+        if self.frame_cache is not None:
+            self.frame_cache.expire()
 
 
 class UDPServer:
@@ -141,15 +219,25 @@ class UDPServer:
     def __init__(self, host: str | None = None,
                  port: int | None = None,
                  voice_port: int | None = None,
-                 video_port: int | None = None) -> None:
+                 video_port: int | None = None,
+                 video_cache_mb: float = 16.0,
+                 capture_path: str | None = None,
+                 record_dir: str | None = None,
+                 record_rooms: list | None = None) -> None:
         host = host or getattr(config_client, "SERVER_HOST", "0.0.0.0")
         # derive ports
         if voice_port is None:
             voice_port = port if port is not None else getattr(config_client, "UDP_PORT_VOICE", 9999)
         if video_port is None:
             video_port = getattr(config_client, "UDP_PORT_VIDEO", 10000)
-        self.voice = _UDPWorker(host, int(voice_port), MSG_VOICE)
-        self.video = _UDPWorker(host, int(video_port), MSG_VIDEO)
+        # capture_path: ghi mọi datagram voice+video vào một file (bench.replay phát lại)
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+        # record_dir: ghi cuộc họp (record_rooms=None → mọi phòng)
+        self.recorder = MeetingRecorder(record_dir, record_rooms) if record_dir else None
+        self.voice = _UDPWorker(host, int(voice_port), MSG_VOICE, capture=self.capture, recorder=self.recorder)
+        cache = FrameCache(int(video_cache_mb * (1 << 20))) if video_cache_mb > 0 else None
+        self.video = _UDPWorker(host, int(video_port), MSG_VIDEO, frame_cache=cache,
+                                capture=self.capture, recorder=self.recorder)
 
     async def start(self) -> None:
         """Start workers and keep running until cancelled. Compatible with `await udp.start()`.
@@ -165,6 +253,10 @@ class UDPServer:
     def stop(self) -> None:
         self.voice.stop()
         self.video.stop()
+        if self.capture is not None:
+            self.capture.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os, json, base64, secrets, hashlib, hmac
+import importlib.util
 import logging
 import queue
 import socket
@@ -103,12 +104,24 @@ def verify_password(password: str, salt_hex: str, hash_hex: str) -> bool:
     return hmac.compare_digest(dk.hex(), hash_hex)
 
 # AES-GCM encryption
-try:
-    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-    CRYPTO_AVAILABLE = True
-except Exception:
-    AESGCM = None
-    CRYPTO_AVAILABLE = False
+# cryptography chỉ được import khi mã hoá/giải mã lần đầu (client hiện màn hình
+# login không phải chờ); ở đây chỉ kiểm tra gói có cài hay không.
+CRYPTO_AVAILABLE = importlib.util.find_spec("cryptography") is not None
+_AESGCM = None
+
+def _aesgcm():
+    global _AESGCM
+    if _AESGCM is None:
+        if not CRYPTO_AVAILABLE:
+            raise RuntimeError("AES unavailable: install 'cryptography'")
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        _AESGCM = AESGCM
+    return _AESGCM
+
+def preload_crypto() -> None:
+    """Import cryptography ngay (gọi từ luồng nền để lần mã hoá đầu không bị trễ)."""
+    if CRYPTO_AVAILABLE:
+        _aesgcm()
 
 def generate_session_key() -> bytes:
     """Sinh khóa phiên 32 byte (256-bit)."""
@@ -118,17 +131,13 @@ def aes_encrypt(plaintext: bytes, key: bytes) -> bytes:
     """
     Mã hóa AES-GCM. Gói dữ liệu = nonce(12B) | ciphertext | tag(16B).
     """
-    if not CRYPTO_AVAILABLE:
-        raise RuntimeError("AES unavailable: install 'cryptography'")
-    aes = AESGCM(key)
+    aes = _aesgcm()(key)
     nonce = os.urandom(12)
     ct = aes.encrypt(nonce, plaintext, associated_data=None)
     return nonce + ct
 
 def aes_decrypt(blob: bytes, key: bytes) -> bytes:
-    if not CRYPTO_AVAILABLE:
-        raise RuntimeError("AES unavailable: install 'cryptography'")
-    aes = AESGCM(key)
+    aes = _aesgcm()(key)
     nonce, ct = blob[:12], blob[12:]
     return aes.decrypt(nonce, ct, associated_data=None)
 